@@ -0,0 +1 @@
+"""Benchmarks for the mapping pipeline, on synthetic grids."""
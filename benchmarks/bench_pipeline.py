@@ -0,0 +1,325 @@
+"""Benchmark the mapping pipeline on synthetic grids of increasing size.
+
+For each size and case, a synthetic grid with properties (and saturations per
+date) is written to ROFF files in a work folder, and the pipeline is run with
+the profile report (see grid3d_maps.avghc._profiling), so each stage is timed:
+grid import, property import, numpies, filters, zonation, HCPFZ, mapping and
+export. The cases are:
+
+* average_map: grid3d_average_map, for all properties and dates
+* hc_thickness: the HC thickness pipeline (use_poro), from HCPFZ to maps;
+  the INIT and UNRST properties are read from ROFF files here
+
+Each case is run in a fresh process, so the peak memory is per case. The
+results are written to a JSON file, and two result files can be compared::
+
+    python -m benchmarks.bench_pipeline --sizes 100k 1M --output new.json
+    python -m benchmarks.bench_pipeline --sizes 100k 1M --compare old.json
+
+Sizes are given by name (see SIZES) or as dimensions, e.g. 300x300x40.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from multiprocessing import get_context
+from pathlib import Path
+
+import numpy as np
+import xtgeo
+import yaml
+
+from benchmarks import synthetic
+
+SIZES = {
+    "100k": "100x100x10",
+    "1M": "200x200x25",
+    "5M": "250x400x50",
+    "20M": "400x500x100",
+}
+
+CASES = ("average_map", "hc_thickness")
+
+
+def run_case(case, dims, workdir, nzones=3, ndates=2, nprops=2):
+    """Run one benchmark case in a work folder.
+
+    Returns:
+        A dict with the case setup and the time and memory use per stage
+    """
+
+    ncol, nrow, nlay = synthetic.parse_dims(dims)
+    workdir = Path(workdir)
+    (workdir / "maps").mkdir(parents=True, exist_ok=True)
+    dates = synthetic.synthetic_dates(ndates)
+
+    start = time.perf_counter()
+    grd = synthetic.synthetic_grid(ncol, nrow, nlay)
+    files = _write_data(grd, workdir, case, dates, nprops)
+    generate = time.perf_counter() - start
+
+    config = {
+        "title": "Synthetic",
+        "zonation": {"zranges": synthetic.zranges(nlay, nzones)},
+        "mapsettings": {
+            "xori": synthetic.XORI,
+            "yori": synthetic.YORI,
+            "xinc": 50.0,
+            "yinc": 50.0,
+            "ncol": ncol + 1,
+            "nrow": nrow + 1,
+        },
+        "computesettings": {"zone": True, "all": True},
+        "output": {"mapfolder": str(workdir / "maps")},
+    }
+
+    report = workdir / f"{case}_profile.json"
+    cwd = os.getcwd()
+    try:
+        os.chdir(workdir)
+        if case == "average_map":
+            _average_map(config, files, report)
+        else:
+            _hc_thickness(config, files, dates, report)
+    finally:
+        os.chdir(cwd)
+
+    stages = json.loads(report.read_text())["stages"]
+
+    return {
+        "case": case,
+        "dims": [ncol, nrow, nlay],
+        "cells": ncol * nrow * nlay,
+        "active_cells": int(grd.nactive),
+        "zones": nzones,
+        "dates": ndates,
+        "properties": nprops,
+        "generate_time": round(generate, 6),
+        "stages": summary(stages),
+    }
+
+
+def summary(stages):
+    """Sum time and take max memory per stage name, over all stage records."""
+
+    result = {}
+    for stage in stages:
+        item = result.setdefault(
+            stage["stage"],
+            {
+                "count": 0,
+                "wall_time": 0.0,
+                "cpu_time": 0.0,
+                "tracemalloc_peak_mb": 0.0,
+                "maxrss_mb": 0.0,
+            },
+        )
+        item["count"] += 1
+        item["wall_time"] = round(item["wall_time"] + stage["wall_time"], 6)
+        item["cpu_time"] = round(item["cpu_time"] + stage["cpu_time"], 6)
+        for key in ("tracemalloc_peak_mb", "maxrss_mb"):
+            item[key] = max(item[key], stage[key] or 0.0)
+    return result
+
+
+def _write_data(grd, workdir, case, dates, nprops):
+    """Write the grid and properties as ROFF; returns {name: filename}."""
+
+    files = {"grid": str(workdir / "grid.roff")}
+    grd.to_file(files["grid"])
+
+    values = synthetic.synthetic_properties(grd, nprops)
+    if case == "average_map":
+        for date, sat in synthetic.synthetic_saturations(grd, dates).items():
+            if date.startswith("SWAT"):
+                values[date] = sat
+    else:
+        values = {"PORO": values["PORO"], "NTG": values["NTG"]}
+        bulk = np.ma.filled(grd.get_bulk_volume(asmasked=False).values)
+        values["PORV"] = values["PORO"] * values["NTG"] * bulk
+        values["DX"] = np.ma.filled(grd.get_dx(asmasked=False).values)
+        values["DY"] = np.ma.filled(grd.get_dy(asmasked=False).values)
+        values["DZ"] = np.ma.filled(grd.get_dz(asmasked=False).values)
+        values.update(synthetic.synthetic_saturations(grd, dates))
+
+    for name, array in values.items():
+        files[name] = str(workdir / f"{name.lower()}.roff")
+        prop = xtgeo.GridProperty(grd, values=array, name=name)
+        prop.to_file(files[name], name=name)
+
+    return files
+
+
+def _average_map(config, files, report):
+    from grid3d_maps.avghc import grid3d_average_map
+
+    config["input"] = {name.lower(): filename for name, filename in files.items()}
+    Path("average_map.yml").write_text(yaml.dump(config), encoding="utf8")
+
+    grid3d_average_map.main(
+        ["--config", "average_map.yml", "--profile-report", str(report)]
+    )
+
+
+def _hc_thickness(config, files, dates, report):
+    from grid3d_maps.avghc import _get_grid_props, _profiling, grid3d_hc_thickness
+
+    config["input"] = {"grid": files["grid"], "dates": dates}
+    config["computesettings"].update(mode="oil", method="use_poro")
+    Path("hc_thickness.yml").write_text(yaml.dump(config), encoding="utf8")
+
+    with _profiling.profile_report(str(report), "hc_thickness benchmark"):
+        with _profiling.stage("config parse"):
+            args = grid3d_hc_thickness.do_parse_args(["--config", "hc_thickness.yml"])
+            config = grid3d_hc_thickness.yamlconfig(args.config, args)
+
+        grd, _, _, _ = _get_grid_props.import_data(
+            "grid3d_hc_thickness", files["grid"], {}, {}, []
+        )
+
+        # as from INIT and UNRST files, with the same names
+        with _profiling.stage("property import"):
+            initobjects = []
+            restobjects = []
+            for name, filename in files.items():
+                if name == "grid":
+                    continue
+                prop = xtgeo.gridproperty_from_file(filename, name=name, grid=grd)
+                if "_" in name:
+                    prop.date = name.split("_")[1]
+                    restobjects.append(prop)
+                else:
+                    initobjects.append(prop)
+
+        with _profiling.stage("numpies"):
+            initd, restartd = _get_grid_props.get_numpies_hc_thickness(
+                config, grd, initobjects, restobjects, dates
+            )
+
+        grid3d_hc_thickness.compute_maps(config, grd, initd, restartd, dates)
+
+
+def run(sizes, cases=CASES, workdir=None, in_process=False, **kwargs):
+    """Run the benchmark cases for all sizes.
+
+    Each case is run in a fresh process, unless in_process is True.
+
+    Returns:
+        The benchmark result, as a dict
+    """
+
+    results = []
+    for size in sizes:
+        dims = SIZES.get(size, size)
+        for case in cases:
+            with tempfile.TemporaryDirectory(dir=workdir) as tmpdir:
+                if in_process:
+                    result = run_case(case, dims, tmpdir, **kwargs)
+                else:
+                    with ProcessPoolExecutor(
+                        max_workers=1, mp_context=get_context("spawn")
+                    ) as executor:
+                        result = executor.submit(
+                            run_case, case, dims, tmpdir, **kwargs
+                        ).result()
+            result["size"] = size
+            results.append(result)
+            print(_describe(result), flush=True)
+
+    return {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "host": platform.node(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+        "versions": _versions(),
+        "results": results,
+    }
+
+
+def compare(old, new):
+    """Compare wall time per (case, size, stage); returns text lines."""
+
+    def _index(benchmark):
+        return {
+            (result["case"], result["size"], stage): item["wall_time"]
+            for result in benchmark["results"]
+            for stage, item in result["stages"].items()
+        }
+
+    oldtimes, newtimes = _index(old), _index(new)
+    lines = [f"{'case':14s} {'size':12s} {'stage':18s} {'old':>9s} {'new':>9s} ratio"]
+    for key in sorted(set(oldtimes) & set(newtimes)):
+        ratio = newtimes[key] / oldtimes[key] if oldtimes[key] > 0 else float("nan")
+        lines.append(
+            f"{key[0]:14s} {key[1]:12s} {key[2]:18s} "
+            f"{oldtimes[key]:9.3f} {newtimes[key]:9.3f} {ratio:5.2f}"
+        )
+    return lines
+
+
+def _describe(result):
+    total = result["stages"]["total"]
+    return (
+        f"{result['case']:14s} {result['size']:12s} {result['cells']:>10d} cells "
+        f"{total['wall_time']:9.2f} s {total['maxrss_mb']:9.1f} MB"
+    )
+
+
+def _versions():
+    versions = {"numpy": np.__version__, "xtgeo": xtgeo.__version__}
+    try:
+        from grid3d_maps.version import __version__
+    except ImportError:
+        __version__ = "0.0.0"
+    versions["grid3d_maps"] = __version__
+    return versions
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.bench_pipeline",
+        description="Benchmark the mapping pipeline on synthetic grids.",
+    )
+    parser.add_argument(
+        "--sizes",
+        nargs="+",
+        default=["100k", "1M"],
+        help=f"Sizes, as {list(SIZES)} or dimensions like 300x300x40",
+    )
+    parser.add_argument("--cases", nargs="+", choices=CASES, default=list(CASES))
+    parser.add_argument("--zones", type=int, default=3, help="Number of zones")
+    parser.add_argument("--dates", type=int, default=2, help="Number of dates")
+    parser.add_argument(
+        "--properties", type=int, default=2, help="Number of properties (>= 2)"
+    )
+    parser.add_argument("--workdir", default=None, help="Folder for the data")
+    parser.add_argument("--output", default="benchmark.json", help="Result file")
+    parser.add_argument("--compare", default=None, help="Earlier result file")
+    args = parser.parse_args(args)
+
+    benchmark = run(
+        args.sizes,
+        cases=args.cases,
+        workdir=args.workdir,
+        nzones=args.zones,
+        ndates=args.dates,
+        nprops=max(2, args.properties),
+    )
+    with open(args.output, "w", encoding="utf8") as stream:
+        json.dump(benchmark, stream, indent=2)
+    print(f"Results are written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf8") as stream:
+            print("\n".join(compare(json.load(stream), benchmark)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
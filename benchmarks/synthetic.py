@@ -0,0 +1,130 @@
+"""Synthetic corner point grids and properties for benchmarking.
+
+The grid is an anticline with vertical pillars, layers that thin towards the
+flanks, and a fraction of randomly inactive cells. Zones are k ranges of equal
+size. Saturations are made from the depth of the cell centers and an oil water
+contact that rises with each date, so the HC thickness maps are not trivial.
+"""
+
+import numpy as np
+import xtgeo
+
+XORI = 460000.0
+YORI = 5930000.0
+
+
+def parse_dims(dims):
+    """Parse dimensions on the form '100x100x10' to (ncol, nrow, nlay)."""
+    ncol, nrow, nlay = (int(dim) for dim in str(dims).lower().split("x"))
+    return ncol, nrow, nlay
+
+
+def synthetic_grid(
+    ncol,
+    nrow,
+    nlay,
+    xinc=50.0,
+    yinc=50.0,
+    top=1600.0,
+    thickness=100.0,
+    relief=80.0,
+    inactive=0.05,
+    seed=1234,
+):
+    """Make a corner point grid of an anticline.
+
+    Args:
+        ncol, nrow, nlay: Grid dimensions
+        xinc, yinc: Cell size (m)
+        top: Depth of the crest (m)
+        thickness: Reservoir thickness at the crest (m)
+        relief: Depth of the top at the corners, relative to the crest (m)
+        inactive: Fraction of randomly inactive cells
+        seed: Random seed
+
+    Returns:
+        An xtgeo Grid
+    """
+
+    xpil = XORI + xinc * np.arange(ncol + 1)
+    ypil = YORI + yinc * np.arange(nrow + 1)
+    xpil, ypil = np.meshgrid(xpil, ypil, indexing="ij")
+
+    # normalized distance from the crest, 0 at the crest and 1 at the corners
+    uval = np.linspace(-1.0, 1.0, ncol + 1)[:, np.newaxis]
+    vval = np.linspace(-1.0, 1.0, nrow + 1)[np.newaxis, :]
+    dist = 0.5 * (uval**2 + vval**2)
+
+    ztop = top + relief * dist
+    zthick = thickness * (1.0 - 0.4 * dist)
+    zbot = ztop + zthick
+
+    coordsv = np.stack((xpil, ypil, ztop, xpil, ypil, zbot), axis=-1)
+
+    kfrac = np.linspace(0.0, 1.0, nlay + 1)
+    zcorn = ztop[..., np.newaxis] + zthick[..., np.newaxis] * kfrac
+    zcornsv = np.repeat(zcorn[..., np.newaxis], 4, axis=-1).astype(np.float32)
+
+    rng = np.random.default_rng(seed)
+    actnumsv = (rng.random((ncol, nrow, nlay)) >= inactive).astype(np.int32)
+
+    return xtgeo.Grid(coordsv, zcornsv, actnumsv)
+
+
+def zranges(nlay, nzones):
+    """Zones as k ranges of (about) equal size, as in the zonation config."""
+
+    bounds = np.linspace(0, nlay, min(nzones, nlay) + 1).round().astype(int)
+    return [
+        {f"Z{izone + 1}": [int(bounds[izone]) + 1, int(bounds[izone + 1])]}
+        for izone in range(len(bounds) - 1)
+    ]
+
+
+def synthetic_properties(grd, nprops=2, seed=1234):
+    """Make continuous properties, PORO and NTG first, then PROP3, ...
+
+    Returns:
+        A dict {name: 3D numpy}
+    """
+
+    rng = np.random.default_rng(seed)
+    ncol, nrow, nlay = grd.dimensions
+    iind = np.linspace(0.0, 6.0, ncol)[:, np.newaxis, np.newaxis]
+    jind = np.linspace(0.0, 4.0, nrow)[np.newaxis, :, np.newaxis]
+    kind = np.linspace(0.0, 3.0, nlay)[np.newaxis, np.newaxis, :]
+
+    trend = np.sin(iind) * np.cos(jind) + np.sin(kind)
+    props = {}
+    for iprop in range(nprops):
+        name = {0: "PORO", 1: "NTG"}.get(iprop, f"PROP{iprop + 1}")
+        noise = rng.random(grd.dimensions, dtype=np.float32)
+        values = 0.2 + 0.05 * trend + 0.05 * (noise - 0.5)
+        if name == "NTG":
+            values = np.clip(3.0 * values, 0.0, 1.0)
+        props[name] = values.astype(np.float64)
+    return props
+
+
+def synthetic_dates(ndates):
+    """Dates on YYYYMMDD form, one year apart."""
+    return [f"{2000 + idate}0101" for idate in range(ndates)]
+
+
+def synthetic_saturations(grd, dates, owc=1680.0, rise=5.0, goc=1630.0):
+    """Make SWAT and SGAS per date, with an OWC that rises with each date.
+
+    Returns:
+        A dict {"SWAT_<date>": 3D numpy, "SGAS_<date>": 3D numpy, ...}
+    """
+
+    zcell = np.ma.filled(grd.get_xyz(asmasked=False)[2].values)
+    sats = {}
+    for idate, date in enumerate(dates):
+        contact = owc - rise * idate
+        swat = np.clip(0.2 + 0.8 * (zcell - contact + 10.0) / 20.0, 0.2, 1.0)
+        sgas = np.clip(0.7 * (goc - zcell) / 20.0, 0.0, 0.8)
+        sgas = np.minimum(sgas, 1.0 - swat)
+        sats[f"SWAT_{date}"] = swat
+        sats[f"SGAS_{date}"] = sgas
+    return sats
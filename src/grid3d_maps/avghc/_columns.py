@@ -0,0 +1,207 @@
+"""Private module for the column table, for re-mapping without 3D data.
+
+The same realization is often mapped at several resolutions or extents, and
+each run reads the grid and the UNRST again. With ``output: columns: FILE``,
+the cells are summed per grid column (i, j) and zone once, to a column table:
+
+* the representative x and y of each column in the zone, the mean of the cell
+  centers of its active cells
+* the sum of each weight (dz by default), with the filters applied
+* the sum of each property times its weight (average maps)
+* the sum of the HCPFZ for each HC mode and date (HC thickness maps)
+
+With ``--from-columns FILE``, the maps are made from the table for any
+mapsettings, in seconds: each zone is gridded as one layer, from the column
+sums at the column x and y, as with ``zone_avg``. Only the (weighted) mean is
+made for average maps. The table is additive over the k-slabs of a grid (see
+_slabs).
+
+The layout of the file is as for the map cube (see grid3d_maps.mapcube)::
+
+    [32 bytes header]   magic, version, offset and length of the index
+    [array 0]           float64 values, C order (ncol, nrow) of the grid
+    [array 1]
+    ...
+    [index]             JSON with the grid, the zones and the array table
+
+The arrays are not compressed, and are read as memory mapped numpies.
+"""
+
+import json
+import logging
+import struct
+
+import numpy as np
+
+from . import _get_zonation_filters
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"G3DCOLTB"
+VERSION = 1
+HEADER = struct.Struct("<8sIIQQ")  # magic, version, reserved, index offset, length
+DTYPE = "<f8"
+
+# coordinates of columns without active cells in a zone; skipped in the gridding
+UNDEF = 1e33
+
+
+class ColumnSums:
+    """The sums per grid column and zone, added for a grid or its k-slabs.
+
+    Args:
+        config: The configuration dictionary
+        zoned: The zones, as from _get_zonation_filters.zonation()
+    """
+
+    def __init__(self, config, zoned):
+        self.zones = _get_zonation_filters.zones_to_map(config, zoned)
+        self.shape = None
+        self._sums = {}
+
+    def add_cells(self, zonation, cells):
+        """Add the cell centers of the active cells, as (xc, yc, actnum)."""
+
+        xc, yc, actnum = cells
+        self.shape = xc.shape[:2]
+        for zname, inzone in self._inzones(zonation):
+            active = inzone & (actnum > 0)
+            self._add((zname, "cells", ""), active)
+            self._add((zname, "x", ""), np.where(active, xc, 0.0))
+            self._add((zname, "y", ""), np.where(active, yc, 0.0))
+
+    def add_sums(self, zonation, kind, sums):
+        """Add the column sums of the 3D numpies in sums, by name, for a kind."""
+
+        for zname, inzone in self._inzones(zonation):
+            for name, values in sums.items():
+                self._add((zname, kind, str(name)), np.where(inzone, values, 0.0))
+
+    def _inzones(self, zonation):
+        for zname, zrange in self.zones:
+            usezonation, usezrange = _get_zonation_filters.zone_subset(
+                zonation, zname, zrange
+            )
+            yield zname, usezonation == usezrange
+
+    def _add(self, key, values):
+        sums = values.sum(axis=2, dtype=np.float64)
+        if key in self._sums:
+            sums = self._sums[key] + sums
+        self._sums[key] = sums
+
+    def write(self, filename, **meta):
+        """Write the column table, with meta data (e.g. the app and geometrics)."""
+
+        if self.shape is None:
+            raise ValueError("No cells are added to the column sums")
+
+        zones = [zname for zname, _ in self.zones]
+        if not zones:
+            logger.warning(
+                "No zones to map (zone and all are off); the column table %s "
+                "has no arrays",
+                filename,
+            )
+
+        with open(filename, "wb") as stream:
+            stream.write(HEADER.pack(MAGIC, VERSION, 0, 0, 0))
+            arrays = []
+            for zname in zones:
+                count = self._sums[(zname, "cells", "")]
+                for key, values in self._sums.items():
+                    if key[0] != zname or key[1] == "cells":
+                        continue
+                    if key[1] in ("x", "y"):
+                        # the mean of the cell centers of the active cells
+                        values = np.where(
+                            count > 0, values / np.where(count > 0, count, 1.0), UNDEF
+                        )
+                    arrays.append(
+                        {
+                            "zone": key[0],
+                            "kind": key[1],
+                            "name": key[2],
+                            "offset": stream.tell(),
+                        }
+                    )
+                    stream.write(np.ascontiguousarray(values, dtype=DTYPE).tobytes())
+
+            index = dict(
+                meta,
+                shape=list(self.shape),
+                dtype=DTYPE,
+                zones=zones,
+                arrays=arrays,
+            )
+            buffer = json.dumps(index, default=float).encode("utf8")
+            offset = stream.tell()
+            stream.write(buffer)
+            stream.seek(0)
+            stream.write(HEADER.pack(MAGIC, VERSION, 0, offset, len(buffer)))
+
+        logger.info(
+            "Column table with %s arrays for %s zones written to %s",
+            len(arrays),
+            len(zones),
+            filename,
+        )
+
+
+class ColumnTable:
+    """Read a column table; the arrays are memory mapped.
+
+    Args:
+        filename: Name of the column table file
+    """
+
+    def __init__(self, filename):
+        self.filename = str(filename)
+        with open(self.filename, "rb") as stream:
+            magic, version, _, offset, length = HEADER.unpack(stream.read(HEADER.size))
+            if magic != MAGIC:
+                raise ValueError(f"File {self.filename} is not a column table")
+            if version > VERSION:
+                raise ValueError(f"Unsupported column table version {version}")
+            stream.seek(offset)
+            self.index = json.loads(stream.read(length).decode("utf8"))
+
+        self._arrays = {
+            (item["zone"], item["kind"], item["name"]): item
+            for item in self.index["arrays"]
+        }
+
+    @property
+    def zones(self):
+        """The zone names, in the order mapped."""
+        return list(self.index["zones"])
+
+    def names(self, zone, kind):
+        """The names of the arrays of a kind in a zone, in stored order."""
+        return [key[2] for key in self._arrays if key[:2] == (zone, kind)]
+
+    def values(self, zone, kind, name=""):
+        """The column values as a read-only memory mapped (ncol, nrow) numpy."""
+
+        key = (zone, kind, str(name))
+        if key not in self._arrays:
+            raise KeyError(f"No column values for {key} in {self.filename}")
+        return np.memmap(
+            self.filename,
+            dtype=self.index["dtype"],
+            mode="r",
+            offset=self._arrays[key]["offset"],
+            shape=tuple(self.index["shape"]),
+        )
+
+    def layer(self, zone, kind, name=""):
+        """The column values as one layer, a (ncol, nrow, 1) numpy."""
+        return np.array(self.values(zone, kind, name))[:, :, np.newaxis]
+
+    def check(self, appname):
+        """Stop if the table was not made by the app."""
+        if self.index.get("appname") != appname:
+            raise ValueError(
+                f"The column table {self.filename} is made by "
+                f"{self.index.get('appname')}, not {appname}"
+            )
@@ -1,156 +1,740 @@
-import getpass
 import logging
-from time import localtime, strftime
+from pathlib import Path
 
 import numpy as np
 import numpy.ma as ma
 import xtgeo
-from xtgeo.surface import RegularSurface
-from xtgeoviz import quickplot
 
-from ._export_via_fmudataio import export_avg_map_dataio
+from grid3d_maps.mapcube import MapCube
+
+from . import (
+    _culling,
+    _footprint,
+    _get_zonation_filters,
+    _gridding,
+    _mapcollect,
+    _mapsettings,
+    _plotting,
+    _profiling,
+    _threads,
+    _tiling,
+    _zonepool,
+)
+from ._export_via_fmudataio import (
+    export_avg_map_dataio,
+    exported_filename,
+    record_exported,
+)
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+# where fmu-dataio puts maps, relative to the run folder
+DATAIO_MAPFOLDER = "share/results/maps"
 
-def get_avg(config, specd, propd, dates, zonation, zoned, filterarray):
+# the keys of the grid numpies in specd to map with culling, as the
+# (coordinates, views, weights) for _culling.culled_inputs()
+CULLED_KEYS = (("ixc",), ("iyc", "icorners"), ("iactnum",))
+
+STATISTIC_TITLES = {
+    "mean": "Weighted average",
+    "min": "Minimum",
+    "max": "Maximum",
+    "std": "Weighted standard deviation",
+    "sum": "Column sum",
+    "p50": "Weighted median",
+}
+
+
+def get_avg(config, specd, propd, dates, zonation, zoned, filterarray, mapcube=None):
     """Compute a dictionary with average numpy per date
 
-    It will return a dictionary per parameter and eventually dates
+    It will return a dictionary per parameter and eventually dates. If a
+    mapcube (MapCubeWriter) is given, maps are added to that instead of being
+    exported as individual files.
+
+    The keys are (zname, propname) for the weighted average, and
+    (zname, propname, statistic) for other statistics given in the
+    computesettings, e.g. ('z1', 'PRESSURE--19991201', 'max').
+
+    The weights given in the computesettings are in specd["weights"] (see
+    _get_grid_props.import_weights()); without, dz is the weight.
+
+    With tuning: footprint, the cells are mapped by the overlap of their top
+    face with each map node (see _footprint), from the corners in
+    specd["icorners"]; zone_avg and coarsen are then not used.
+
+    With culling (see _culling), specd["culled"] has the grid columns to map.
+
+    With tuning: threads, the layers (or the chunks of cells for footprints)
+    are mapped in threads, with the same maps for any number of threads (see
+    _threads).
+
+    With tuning: processes, the zones are mapped in a pool of processes, from
+    the numpies in shared memory (see _zonepool).
+
+    With tuning: tiles, the map is made tile by tile (see _tiling), and a
+    TiledMaps is returned instead of the dictionary, with the maps made from
+    memory mapped files when used, so only one map is in memory at a time.
     """
     logger.debug("Dates is unused %s", dates)
 
     avgd = {}
 
-    myavgzon = config["computesettings"]["tuning"]["zone_avg"]
-    mycoarsen = config["computesettings"]["tuning"]["coarsen"]
+    # filters get into effect by multiplying with the weights (DZ by default),
+    # and each weight is shared by all properties and zones that use it
+    usedweights = _used_weights(config, specd, propd, filterarray)
 
-    if "templatefile" in config["mapsettings"]:
-        xmap = xtgeo.surface_from_file(config["mapsettings"]["templatefile"])
-        xmap.values = 0.0
-    else:
-        ncol = config["mapsettings"].get("ncol")
-        nrow = config["mapsettings"].get("nrow")
-
-        xmap = RegularSurface(
-            xori=config["mapsettings"].get("xori"),
-            yori=config["mapsettings"].get("yori"),
-            ncol=ncol,
-            nrow=nrow,
-            xinc=config["mapsettings"].get("xinc"),
-            yinc=config["mapsettings"].get("yinc"),
-            values=np.zeros((ncol, nrow)),
+    # with culling, the box of the kept grid columns is mapped (see _culling)
+    culled = specd.get("culled")
+    if culled is not None:
+        specd, propd, usedweights, zonation = _culling.culled_inputs(
+            culled, specd, CULLED_KEYS, propd, usedweights, zonation
         )
 
+    mytiles = config["computesettings"]["tuning"]["tiles"]
+
+    # the maps are made from the geometry
+    geometry = _mapsettings.map_geometry(config)
+
     logger.info("Mapping ...")
     if len(propd) == 0 or len(zoned) == 0:
         raise RuntimeError("The dictionary <propd> or <zoned> is zero. Stop")
 
-    for zname, zrange in zoned.items():
+    corners = None
+    tiledmaps = None
+    if mytiles:
+        tilelist = _tiling.tiles(
+            geometry,
+            int(mytiles),
+            (specd["ixc"], specd["iyc"], specd["iactnum"]),
+            corners=specd.get("icorners"),
+            coarsen=config["computesettings"]["tuning"]["coarsen"],
+        )
+        tiledmaps = _tiling.TiledMaps(
+            geometry, folder=config["computesettings"]["tuning"]["tilefolder"]
+        )
+    elif config["computesettings"]["tuning"]["footprint"]:
+        corners = _footprint.map_index_corners(geometry, specd["icorners"])
+
+    zones = _get_zonation_filters.zones_to_map(config, zoned)
+
+    # with processes, the zones are mapped in a pool, from shared numpies
+    pooled = None
+    nprocesses = _zonepool.processes(config)
+    if nprocesses > 1 and tiledmaps is None and len(zones) > 1:
+        shared = {
+            "specd": {key: specd[key] for key in ("ixc", "iyc")},
+            "propd": propd,
+            "usedweights": usedweights,
+            "zonation": zonation,
+            "corners": corners,
+        }
+        pooled = _zonepool.map_in_pool(
+            _pooled_zone_maps,
+            shared,
+            [(zname, zrange, config) for zname, zrange in zones],
+            nprocesses,
+        )
+    elif nprocesses > 1:
+        logger.info("The zones are mapped in one process (tiles or one zone)")
+
+    for zname, zrange in zones:
         logger.debug("ZNAME and ZRANGE are %s:  %s", zname, zrange)
-        usezonation = zonation
-        usezrange = zrange
 
-        # in case of super zones:
-        if isinstance(zrange, list):
-            usezonation = zonation.copy()
-            usezonation[:, :, :] = 0
-            logger.debug(usezonation)
-            for zr in zrange:
-                usezonation[zonation == zr] = 888
+        with _profiling.stage("mapping", zone=zname):
+            if pooled is not None:
+                zonemaps = next(pooled)
+            elif tiledmaps is None:
+                usezonation, usezrange = _get_zonation_filters.zone_subset(
+                    zonation, zname, zrange
+                )
+                zonemaps = _zone_maps(
+                    config,
+                    geometry,
+                    specd,
+                    propd,
+                    usedweights,
+                    usezonation,
+                    usezrange,
+                    corners=corners,
+                )
+            else:
+                usezonation, usezrange = _get_zonation_filters.zone_subset(
+                    zonation, zname, zrange
+                )
+                zonemaps = _tiled_zone_maps(
+                    config,
+                    tilelist,
+                    tiledmaps,
+                    zname,
+                    specd,
+                    propd,
+                    usedweights,
+                    usezonation,
+                    usezrange,
+                )
+
+            _export_zone_maps(
+                config,
+                geometry,
+                zname,
+                zonemaps,
+                avgd if tiledmaps is None else None,
+                mapcube,
+            )
 
-            usezrange = 888
+    if pooled is not None:
+        pooled.close()
 
-        if zname == "all":
-            usezonation = zonation.copy()
-            usezonation[:, :, :] = 999
-            usezrange = 999
+    # with tiles, the maps are made from the memory mapped files when used
+    return avgd if tiledmaps is None else tiledmaps
 
-            if config["computesettings"]["all"] is not True:
-                logger.debug("Skip <%s> (cf. computesettings: all)", zname)
-                continue
-        else:
-            if config["computesettings"]["zone"] is not True:
-                continue
 
-        for propname, pvalues in propd.items():
-            # filters get into effect by multyplying with DZ weight
-            usedz = specd["idz"] * filterarray
-
-            xmap.avg_from_3dprop(
-                xprop=specd["ixc"],
-                yprop=specd["iyc"],
-                mprop=pvalues,
-                dzprop=usedz,
-                zoneprop=usezonation,
-                zone_minmax=[usezrange, usezrange],
-                zone_avg=myavgzon,
-                coarsen=mycoarsen,
+def get_avg_from_slabs(config, slabmaps, mapcube=None):
+    """Export the average maps summed over the k-slabs of a grid (see _slabs).
+
+    Returns:
+        A dictionary of the maps, as get_avg()
+    """
+
+    avgd = {}
+    geometry = _mapsettings.map_geometry(config)
+    for zname in slabmaps.znames:
+        with _profiling.stage("mapping", zone=zname):
+            _export_zone_maps(
+                config, geometry, zname, slabmaps.zone_maps(zname), avgd, mapcube
+            )
+    return avgd
+
+
+def add_column_sums(columns, config, specd, propd, zonation, filterarray):
+    """Add the weights, and the properties times their weight, to the column sums.
+
+    The weights are as for get_avg(), with the filters applied (see _columns).
+    """
+
+    usedweights = _used_weights(config, specd, propd, filterarray)
+    columns.add_cells(zonation, (specd["ixc"], specd["iyc"], specd["iactnum"]))
+    columns.add_sums(zonation, "weight", usedweights)
+    for propname, pvalues in propd.items():
+        weighted = pvalues * usedweights[property_weight(config, propname)]
+        columns.add_sums(zonation, "sum", {propname: weighted})
+
+
+def get_avg_from_columns(config, table, mapcube=None):
+    """Export the average maps of each zone from a column table (see _columns).
+
+    Returns:
+        A dictionary of the maps, as get_avg()
+    """
+
+    avgd = {}
+    geometry = _mapsettings.map_geometry(config)
+    for zname in table.zones:
+        with _profiling.stage("mapping", zone=zname):
+            _export_zone_maps(
+                config,
+                geometry,
+                zname,
+                _column_zone_maps(config, geometry, table, zname),
+                avgd,
+                mapcube,
+            )
+    return avgd
+
+
+def _column_zone_maps(config, geometry, table, zname):
+    """Grid the column sums of a zone as one layer; yields (propname, {mean})."""
+
+    xprop = table.layer(zname, "x")
+    yprop = table.layer(zname, "y")
+    zoneprop = np.ones(xprop.shape, dtype=np.int32)
+
+    for propname, weightname in table.index["weights"].items():
+        wsum = table.layer(zname, "weight", weightname)
+        msum = table.layer(zname, "sum", propname)
+        with _profiling.stage("gridding", property=propname):
+            nodestats = _gridding.NodeStatistics(geometry)
+            nodestats.add(
+                xprop,
+                yprop,
+                msum / np.where(wsum > 0.0, wsum, 1.0),
+                wsum,
+                zoneprop,
+                (1, 1),
+                coarsen=config["computesettings"]["tuning"]["coarsen"],
+                threads=_threads.threads(config),
             )
+        yield propname, _masked_zeros(config, nodestats.result())
+
+
+def _export_zone_maps(config, geometry, zname, zonemaps, avgd, mapcube):
+    """Export the maps of a zone, and keep them in avgd (unless None)."""
 
+    for propname, statmaps in zonemaps:
+        attribute, _, date = propname.partition("--")
+        for stat, values in statmaps.items():
             filename = None
             if config["output"]["mapfolder"] != "fmu-dataio":
-                filename = _avg_filesettings(config, zname, propname, mode="map")
+                filename = _avg_filesettings(
+                    config, zname, propname, mode="map", statistic=stat
+                )
+
+            usename = _usename(zname, propname, stat)
+            statattribute = attribute
+            if stat != "mean":
+                statattribute = attribute + "_" + stat
+
+            xmap = geometry.surface(values)
+            if avgd is not None:
+                avgd[usename] = xmap
+            _mapcollect.add(zname, statattribute, date, xmap)
+            with _profiling.stage("export", attribute=statattribute, date=date):
+                if mapcube is not None:
+                    mapcube.add(zname, statattribute, date, xmap)
+                elif filename is None:
+                    fname = export_avg_map_dataio(
+                        xmap, usename[:2], config, statistic=stat
+                    )
+                    record_exported((zname, statattribute, date), fname)
+                else:
+                    logger.info("Map file to {}".format(filename))
+                    xmap.to_file(filename)
+
+
+def _usename(zname, propname, stat):
+    """The key of a map, as (zname, propname) or (zname, propname, statistic)."""
+    if stat == "mean":
+        return (zname, propname)
+    return (zname, propname, stat)
+
+
+def _zone_maps(
+    config, geometry, specd, propd, usedweights, zonation, zrange, corners=None
+):
+    """Map the properties in a zone; yields (propname, {statistic: values}).
+
+    The inputs may be views of the grid, as for a tile (see _tiled_zone_maps).
+    For the footprint mapping, the corners in the map index space are made
+    from specd["icorners"], unless given.
+    """
 
-            usename = (zname, propname)
+    myavgzon = config["computesettings"]["tuning"]["zone_avg"]
+    mycoarsen = config["computesettings"]["tuning"]["coarsen"]
+    myfootprint = config["computesettings"]["tuning"]["footprint"]
+    mythreads = _threads.threads(config)
+
+    if myfootprint:
+        with _profiling.stage("footprints"):
+            if corners is None:
+                corners = _footprint.map_index_corners(geometry, specd["icorners"])
+            footmaps = _footprint_means(
+                config,
+                geometry,
+                corners,
+                propd,
+                usedweights,
+                zonation == zrange,
+                threads=mythreads,
+            )
+
+    # xmap is for the xtgeo gridding
+    xmap = geometry.surface()
+
+    for propname, pvalues in propd.items():
+        usedz = usedweights[property_weight(config, propname)]
+        statistics = property_statistics(config, propname)
+
+        with _profiling.stage("gridding", property=propname):
+            if myfootprint:
+                statmaps = {"mean": footmaps[propname]}
+            elif statistics == ["mean"] and mythreads == 1:
+                xmap.avg_from_3dprop(
+                    xprop=specd["ixc"],
+                    yprop=specd["iyc"],
+                    mprop=pvalues,
+                    dzprop=usedz,
+                    zoneprop=zonation,
+                    zone_minmax=[zrange, zrange],
+                    zone_avg=myavgzon,
+                    coarsen=mycoarsen,
+                )
+                statmaps = {"mean": xmap.values}
+            else:
+                statmaps = _gridding.node_statistics(
+                    geometry,
+                    specd["ixc"],
+                    specd["iyc"],
+                    pvalues,
+                    usedz,
+                    zonation,
+                    [zrange, zrange],
+                    statistics=statistics,
+                    zone_avg=myavgzon,
+                    coarsen=mycoarsen,
+                    threads=mythreads,
+                )
+
+        yield propname, _masked_zeros(config, statmaps)
+
+
+def _masked_zeros(config, statmaps):
+    """The maps with zeros masked, with computesettings: mask_zeros."""
+    if not config["computesettings"]["mask_zeros"]:
+        return statmaps
+    return {
+        stat: ma.masked_inside(values, -1e-30, 1e-30)
+        for stat, values in statmaps.items()
+    }
+
+
+def _pooled_zone_maps(shared, zname, zrange, config):
+    """Map a zone in a worker process, from the shared numpies (see _zonepool).
+
+    Returns:
+        A list of (propname, {statistic: values}), as from _zone_maps()
+    """
+
+    zonation, zrange = _get_zonation_filters.zone_subset(
+        shared["zonation"], zname, zrange
+    )
+    return list(
+        _zone_maps(
+            config,
+            _mapsettings.map_geometry(config),
+            shared["specd"],
+            shared["propd"],
+            shared["usedweights"],
+            zonation,
+            zrange,
+            corners=shared["corners"],
+        )
+    )
+
+
+def _tiled_zone_maps(
+    config, tilelist, tiledmaps, zname, specd, propd, usedweights, zonation, zrange
+):
+    """Map the properties in a zone tile by tile, to the tiled maps.
+
+    When all tiles are done, yields (propname, {statistic: values}) as
+    _zone_maps(), with the values read from the tiled maps.
+    """
+
+    for tile in tilelist:
+        tilespecd = {
+            key: tile.view(specd[key]) for key in ("ixc", "iyc") if key in specd
+        }
+        if "icorners" in specd:
+            tilespecd["icorners"] = tuple(tile.view(item) for item in specd["icorners"])
+
+        with _profiling.stage("tile", nodes=tile.nodes):
+            for propname, statmaps in _zone_maps(
+                config,
+                tile.geometry,
+                tilespecd,
+                {name: tile.view(values) for name, values in propd.items()},
+                {name: tile.view(weight) for name, weight in usedweights.items()},
+                tile.view(zonation),
+                zrange,
+            ):
+                for stat, values in statmaps.items():
+                    tiledmaps.write(_usename(zname, propname, stat), tile, values)
+
+    for propname in propd:
+        yield (
+            propname,
+            {
+                stat: ma.masked_invalid(
+                    np.array(tiledmaps.values(_usename(zname, propname, stat)))
+                )
+                for stat in property_statistics(config, propname)
+            },
+        )
+
+
+def _footprint_means(config, geometry, corners, propd, usedweights, inzone, threads=1):
+    """The footprint averages in a zone, in one pass per weight."""
+
+    footmaps = {}
+    for name, weight in usedweights.items():
+        propnames = [pname for pname in propd if property_weight(config, pname) == name]
+        means = _footprint.average(
+            geometry,
+            corners,
+            [propd[pname] for pname in propnames],
+            weight,
+            inzone,
+            threads=threads,
+        )
+        footmaps.update(zip(propnames, means))
+    return footmaps
+
+
+class SlabMaps:
+    """The average maps of each zone, summed over the k-slabs of a grid.
+
+    Each slab is added with its numpies, as for get_avg(), and the layers (or
+    the cells, for footprints) are summed per map node over the slabs, in the
+    order of the slabs (see _slabs). zone_avg is not used.
 
-            if config["computesettings"]["mask_zeros"]:
-                xmap.values = ma.masked_inside(xmap.values, -1e-30, 1e-30)
+    Args:
+        config: The configuration dictionary
+        zoned: The zones, as from _get_zonation_filters.zonation()
+    """
+
+    def __init__(self, config, zoned):
+        self.config = config
+        self.geometry = _mapsettings.map_geometry(config)
+        self.zones = _get_zonation_filters.zones_to_map(config, zoned)
+        self.znames = [zname for zname, _ in self.zones]
+        self.propnames = []
+        self._sums = {}
+
+    def add(self, specd, propd, zonation, filterarray):
+        """Map the numpies of a slab, and add to the sums of each zone."""
+
+        config = self.config
+        mycoarsen = config["computesettings"]["tuning"]["coarsen"]
+        myfootprint = config["computesettings"]["tuning"]["footprint"]
+        mythreads = _threads.threads(config)
+        self.propnames = list(propd)
+
+        usedweights = _used_weights(config, specd, propd, filterarray)
+        culled = specd.get("culled")
+        if culled is not None:
+            specd, propd, usedweights, zonation = _culling.culled_inputs(
+                culled, specd, CULLED_KEYS, propd, usedweights, zonation
+            )
+        if myfootprint:
+            corners = _footprint.map_index_corners(self.geometry, specd["icorners"])
+
+        for zname, zrange in self.zones:
+            usezonation, usezrange = _get_zonation_filters.zone_subset(
+                zonation, zname, zrange
+            )
+            if myfootprint:
+                inzone = usezonation == usezrange
+                for name, weight in usedweights.items():
+                    propnames = [
+                        pname
+                        for pname in propd
+                        if property_weight(config, pname) == name
+                    ]
+                    sums = _footprint.average_sums(
+                        self.geometry,
+                        corners,
+                        [propd[pname] for pname in propnames],
+                        weight,
+                        inzone,
+                        threads=mythreads,
+                    )
+                    if (zname, name) in self._sums:
+                        sums = [
+                            total + part
+                            for total, part in zip(self._sums[(zname, name)], sums)
+                        ]
+                    self._sums[(zname, name)] = sums
+                continue
 
-            avgd[usename] = xmap.copy()
-            if filename is None:
-                export_avg_map_dataio(avgd[usename], usename, config)
+            for propname, pvalues in propd.items():
+                if (zname, propname) not in self._sums:
+                    self._sums[(zname, propname)] = _gridding.NodeStatistics(
+                        self.geometry, statistics=property_statistics(config, propname)
+                    )
+                self._sums[(zname, propname)].add(
+                    specd["ixc"],
+                    specd["iyc"],
+                    pvalues,
+                    usedweights[property_weight(config, propname)],
+                    usezonation,
+                    (usezrange, usezrange),
+                    coarsen=mycoarsen,
+                    threads=mythreads,
+                )
+
+    def zone_maps(self, zname):
+        """Yield (propname, {statistic: values}) for a zone, as _zone_maps()."""
+
+        config = self.config
+        for propname in self.propnames:
+            if config["computesettings"]["tuning"]["footprint"]:
+                name = property_weight(config, propname)
+                propnames = [
+                    pname
+                    for pname in self.propnames
+                    if property_weight(config, pname) == name
+                ]
+                means = _footprint.averages_from_sums(self._sums[(zname, name)])
+                statmaps = {"mean": means[propnames.index(propname)]}
             else:
-                logger.info("Map file to {}".format(filename))
-                avgd[usename].to_file(filename)
+                statmaps = self._sums[(zname, propname)].result()
+            yield propname, _masked_zeros(config, statmaps)
 
-    return avgd
+
+def property_statistics(config, propname):
+    """The statistics to compute for a property, from the computesettings.
+
+    The statistics are given as a list for all properties, or as a dict with
+    a list per property, e.g. {PRESSURE: [mean, min, max]}, where the key may
+    be with or without the date. Properties not in the dict get the mean.
+    """
+
+    statistics = _per_property(
+        config["computesettings"].get("statistics"), propname, ["mean"]
+    )
+    if isinstance(statistics, str):
+        statistics = [statistics]
+
+    unknown = [stat for stat in statistics if stat not in _gridding.STATISTICS]
+    if unknown:
+        raise ValueError(
+            f"Unknown statistics {unknown} for {propname}, "
+            f"use some of {list(_gridding.STATISTICS)}"
+        )
+    statistics = list(statistics)
+    if config["computesettings"]["tuning"]["footprint"] and statistics != ["mean"]:
+        raise ValueError(
+            f"Only the mean is made with tuning: footprint, not {statistics}"
+        )
+    return statistics
+
+
+def _used_weights(config, specd, propd, filterarray):
+    """The weights used by the properties, with the filters applied.
+
+    The weights are from specd["weights"] (dz without), and each is made once,
+    for all properties and zones that use it.
+    """
+    weights = specd.get("weights") or {"dz": specd["idz"]}
+    return {
+        name: weight * filterarray
+        for name, weight in weights.items()
+        if name in weight_names(config, propd)
+    }
+
+
+def weight_names(config, propnames):
+    """The weights used by the properties, e.g. {'dz', 'hcpv--19991201'}."""
+    return {property_weight(config, propname) for propname in propnames}
+
+
+def property_weight(config, propname):
+    """The weight for a property, from the computesettings; dz by default.
+
+    The weight is given for all properties, or as a dict with a weight per
+    property, e.g. {PRESSURE: porv}, where the key may be with or without the
+    date.
+    """
+    return _per_property(config["computesettings"].get("weight"), propname, "dz")
 
 
-def do_avg_plotting(config, avgd):
+def _per_property(setting, propname, default):
+    """A setting for all properties, or from a dict per property (or attribute)."""
+
+    if not setting:
+        return default
+    if isinstance(setting, dict):
+        attribute = propname.partition("--")[0]
+        return setting.get(propname, setting.get(attribute, default))
+    return setting
+
+
+def do_avg_plotting(config, avgd, plotcontext=None):
     """Do plotting via matplotlib to PNG (etc) (if requested)"""
 
     logger.info("Plotting ...")
 
+    if plotcontext is None:
+        plotcontext = _plotting.PlotContext(config)
+
+    jobs = []
     for names, xmap in avgd.items():
-        # 'names' is a tuple as (zname, pname)
+        # 'names' is a tuple as (zname, pname) or (zname, pname, statistic)
         zname = names[0]
         pname = names[1]
+        stat = names[2] if len(names) > 2 else "mean"
 
-        plotfile = _avg_filesettings(config, zname, pname, mode="plot")
-
-        pcfg = _avg_plotsettings(config, zname, pname)
-
-        logger.info("Plot to {}".format(plotfile))
-
-        usevrange = pcfg["valuerange"]
-
-        faults = None
-        if pcfg["faultpolygons"] is not None:
-            try:
-                fau = xtgeo.polygons_from_file(pcfg["faultpolygons"], fformat="guess")
-                faults = {"faults": fau}
-                logger.info("Use fault polygons")
-            except OSError as err:
-                logger.info(str(err))
-                faults = None
-                logger.info("No fault polygons")
-
-        quickplot(
-            xmap,
-            filename=plotfile,
-            title=pcfg["title"],
-            subtitle=pcfg["subtitle"],
-            infotext=pcfg["infotext"],
-            xlabelrotation=pcfg["xlabelrotation"],
-            minmax=usevrange,
-            colormap=pcfg["colortable"],
-            faults=faults,
-        )
+        plotfile = _avg_filesettings(config, zname, pname, mode="plot", statistic=stat)
+
+        pcfg = plotcontext.plotsettings(_avg_plotsettings, zname, pname)
+        if stat != "mean":
+            pcfg["title"] = STATISTIC_TITLES[stat] + " for " + pname + ", zone " + zname
+            if stat in ("std", "sum"):
+                # the value range is for the property values
+                pcfg["valuerange"] = (None, None)
+
+        jobs.append(_plotting.plot_job(plotfile, xmap, pcfg, pcfg["valuerange"]))
+
+    _plotting.plot_maps(plotcontext, jobs)
 
 
-def _avg_filesettings(config, zname, pname, mode="root"):
+def find_avg_maps(config, znames):
+    """Find the average maps that get_avg() has made earlier with this config.
+
+    The maps are read from the map cube, from the fmu-dataio share folder (as
+    recorded at export) or from the mapfolder, depending on the output
+    settings. Maps that are not found are skipped with a warning.
+
+    Returns:
+        A dictionary of maps as from get_avg()
+    """
+
+    propnames = [
+        pname
+        for pname in config["input"]
+        if pname not in ("folderroot", "eclroot", "grid", "fmu_global_config")
+    ]
+
+    mapcube = None
+    if config["output"].get("mapcube"):
+        mapcube = MapCube(config["output"]["mapcube"])
+
+    avgd = {}
+    for zname in znames:
+        if zname == "all":
+            if config["computesettings"]["all"] is not True:
+                continue
+        elif config["computesettings"]["zone"] is not True:
+            continue
+
+        for propname, stat in (
+            (propname, stat)
+            for propname in propnames
+            for stat in property_statistics(config, propname)
+        ):
+            usename = (zname, propname)
+            attribute, _, date = propname.partition("--")
+            if stat != "mean":
+                usename = (zname, propname, stat)
+                attribute = attribute + "_" + stat
+
+            if mapcube is not None:
+                if (zname, attribute, date) in mapcube:
+                    avgd[usename] = mapcube.get_surface(zname, attribute, date)
+                else:
+                    logger.warning("No map for %s in map cube", usename)
+                continue
+
+            if config["output"]["mapfolder"] == "fmu-dataio":
+                filename = exported_filename((zname, attribute, date), DATAIO_MAPFOLDER)
+            else:
+                filename = _avg_filesettings(
+                    config, zname, propname, mode="map", statistic=stat
+                )
+
+            if filename is None or not Path(filename).is_file():
+                logger.warning("No map file %s for %s", filename, usename)
+                continue
+
+            logger.info("Map file from {}".format(filename))
+            avgd[usename] = xtgeo.surface_from_file(filename)
+
+    return avgd
+
+
+def _avg_filesettings(config, zname, pname, mode="root", statistic="mean"):
     """Local function for map or plot file root name"""
 
     delim = "--"
@@ -172,7 +756,10 @@ def _avg_filesettings(config, zname, pname, mode="root"):
     if prefix == "all" and config["output"]["prefix"]:
         prefix = config["output"]["prefix"]
 
-    xfil = (prefix + delim + tag + "average" + "_" + pname).replace(" ", "")
+    # e.g. z1--average_por for the mean and z1--max_por for other statistics
+    statname = "average" if statistic == "mean" else statistic
+
+    xfil = (prefix + delim + tag + statname + "_" + pname).replace(" ", "")
 
     if mode == "root":
         return xfil
@@ -188,14 +775,15 @@ def _avg_filesettings(config, zname, pname, mode="root"):
     return path + xfil
 
 
-def _avg_plotsettings(config, zname, pname):
+def _avg_plotsettings(plotcontext, zname, pname):
     """Local function for plot additional info for AVG maps."""
 
+    config = plotcontext.config
+
     title = "Weighted average for " + pname + ", zone " + zname
 
-    showtime = strftime("%Y-%m-%d %H:%M:%S", localtime())
     infotext = config["title"] + " - "
-    infotext += getpass.getuser() + " " + showtime
+    infotext += plotcontext.user + " " + plotcontext.showtime
     if config["output"]["tag"]:
         infotext += " (tag: " + config["output"]["tag"] + ")"
 
@@ -18,17 +18,35 @@ def parse_args(args, appname, appdescr):
         args = sys.argv[1:]
 
     usetxt = appname + " --config some.yaml ... "
+    if appname == "grid3d_hc_average_maps":
+        usetxt = appname + " --hcconfig hc.yaml --avgconfig avg.yaml ... "
 
     parser = argparse.ArgumentParser(description=appdescr, usage=usetxt)
 
-    parser.add_argument(
-        "-c",
-        "--config",
-        dest="config",
-        type=str,
-        required=True,
-        help="Config file on YAML format (required)",
-    )
+    if appname == "grid3d_hc_average_maps":
+        parser.add_argument(
+            "--hcconfig",
+            dest="hcconfig",
+            type=str,
+            required=True,
+            help="Config file for HC thickness maps on YAML format (required)",
+        )
+        parser.add_argument(
+            "--avgconfig",
+            dest="avgconfig",
+            type=str,
+            required=True,
+            help="Config file for average maps on YAML format (required)",
+        )
+    else:
+        parser.add_argument(
+            "-c",
+            "--config",
+            dest="config",
+            type=str,
+            required=True,
+            help="Config file on YAML format (required)",
+        )
 
     parser.add_argument(
         "-f",
@@ -62,12 +80,13 @@ def parse_args(args, appname, appdescr):
         "--zfile", dest="zfile", type=str, help="Explicit file (YAML) for zonation"
     )
 
-    parser.add_argument(
-        "--dump",
-        dest="dumpfile",
-        type=str,
-        help="Dump the parsed config to a file (for qc)",
-    )
+    if appname != "grid3d_hc_average_maps":
+        parser.add_argument(
+            "--dump",
+            dest="dumpfile",
+            type=str,
+            help="Dump the parsed config to a file (for qc)",
+        )
 
     parser.add_argument(
         "--legacydateformat",
@@ -77,6 +96,45 @@ def parse_args(args, appname, appdescr):
         "names, such as 1991_01_01 instead of 19910101",
     )
 
+    if appname in (
+        "grid3d_hc_thickness",
+        "grid3d_average_map",
+        "grid3d_hc_average_maps",
+    ):
+        parser.add_argument(
+            "--profile-report",
+            dest="profile_report",
+            type=str,
+            default=None,
+            help="Write wall time, CPU time and memory use per stage to a JSON file",
+        )
+        parser.add_argument(
+            "--trace",
+            dest="trace",
+            type=str,
+            default=None,
+            help="Write the stages as spans to a Chrome trace event (JSON) file; "
+            "also possible via the GRID3D_MAPS_TRACE environment variable",
+        )
+
+        parser.add_argument(
+            "--plot-only",
+            dest="plot_only",
+            action="store_true",
+            help="Only make plots, from maps made earlier with the same config "
+            "(no import of 3D grid data)",
+        )
+
+    if appname in ("grid3d_hc_thickness", "grid3d_average_map"):
+        parser.add_argument(
+            "--from-columns",
+            dest="from_columns",
+            type=str,
+            default=None,
+            help="Make the maps from a column table made earlier (output: columns), "
+            "for the mapsettings in the config (no import of 3D grid data)",
+        )
+
     if appname == "grid3d_hc_thickness":
         parser.add_argument(
             "-d",
@@ -194,7 +252,11 @@ def dateformatting(config):
 
     if "dates" in config["input"]:
         update = True
-        for entry in config["input"]["dates"]:
+        dates = config["input"]["dates"]
+        # a single entry, e.g. 'all' or a range (see _timelapse)
+        if isinstance(dates, (str, int)):
+            dates = [dates]
+        for entry in dates:
             if isinstance(entry, datetime.date):
                 newdates.append(entry.strftime("%Y%m%d"))
             else:
@@ -265,7 +327,10 @@ def propformatting(config):
 
         newdates = []
         if "dates" in prop:
-            for entry in prop["dates"]:
+            pdates = prop["dates"]
+            if isinstance(pdates, (str, int)):
+                pdates = [pdates]
+            for entry in pdates:
                 if isinstance(entry, datetime.date):
                     newdates.append(entry.strftime("%Y%m%d"))
                 else:
@@ -440,6 +505,39 @@ def yconfig_set_defaults(config, appname):
     if "coarsen" not in newconfig["computesettings"]["tuning"]:
         newconfig["computesettings"]["tuning"]["coarsen"] = 1
 
+    if "footprint" not in newconfig["computesettings"]["tuning"]:
+        newconfig["computesettings"]["tuning"]["footprint"] = False
+
+    if "auto" not in newconfig["computesettings"]["tuning"]:
+        newconfig["computesettings"]["tuning"]["auto"] = False
+
+    if "tiles" not in newconfig["computesettings"]["tuning"]:
+        newconfig["computesettings"]["tuning"]["tiles"] = None
+
+    if "tilefolder" not in newconfig["computesettings"]["tuning"]:
+        newconfig["computesettings"]["tuning"]["tilefolder"] = None
+
+    if "cull" not in newconfig["computesettings"]["tuning"]:
+        newconfig["computesettings"]["tuning"]["cull"] = False
+
+    if "precision" not in newconfig["computesettings"]["tuning"]:
+        newconfig["computesettings"]["tuning"]["precision"] = "float64"
+
+    if "threads" not in newconfig["computesettings"]["tuning"]:
+        newconfig["computesettings"]["tuning"]["threads"] = None
+
+    if "processes" not in newconfig["computesettings"]["tuning"]:
+        newconfig["computesettings"]["tuning"]["processes"] = None
+
+    if "slabs" not in newconfig["computesettings"]["tuning"]:
+        newconfig["computesettings"]["tuning"]["slabs"] = None
+
+    if "steps" not in newconfig["computesettings"]["tuning"]:
+        newconfig["computesettings"]["tuning"]["steps"] = 10
+
+    if "aoi" not in newconfig["computesettings"]:
+        newconfig["computesettings"]["aoi"] = None
+
     if appname == "grid3d_hc_thickness":
         if "dates" not in newconfig["input"]:
             if newconfig["computesettings"]["mode"] in "rock":
@@ -483,6 +581,31 @@ def yconfig_set_defaults(config, appname):
                 newconfig["input"]["xhcpv"] = newconfig["input"][xword]
                 break
 
+    if appname == "grid3d_contact_map":
+        if "mode" not in newconfig["computesettings"]:
+            newconfig["computesettings"]["mode"] = "oil"
+
+        if "contact_threshold" not in newconfig["computesettings"]:
+            newconfig["computesettings"]["contact_threshold"] = 0.5
+
+        if "zone" not in newconfig["computesettings"]:
+            newconfig["computesettings"]["zone"] = False
+
+        if "all" not in newconfig["computesettings"]:
+            newconfig["computesettings"]["all"] = True
+
+    if appname == "grid3d_average_map":
+        # a list for all properties, or a dict with a list per property
+        if "statistics" not in newconfig["computesettings"]:
+            newconfig["computesettings"]["statistics"] = ["mean"]
+
+        # one weight for all properties, or a dict with a weight per property
+        if "weight" not in newconfig["computesettings"]:
+            newconfig["computesettings"]["weight"] = "dz"
+
+        if "weightsources" not in newconfig["computesettings"]:
+            newconfig["computesettings"]["weightsources"] = {}
+
     # treat dates as strings, not ints
     if "dates" in config["input"]:
         dlist = []
@@ -530,4 +653,14 @@ def yconfig_metadata_hc(config):
     newconfig["metadata"]["globaltag"] = config["output"].get("tag", "")
 
     return newconfig
+
+
+def yconfig_metadata_contact(config):
+    """Collect general metadata for the contact script; depths are in meters."""
+
+    newconfig = copy.deepcopy(config)
+
+    newconfig["metadata"]["unit"] = "m"
+    newconfig["metadata"]["globaltag"] = config["output"].get("tag", "")
+
     return newconfig
@@ -0,0 +1,237 @@
+"""Private module for culling grid columns away from the map (tuning: cull).
+
+When the map covers only a part of the field, the mapping still grids all the
+cells. With culling, the grid columns that cannot reach a map node are dropped
+once per grid and map geometry, before any zone or date is mapped:
+
+* columns outside the map extent
+* columns that reach only nodes that are masked in the map geometry (the
+  undefined nodes of a template map)
+* columns outside the optional area of interest (computesettings: aoi), a
+  polygons file; nodes away from the polygons then get no cells
+
+The reach of a column is from the cell footprints with tuning: footprint, else
+the cell centers with the margin of the tiled mapping (see _tiling), so the
+kept nodes are mapped from the same cells as without culling.
+
+The culled grid is the (i, j) box of the kept columns, as views of the 3D
+numpies, where the columns not kept inside the box get undefined coordinates
+and zero weights, which the gridding skips.
+"""
+
+import logging
+
+import numpy as np
+import xtgeo
+
+from . import _gridcache, _mapsettings, _slabs, _tiling
+
+logger = logging.getLogger(__name__)
+
+# coordinates at or above this are skipped in the gridding (as in xtgeo)
+UNDEF = 1e21
+
+
+class Culled:
+    """The box of the kept grid columns, and the kept columns in the box.
+
+    Args:
+        columns: The grid column ranges of the box, as (i0, i1, j0, j1)
+        keep: A 2D boolean numpy for the columns in the box
+    """
+
+    __slots__ = ("columns", "keep")
+
+    def __init__(self, columns, keep):
+        self.columns = columns
+        self.keep = keep
+
+    def view(self, array):
+        """The box of a 3D (or 4D) grid numpy as a view, or a tuple of them."""
+        if isinstance(array, tuple):
+            return tuple(self.view(item) for item in array)
+        icol0, icol1, jrow0, jrow1 = self.columns
+        return array[icol0:icol1, jrow0:jrow1]
+
+    def coordinates(self, array):
+        """The box of a coordinate numpy; undefined in the columns not kept."""
+        return np.where(self.keep[:, :, np.newaxis], self.view(array), UNDEF)
+
+    def weights(self, array):
+        """The box of a weight (or actnum) numpy; zero in the columns not kept."""
+        view = self.view(array)
+        return np.where(self.keep[:, :, np.newaxis], view, np.zeros((), view.dtype))
+
+    def __repr__(self):
+        return f"Culled(columns={self.columns}, kept={int(self.keep.sum())})"
+
+
+def culled_inputs(culled, gridd, gridkeys, propd, weightd, zonation):
+    """The numpies for the box of the kept grid columns.
+
+    Args:
+        culled (Culled): The kept grid columns
+        gridd: The grid numpies, as specd (average maps) or initd (HC maps)
+        gridkeys: The keys of the grid numpies to keep, as (coordinates, views,
+            weights); the coordinates are undefined, and the weights (e.g.
+            actnum, dz) are zero, in the columns not kept
+        propd: The property numpies (or the HCPFZ by date), as views
+        weightd: The weight numpies, zero in the columns not kept
+        zonation: The zonation numpy, as a view
+
+    Returns:
+        The (gridd, propd, weightd, zonation) of the box
+    """
+
+    coordinates, views, weights = gridkeys
+    boxd = {}
+    for keys, func in (
+        (views, culled.view),
+        (coordinates, culled.coordinates),
+        (weights, culled.weights),
+    ):
+        boxd.update({key: func(gridd[key]) for key in keys if key in gridd})
+    return (
+        boxd,
+        {name: culled.view(values) for name, values in propd.items()},
+        {name: culled.weights(weight) for name, weight in weightd.items()},
+        culled.view(zonation),
+    )
+
+
+def culled_columns(config, grd, cells, corners=None):
+    """Cull the grid columns for the map geometry (and AOI) in the config.
+
+    The result is kept in the config, as "_culled", next to the map geometry,
+    and with the grid cache active, it is shared by runs with the same grid,
+    map geometry and AOI.
+
+    Args:
+        config: The configuration dictionary
+        grd (Grid): The grid, to identify it in the grid cache
+        cells: The cell centers and actnum, as (xc, yc, actnum) 3D numpies
+        corners: The (x, y) top face corners, for the footprint mapping
+
+    Returns:
+        A Culled, or None if culling is not asked for or all columns are kept
+    """
+
+    aoi = config["computesettings"]["aoi"]
+    if not (config["computesettings"]["tuning"]["cull"] or aoi):
+        return None
+
+    # the columns of each k-slab (see _slabs) are culled for the slab
+    slab = _slabs.layer_range(grd) is not None
+    if "_culled" in config and not slab:
+        return config["_culled"]
+
+    geometry = _mapsettings.map_geometry(config)
+    coarsen = config["computesettings"]["tuning"]["coarsen"]
+    key = (
+        tuple(geometry.as_dict().items()),
+        None if geometry.mask is None else np.packbits(geometry.mask).tobytes(),
+        _gridcache.file_digest(aoi) if aoi else None,
+        corners is not None,
+        coarsen,
+    )
+    culled = _gridcache.cached_for_grid(
+        "culled columns",
+        grd,
+        key,
+        lambda: cull(geometry, cells, corners=corners, aoi=aoi, coarsen=coarsen),
+    )
+    if not slab:
+        config["_culled"] = culled
+    return culled
+
+
+def cull(geometry, cells, corners=None, aoi=None, coarsen=1):
+    """Find the grid columns that reach a map node that is not masked (inside
+    the AOI).
+
+    Args:
+        geometry (MapGeometry): The map geometry
+        cells: The cell centers and actnum, as (xc, yc, actnum) 3D numpies
+        corners: The (x, y) top face corners, for the footprint mapping
+        aoi: A polygons file, with the area of interest
+        coarsen (int): The box starts at a multiple of coarsen, so the same
+            cells are used as without culling
+
+    Returns:
+        A Culled, or None if all columns are kept
+    """
+
+    ncol, nrow = geometry.ncol, geometry.nrow
+    umin, umax, vmin, vmax = _tiling.column_extent(
+        geometry, cells, corners, coarsen=coarsen
+    )
+
+    # the nodes whose square [i - 0.5, i + 0.5] x [j - 0.5, j + 0.5] each
+    # column reaches; no nodes for columns without cells
+    with np.errstate(invalid="ignore"):
+        reach = np.isfinite(umin)
+        ilow = np.clip(np.ceil(np.where(reach, umin, 0.0) - 0.5), 0, ncol)
+        ihigh = np.clip(np.floor(np.where(reach, umax, -1.0) + 0.5), -1, ncol - 1)
+        jlow = np.clip(np.ceil(np.where(reach, vmin, 0.0) - 0.5), 0, nrow)
+        jhigh = np.clip(np.floor(np.where(reach, vmax, -1.0) + 0.5), -1, nrow - 1)
+    reach &= (ilow <= ihigh) & (jlow <= jhigh)
+
+    nodes = None if geometry.mask is None else ~geometry.mask
+    if aoi:
+        inside = aoi_nodes(geometry, aoi)
+        nodes = inside if nodes is None else nodes & inside
+
+    if nodes is not None:
+        # the number of nodes to map in the node range of each column, from
+        # the cumulated sums (summed area table) of the nodes
+        table = np.zeros((ncol + 1, nrow + 1), dtype=np.int64)
+        table[1:, 1:] = nodes.cumsum(axis=0).cumsum(axis=1)
+        ilow, ihigh = ilow.astype(np.int64), ihigh.astype(np.int64) + 1
+        jlow, jhigh = jlow.astype(np.int64), jhigh.astype(np.int64) + 1
+        ihigh, jhigh = np.maximum(ihigh, ilow), np.maximum(jhigh, jlow)
+        count = (
+            table[ihigh, jhigh]
+            - table[ilow, jhigh]
+            - table[ihigh, jlow]
+            + table[ilow, jlow]
+        )
+        reach &= count > 0
+
+    total = int(np.isfinite(umin).sum())
+    kept = int(reach.sum())
+    logger.info("Culling keeps %s of %s grid columns", kept, total)
+    if kept == total:
+        return None
+
+    icols = np.flatnonzero(reach.any(axis=1))
+    jrows = np.flatnonzero(reach.any(axis=0))
+    if kept == 0:
+        icols = jrows = np.zeros(1, dtype=np.int64)
+
+    columns = (
+        *_tiling.column_range(icols[0], icols[-1] + 1, reach.shape[0], coarsen),
+        *_tiling.column_range(jrows[0], jrows[-1] + 1, reach.shape[1], coarsen),
+    )
+    icol0, icol1, jrow0, jrow1 = columns
+    keep = reach[icol0:icol1, jrow0:jrow1].copy()
+    return Culled(columns, keep)
+
+
+def aoi_nodes(geometry, aoi):
+    """The map nodes inside the polygons of the AOI file, as a 2D boolean numpy."""
+
+    from matplotlib.path import Path
+
+    polygons = xtgeo.polygons_from_file(aoi, fformat="guess")
+    dataframe = polygons.get_dataframe(copy=False)
+    xnodes, ynodes = geometry.nodes()
+    points = np.column_stack((xnodes.ravel(), ynodes.ravel()))
+
+    inside = np.zeros(len(points), dtype=bool)
+    for _, poly in dataframe.groupby(polygons.pname):
+        vertices = poly[[polygons.xname, polygons.yname]].to_numpy()
+        if len(vertices) >= 3:
+            inside |= Path(vertices).contains_points(points)
+
+    logger.info("The AOI in %s has %s map nodes", aoi, int(inside.sum()))
+    return inside.reshape(xnodes.shape)
@@ -3,13 +3,17 @@
 import json
 import logging
 import warnings
+from pathlib import Path
 
 import fmu.dataio as dataio
 
 logger = logging.getLogger(__name__)
 
+# the record of the exported map files, kept in the map folder
+RECORD = ".grid3d_maps_exported.json"
 
-def export_avg_map_dataio(surf, nametuple, config):
+
+def export_avg_map_dataio(surf, nametuple, config, statistic="mean"):
     """Export avererage maps using dataio.
 
     Args:
@@ -17,10 +21,11 @@ def export_avg_map_dataio(surf, nametuple, config):
         nametuple: On form ('myzone1', 'PRESSURE--19991201') where the last
             is an identifier (nameid) for the metadata config
         config: The processed config setup for this script (i.e. not global_config)
+        statistic: The statistic per map node, e.g. "mean" (average) or "max"
     """
 
     zoneinfo, nameid = nametuple
-    logger.debug("Processed config: \n%s", json.dumps(config, indent=4))
+    logger.debug("Processed config: \n%s", json.dumps(config, indent=4, default=str))
 
     if "input" in config and "fmu_global_config" in config["input"]:
         warnings.warn(
@@ -68,7 +73,7 @@ def export_avg_map_dataio(surf, nametuple, config):
         content="property",
         content_metadata={"attribute": attribute, "is_discrete": False},
         timedata=tdata,
-        tagname=globaltag + "average_" + name,
+        tagname=globaltag + _statname(statistic) + "_" + name,
         workflow="grid3d-maps script average maps",
     )
     fname = edata.export(surf)
@@ -87,7 +92,7 @@ def export_hc_map_dataio(surf, zname, date, hcmode, config):
         hcmode: e.g. "oil", "gas"
     """
 
-    logger.debug("Processed config: \n%s", json.dumps(config, indent=4))
+    logger.debug("Processed config: \n%s", json.dumps(config, indent=4, default=str))
 
     if "input" in config and "fmu_global_config" in config["input"]:
         warnings.warn(
@@ -132,3 +137,78 @@ def export_hc_map_dataio(surf, zname, date, hcmode, config):
     fname = edata.export(surf)
     logger.info(f"Output as fmu-dataio: {fname}")
     return fname
+
+
+def export_contact_map_dataio(surf, zname, date, contact, config):
+    """Export fluid contact maps using dataio.
+
+    Args:
+        surf: XTGeo RegularSurface object
+        zname: The zone name.
+        date: The date tag
+        contact: e.g. "owc", "goc"
+        config: The processed config setup
+    """
+
+    globaltag = config["metadata"].get("globaltag", "")
+    globaltag = globaltag + "_" if globaltag else ""
+
+    tdata = None
+    if len(date) >= 8:
+        tdata = [[date[0:8], "monitor"]]
+    if len(date) > 8:
+        tdata.append([date[9:17], "base"])
+
+    edata = dataio.ExportData(
+        name=zname,
+        content="fluid_contact",
+        content_metadata={"contact": contact},
+        timedata=tdata,
+        unit=config["metadata"].get("unit", "m"),
+        tagname=globaltag + contact,
+        workflow="grid3d-maps script contact maps",
+    )
+    fname = edata.export(surf)
+    logger.info(f"Output as fmu-dataio: {fname}")
+    return fname
+
+
+def record_exported(key, filename):
+    """Record the file of an exported map by its (zone, attribute, date) key.
+
+    The record is kept next to the maps, so that the maps are found again from
+    the key (e.g. with --plot-only) with the file names that fmu-dataio gave.
+    """
+
+    folder = Path(filename).parent
+    record = {tuple(item["key"]): item["file"] for item in _read_record(folder)}
+    record[tuple(key)] = Path(filename).name
+
+    items = [{"key": list(key), "file": name} for key, name in record.items()]
+    (folder / RECORD).write_text(json.dumps(items, indent=2), encoding="utf8")
+
+
+def exported_filename(key, folder):
+    """The file of a map exported earlier to folder, or None if not recorded.
+
+    Args:
+        key: The map key, as (zone, attribute, date)
+        folder: The map folder of fmu-dataio, e.g. 'share/results/maps'
+    """
+
+    for item in _read_record(Path(folder)):
+        if tuple(item["key"]) == tuple(key):
+            return str(Path(folder) / item["file"])
+    return None
+
+
+def _read_record(folder):
+    record = folder / RECORD
+    if not record.is_file():
+        return []
+    return json.loads(record.read_text(encoding="utf8"))
+
+
+def _statname(statistic):
+    """The name of a statistic in tag and file names; 'average' for the mean."""
+    return "average" if statistic == "mean" else statistic
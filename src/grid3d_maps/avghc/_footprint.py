@@ -0,0 +1,298 @@
+"""Private module for mapping by the exact cell footprints (area weighted).
+
+The default mapping grids the cell centers to the map nodes, so a cell that
+is larger than the map increment leaves holes or blocky artefacts. Here, each
+map node is the square around the node, and each cell is its top face
+polygon. The weight of a cell at a node is the area of the overlap of the
+polygon and the node square, as a fraction of the node area, computed exactly:
+
+* an average map is sum(area * w * m) / sum(area * w), where w is the weight
+  (dz by default) of the cell
+* a HC thickness map is sum(area * hcpfz), which preserves the HC volume
+
+The corners are transformed to the map index space once per mapping, in
+which the square of node (i, j) is [i, i + 1] x [j, j + 1], also for rotated
+maps. The (cell, node) pairs are made for the nodes in the
+bounding box of each cell, in chunks of cells, and the overlap areas are from
+the edge integral (Green's theorem) of the polygon, clipped to the node square.
+Everything is vectorized over the pairs of a chunk, and with tuning: threads,
+the chunks are run in threads (see _threads).
+"""
+
+import logging
+
+import numpy as np
+import numpy.ma as ma
+
+from . import _threads
+
+logger = logging.getLogger(__name__)
+
+TINY = 1.1e-20
+
+# overlap areas (as a fraction of the node area) below this are round-off, e.g.
+# for nodes along the edge of a cell, and are not used
+MINAREA = 1e-12
+
+# the number of (cell, node) pairs to process at a time
+CHUNKSIZE = 1 << 21
+
+
+def map_index_corners(geometry, corners):
+    """Transform cell corners to the index space of the map.
+
+    Args:
+        geometry (MapGeometry): The map geometry, which may be rotated
+        corners: The (x, y) top face corners, each as (ncol, nrow, nlay, 4)
+
+    Returns:
+        The (u, v) corners, each as (ncell, 4), where the square of node (i, j)
+        is [i, i + 1] x [j, j + 1]
+    """
+
+    xcorners, ycorners = corners
+    ucorners, vcorners = geometry.to_index(
+        xcorners.reshape(-1, 4), ycorners.reshape(-1, 4)
+    )
+    return ucorners + 0.5, vcorners + 0.5
+
+
+def node_sums(geometry, corners, values, cells, threads=1):
+    """Sum values per map node, weighted by the overlap area of each cell.
+
+    The chunks of cells are the same for any number of threads, and their sums
+    are added in order, so the sums are too.
+
+    Args:
+        geometry (MapGeometry): The map geometry
+        corners: The (u, v) corners from map_index_corners()
+        values: A list of 1D numpies, one value per cell in cells
+        cells: The (flat) indices of the cells to map
+        threads (int): The number of threads for the chunks
+
+    Returns:
+        A list of (ncol, nrow) numpies, the sums for each of the values
+    """
+
+    ucorners, vcorners = corners[0][cells], corners[1][cells]
+    values = np.stack(values)
+    ncol, nrow = geometry.ncol, geometry.nrow
+    nnodes = ncol * nrow
+    sums = np.zeros((len(values), nnodes))
+
+    # the nodes in the bounding box of each cell, inside the map
+    imin = np.clip(np.floor(ucorners.min(axis=1)), 0, ncol).astype(np.int64)
+    imax = np.clip(np.ceil(ucorners.max(axis=1)), 0, ncol).astype(np.int64)
+    jmin = np.clip(np.floor(vcorners.min(axis=1)), 0, nrow).astype(np.int64)
+    jmax = np.clip(np.ceil(vcorners.max(axis=1)), 0, nrow).astype(np.int64)
+    nicol = np.where(jmax > jmin, imax - imin, 0)
+    nlines = (jmax - jmin + 1) * nicol
+
+    # chunks of cells with about CHUNKSIZE (cell, column, row line) each
+    starts = np.cumsum(nlines) - nlines
+    total = starts[-1] + nlines[-1] if len(cells) else 0
+    bounds = np.unique(
+        np.concatenate(
+            (
+                [0],
+                np.searchsorted(starts, np.arange(CHUNKSIZE, total, CHUNKSIZE)),
+                [len(cells)],
+            )
+        )
+    )
+
+    def chunk_sums(chunk):
+        first, last = chunk
+
+        # the cell and node column, per column of each cell
+        ccell = _expand(np.arange(first, last), nicol[first:last])
+        icol = imin[ccell] + _offsets(nicol[first:last])
+        edges = _column_edges(ucorners[ccell], vcorners[ccell], icol)
+
+        # the row lines jmin, ..., jmax of each column, and the nodes between
+        nrows = (jmax - jmin)[ccell]
+        lcol = _expand(np.arange(len(ccell)), nrows + 1)
+        yline = jmin[ccell][lcol] + _offsets(nrows + 1)
+        ramps = _ramp_integral(edges, lcol, yline)
+
+        upper = np.ones(len(yline), dtype=bool)
+        upper[np.cumsum(nrows + 1) - 1] = False
+        area = np.abs(ramps[:-1] - ramps[1:])[upper[:-1]]
+        pcell = ccell[lcol[upper]]
+        nodes = icol[lcol[upper]] * nrow + yline[upper]
+
+        # the sums for the nodes the chunk reaches, from the first of them
+        used = area > MINAREA
+        nodes, area, pcell = nodes[used], area[used], pcell[used]
+        if len(nodes) == 0:
+            return 0, np.zeros((len(values), 0))
+        nodemin = nodes.min()
+        return nodemin, np.stack(
+            [
+                np.bincount(nodes - nodemin, weights=area * vals[pcell])
+                for vals in values
+            ]
+        )
+
+    chunks = zip(bounds[:-1], bounds[1:])
+    for nodemin, partial in _threads.ordered_map(chunk_sums, chunks, threads):
+        sums[:, nodemin : nodemin + partial.shape[1]] += partial
+
+    return [nodesum.reshape(ncol, nrow) for nodesum in sums]
+
+
+def _expand(items, counts):
+    """Repeat each item count times."""
+    return np.repeat(items, counts)
+
+
+def _offsets(counts):
+    """0, 1, ..., count - 1 for each count, concatenated."""
+    ends = np.cumsum(counts)
+    return np.arange(ends[-1] if len(ends) else 0) - np.repeat(ends - counts, counts)
+
+
+def overlap_area(ucorners, vcorners, inode, jnode):
+    """The area of each quadrilateral inside the unit square of its node.
+
+    The corners are in the xtgeo order, so the polygon is corners 0, 1, 3, 2.
+    """
+
+    edges = _column_edges(ucorners, vcorners, inode)
+    index = np.arange(len(inode))
+    return np.abs(
+        _ramp_integral(edges, index, jnode) - _ramp_integral(edges, index, jnode + 1.0)
+    )
+
+
+def _column_edges(ucorners, vcorners, inode):
+    """The polygon edges clipped to the column inode <= u <= inode + 1.
+
+    Per edge, as (n, 4) numpies: the signed clipped width, the highest and
+    lowest v over the clipped edge, and 1 / (2 * their difference) (or 0).
+    """
+
+    width = np.empty(ucorners.shape)
+    vhigh = np.empty(ucorners.shape)
+    vlow = np.empty(ucorners.shape)
+    for num, (first, second) in enumerate(((0, 1), (1, 3), (3, 2), (2, 0))):
+        xa, ya = ucorners[:, first], vcorners[:, first]
+        xb, yb = ucorners[:, second], vcorners[:, second]
+
+        dxe = xb - xa
+        slope = (yb - ya) / np.where(dxe == 0.0, 1.0, dxe)
+        low = np.clip(np.minimum(xa, xb), inode, inode + 1.0)
+        high = np.clip(np.maximum(xa, xb), inode, inode + 1.0)
+        ylow = ya + (low - xa) * slope
+        yhigh = ya + (high - xa) * slope
+
+        width[:, num] = np.sign(dxe) * (high - low)
+        vhigh[:, num] = np.maximum(ylow, yhigh)
+        vlow[:, num] = np.minimum(ylow, yhigh)
+
+    dvh = vhigh - vlow
+    halfinv = np.where(dvh > 0.0, 0.5 / np.where(dvh > 0.0, dvh, 1.0), 0.0)
+    return width, vhigh, vlow, halfinv
+
+
+def _ramp_integral(edges, index, yline):
+    """Sum over the clipped edges of the integral of max(v - yline, 0) du.
+
+    The sum is the area of the polygon in the column above yline, with a sign
+    given by the orientation, so the area inside the node square between the
+    row lines j and j + 1 is the difference at j and j + 1. Along an edge, v is
+    linear in u, so the integral is the width times the mean of the ramp: the
+    mean of the ends where the edge is above the line, else from the
+    antiderivative of the ramp, max(t, 0) ** 2 / 2.
+    """
+
+    width, vhigh, vlow, halfinv = (item[index] for item in edges)
+    yline = np.asarray(yline, dtype=np.float64)[:, np.newaxis]
+
+    above = vhigh - yline
+    below = vlow - yline
+    ramp = np.maximum(above, 0.0)
+    mean = np.where(below >= 0.0, 0.5 * (above + below), ramp * ramp * halfinv)
+    return (width * mean).sum(axis=1)
+
+
+def average(geometry, corners, mprops, weight, inzone, threads=1):
+    """Area and weight averaged maps, for one or more properties.
+
+    Args:
+        geometry (MapGeometry): The map geometry
+        corners: The (u, v) corners from map_index_corners()
+        mprops: A list of 3D numpies, the properties to average
+        weight: The 3D weight (e.g. dz * filter); 0 for inactive cells
+        inzone: A 3D boolean numpy, True for the cells in the zone
+        threads (int): The number of threads, see node_sums()
+
+    Returns:
+        A list of masked (ncol, nrow) numpies, one per property; masked where
+        the summed weight is zero
+    """
+
+    return averages_from_sums(
+        average_sums(geometry, corners, mprops, weight, inzone, threads=threads)
+    )
+
+
+def average_sums(geometry, corners, mprops, weight, inzone, threads=1):
+    """The node sums of the weight, and of each property times the weight.
+
+    The arguments are as for average(). The sums of parts of a grid, e.g. the
+    k-slabs (see _slabs), can be added before averages_from_sums().
+    """
+
+    cells = np.flatnonzero((weight > 0.0) & inzone)
+    wvals = weight.ravel()[cells]
+    return node_sums(
+        geometry,
+        corners,
+        [wvals] + [mprop.ravel()[cells] * wvals for mprop in mprops],
+        cells,
+        threads=threads,
+    )
+
+
+def averages_from_sums(sums):
+    """The averages from the sums of average_sums()."""
+    wsum = sums[0]
+    return [
+        ma.masked_where(wsum < TINY, msum / np.where(wsum < TINY, 1.0, wsum))
+        for msum in sums[1:]
+    ]
+
+
+def thickness(geometry, corners, hcpfz, dz, inzone, mask_outside=False, threads=1):
+    """The HC thickness map; the HC per area of each cell times the overlap.
+
+    With mask_outside, nodes not covered by cells with a thickness in the
+    zone are masked.
+    """
+
+    return thickness_from_sums(
+        thickness_sums(geometry, corners, hcpfz, dz, inzone, threads=threads),
+        mask_outside=mask_outside,
+    )
+
+
+def thickness_sums(geometry, corners, hcpfz, dz, inzone, threads=1):
+    """The node sums of the HC and of the thickness, as for average_sums()."""
+
+    cells = np.flatnonzero((dz > 0.0) & inzone)
+    return node_sums(
+        geometry,
+        corners,
+        [hcpfz.ravel()[cells], dz.ravel()[cells]],
+        cells,
+        threads=threads,
+    )
+
+
+def thickness_from_sums(sums, mask_outside=False):
+    """The HC thickness from the sums of thickness_sums()."""
+    hcsum, dzsum = sums
+    if mask_outside:
+        return ma.masked_where(dzsum < TINY, hcsum)
+    return ma.array(hcsum)
@@ -3,11 +3,50 @@ from collections import defaultdict
 
 import numpy as np
 import numpy.ma as ma
-import xtgeo
 from xtgeo.common.exceptions import DateNotFoundError, KeywordFoundNoDateError
 
+from . import _gridcache, _profiling, _slabs
+
 logger = logging.getLogger(__name__)
 
+# computesettings: tuning: precision, the float type of the numpies
+PRECISIONS = {"float64": np.float64, "float32": np.float32}
+
+MB = 1024 * 1024
+
+
+def compute_dtype(config):
+    """The float type of the numpies, from computesettings: tuning: precision.
+
+    With float32, the thicknesses, properties, weights, saturations and so the
+    HCPFZ are float32, as in the ROFF and UNRST files. The cell center (and
+    corner) coordinates stay float64, since UTM coordinates in float32 are only
+    accurate to about half a metre, and the map sums are float64.
+    """
+
+    precision = config["computesettings"]["tuning"]["precision"]
+    if precision not in PRECISIONS:
+        raise ValueError(
+            f"Unknown precision {precision}, use one of {list(PRECISIONS)}"
+        )
+    return np.dtype(PRECISIONS[precision])
+
+
+def _log_numpies_mb(what, dtype, *numpies):
+    """Log the memory of the numpies in dicts; shared numpies counted once."""
+    arrays = {}
+    for values in numpies:
+        for value in values.values():
+            for array in value if isinstance(value, tuple) else (value,):
+                if isinstance(array, np.ndarray):
+                    arrays[id(array)] = array
+    logger.info(
+        "The numpies for the %s use %.1f MB (%s)",
+        what,
+        sum(value.nbytes for value in arrays.values()) / MB,
+        dtype.name,
+    )
+
 
 def files_to_import(config, appname):
     """Get a list of files to import, based on config"""
@@ -111,7 +150,7 @@ def files_to_import(config, appname):
     return gfile, initlist, restartlist, dates
 
 
-def import_data(appname, gfile, initlist, restartlist, dates):
+def import_data(appname, gfile, initlist, restartlist, dates, grd=None):
     """Get the grid and the props data.
     Well get the grid and the propsdata for data to be plotted,
     zonation (if required), filters (if required)
@@ -121,11 +160,14 @@ def import_data(appname, gfile, initlist, restartlist, dates):
     Args:
         config(dict): Th configuration dictionary
         appname(str): Name of application
+        grd (Grid): The grid, e.g. a k-slab (see _slabs); imported if None
 
     """
     logger.debug("Import data for %s", appname)
     # get the grid data + some geometrics
-    grd = xtgeo.grid_from_file(gfile)
+    if grd is None:
+        with _profiling.stage("grid import"):
+            grd = _gridcache.grid_from_file(gfile)
 
     # For rock thickness only model, the initlist and restartlist will be
     # empty dicts, and just return at this point.
@@ -133,6 +175,12 @@ def import_data(appname, gfile, initlist, restartlist, dates):
     if not initlist and not restartlist:
         return grd, None, None, None
 
+    with _profiling.stage("property import"):
+        return _import_properties(appname, grd, initlist, restartlist, dates)
+
+
+def _import_properties(appname, grd, initlist, restartlist, dates):
+
     # collect data per initfile etc: make a dict on the form:
     # {initfilename: [[prop1, lookfor1], [prop2, lookfor2], ...]} the
     # trick is defaultdict!
@@ -176,8 +224,8 @@ def import_data(appname, gfile, initlist, restartlist, dates):
                 usenames.append(usename)
 
             logger.info(f"Import <{lookfornames}> from <{inifile}> ...")
-            tmp = xtgeo.gridproperties_from_file(
-                inifile, names=lookfornames, fformat="init", grid=grd
+            tmp = _slabs.gridproperties_from_file(
+                inifile, grd, names=lookfornames, fformat="init"
             )
             for i, name in enumerate(lookfornames):
                 prop = tmp.get_prop_by_name(name)
@@ -193,8 +241,8 @@ def import_data(appname, gfile, initlist, restartlist, dates):
                 lookforname = None
 
             logger.info(f"Import <{lookforname}> from <{inifile}> ...")
-            tmp = xtgeo.gridproperty_from_file(
-                inifile, name=lookforname, fformat="guess", grid=grd
+            tmp = _slabs.gridproperty_from_file(
+                inifile, grd, name=lookforname, fformat="guess"
             )
             tmp.name = usename
             initobjects.append(tmp)
@@ -207,8 +255,8 @@ def import_data(appname, gfile, initlist, restartlist, dates):
 
     for restfile, restprops in restdict.items():
         try:
-            tmp = xtgeo.gridproperties_from_file(
-                restfile, names=restprops, fformat="unrst", grid=grd, dates=dates
+            tmp = _slabs.gridproperties_from_file(
+                restfile, grd, names=restprops, fformat="unrst", dates=dates
             )
 
         except DateNotFoundError as rwarn:
@@ -239,6 +287,37 @@ def import_data(appname, gfile, initlist, restartlist, dates):
     return grd, initobjects, restobjects, newdateslist
 
 
+def filterinfo(config):
+    """Get a text describing the filters in config, e.g. for plot subtitles."""
+
+    info = ""
+
+    if "filters" not in config or not isinstance(config["filters"], list):
+        return info
+
+    for flist in config["filters"]:
+        if "name" in flist:
+            info = info + "  " + flist["name"]
+            drange = flist.get("discrange", None)
+            irange = flist.get("intvrange", None)
+
+            # drange may either be a list or a dict (or None):
+            if isinstance(drange, dict):
+                drange = list(drange.values())
+
+            if not flist.get("discrete", False):
+                info = info + ":" + str(irange)
+            elif drange and irange is None:
+                info = info + ":" + str(list(drange))
+            elif drange is None and irange:
+                info = info + ":" + str(irange)
+
+        if "tvdrange" in flist:
+            info = info + "  " + "tvdrange: {}".format(flist["tvdrange"])
+
+    return info
+
+
 def import_filters(config, appname, grd):
     """Get the filterdata, and process them, return a filterarray
 
@@ -255,17 +334,131 @@ def import_filters(config, appname, grd):
 
     """
 
+    logger.debug("Import filter data for %s", appname)
+
+    config["_filterinfo"] = filterinfo(config)  # perhaps not best practice...
+
+    if "filters" not in config or not isinstance(config["filters"], list):
+        return np.ones(grd.dimensions, dtype=np.int8)
+
+    # identical filters on an identical grid give the same filter array
     eclroot = config["input"].get("eclroot")
+    sources = []
+    for flist in config["filters"]:
+        if "source" in flist:
+            source = flist["source"]
+            if "$eclroot" in source:
+                source = source.replace("$eclroot", eclroot)
+            sources.append(_gridcache.file_digest(source))
 
-    logger.debug("Import filter data for %s", appname)
+    key = (repr(config["filters"]), tuple(sources))
+    return _gridcache.cached_for_grid(
+        "filterarray", grd, key, lambda: _filterarray(config, grd)
+    )
 
-    filterarray = np.ones(grd.dimensions, dtype="int")
 
-    filterinfo = ""
+def import_weights(config, grd, specd, names):
+    """Get the weights for the average maps, each computed once.
 
-    if "filters" not in config or not isinstance(config["filters"], list):
-        config["_filterinfo"] = filterinfo  # perhaps not best practice...
-        return filterarray
+    The weights are 'dz', 'bulk' (bulk volume), 'porv' (pore volume) and
+    'hcpv--YYYYMMDD' (HC pore volume at a date, from the water saturation).
+    PORV and SWAT are read from computesettings: weightsources, or from the
+    INIT and UNRST files of the eclroot, e.g.::
+
+        weightsources:
+          PORV: $folderroot/porv.roff
+          SWAT--19991201: $folderroot/swat_19991201.roff  # or SWAT: a UNRST
+
+    Args:
+        config(dict): The configuration dictionary
+        grd (Grid): The XTGeo Grid object
+        specd (dict): The grid geometry numpies, as from get_numpies_avgprops()
+        names: The weights to get, e.g. ['dz', 'hcpv--19991201']
+
+    Returns:
+        A dict {name: 3D numpy}, with 0 for inactive cells
+    """
+
+    weights = {}
+    for name in sorted(names, key=lambda name: name != "porv"):
+        kind, _, date = name.partition("--")
+        if name == "dz":
+            weights[name] = specd["idz"]
+        elif name == "bulk":
+            weights[name] = _gridcache.cached_for_grid(
+                "bulk volume",
+                grd,
+                compute_dtype(config).name,
+                lambda: _bulk_volume(grd, specd),
+            )
+        elif name == "porv":
+            weights[name] = _weightprop(config, grd, specd, "PORV")
+        elif kind == "hcpv" and len(date) == 8:
+            if "porv" not in weights:
+                weights["porv"] = _weightprop(config, grd, specd, "PORV")
+            swat = _weightprop(config, grd, specd, "SWAT", date)
+            weights[name] = weights["porv"] * (1.0 - swat)
+        else:
+            raise ValueError(
+                f"Unknown weight {name}, use dz, bulk, porv or hcpv--YYYYMMDD"
+            )
+        logger.info("Weight %s, mean value %s", name, weights[name].mean())
+
+    return {name: weights[name] for name in names}
+
+
+def _bulk_volume(grd, specd):
+    bulk = ma.filled(grd.get_bulk_volume(asmasked=False).values, fill_value=0.0)
+    bulk = bulk.astype(specd["idz"].dtype, copy=False)
+    bulk[specd["iactnum"] == 0] = 0.0
+    return bulk
+
+
+def _weightprop(config, grd, specd, pname, date=None):
+    """Import PORV or SWAT (at a date) for a weight; 0 for inactive cells."""
+
+    sources = config["computesettings"]["weightsources"]
+    eclroot = config["input"].get("eclroot")
+    folderroot = config["input"].get("folderroot")
+
+    dated = pname + "--" + date if date else pname
+    if dated in sources:
+        source, lookfor = sources[dated], None
+    elif pname in sources:
+        source, lookfor = sources[pname], pname
+    elif eclroot:
+        source, lookfor = eclroot + (".UNRST" if date else ".INIT"), pname
+    else:
+        raise ValueError(
+            f"The weight needs {dated}; give it in computesettings: weightsources, "
+            "or give the eclroot"
+        )
+
+    if "$folderroot" in source:
+        source = source.replace("$folderroot", folderroot)
+    if "$eclroot" in source:
+        source = source.replace("$eclroot", eclroot)
+
+    logger.info("Weight, import <%s> from <%s> ...", dated, source)
+    if source.endswith("UNRST"):
+        prop = _slabs.gridproperty_from_file(
+            source, grd, name=lookfor, fformat="unrst", date=int(date)
+        )
+    elif source.endswith("INIT"):
+        prop = _slabs.gridproperty_from_file(source, grd, name=lookfor, fformat="init")
+    else:
+        prop = _slabs.gridproperty_from_file(source, grd)
+
+    values = ma.filled(prop.values, fill_value=0.0).astype(compute_dtype(config))
+    values[specd["iactnum"] == 0] = 0.0
+    return values
+
+
+def _filterarray(config, grd):
+    eclroot = config["input"].get("eclroot")
+
+    # 0 or 1, as int8, so the weights keep their float type when filtered
+    filterarray = np.ones(grd.dimensions, dtype=np.int8)
 
     for flist in config["filters"]:
         if "name" in flist:
@@ -276,30 +469,24 @@ def import_filters(config, appname, grd):
 
             # drange may either be a list or a dict (or None):
             if isinstance(drange, dict):
-                drangetxt = list(drange.values())
                 drange = list(drange.keys())
-            elif isinstance(drange, list):
-                drangetxt = list(drange)
 
             irange = flist.get("intvrange", None)
             discrete = flist.get("discrete", False)
-            filterinfo = filterinfo + "  " + name
 
             if "$eclroot" in source:
                 source = source.replace("$eclroot", eclroot)
-            gprop = xtgeo.gridproperty_from_file(source, grid=grd, name=name)
+            gprop = _slabs.gridproperty_from_file(source, grd, name=name)
             pval = gprop.values
             logger.info("Filter, import <{}> from <{}> ...".format(name, source))
 
             if not discrete:
                 filterarray[(pval < irange[0]) | (pval > irange[1])] = 0
-                filterinfo = filterinfo + ":" + str(irange)
             else:
                 # discrete variables can both be a range and discrete choice
                 # i.e. intvrange vs discrange
-                invarray = np.zeros(grd.dimensions, dtype="int")
+                invarray = np.zeros(grd.dimensions, dtype=np.int8)
                 if drange and irange is None:
-                    filterinfo = filterinfo + ":" + str(drangetxt)
                     for ival in drange:
                         if ival not in gprop.codes:
                             logger.warning(
@@ -309,7 +496,6 @@ def import_filters(config, appname, grd):
 
                         invarray[pval == ival] = 1
                 elif drange is None and irange:
-                    filterinfo = filterinfo + ":" + str(irange)
                     invarray[(pval >= irange[0]) & (pval <= irange[1])] = 1
                 else:
                     raise ValueError(
@@ -322,7 +508,6 @@ def import_filters(config, appname, grd):
         if "tvdrange" in flist:
             tvdrange = flist["tvdrange"]
             _xc, _yc, zc = grd.get_xyz(asmasked=False)
-            filterinfo = filterinfo + "  " + "tvdrange: {}".format(tvdrange)
 
             filterarray[zc.values < tvdrange[0]] = 0
             filterarray[zc.values > tvdrange[1]] = 0
@@ -330,8 +515,6 @@ def import_filters(config, appname, grd):
                 "Filter on tdvrange {} (rough; based on cell center)".format(tvdrange)
             )
 
-    config["_filterinfo"] = filterinfo  # perhaps not best practice...
-
     return filterarray
 
 
@@ -340,38 +523,21 @@ def get_numpies_hc_thickness(config, grd, initobjects, restobjects, dates):
 
     logger.debug("Getting numpies...")
 
-    logger.debug("Getting actnum...")
-    actnum = grd.get_actnum().values
-    actnum = ma.filled(actnum)
-
-    logger.debug("Getting xc, yc, zc...")
-    xc, yc, zc = grd.get_xyz(asmasked=False)
-    xc = ma.filled(xc.values)
-    yc = ma.filled(yc.values)
-    zc = ma.filled(zc.values)
-
-    logger.debug("Getting dz...")
-    dz = ma.filled(grd.get_dz(asmasked=False).values)
-    logger.debug("Getting dz as ma.filled...")
-    dz[actnum == 0] = 0.0
-
-    logger.debug("Getting dx dy...")
-    dx = ma.filled(grd.get_dx().values)
-    dy = ma.filled(grd.get_dy().values)
-    logger.debug("ma.filled for dx dy done")
-
-    initd = {
-        "iactnum": actnum,
-        "xc": xc,
-        "yc": yc,
-        "zc": zc,
-        "dx": dx,
-        "dy": dy,
-        "dz": dz,
-    }
+    dtype = compute_dtype(config)
+    initd = dict(
+        _gridcache.cached_for_grid(
+            "hc geometry", grd, dtype.name, lambda: _hc_geometry(grd, dtype)
+        )
+    )
+    actnum = initd["iactnum"]
 
     logger.debug("Got {}".format(initd.keys()))
 
+    if config["computesettings"]["tuning"]["footprint"]:
+        initd["corners"] = _gridcache.cached_for_grid(
+            "top corners", grd, None, lambda: _top_corners(grd)
+        )
+
     if config["computesettings"]["critmode"]:
         crname = config["computesettings"]["critmode"].upper()
     else:
@@ -382,31 +548,35 @@ def get_numpies_hc_thickness(config, grd, initobjects, restobjects, dates):
     xinput = config["input"]
 
     if "rock" in xmode:
+        _log_numpies_mb("HC thickness", dtype, initd)
         return initd, None
 
     if "xhcpv" in xinput:
-        xhcpv = ma.filled(initobjects[0].values, fill_value=0.0)
+        xhcpv = _filled(initobjects[0], 0.0, dtype)
         xhcpv[actnum == 0] = 0.0
         initd.update({"xhcpv": xhcpv})
 
     else:
         if xmethod == "use_poro" or xmethod == "use_porv":
+            # the grid geometry may be shared; the INIT values are preferred
+            dx, dy, dz = initd["dx"], initd["dy"], initd["dz"].copy()
+
             # initobjects is a list of GridProperty objects (single)
             for prop in initobjects:
                 if prop.name == "PORO":
-                    poro = ma.filled(prop.values, fill_value=0.0)
+                    poro = _filled(prop, 0.0, dtype)
                 if prop.name == "NTG":
-                    ntg = ma.filled(prop.values, fill_value=0.0)
+                    ntg = _filled(prop, 0.0, dtype)
                 if prop.name == "PORV":
-                    porv = ma.filled(prop.values, fill_value=0.0)
+                    porv = _filled(prop, 0.0, dtype)
                 if prop.name == "DX":
-                    dx = ma.filled(prop.values, fill_value=0.0)
+                    dx = _filled(prop, 0.0, dtype)
                 if prop.name == "DY":
-                    dy = ma.filled(prop.values, fill_value=0.0)
+                    dy = _filled(prop, 0.0, dtype)
                 if prop.name == "DZ":
-                    dz = ma.filled(prop.values, fill_value=0.0)
+                    dz = _filled(prop, 0.0, dtype)
                 if crname is not None and prop.name == crname:
-                    soxcr = ma.filled(prop.values, fill_value=0.0)
+                    soxcr = _filled(prop, 0.0, dtype)
 
             porv[actnum == 0] = 0.0
             poro[actnum == 0] = 0.0
@@ -437,12 +607,12 @@ def get_numpies_hc_thickness(config, grd, initobjects, restobjects, dates):
         for prop in restobjects:
             pname = "SWAT" + "_" + str(date)
             if prop.name == pname:
-                swat[date] = ma.filled(prop.values, fill_value=1)
+                swat[date] = _filled(prop, 1, dtype)
                 nsoil += 1
 
             pname = "SGAS" + "_" + str(date)
             if prop.name == pname:
-                sgas[date] = ma.filled(prop.values, fill_value=1)
+                sgas[date] = _filled(prop, 1, dtype)
                 nsoil += 1
 
             if nsoil == 2:
@@ -462,24 +632,99 @@ def get_numpies_hc_thickness(config, grd, initobjects, restobjects, dates):
         restartd["swat_" + str(date)] = swat[date]
         restartd["soil_" + str(date)] = soil[date]
 
+    _log_numpies_mb("HC thickness", dtype, initd, restartd)
     return initd, restartd
 
 
-def get_numpies_avgprops(config, grd, initobjects, restobjects):
-    """Process for average map; to get the needed numpies"""
+def _filled(prop, fill_value, dtype):
+    """The values of a grid property as a numpy of the float type dtype."""
+    return ma.filled(prop.values, fill_value=fill_value).astype(dtype, copy=False)
+
+
+def _cell_geometry(grd, dtype):
+    """Get actnum, cell centers and thickness numpies, shared by the scripts.
 
-    actnum = grd.get_actnum().get_npvalues3d(fill_value=0)
-    # mask is False  to get values for all cells, also inactive
+    The cell centers are float64, zc and dz of the float type dtype.
+    """
+
+    logger.debug("Getting actnum...")
+    actnum = ma.filled(grd.get_actnum().values, fill_value=0)
+
+    # mask is False to get values for all cells, also inactive
+    logger.debug("Getting xc, yc, zc...")
     xc, yc, zc = grd.get_xyz(asmasked=False)
-    xc = xc.get_npvalues3d()
-    yc = yc.get_npvalues3d()
-    zc = zc.get_npvalues3d()
-    dz = grd.get_dz(asmasked=False).get_npvalues3d()
+    xc = ma.filled(xc.values)
+    yc = ma.filled(yc.values)
+    zc = ma.filled(zc.values).astype(dtype, copy=False)
 
+    logger.debug("Getting dz...")
+    dz = ma.filled(grd.get_dz(asmasked=False).values).astype(dtype, copy=False)
     dz[actnum == 0] = 0.0
 
+    return {"iactnum": actnum, "xc": xc, "yc": yc, "zc": zc, "dz": dz}
+
+
+def _hc_geometry(grd, dtype):
+    """Get the grid geometry numpies for the HC thickness script."""
+
+    geometry = dict(
+        _gridcache.cached_for_grid(
+            "cell geometry", grd, dtype.name, lambda: _cell_geometry(grd, dtype)
+        )
+    )
+
+    logger.debug("Getting dx dy...")
+    geometry["dx"] = ma.filled(grd.get_dx().values).astype(dtype, copy=False)
+    geometry["dy"] = ma.filled(grd.get_dy().values).astype(dtype, copy=False)
+    logger.debug("ma.filled for dx dy done")
+
+    return geometry
+
+
+def _top_corners(grd):
+    """Get the x and y of the top face corners, each as (ncol, nrow, nlay, 4).
+
+    The corners are in the xtgeo order, i.e. the top face polygon is corners
+    0, 1, 3, 2; inactive cells get corners as active cells.
+    """
+
+    logger.debug("Getting top face corners...")
+    corners = grd.get_xyz_corners()
+    xcorners = np.stack(
+        [ma.filled(corners[3 * num].values) for num in range(4)], axis=-1
+    )
+    ycorners = np.stack(
+        [ma.filled(corners[3 * num + 1].values) for num in range(4)], axis=-1
+    )
+    return xcorners, ycorners
+
+
+def _avg_geometry(grd, dtype):
+    """Get the grid geometry numpies for the average map script."""
+
+    geometry = _gridcache.cached_for_grid(
+        "cell geometry", grd, dtype.name, lambda: _cell_geometry(grd, dtype)
+    )
+
     # store these in a dict for special data (specd):
-    specd = {"idz": dz, "ixc": xc, "iyc": yc, "izc": zc, "iactnum": actnum}
+    return {
+        "idz": geometry["dz"],
+        "ixc": geometry["xc"],
+        "iyc": geometry["yc"],
+        "izc": geometry["zc"],
+        "iactnum": geometry["iactnum"],
+    }
+
+
+def get_numpies_avgprops(config, grd, initobjects, restobjects):
+    """Process for average map; to get the needed numpies"""
+
+    dtype = compute_dtype(config)
+    specd = dict(
+        _gridcache.cached_for_grid(
+            "avg geometry", grd, dtype.name, lambda: _avg_geometry(grd, dtype)
+        )
+    )
 
     if initobjects is not None and restobjects is not None:
         groupobjects = initobjects + restobjects
@@ -490,6 +735,11 @@ def get_numpies_avgprops(config, grd, initobjects, restobjects):
     else:
         raise ValueError("Both initiobjects and restobjects are None")
 
+    if config["computesettings"]["tuning"]["footprint"]:
+        specd["icorners"] = _gridcache.cached_for_grid(
+            "top corners", grd, None, lambda: _top_corners(grd)
+        )
+
     propd = {}
 
     for pname in config["input"]:
@@ -523,7 +773,7 @@ def get_numpies_avgprops(config, grd, initobjects, restobjects):
 
                     if ok1 and ok2:
                         ptmp = ptmp1 - ptmp2
-                        propd[pname] = ptmp
+                        propd[pname] = ptmp.astype(dtype, copy=False)
 
             # only one date
             else:
@@ -531,15 +781,16 @@ def get_numpies_avgprops(config, grd, initobjects, restobjects):
                     usepname = pname.replace("--", "_")
                     if usepname == prop.name:
                         ptmp = prop.get_npvalues3d()
-                        propd[pname] = ptmp
+                        propd[pname] = ptmp.astype(dtype, copy=False)
 
         # no dates
         else:
             for prop in groupobjects:
                 if usepname == prop.name:
                     ptmp = prop.get_npvalues3d()
-                    propd[pname] = ptmp
+                    propd[pname] = ptmp.astype(dtype, copy=False)
 
+    _log_numpies_mb("average maps", dtype, specd, propd)
     logger.debug("Return specd from {} is {}".format(__name__, specd.keys()))
     logger.debug("Return propd from {} is {}".format(__name__, propd.keys()))
     return specd, propd
@@ -1,7 +1,8 @@
 import logging
 
 import numpy as np
-import xtgeo
+
+from . import _gridcache, _slabs
 
 logger = logging.getLogger(__name__)
 
@@ -24,6 +25,20 @@ def zonation(config, grd):
         superzoned (dict): Super zonation dictionary (name: [zone range])
     """
 
+    # identical zonation on an identical grid gives the same zonation
+    key = repr(config["zonation"])
+    if "zproperty" in config["zonation"]:
+        source = config["zonation"]["zproperty"]["source"]
+        if "$eclroot" in source:
+            source = source.replace("$eclroot", config["input"]["eclroot"])
+        key = (key, _gridcache.file_digest(source))
+
+    return _gridcache.cached_for_grid(
+        "zonation", grd, key, lambda: _zonation(config, grd)
+    )
+
+
+def _zonation(config, grd):
     if "zproperty" in config["zonation"] and "zranges" in config["zonation"]:
         raise ValueError('Cannot have both "zproperty" and "zranges" in "zonation"')
 
@@ -42,8 +57,8 @@ def zonation(config, grd):
         if "$eclroot" in mysource:
             mysource = mysource.replace("$eclroot", eclroot)
 
-        zon = xtgeo.gridproperty_from_file(
-            mysource, fformat="guess", name=zcfg["name"], grid=grd
+        zon = _slabs.gridproperty_from_file(
+            mysource, grd, fformat="guess", name=zcfg["name"]
         )
         myzonation = zon.values.astype(np.int32)
         # myzonation = np.ma.filled(zonation, fill_value=0)
@@ -65,7 +80,9 @@ def zonation(config, grd):
 
             logger.debug("K01 K02: %s - %s", k01, k02)
 
-            usezonation[:, :, k01:k02] = i + 1
+            # the layers are counted from the first layer of a k-slab grid
+            first = _slabs.first_layer(grd)
+            usezonation[:, :, max(k01 - first, 0) : max(k02 - first, 0)] = i + 1
             zoned[zname] = i + 1
 
     if "superranges" in config["zonation"]:
@@ -95,3 +112,68 @@ def zonation(config, grd):
     zmerged["all"] = None
 
     return usezonation, zmerged
+
+
+def zone_names(config):
+    """Get the zone names as zonation() would, but without reading a grid.
+
+    Args:
+        config (dict): The config dict
+
+    Returns:
+        A list of zone names, super zone names and finally "all"
+    """
+
+    names = []
+    if "zproperty" in config["zonation"]:
+        for zns in config["zonation"]["zproperty"]["zones"]:
+            names.append(list(zns.keys())[0])
+
+    elif "zranges" in config["zonation"]:
+        for zz in config["zonation"]["zranges"]:
+            names.append(list(zz.keys())[0])
+
+    if "superranges" in config["zonation"]:
+        for zz in config["zonation"]["superranges"]:
+            names.append(list(zz.keys())[0])
+
+    names.append("all")
+    return names
+
+
+def zones_to_map(config, zoned):
+    """The zones to map, as (zname, zrange), from computesettings: zone and all."""
+
+    zones = []
+    for zname, zrange in zoned.items():
+        if zname == "all":
+            if config["computesettings"]["all"] is not True:
+                logger.debug("Skip <%s> (cf. computesettings: all)", zname)
+                continue
+        elif config["computesettings"]["zone"] is not True:
+            logger.debug("Skip <%s> (cf. computesettings: zone)", zname)
+            continue
+        zones.append((zname, zrange))
+    return zones
+
+
+def zone_subset(zonation, zname, zrange):
+    """The zonation and the zone number for mapping a zone.
+
+    A super zone (a list of zones) is 888 in its cells, and "all" is 999 in
+    all cells; for a zone, the zonation is used as is.
+
+    Returns:
+        The zonation (3D numpy) and the zone number
+    """
+
+    if zname == "all":
+        return np.full(zonation.shape, 999, dtype=zonation.dtype), 999
+
+    if isinstance(zrange, list):
+        logger.debug("Super zone %s: %s", zname, zrange)
+        usezonation = np.zeros(zonation.shape, dtype=zonation.dtype)
+        usezonation[np.isin(zonation, zrange)] = 888
+        return usezonation, 888
+
+    return zonation, zrange
@@ -0,0 +1,163 @@
+"""Private module for sharing grid derived data between runs in one process.
+
+In an ensemble run (see grid3d_maps.ensemble) many realizations are mapped in
+the same process. Realizations often have identical grids, and then the grid,
+its geometry (cell centers, thickness, actnum), the zonation, the filter array
+and the map settings are made once and reused. Grids and other input files are
+identified by a digest of the file content, not by the file name.
+
+The data derived from a grid are kept for the MAXGRIDS grids used most
+recently, so an ensemble where each realization has its own grid does not grow
+the memory with the number of realizations; the data of older grids are
+dropped as a new grid is imported.
+
+Outside an ensemble run the cache is not active, and nothing is kept. Cached
+numpy arrays are read-only, so that a reused array cannot be modified by
+accident.
+"""
+
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+import xtgeo
+
+logger = logging.getLogger(__name__)
+
+# the number of grids that the grid derived data are kept for
+MAXGRIDS = 2
+
+# data not derived from a grid (file digests, map geometries)
+_CACHE = None
+# the data derived from each grid, by grid digest, least recently used first
+_GRIDS = OrderedDict()
+# the grid digest of each cached Grid instance, by id
+_GRIDIDS = {}
+_STATS = {"hits": 0, "misses": 0}
+
+
+@contextmanager
+def active():
+    """Keep grid derived data while the context is active.
+
+    If the cache is active already (e.g. in an ensemble run), it is used as is.
+    """
+    if _CACHE is not None:
+        yield
+        return
+
+    activate()
+    try:
+        yield
+    finally:
+        deactivate()
+
+
+def activate():
+    """Activate the cache (e.g. once per worker process); clears old content."""
+    global _CACHE
+    _CACHE = {}
+    _GRIDS.clear()
+    _GRIDIDS.clear()
+    _STATS.update(hits=0, misses=0)
+
+
+def deactivate():
+    global _CACHE
+    _CACHE = None
+    _GRIDS.clear()
+    _GRIDIDS.clear()
+
+
+def stats():
+    """Return the number of cache hits and misses since activation, and the
+    number of grids kept."""
+    return dict(_STATS, grids=len(_GRIDS))
+
+
+def file_digest(filename):
+    """A digest of the file content; reused as long as the file is unchanged."""
+    stat = os.stat(filename)
+    key = ("digest", os.path.abspath(filename), stat.st_size, stat.st_mtime_ns)
+    if _CACHE is not None and key in _CACHE:
+        return _CACHE[key]
+
+    sha = hashlib.sha1()
+    with open(filename, "rb") as stream:
+        for chunk in iter(lambda: stream.read(1 << 20), b""):
+            sha.update(chunk)
+
+    if _CACHE is not None:
+        _CACHE[key] = sha.hexdigest()
+    return sha.hexdigest()
+
+
+def cached(kind, key, func):
+    """Return func() for (kind, key), computed once while the cache is active."""
+    if _CACHE is None:
+        return func()
+    return _lookup(_CACHE, kind, key, func)
+
+
+def cached_for_grid(kind, grd, key, func):
+    """As cached(), for data derived from a grid made by grid_from_file().
+
+    Data for other grids are not cached, since they cannot be identified.
+    """
+    digest = _GRIDIDS.get(id(grd))
+    if _CACHE is None or digest is None:
+        return func()
+
+    _GRIDS.move_to_end(digest)
+    return _lookup(_GRIDS[digest], kind, key, func)
+
+
+def grid_from_file(gfile):
+    """Import a grid; identical grid files give the same Grid instance.
+
+    The data of the least recently used grids are dropped, so that the data
+    of at most MAXGRIDS grids are kept.
+    """
+    if _CACHE is None:
+        return xtgeo.grid_from_file(gfile)
+
+    digest = file_digest(gfile)
+    if digest not in _GRIDS:
+        _GRIDS[digest] = {}
+        while len(_GRIDS) > MAXGRIDS:
+            olddigest, olddata = _GRIDS.popitem(last=False)
+            _GRIDIDS.pop(id(olddata.get(("grid", None))), None)
+            logger.info("Drop the cached data of grid %s", olddigest)
+
+    _GRIDS.move_to_end(digest)
+    grd = _lookup(_GRIDS[digest], "grid", None, lambda: xtgeo.grid_from_file(gfile))
+    # the cache keeps the grid alive, so id(grd) is unique while it is kept
+    _GRIDIDS[id(grd)] = digest
+    return grd
+
+
+def _lookup(store, kind, key, func):
+    ckey = (kind, key)
+    if ckey in store:
+        _STATS["hits"] += 1
+        logger.info("Reuse %s from an earlier run in this process", kind)
+        return store[ckey]
+
+    _STATS["misses"] += 1
+    store[ckey] = _readonly(func())
+    return store[ckey]
+
+
+def _readonly(obj):
+    if isinstance(obj, np.ndarray):
+        obj.flags.writeable = False
+    elif isinstance(obj, (tuple, list)):
+        for item in obj:
+            _readonly(item)
+    elif isinstance(obj, dict):
+        for item in obj.values():
+            _readonly(item)
+    return obj
@@ -0,0 +1,442 @@
+"""Private module for several statistics per map node in one gridding pass.
+
+The gridding follows xtgeo's avg_from_3dprop(): each layer (or each zone, with
+zone_avg) is interpolated linearly from the cell centers to the map nodes, so
+every layer gives a value and a thickness (weight) at each node. Here, m * dz
+and dz are interpolated in one call per layer, and the layers are reduced in
+one pass to all the requested statistics:
+
+* mean: the dz weighted mean, as avg_from_3dprop()
+* min, max: the min and max of the layer values
+* std: the dz weighted standard deviation of the layer values
+* sum: the sum of the layer values, i.e. the column sum
+* p50: the dz weighted median of the layer values
+
+Only layers with a thickness at the node are taken into account. The layer
+values are kept for the median only, in the float type of the inputs, while
+the sums over the layers are float64 (also for float32 inputs).
+
+The HC thickness is gridded as xtgeo's hc_thickness_from_3dprops(), the HCPFZ
+summed over the layers (see node_thickness).
+
+The sums over the layers are kept in a NodeStatistics (or NodeThickness), so
+the layers can be added in parts, as for the k-slabs of a large grid (see
+_slabs).
+
+The mean maps are gridded by xtgeo (avg_from_3dprop and
+hc_thickness_from_3dprops) with one thread, and here with tuning: threads, or
+for other statistics. With threads, the layers are gridded in threads, and
+added in the order of the layers (see _threads), so the maps are the same as
+with one thread, and the same as from xtgeo (see test_grid3d_threads).
+"""
+
+import logging
+import warnings
+
+import numpy as np
+import numpy.ma as ma
+import scipy.interpolate
+
+from . import _threads
+
+logger = logging.getLogger(__name__)
+
+STATISTICS = ("mean", "min", "max", "std", "sum", "p50")
+
+UNDEF = 1e33
+TINY = 1.1e-20
+
+
+def node_statistics(
+    geometry,
+    xprop,
+    yprop,
+    mprop,
+    dzprop,
+    zoneprop,
+    zone_minmax,
+    statistics=("mean",),
+    zone_avg=False,
+    coarsen=1,
+    threads=1,
+):
+    """Compute statistics per map node for a property, in one pass.
+
+    The arguments are as for xtgeo's RegularSurface.avg_from_3dprop(), with
+    the map geometry (MapGeometry) first; the inputs are 3D numpies for all
+    cells, with dz = 0 for inactive cells. The layers are gridded in threads
+    with threads > 1.
+
+    Returns:
+        A dict {statistic: 2D masked numpy} for the map geometry
+    """
+
+    xprop, yprop, zoneprop, mprop, dzprop = _zone_layers(
+        xprop, yprop, zoneprop, zone_minmax, coarsen, zone_avg, dzprop, mprop
+    )
+
+    nodestats = NodeStatistics(geometry, statistics=statistics)
+    nodestats.add(xprop, yprop, mprop, dzprop, zoneprop, zone_minmax, threads=threads)
+    return nodestats.result()
+
+
+class NodeStatistics:
+    """The sums over the layers per map node, for the statistics.
+
+    The layers may be added in parts, e.g. for each k-slab of a grid (see
+    _slabs), in the order of the layers; the statistics are then the same as
+    for all the layers at once.
+
+    Args:
+        geometry (MapGeometry): The map geometry
+        statistics: The statistics to compute, from STATISTICS
+    """
+
+    def __init__(self, geometry, statistics=("mean",)):
+        unknown = set(statistics) - set(STATISTICS)
+        if unknown:
+            raise ValueError(f"Unknown statistics {sorted(unknown)}, use {STATISTICS}")
+
+        self.geometry = geometry
+        self.statistics = statistics
+        self.shape = shape = (geometry.ncol, geometry.nrow)
+        self.msum = np.zeros(shape)
+        self.dzsum = np.zeros(shape)
+        self.wsum = np.zeros(shape)
+        self.m2sum = np.zeros(shape)
+        self.count = np.zeros(shape)
+        self.vsum = np.zeros(shape)
+        self.vmin = np.full(shape, np.inf)
+        self.vmax = np.full(shape, -np.inf)
+        self.layers = []
+
+    def add(
+        self, xprop, yprop, mprop, dzprop, zoneprop, zone_minmax, coarsen=1, threads=1
+    ):
+        """Grid the layers in the zone range, and add them to the sums.
+
+        The inputs are 3D numpies, as for node_statistics(), but without
+        zone_avg, and the layers are gridded in threads with threads > 1.
+        """
+
+        if coarsen > 1:
+            xprop, yprop, mprop, dzprop, zoneprop = (
+                prop[::coarsen, ::coarsen, :]
+                for prop in (xprop, yprop, mprop, dzprop, zoneprop)
+            )
+
+        weights = np.ones(dzprop.shape, dtype=dzprop.dtype)
+        weights[zoneprop < zone_minmax[0]] = 0.0
+        weights[zoneprop > zone_minmax[1]] = 0.0
+        zoneprop = ma.masked_outside(zoneprop, *zone_minmax)
+
+        xiv, yiv = self.geometry.nodes()
+        layertype = np.result_type(mprop, dzprop, np.float32)
+
+        def layer_values(klay):
+            """The gridded m * dz * w, dz and dz * w of a layer, and the value."""
+
+            xcv = xprop[:, :, klay].ravel()
+            inside = xcv < 1e20
+            ycv = yprop[:, :, klay].ravel()[inside]
+            mvv = mprop[:, :, klay].ravel()[inside]
+            dzv = dzprop[:, :, klay].ravel()[inside]
+            wei = weights[:, :, klay].ravel()[inside]
+            xcv = xcv[inside]
+
+            try:
+                gridded = scipy.interpolate.griddata(
+                    (xcv, ycv),
+                    np.column_stack((mvv * dzv * wei, dzv, dzv * wei)),
+                    (xiv, yiv),
+                    method="linear",
+                    fill_value=0.0,
+                )
+            except ValueError:
+                warnings.warn(
+                    "Some problems in gridding ... will continue", UserWarning
+                )
+                return None
+
+            mdzi, dzi, wdzi = gridded[..., 0], gridded[..., 1], gridded[..., 2]
+
+            # the layer value and weight at each node with a thickness
+            used = wdzi > TINY
+            value = np.where(used, mdzi / np.where(used, wdzi, 1.0), 0.0)
+            return mdzi, dzi, wdzi, used, value
+
+        layers_in_zone = _layers_in_zone(zoneprop, zone_minmax)
+        for gridded in _threads.ordered_map(layer_values, layers_in_zone, threads):
+            if gridded is None:
+                continue
+
+            mdzi, dzi, wdzi, used, value = gridded
+            self.msum += mdzi
+            self.dzsum += dzi
+            self.wsum += np.where(used, wdzi, 0.0)
+            self.m2sum += np.where(used, wdzi * value * value, 0.0)
+            self.count += used
+            self.vsum += value
+            self.vmin = np.where(used, np.minimum(self.vmin, value), self.vmin)
+            self.vmax = np.where(used, np.maximum(self.vmax, value), self.vmax)
+            if "p50" in self.statistics:
+                self.layers.append(
+                    (
+                        np.where(used, value, np.inf).astype(layertype, copy=False),
+                        np.where(used, wdzi, 0.0).astype(layertype, copy=False),
+                    )
+                )
+
+    def result(self):
+        """The statistics, as a dict {statistic: 2D masked numpy}."""
+
+        msum, dzsum, wsum = self.msum, self.dzsum, self.wsum
+        result = {}
+        for stat in self.statistics:
+            if stat == "mean":
+                values = msum / np.where(dzsum == 0.0, 1e-20, dzsum)
+            elif stat == "min":
+                values = self.vmin
+            elif stat == "max":
+                values = self.vmax
+            elif stat == "std":
+                wmean = msum / np.where(wsum > 0.0, wsum, 1.0)
+                variance = self.m2sum / np.where(wsum > 0.0, wsum, 1.0) - wmean * wmean
+                values = np.sqrt(np.maximum(variance, 0.0))
+            elif stat == "sum":
+                values = self.vsum
+            else:
+                values = _weighted_median(self.layers, self.shape)
+            mask = dzsum < TINY
+            if stat != "mean":
+                mask = mask | (self.count == 0)
+            values = ma.masked_invalid(values)
+            result[stat] = ma.masked_where(mask | ma.getmaskarray(values), values)
+
+        return result
+
+
+def node_thickness(
+    geometry,
+    xprop,
+    yprop,
+    hcpfzprop,
+    dzprop,
+    zoneprop,
+    zone_minmax,
+    zone_avg=False,
+    coarsen=1,
+    mask_outside=False,
+    threads=1,
+):
+    """The HC thickness per map node, as xtgeo's hc_thickness_from_3dprops().
+
+    The HCPFZ of each layer (summed per zone with zone_avg) is gridded to the
+    map nodes, and summed over the layers. Layers with (almost) no HC are
+    skipped. With mask_outside, nodes where the gridded thickness is zero are
+    masked. The layers are gridded in threads with threads > 1.
+
+    Returns:
+        A 2D masked numpy for the map geometry
+    """
+
+    xprop, yprop, zoneprop, hcpfzprop, dzprop = _zone_layers(
+        xprop,
+        yprop,
+        zoneprop,
+        zone_minmax,
+        coarsen,
+        zone_avg,
+        dzprop,
+        hcpfzprop,
+        summing=True,
+    )
+
+    nodethickness = NodeThickness(geometry, mask_outside=mask_outside)
+    nodethickness.add(
+        xprop, yprop, hcpfzprop, dzprop, zoneprop, zone_minmax, threads=threads
+    )
+    return nodethickness.result()
+
+
+class NodeThickness:
+    """The sums over the layers per map node, for the HC thickness.
+
+    The layers may be added in parts, as for NodeStatistics.
+
+    Args:
+        geometry (MapGeometry): The map geometry
+        mask_outside (bool): Mask the nodes where the gridded thickness is zero
+    """
+
+    def __init__(self, geometry, mask_outside=False):
+        self.geometry = geometry
+        self.mask_outside = mask_outside
+        self.hcsum = np.zeros((geometry.ncol, geometry.nrow))
+        self.dzsum = np.zeros((geometry.ncol, geometry.nrow))
+
+    def add(
+        self,
+        xprop,
+        yprop,
+        hcpfzprop,
+        dzprop,
+        zoneprop,
+        zone_minmax,
+        coarsen=1,
+        threads=1,
+    ):
+        """Grid the layers in the zone range, and add them to the sums."""
+
+        if coarsen > 1:
+            xprop, yprop, hcpfzprop, dzprop, zoneprop = (
+                prop[::coarsen, ::coarsen, :]
+                for prop in (xprop, yprop, hcpfzprop, dzprop, zoneprop)
+            )
+
+        weights = np.ones(dzprop.shape, dtype=dzprop.dtype)
+        weights[zoneprop < zone_minmax[0]] = 0.0
+        weights[zoneprop > zone_minmax[1]] = 0.0
+        zoneprop = ma.masked_outside(zoneprop, *zone_minmax)
+
+        xiv, yiv = self.geometry.nodes()
+        mask_outside = self.mask_outside
+
+        def layer_sums(klay):
+            """The gridded HCPFZ (None without HC) and dz (with mask_outside)."""
+
+            hashc = abs(hcpfzprop[:, :, klay].sum()) >= 1e-12
+            if not (hashc or mask_outside):
+                return None
+
+            xcv = xprop[:, :, klay].ravel()
+            inside = xcv < 1e20
+            ycv = yprop[:, :, klay].ravel()[inside]
+            hcv = hcpfzprop[:, :, klay].ravel()[inside]
+            dzv = dzprop[:, :, klay].ravel()[inside]
+            wei = weights[:, :, klay].ravel()[inside]
+            xcv = xcv[inside]
+
+            try:
+                gridded = scipy.interpolate.griddata(
+                    (xcv, ycv),
+                    np.column_stack((hcv * wei, dzv)),
+                    (xiv, yiv),
+                    method="linear",
+                    fill_value=0.0,
+                )
+            except ValueError:
+                warnings.warn(
+                    "Some problems in gridding ... will continue", UserWarning
+                )
+                return None
+            return gridded[..., 0] if hashc else None, gridded[..., 1]
+
+        layers_in_zone = _layers_in_zone(zoneprop, zone_minmax)
+        for gridded in _threads.ordered_map(layer_sums, layers_in_zone, threads):
+            if gridded is None:
+                continue
+            hci, dzi = gridded
+            if hci is not None:
+                self.hcsum += hci
+            self.dzsum += dzi
+
+    def result(self):
+        """The HC thickness, as a 2D masked numpy."""
+        if self.mask_outside:
+            return ma.masked_where(self.dzsum < TINY, self.hcsum)
+        return ma.array(self.hcsum)
+
+
+def _layers_in_zone(zoneprop, zone_minmax):
+    """The layers with a mean zone (rounded) in the zone range, as xtgeo."""
+
+    for klay in range(zoneprop.shape[2]):
+        numz = zoneprop[:, :, klay].mean()
+        if not isinstance(numz, float):
+            continue
+        numz = int(round(numz))
+        if zone_minmax[0] <= numz <= zone_minmax[1]:
+            yield klay
+
+
+def _weighted_median(layers, shape):
+    """The weighted median over the layers; nodes without weight get nan."""
+
+    if not layers:
+        return np.full(shape, np.nan)
+
+    values = np.stack([layer[0] for layer in layers])
+    weights = np.stack([layer[1] for layer in layers])
+
+    order = np.argsort(values, axis=0)
+    values = np.take_along_axis(values, order, axis=0)
+    cumulative = np.cumsum(
+        np.take_along_axis(weights, order, axis=0), axis=0, dtype=np.float64
+    )
+
+    half = 0.5 * cumulative[-1]
+    index = np.argmax(cumulative >= half, axis=0)
+    median = np.take_along_axis(values, index[np.newaxis], axis=0)[0]
+    return np.where(half > 0.0, median, np.nan)
+
+
+def _zone_layers(
+    xprop,
+    yprop,
+    zoneprop,
+    zone_minmax,
+    coarsen,
+    zone_avg,
+    dzprop,
+    mprop,
+    summing=False,
+):
+    """Coarsen, and optionally average each zone to one layer, as xtgeo does.
+
+    With zone_avg, the coordinates are averaged per zone, the thickness is
+    summed and the property is dz weighted, or summed with summing (HCPFZ).
+    """
+
+    if coarsen > 1:
+        xprop = xprop[::coarsen, ::coarsen, :]
+        yprop = yprop[::coarsen, ::coarsen, :]
+        zoneprop = zoneprop[::coarsen, ::coarsen, :]
+        dzprop = dzprop[::coarsen, ::coarsen, :]
+        mprop = mprop[::coarsen, ::coarsen, :]
+
+    if zone_avg:
+        zmin = max(int(zone_minmax[0]), int(zoneprop.min()))
+        zmax = min(int(zone_minmax[1]), int(zoneprop.max()))
+
+        layers = []
+        for izone in range(zmin, zmax + 1):
+            outside = zoneprop != izone
+            dzz = ma.masked_where(outside, dzprop)
+            if summing:
+                mzone = ma.sum(ma.masked_where(outside, mprop), axis=2)
+            else:
+                normed_dz = dzz / dzz.sum(axis=2)[:, :, np.newaxis]
+                mzone = ma.average(
+                    ma.masked_where(outside, mprop), weights=normed_dz, axis=2
+                )
+            layers.append(
+                (
+                    ma.average(ma.masked_where(outside, xprop), axis=2),
+                    ma.average(ma.masked_where(outside, yprop), axis=2),
+                    ma.average(ma.masked_where(outside, zoneprop), axis=2),
+                    mzone,
+                    ma.sum(dzz, axis=2),
+                )
+            )
+        xprop, yprop, zoneprop, mprop, dzprop = (
+            ma.dstack([layer[item] for layer in layers]) for item in range(5)
+        )
+
+    return (
+        ma.filled(xprop, fill_value=UNDEF),
+        ma.filled(yprop, fill_value=UNDEF),
+        ma.filled(zoneprop, fill_value=0),
+        ma.filled(mprop, fill_value=0.0),
+        ma.filled(dzprop, fill_value=0.0),
+    )
@@ -1,145 +1,546 @@
 """Private module for HC thickness functions."""
 
-import getpass
 import logging
-from time import localtime, strftime
+from pathlib import Path
 
 import numpy as np
+import numpy.ma as ma
 import xtgeo
-from xtgeo.surface import RegularSurface
-from xtgeoviz import quickplot
 
-from ._export_via_fmudataio import export_hc_map_dataio
+from grid3d_maps.mapcube import MapCube
+
+from . import (
+    _culling,
+    _footprint,
+    _get_zonation_filters,
+    _gridding,
+    _mapcollect,
+    _mapsettings,
+    _plotting,
+    _profiling,
+    _threads,
+    _tiling,
+    _zonepool,
+)
+from ._compute_avg import DATAIO_MAPFOLDER
+from ._export_via_fmudataio import (
+    export_hc_map_dataio,
+    exported_filename,
+    record_exported,
+)
 
 logger = logging.getLogger(__name__)
 
+# the keys of the grid numpies in initd to map with culling, as the
+# (coordinates, views, weights) for _culling.culled_inputs()
+CULLED_KEYS = (("xc",), ("yc", "corners"), ("dz", "iactnum"))
 
-def do_hc_mapping(config, initd, hcpfzd, zonation, zoned, hcmode):
-    """Do the actual map gridding, for zones and groups of zones"""
+
+def do_hc_mapping(config, initd, hcpfzd, zonation, zoned, hcmode, mapcube=None):
+    """Do the actual map gridding, for zones and groups of zones.
+
+    If a mapcube (MapCubeWriter) is given, maps are added to that instead of
+    being exported as individual files.
+
+    With tuning: footprint, the cells are mapped by the overlap of their top
+    face with each map node (see _footprint), from the corners in
+    initd["corners"]; zone_avg and coarsen are then not used.
+
+    With culling (see _culling), initd["culled"] has the grid columns to map.
+
+    With tuning: threads, the layers (or the chunks of cells for footprints)
+    are mapped in threads, with the same maps for any number of threads (see
+    _threads).
+
+    With tuning: processes, the zones and dates are mapped in a pool of
+    processes, from the numpies in shared memory (see _zonepool).
+
+    With tuning: tiles, the maps are made tile by tile (see _tiling), and the
+    maps of each zone are a TiledMaps, made from memory mapped files when used.
+    """
 
     mapzd = {}
 
-    if "templatefile" in config["mapsettings"]:
-        basemap = xtgeo.surface_from_file(config["mapsettings"]["templatefile"])
-        basemap.values = 0.0
-    else:
-        ncol = config["mapsettings"].get("ncol")
-        nrow = config["mapsettings"].get("nrow")
-
-        basemap = RegularSurface(
-            xori=config["mapsettings"].get("xori"),
-            yori=config["mapsettings"].get("yori"),
-            ncol=config["mapsettings"].get("ncol"),
-            nrow=config["mapsettings"].get("nrow"),
-            xinc=config["mapsettings"].get("xinc"),
-            yinc=config["mapsettings"].get("yinc"),
-            values=np.zeros((ncol, nrow)),
+    geometry = _mapsettings.map_geometry(config)
+
+    # with culling, the box of the kept grid columns is mapped (see _culling)
+    culled = initd.get("culled")
+    if culled is not None:
+        initd, hcpfzd, _, zonation = _culling.culled_inputs(
+            culled, initd, CULLED_KEYS, hcpfzd, {}, zonation
         )
 
-    mycoarsen = config["computesettings"]["tuning"]["coarsen"]
-    myavgzon = config["computesettings"]["tuning"]["zone_avg"]
     mymaskoutside = config["computesettings"]["mask_outside"]
+    mytiles = config["computesettings"]["tuning"]["tiles"]
+
+    corners = None
+    if mytiles:
+        tilelist = _tiling.tiles(
+            geometry,
+            int(mytiles),
+            (initd["xc"], initd["yc"], initd["iactnum"]),
+            corners=initd.get("corners"),
+            coarsen=config["computesettings"]["tuning"]["coarsen"],
+        )
+    elif config["computesettings"]["tuning"]["footprint"]:
+        corners = _footprint.map_index_corners(geometry, initd["corners"])
+
+    zones = _get_zonation_filters.zones_to_map(config, zoned)
+
+    # with processes, the (zone, date) pairs are mapped in a pool, from shared
+    # numpies
+    pooled = None
+    nprocesses = _zonepool.processes(config)
+    tasks = [
+        (zname, zrange, date, config) for zname, zrange in zones for date in hcpfzd
+    ]
+    if nprocesses > 1 and not mytiles and len(tasks) > 1:
+        shared = {
+            "initd": {key: initd[key] for key in ("xc", "yc", "dz")},
+            "hcpfzd": hcpfzd,
+            "zonation": zonation,
+            "corners": corners,
+        }
+        pooled = _zonepool.map_in_pool(
+            _pooled_zone_thickness, shared, tasks, nprocesses
+        )
+    elif nprocesses > 1:
+        logger.info("The zones are mapped in one process (tiles or one map)")
+
+    for zname, zrange in zones:
+        mapd = {}
+        if pooled is None:
+            zonesubset = _get_zonation_filters.zone_subset(zonation, zname, zrange)
+
+        with _profiling.stage("mapping", zone=zname, hcmode=hcmode):
+            if pooled is not None:
+                zonemaps = ((date, next(pooled)) for date in hcpfzd)
+            elif mytiles:
+                # nodes outside all tiles have no HC; undefined with mask_outside
+                mapd = _tiling.TiledMaps(
+                    geometry,
+                    folder=config["computesettings"]["tuning"]["tilefolder"],
+                    fill=np.nan if mymaskoutside else 0.0,
+                )
+                zonemaps = _tiled_zone_thickness(
+                    config, tilelist, mapd, initd, hcpfzd, *zonesubset
+                )
+            else:
+                zonemaps = _zone_thickness(
+                    config,
+                    geometry,
+                    initd,
+                    hcpfzd,
+                    *zonesubset,
+                    corners=corners,
+                )
+
+            _export_zone_thickness(
+                config,
+                geometry,
+                zname,
+                zonemaps,
+                hcmode,
+                None if mytiles else mapd,
+                mapcube,
+            )
 
-    for zname, zrange in zoned.items():
-        usezonation = zonation.copy()
-        usezrange = zrange
+        mapzd[zname] = mapd
 
-        # in case of super zones:
-        if isinstance(zrange, list):
-            usezonation = zonation.copy()
-            usezonation[:, :, :] = 0
-            logger.debug(usezonation)
-            for zr in zrange:
-                usezonation[zonation == zr] = 888
+    if pooled is not None:
+        pooled.close()
 
-            usezrange = 888
+    # return the map dictionary: {zname: {date1: map_object1, ...}}
 
-        if zname == "all":
-            usezonation = zonation.copy()
-            usezonation[:, :, :] = 999
-            usezrange = 999
+    return mapzd
 
-            if config["computesettings"]["all"] is not True:
-                logger.debug("Skip <%s> (cf. computesettings: all)", zname)
-                continue
-        else:
-            if config["computesettings"]["zone"] is not True:
-                logger.debug("Skip <%s> (cf. computesettings: zone)", zname)
-                continue
 
+def hc_maps_from_slabs(config, slabthickness, hcmode, mapcube=None):
+    """Export the HC thickness maps summed over the k-slabs of a grid.
+
+    Returns:
+        The map dictionary as from do_hc_mapping()
+    """
+
+    mapzd = {}
+    geometry = _mapsettings.map_geometry(config)
+    for zname in slabthickness.znames:
+        mapd = {}
+        with _profiling.stage("mapping", zone=zname, hcmode=hcmode):
+            _export_zone_thickness(
+                config,
+                geometry,
+                zname,
+                slabthickness.zone_maps(zname),
+                hcmode,
+                mapd,
+                mapcube,
+            )
+        mapzd[zname] = mapd
+    return mapzd
+
+
+def hc_maps_from_columns(config, table, hcmode, mapcube=None):
+    """Export the HC thickness maps from a column table (see _columns).
+
+    Returns:
+        The map dictionary as from do_hc_mapping()
+    """
+
+    mapzd = {}
+    geometry = _mapsettings.map_geometry(config)
+    for zname in table.zones:
         mapd = {}
+        with _profiling.stage("mapping", zone=zname, hcmode=hcmode):
+            _export_zone_thickness(
+                config,
+                geometry,
+                zname,
+                _column_zone_thickness(config, geometry, table, zname, hcmode),
+                hcmode,
+                mapd,
+                mapcube,
+            )
+        mapzd[zname] = mapd
+    return mapzd
+
+
+def _column_zone_thickness(config, geometry, table, zname, hcmode):
+    """Grid the column HCPFZ sums of a zone as one layer; yields (date, values)."""
+
+    xprop = table.layer(zname, "x")
+    yprop = table.layer(zname, "y")
+    dzprop = table.layer(zname, "weight", "dz")
+    zoneprop = np.ones(xprop.shape, dtype=np.int32)
 
-        for date, hcpfz in hcpfzd.items():
-            logger.debug("Mapping <%s> for date <%s> ...", zname, date)
-            xmap = basemap.copy()
-
-            xmap.hc_thickness_from_3dprops(
-                xprop=initd["xc"],
-                yprop=initd["yc"],
-                hcpfzprop=hcpfz,
-                zoneprop=usezonation,
-                zone_minmax=(usezrange, usezrange),
-                coarsen=mycoarsen,
-                dzprop=initd["dz"],
-                zone_avg=myavgzon,
-                mask_outside=mymaskoutside,
+    for date in table.names(zname, hcmode):
+        with _profiling.stage("gridding", date=date):
+            nodethickness = _gridding.NodeThickness(
+                geometry, mask_outside=config["computesettings"]["mask_outside"]
             )
-            filename = None
-            if config["output"]["mapfolder"] != "fmu-dataio":
+            nodethickness.add(
+                xprop,
+                yprop,
+                table.layer(zname, hcmode, date),
+                dzprop,
+                zoneprop,
+                (1, 1),
+                coarsen=config["computesettings"]["tuning"]["coarsen"],
+                threads=_threads.threads(config),
+            )
+        yield date, nodethickness.result()
+
+
+def _export_zone_thickness(config, geometry, zname, zonemaps, hcmode, mapd, mapcube):
+    """Export the maps of a zone by date, and keep them in mapd (unless None)."""
+
+    for date, values in zonemaps:
+        xmap = geometry.surface(values)
+
+        filename = None
+        usedate = date.replace("unknowndate", "")
+        _mapcollect.add(zname, hcmode + "thickness", usedate, xmap)
+        with _profiling.stage("export", date=usedate):
+            if mapcube is not None:
+                mapcube.add(zname, hcmode + "thickness", usedate, xmap)
+            elif config["output"]["mapfolder"] != "fmu-dataio":
                 filename = _hc_filesettings(config, zname, date, hcmode)
                 logger.info(f"Map file to {filename}")
                 xmap.to_file(filename)
             else:
-                export_hc_map_dataio(xmap, zname, date, hcmode, config)
+                fname = export_hc_map_dataio(xmap, zname, date, hcmode, config)
+                record_exported((zname, hcmode + "thickness", usedate), fname)
 
+        if mapd is not None:
             mapd[date] = xmap
 
-        mapzd[zname] = mapd
 
-    # return the map dictionary: {zname: {date1: map_object1, ...}}
+class SlabThickness:
+    """The HC thickness of each zone and date, summed over the k-slabs of a grid.
+
+    Each slab is added with its numpies, as for do_hc_mapping(), and the
+    layers (or the cells, for footprints) are summed per map node over the
+    slabs (see _slabs). zone_avg is not used.
+
+    Args:
+        config: The configuration dictionary
+        zoned: The zones, as from _get_zonation_filters.zonation()
+    """
+
+    def __init__(self, config, zoned):
+        self.config = config
+        self.geometry = _mapsettings.map_geometry(config)
+        self.zones = _get_zonation_filters.zones_to_map(config, zoned)
+        self.znames = [zname for zname, _ in self.zones]
+        self.dates = []
+        self._sums = {}
+
+    def add(self, initd, hcpfzd, zonation):
+        """Map the numpies of a slab, and add to the sums of each zone and date."""
+
+        config = self.config
+        mycoarsen = config["computesettings"]["tuning"]["coarsen"]
+        mymaskoutside = config["computesettings"]["mask_outside"]
+        myfootprint = config["computesettings"]["tuning"]["footprint"]
+        mythreads = _threads.threads(config)
+        self.dates = list(hcpfzd)
+
+        culled = initd.get("culled")
+        if culled is not None:
+            initd, hcpfzd, _, zonation = _culling.culled_inputs(
+                culled, initd, CULLED_KEYS, hcpfzd, {}, zonation
+            )
+        if myfootprint:
+            corners = _footprint.map_index_corners(self.geometry, initd["corners"])
+
+        for zname, zrange in self.zones:
+            usezonation, usezrange = _get_zonation_filters.zone_subset(
+                zonation, zname, zrange
+            )
+            for date, hcpfz in hcpfzd.items():
+                if myfootprint:
+                    sums = _footprint.thickness_sums(
+                        self.geometry,
+                        corners,
+                        hcpfz,
+                        initd["dz"],
+                        usezonation == usezrange,
+                        threads=mythreads,
+                    )
+                    if (zname, date) in self._sums:
+                        sums = [
+                            total + part
+                            for total, part in zip(self._sums[(zname, date)], sums)
+                        ]
+                    self._sums[(zname, date)] = sums
+                    continue
+
+                if (zname, date) not in self._sums:
+                    self._sums[(zname, date)] = _gridding.NodeThickness(
+                        self.geometry, mask_outside=mymaskoutside
+                    )
+                self._sums[(zname, date)].add(
+                    initd["xc"],
+                    initd["yc"],
+                    hcpfz,
+                    initd["dz"],
+                    usezonation,
+                    (usezrange, usezrange),
+                    coarsen=mycoarsen,
+                    threads=mythreads,
+                )
+
+    def zone_maps(self, zname):
+        """Yield (date, values) for a zone, as _zone_thickness()."""
+
+        for date in self.dates:
+            if self.config["computesettings"]["tuning"]["footprint"]:
+                yield (
+                    date,
+                    _footprint.thickness_from_sums(
+                        self._sums[(zname, date)],
+                        mask_outside=self.config["computesettings"]["mask_outside"],
+                    ),
+                )
+            else:
+                yield date, self._sums[(zname, date)].result()
 
-    return mapzd
 
+def _zone_thickness(config, geometry, initd, hcpfzd, zonation, zrange, corners=None):
+    """Map the HC thickness in a zone; yields (date, values) for each date.
 
-def do_hc_plotting(config, mapzd, hcmode, filtermean=None):
+    The inputs may be views of the grid, as for a tile (see
+    _tiled_zone_thickness). For the footprint mapping, the corners in the map
+    index space are made from initd["corners"], unless given.
+    """
+
+    mycoarsen = config["computesettings"]["tuning"]["coarsen"]
+    myavgzon = config["computesettings"]["tuning"]["zone_avg"]
+    mymaskoutside = config["computesettings"]["mask_outside"]
+    myfootprint = config["computesettings"]["tuning"]["footprint"]
+    mythreads = _threads.threads(config)
+
+    if myfootprint and corners is None:
+        corners = _footprint.map_index_corners(geometry, initd["corners"])
+
+    for date, hcpfz in hcpfzd.items():
+        logger.debug("Mapping for date <%s> ...", date)
+
+        with _profiling.stage("gridding", date=date):
+            if myfootprint:
+                values = _footprint.thickness(
+                    geometry,
+                    corners,
+                    hcpfz,
+                    initd["dz"],
+                    zonation == zrange,
+                    mask_outside=mymaskoutside,
+                    threads=mythreads,
+                )
+            elif mythreads > 1:
+                values = _gridding.node_thickness(
+                    geometry,
+                    initd["xc"],
+                    initd["yc"],
+                    hcpfz,
+                    initd["dz"],
+                    zonation,
+                    (zrange, zrange),
+                    zone_avg=myavgzon,
+                    coarsen=mycoarsen,
+                    mask_outside=mymaskoutside,
+                    threads=mythreads,
+                )
+            else:
+                xmap = geometry.surface()
+                xmap.hc_thickness_from_3dprops(
+                    xprop=initd["xc"],
+                    yprop=initd["yc"],
+                    hcpfzprop=hcpfz,
+                    zoneprop=zonation,
+                    zone_minmax=(zrange, zrange),
+                    coarsen=mycoarsen,
+                    dzprop=initd["dz"],
+                    zone_avg=myavgzon,
+                    mask_outside=mymaskoutside,
+                )
+                values = xmap.values
+        yield date, values
+
+
+def _pooled_zone_thickness(shared, zname, zrange, date, config):
+    """Map the HC thickness of a zone at a date in a worker process.
+
+    The numpies are views of the shared memory block (see _zonepool).
+
+    Returns:
+        The values, as from _zone_thickness()
+    """
+
+    zonation, zrange = _get_zonation_filters.zone_subset(
+        shared["zonation"], zname, zrange
+    )
+    ((_, values),) = _zone_thickness(
+        config,
+        _mapsettings.map_geometry(config),
+        shared["initd"],
+        {date: shared["hcpfzd"][date]},
+        zonation,
+        zrange,
+        corners=shared["corners"],
+    )
+    return values
+
+
+def _tiled_zone_thickness(config, tilelist, tiledmaps, initd, hcpfzd, zonation, zrange):
+    """Map the HC thickness in a zone tile by tile, to the tiled maps (by date).
+
+    When all tiles are done, yields (date, values) as _zone_thickness(), with
+    the values read from the tiled maps.
+    """
+
+    for tile in tilelist:
+        tileinitd = {key: tile.view(initd[key]) for key in ("xc", "yc", "dz")}
+        if "corners" in initd:
+            tileinitd["corners"] = tuple(tile.view(item) for item in initd["corners"])
+
+        with _profiling.stage("tile", nodes=tile.nodes):
+            for date, values in _zone_thickness(
+                config,
+                tile.geometry,
+                tileinitd,
+                {date: tile.view(hcpfz) for date, hcpfz in hcpfzd.items()},
+                tile.view(zonation),
+                zrange,
+            ):
+                tiledmaps.write(date, tile, values)
+
+    for date in hcpfzd:
+        yield date, ma.masked_invalid(np.array(tiledmaps.values(date)))
+
+
+def do_hc_plotting(config, mapzd, hcmode, filtermean=None, plotcontext=None):
     """Do plotting via matplotlib to PNG (etc) (if requested)"""
 
     logger.info("Plotting ...")
 
+    if plotcontext is None:
+        plotcontext = _plotting.PlotContext(config)
+
+    subtitle = None
+    if filtermean is not None and filtermean < 1.0:
+        subtitle = "Property filter: " + config["_filterinfo"]
+
+    jobs = []
     for zname, mapd in mapzd.items():
         for date, xmap in mapd.items():
             plotfile = _hc_filesettings(config, zname, date, hcmode, mode="plot")
 
-            pcfg = _hc_plotsettings(config, zname, date, filtermean)
-
-            logger.info("Plot to {}".format(plotfile))
+            pcfg = plotcontext.plotsettings(_plotting.zone_plotsettings, zname)
+            pcfg["title"] = _hc_plottitle(config, zname, date)
+            pcfg["subtitle"] = subtitle
 
             usevrange = pcfg["valuerange"]
             if len(date) > 10:
                 usevrange = pcfg["diffvaluerange"]
 
-            faults = None
-            if pcfg["faultpolygons"] is not None:
-                try:
-                    fau = xtgeo.polygons_from_file(
-                        pcfg["faultpolygons"], fformat="guess"
-                    )
-                    faults = {"faults": fau}
-                except OSError as err:
-                    logger.info(err)
-                    faults = None
-
-            quickplot(
-                xmap,
-                filename=plotfile,
-                title=pcfg["title"],
-                subtitle=pcfg["subtitle"],
-                infotext=pcfg["infotext"],
-                xlabelrotation=pcfg["xlabelrotation"],
-                minmax=usevrange,
-                colormap=pcfg["colortable"],
-                faults=faults,
-            )
+            jobs.append(_plotting.plot_job(plotfile, xmap, pcfg, usevrange))
+
+    _plotting.plot_maps(plotcontext, jobs)
+
+
+def find_hc_maps(config, znames, hcmode):
+    """Find the HC thickness maps that do_hc_mapping() has made earlier.
+
+    The maps are read from the map cube, from the fmu-dataio share folder (as
+    recorded at export) or from the mapfolder, depending on the output
+    settings. Maps that are not found are skipped with a warning.
+
+    Returns:
+        The map dictionary as from do_hc_mapping(): {zname: {date: map, ...}}
+    """
+
+    dates = [str(date) for date in config["input"]["dates"]]
+    if "rock" in hcmode or "xhcpv" in config["input"]:
+        dates = dates[:1]
+
+    mapcube = None
+    if config["output"].get("mapcube"):
+        mapcube = MapCube(config["output"]["mapcube"])
+
+    mapzd = {}
+    for zname in znames:
+        if zname == "all":
+            if config["computesettings"]["all"] is not True:
+                continue
+        elif config["computesettings"]["zone"] is not True:
+            continue
+
+        mapd = {}
+        for date in dates:
+            key = (zname, hcmode + "thickness", date.replace("unknowndate", ""))
+            if mapcube is not None:
+                if key in mapcube:
+                    mapd[date] = mapcube.get_surface(*key)
+                else:
+                    logger.warning("No map for %s in map cube", key)
+                continue
+
+            if config["output"]["mapfolder"] == "fmu-dataio":
+                filename = exported_filename(key, DATAIO_MAPFOLDER)
+            else:
+                filename = _hc_filesettings(config, zname, date, hcmode)
+
+            if filename is None or not Path(filename).is_file():
+                logger.warning("No map file %s for zone %s", filename, zname)
+                continue
+
+            logger.info("Map file from {}".format(filename))
+            mapd[date] = xtgeo.surface_from_file(filename)
+
+        mapzd[zname] = mapd
+
+    return mapzd
 
 
 def _hc_filesettings(config, zname, date, hcmode, mode="map"):
@@ -214,8 +615,8 @@ def _dates_oldformat(date):
     return newdate
 
 
-def _hc_plotsettings(config, zname, date, filtermean):
-    """Local function for plot additional info."""
+def _hc_plottitle(config, zname, date):
+    """Local function for plot title."""
 
     phase = config["computesettings"]["mode"]
 
@@ -231,66 +632,4 @@ def _hc_plotsettings(config, zname, date, filtermean):
     if date and date != "unknowndate":
         title = title + " " + date
 
-    showtime = strftime("%Y-%m-%d %H:%M:%S", localtime())
-    infotext = config["title"] + " - "
-    infotext += " " + getpass.getuser() + " " + showtime
-    if config["output"]["tag"]:
-        infotext += " (tag: " + config["output"]["tag"] + ")"
-
-    subtitle = None
-    if filtermean < 1.0:
-        subtitle = "Property filter: " + config["_filterinfo"]
-
-    xlabelrotation = None
-    valuerange = (None, None)
-    diffvaluerange = (None, None)
-    colortable = "rainbow"
-    xlabelrotation = 0
-    fpolyfile = None
-
-    if "xlabelrotation" in config["plotsettings"]:
-        xlabelrotation = config["plotsettings"]["xlabelrotation"]
-
-    if "valuerange" in config["plotsettings"]:
-        valuerange = tuple(config["plotsettings"]["valuerange"])
-
-    if "diffvaluerange" in config["plotsettings"]:
-        diffvaluerange = tuple(config["plotsettings"]["diffvaluerange"])
-
-    if "faultpolygons" in config["plotsettings"]:
-        fpolyfile = config["plotsettings"]["faultpolygons"]
-
-    if "colortable" in config["plotsettings"]:
-        colortable = config["plotsettings"]["colortable"]
-
-    # there may be individual plotsettings for zname
-    if zname is not None and zname in config["plotsettings"]:
-        zfg = config["plotsettings"][zname]
-
-        if "valuerange" in zfg:
-            valuerange = tuple(zfg["valuerange"])
-
-        if "diffvaluerange" in zfg:
-            diffvaluerange = tuple(zfg["diffvaluerange"])
-
-        if "xlabelrotation" in zfg:
-            xlabelrotation = zfg["xlabelrotation"]
-
-        if "colortable" in zfg:
-            colortable = zfg["colortable"]
-
-        if "faultpolygons" in zfg:
-            fpolyfile = zfg["faultpolygons"]
-
-    # assing settings to a dictionary which is returned
-    plotcfg = {}
-    plotcfg["title"] = title
-    plotcfg["subtitle"] = subtitle
-    plotcfg["infotext"] = infotext
-    plotcfg["valuerange"] = valuerange
-    plotcfg["diffvaluerange"] = diffvaluerange
-    plotcfg["xlabelrotation"] = xlabelrotation
-    plotcfg["colortable"] = colortable
-    plotcfg["faultpolygons"] = fpolyfile
-
-    return plotcfg
+    return title
@@ -0,0 +1,40 @@
+"""Private module for collecting the finished maps in the running process.
+
+Used by an ensemble run with statistics (see grid3d_maps.ensemble), where the
+maps of each realization are fed to streaming statistics. Outside such a run
+nothing is collected.
+"""
+
+from contextlib import contextmanager
+
+import numpy as np
+import numpy.ma as ma
+
+from grid3d_maps.mapcube import GEOMETRY_KEYS
+
+_MAPS = None
+
+
+@contextmanager
+def collecting():
+    """Collect maps while the context is active; yields the list of maps.
+
+    Each map is a tuple ((zone, attribute, date), values, geometry), where
+    the values is a 2D float64 numpy with NaN for undefined nodes.
+    """
+    global _MAPS
+    _MAPS = []
+    try:
+        yield _MAPS
+    finally:
+        _MAPS = None
+
+
+def add(zone, attribute, date, surf):
+    """Collect a map, if collecting."""
+    if _MAPS is None:
+        return
+
+    values = ma.filled(surf.values.astype(np.float64), fill_value=np.nan)
+    geometry = {key: getattr(surf, key) for key in GEOMETRY_KEYS}
+    _MAPS.append(((zone, attribute, date), values, geometry))
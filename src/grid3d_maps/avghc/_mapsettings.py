@@ -1,34 +1,249 @@
 import copy
 import logging
+import os
 
+import numpy as np
 import xtgeo
+from xtgeo.surface import RegularSurface
+
+from grid3d_maps.mapcube import GEOMETRY_KEYS
+
+from . import _gridcache, _threads
 
 logger = logging.getLogger(__name__)
 
+# defaults for computesettings: tuning: auto; no time and memory budgets
+AUTOTUNE = {"resolution": 0.5, "max_coarsen": 3, "time": None, "memory": None}
+
+# the largest map increment from auto tuning, relative to the cell size
+MAX_RESOLUTION = 2.0
+
+# percentiles for the cell sizes
+PCTS = (10, 50, 90)
+
+# cost model for the mapping, fitted to scipy griddata (linear) and the
+# footprint mapping on one core of a typical Linux node
+GRIDDATA_POINT_TIME = 1.5e-5  # s per cell (triangulation)
+GRIDDATA_NODE_TIME = 7e-8  # s per map node and layer
+FOOTPRINT_PAIR_TIME = 4.5e-7  # s per (cell, node) pair
+MAP_BYTES = 10  # per node of a kept map (values and mask)
+WORK_BYTES = 80  # per node for the work arrays
+TRIANGULATION_BYTES = 150  # per cell in a layer
+FOOTPRINT_CHUNK_BYTES = 500e6
+
+
+class MapGeometry:
+    """The geometry of the output maps; made once per run and not modified.
+
+    The geometry is from the map settings, or from the template file, which is
+    then read once. All mapping, masking and export use it, so each map is a
+    new surface with this geometry (see surface()), not a copy of a template.
+
+    The affine transform maps the node indices (i, j) to (x, y), also for
+    rotated (and y flipped) maps; to_index() is the inverse. The mask is the
+    undefined nodes of the template, as a read only (ncol, nrow) numpy, or None
+    if all nodes are defined; the maps are undefined there too.
+
+    Args:
+        xori, yori, xinc, yinc, ncol, nrow, rotation, yflip: As for a
+            RegularSurface; rotation is in degrees
+        mask: The undefined nodes, as a boolean (ncol, nrow) numpy, or None
+    """
+
+    __slots__ = (*GEOMETRY_KEYS, "transform", "mask", "_nodes")
+
+    def __init__(
+        self, xori, yori, xinc, yinc, ncol, nrow, rotation=0.0, yflip=1, mask=None
+    ):
+        geometry = {
+            "xori": float(xori),
+            "yori": float(yori),
+            "xinc": float(xinc),
+            "yinc": float(yinc),
+            "ncol": int(ncol),
+            "nrow": int(nrow),
+            "rotation": float(rotation),
+            "yflip": int(yflip),
+        }
+        for key, value in geometry.items():
+            object.__setattr__(self, key, value)
+
+        angle = np.radians(self.rotation)
+        transform = np.array(
+            [
+                [
+                    self.xinc * np.cos(angle),
+                    -self.yinc * self.yflip * np.sin(angle),
+                    self.xori,
+                ],
+                [
+                    self.xinc * np.sin(angle),
+                    self.yinc * self.yflip * np.cos(angle),
+                    self.yori,
+                ],
+            ]
+        )
+        transform.flags.writeable = False
+        object.__setattr__(self, "transform", transform)
+
+        if mask is not None:
+            mask = np.array(mask, dtype=bool)
+            if mask.shape != (self.ncol, self.nrow):
+                raise ValueError(
+                    f"The map mask shape {mask.shape} is not the map shape "
+                    f"{(self.ncol, self.nrow)}"
+                )
+            mask = mask if mask.any() else None
+        if mask is not None:
+            mask.flags.writeable = False
+        object.__setattr__(self, "mask", mask)
+        object.__setattr__(self, "_nodes", None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"The map geometry is read only, cannot set {name}")
+
+    def __reduce__(self):
+        args = tuple(getattr(self, key) for key in GEOMETRY_KEYS)
+        return (MapGeometry, (*args, self.mask))
+
+    def __repr__(self):
+        args = ", ".join(f"{key}={getattr(self, key)!r}" for key in GEOMETRY_KEYS)
+        masked = "" if self.mask is None else f", {self.mask.sum()} masked nodes"
+        return f"MapGeometry({args}{masked})"
+
+    @classmethod
+    def from_surface(cls, surf):
+        """From a surface, with its undefined nodes as the mask."""
+        return cls(
+            **{key: getattr(surf, key) for key in GEOMETRY_KEYS},
+            mask=np.ma.getmaskarray(surf.values),
+        )
+
+    @classmethod
+    def from_mapsettings(cls, mapsettings):
+        """From the mapsettings in the config; a templatefile is read here."""
+        if "templatefile" in mapsettings:
+            logger.info("Map geometry from %s", mapsettings["templatefile"])
+            return cls.from_surface(
+                xtgeo.surface_from_file(mapsettings["templatefile"])
+            )
+        return cls(**{key: mapsettings[key] for key in GEOMETRY_KEYS[:6]})
 
-def check_mapsettings(config, grd):
+    def as_dict(self):
+        """The geometry as a dict, e.g. for RegularSurface(**geometry)."""
+        return {key: getattr(self, key) for key in GEOMETRY_KEYS}
+
+    def surface(self, values=0.0):
+        """A new RegularSurface with this geometry, zero valued by default.
+
+        The values are masked where the geometry is masked.
+        """
+        if np.isscalar(values):
+            values = np.full((self.ncol, self.nrow), values, dtype=np.float64)
+        if self.mask is not None:
+            values = np.ma.masked_where(self.mask, values)
+        return RegularSurface(**self.as_dict(), values=values)
+
+    def nodes(self):
+        """The x and y of all nodes, as read only (ncol, nrow) numpies."""
+        if self._nodes is None:
+            inode, jnode = np.meshgrid(
+                np.arange(self.ncol, dtype=np.float64),
+                np.arange(self.nrow, dtype=np.float64),
+                indexing="ij",
+            )
+            xnodes, ynodes = self.to_xy(inode, jnode)
+            xnodes.flags.writeable = False
+            ynodes.flags.writeable = False
+            object.__setattr__(self, "_nodes", (xnodes, ynodes))
+        return self._nodes
+
+    def to_xy(self, inode, jnode):
+        """The x and y of (fractional) node indices."""
+        matrix = self.transform
+        return (
+            matrix[0, 0] * inode + matrix[0, 1] * jnode + matrix[0, 2],
+            matrix[1, 0] * inode + matrix[1, 1] * jnode + matrix[1, 2],
+        )
+
+    def to_index(self, xval, yval):
+        """The (fractional) node indices of x and y; the inverse of to_xy()."""
+        matrix = self.transform
+        dxv = np.asarray(xval) - matrix[0, 2]
+        dyv = np.asarray(yval) - matrix[1, 2]
+        det = matrix[0, 0] * matrix[1, 1] - matrix[0, 1] * matrix[1, 0]
+        return (
+            (matrix[1, 1] * dxv - matrix[0, 1] * dyv) / det,
+            (matrix[0, 0] * dyv - matrix[1, 0] * dxv) / det,
+        )
+
+    def window(self, icol, jrow, ncol, nrow):
+        """The geometry of ncol x nrow nodes from node (icol, jrow), e.g. a tile."""
+        xori, yori = self.to_xy(icol, jrow)
+        mask = None
+        if self.mask is not None:
+            mask = self.mask[icol : icol + ncol, jrow : jrow + nrow]
+        return MapGeometry(
+            **dict(self.as_dict(), xori=xori, yori=yori, ncol=ncol, nrow=nrow),
+            mask=mask,
+        )
+
+    def bounds(self):
+        """The min and max x and y of the corner nodes, as (xmin, xmax, ymin, ymax)."""
+        xcorners, ycorners = self.to_xy(
+            np.array([0.0, self.ncol - 1, 0.0, self.ncol - 1]),
+            np.array([0.0, 0.0, self.nrow - 1, self.nrow - 1]),
+        )
+        return (
+            float(xcorners.min()),
+            float(xcorners.max()),
+            float(ycorners.min()),
+            float(ycorners.max()),
+        )
+
+
+def map_geometry(config):
+    """Get the MapGeometry for the mapsettings in the config, made once.
+
+    The geometry is kept in the config, as "_mapgeometry". With the grid cache
+    active (e.g. time-lapse and ensemble runs), it is also shared by configs
+    with the same map settings, and a template file is read once.
+    """
+
+    geometry = config.get("_mapgeometry")
+    if geometry is not None:
+        return geometry
+
+    mapsettings = config["mapsettings"]
+    if "templatefile" in mapsettings:
+        stat = os.stat(mapsettings["templatefile"])
+        key = (
+            os.path.abspath(mapsettings["templatefile"]),
+            stat.st_size,
+            stat.st_mtime_ns,
+        )
+    else:
+        key = tuple(sorted((name, str(val)) for name, val in mapsettings.items()))
+
+    geometry = _gridcache.cached(
+        "map geometry", key, lambda: MapGeometry.from_mapsettings(mapsettings)
+    )
+    config["_mapgeometry"] = geometry
+    return geometry
+
+
+def check_mapsettings(config, grd, geometrics=None):
     """Check if given map settings looks sane compared with actual grid
 
     It returns a 'pscore' which is a measure of problems. Everything
-    greater than 0 is a problem, and > 0 is critical
+    greater than 0 is a problem, and > 0 is critical. The geometrics of the
+    grid may be given instead of the grid (e.g. from a column table).
     """
 
-    ggeom = grd.get_geometrics(return_dict=True, cellcenter=False)
+    ggeom = geometrics or grid_geometrics(grd)
 
     # Compute the geometrics values from the mapsettings:
-    cfmp = config["mapsettings"]
-
-    if "templatefile" in cfmp:
-        mymap = xtgeo.surface_from_file(cfmp["templatefile"])
-        xmin = mymap.xmin
-        xmax = mymap.xmax
-        ymin = mymap.ymin
-        ymax = mymap.ymax
-    else:
-        xmin = cfmp["xori"]  # since unrotated map
-        xmax = xmin + (cfmp["ncol"] - 1) * cfmp["xinc"]
-        ymin = cfmp["yori"]  # since unrotated map
-        ymax = ymin + (cfmp["nrow"] - 1) * cfmp["yinc"]
+    xmin, xmax, ymin, ymax = map_geometry(config).bounds()
 
     # problems score pscore is 0 if all is OK
     pscore = 0
@@ -41,14 +256,21 @@ def check_mapsettings(config, grd):
     return pscore
 
 
-def estimate_mapsettings(config, grd):
-    """Guess map settings if they are missing."""
+def estimate_mapsettings(config, grd, xinc=None, geometrics=None):
+    """Guess map settings if they are missing.
+
+    The map covers the grid with some margin, and the map increment is half the
+    average cell size, unless given. The geometrics of the grid may be given
+    instead of the grid, as for check_mapsettings().
+    """
 
     newconfig = copy.deepcopy(config)
 
     newconfig["mapsettings"] = {}
+    newconfig.pop("_mapgeometry", None)
+    newconfig.pop("_culled", None)
 
-    ggeom = grd.get_geometrics(return_dict=True, cellcenter=False)
+    ggeom = geometrics or grid_geometrics(grd)
 
     xmin = ggeom["xmin"]
     xmax = ggeom["xmax"]
@@ -65,8 +287,9 @@ def estimate_mapsettings(config, grd):
 
     avgdxy = 0.5 * (ggeom["avg_dx"] + ggeom["avg_dy"])
 
-    xinc = 0.5 * avgdxy
-    yinc = 0.5 * avgdxy
+    if xinc is None:
+        xinc = 0.5 * avgdxy
+    yinc = xinc
 
     ncol = int(1.1 * xlen / xinc)
     nrow = int(1.1 * ylen / yinc)
@@ -81,3 +304,226 @@ def estimate_mapsettings(config, grd):
     logger.debug(newconfig)
 
     return newconfig
+
+
+def autotune(config, grd, cells, zonation, zoned, nmaps, npasses):
+    """Pick the map increment and coarsen for the accuracy and the budgets.
+
+    The settings are in computesettings: tuning: auto (see the docs), e.g.::
+
+        auto:
+          resolution: 0.5  # map increment as a fraction of the median cell size
+          max_coarsen: 3
+          time: 60  # seconds for the mapping
+          memory: 2000  # MB for the mapping
+
+    The map increment is first from the resolution and the median cell size,
+    sampled from the grid. While the predicted mapping time or memory is above
+    the budget, coarsen is increased (up to max_coarsen), and then the map
+    increment (up to MAX_RESOLUTION times the cell size). Given map settings
+    are kept, so then only coarsen is tuned.
+
+    Args:
+        config: The configuration dictionary
+        grd (Grid): The grid
+        cells: The cell centers and actnum, as (xc, yc, actnum) 3D numpies
+        zonation, zoned: The zonation, as from the zonation config
+        nmaps: The number of maps per zone, e.g. properties (times statistics)
+        npasses: The number of mapping passes per zone, e.g. properties
+
+    Returns:
+        A new config with the mapsettings and tuning: coarsen set
+    """
+
+    tuning = config["computesettings"]["tuning"]
+    auto = dict(
+        AUTOTUNE, **(tuning["auto"] if isinstance(tuning["auto"], dict) else {})
+    )
+
+    sizes = cell_sizes(*cells)
+    cellsize = 0.5 * (sizes["dx"][1] + sizes["dy"][1])
+    logger.info(
+        "Cell sizes (P10, P50, P90), dx: %s, dy: %s",
+        ", ".join(f"{val:.1f}" for val in sizes["dx"]),
+        ", ".join(f"{val:.1f}" for val in sizes["dy"]),
+    )
+
+    estimated = config["mapsettings"] is None
+    xinc = auto["resolution"] * cellsize
+    newconfig = copy.deepcopy(config)
+    if estimated:
+        newconfig = estimate_mapsettings(newconfig, grd, xinc=xinc)
+
+    footprint = tuning["footprint"]
+    coarsen = int(tuning["coarsen"])
+    nthreads = _threads.threads(config)
+    zonecells = _zone_cells(cells[2], zonation, zoned, config["computesettings"])
+
+    while True:
+        geometry = map_geometry(newconfig)
+        seconds, megabytes = predict_cost(
+            geometry,
+            zonecells,
+            cellsize,
+            nmaps,
+            npasses,
+            coarsen,
+            footprint,
+            threads=nthreads,
+        )
+        logger.debug(
+            "Predicted %.1f s and %.0f MB for increment %.1f and coarsen %s",
+            seconds,
+            megabytes,
+            geometry.xinc,
+            coarsen,
+        )
+
+        overtime = auto["time"] is not None and seconds > auto["time"]
+        overmemory = auto["memory"] is not None and megabytes > auto["memory"]
+        if not (overtime or overmemory):
+            break
+
+        if overtime and not footprint and coarsen < auto["max_coarsen"]:
+            coarsen += 1
+        elif estimated and xinc * 1.25 <= MAX_RESOLUTION * cellsize:
+            xinc *= 1.25
+            newconfig = estimate_mapsettings(newconfig, grd, xinc=xinc)
+        else:
+            logger.warning(
+                "The mapping is predicted to be above the budget (%s s, %s MB)",
+                auto["time"],
+                auto["memory"],
+            )
+            break
+
+    logger.info(
+        "Predicted mapping time %.1f s and memory %.0f MB, for %s x %s nodes "
+        "(increment %.1f) and coarsen %s",
+        seconds,
+        megabytes,
+        geometry.ncol,
+        geometry.nrow,
+        geometry.xinc,
+        coarsen,
+    )
+    newconfig["computesettings"]["tuning"]["coarsen"] = coarsen
+    return newconfig
+
+
+def cell_sizes(xcells, ycells, actnum, samples=10000, seed=1234):
+    """Sample the distance between the centers of active neighbour cells.
+
+    Returns:
+        A dict with the P10, P50 and P90 of the distance along i (dx) and along
+        j (dy); the distance is 0 if there are too few cells to sample
+    """
+
+    rng = np.random.default_rng(seed)
+    ncol, nrow, nlay = actnum.shape
+    sizes = {}
+    for name, (idir, jdir) in (("dx", (1, 0)), ("dy", (0, 1))):
+        if ncol - idir < 1 or nrow - jdir < 1:
+            sizes[name] = (0.0, 0.0, 0.0)
+            continue
+        icell = rng.integers(0, ncol - idir, samples)
+        jcell = rng.integers(0, nrow - jdir, samples)
+        kcell = rng.integers(0, nlay, samples)
+        active = (actnum[icell, jcell, kcell] > 0) & (
+            actnum[icell + idir, jcell + jdir, kcell] > 0
+        )
+        icell, jcell, kcell = icell[active], jcell[active], kcell[active]
+        distance = np.hypot(
+            xcells[icell + idir, jcell + jdir, kcell] - xcells[icell, jcell, kcell],
+            ycells[icell + idir, jcell + jdir, kcell] - ycells[icell, jcell, kcell],
+        )
+        if distance.size == 0:
+            sizes[name] = (0.0, 0.0, 0.0)
+        else:
+            sizes[name] = tuple(float(val) for val in np.percentile(distance, PCTS))
+    return sizes
+
+
+def predict_cost(
+    geometry, zonecells, cellsize, nmaps, npasses, coarsen, footprint, threads=1
+):
+    """Predict the time (s) and memory (MB) for the mapping, from a cost model.
+
+    The time is for the xtgeo gridding (two linear griddata per layer), or for
+    the footprint mapping, shared by the threads. The memory is for the maps
+    that are kept, and the work arrays and the triangulation (or the footprint
+    chunks) of each thread.
+
+    Args:
+        geometry (MapGeometry): The map geometry
+        zonecells: A list of (active cells, layers) for each zone to map
+        cellsize: The (median) cell size
+        nmaps, npasses: The number of maps and mapping passes per zone
+        coarsen: The coarsen factor, not used for the footprint mapping
+        footprint (bool): If the mapping is by footprints
+        threads (int): The number of threads for the mapping
+    """
+
+    nnodes = geometry.ncol * geometry.nrow
+    seconds = 0.0
+    largest = 0
+    for ncells, nlayers in zonecells:
+        if footprint:
+            pairs = (
+                ncells
+                * (cellsize / geometry.xinc + 1.0)
+                * (cellsize / geometry.yinc + 1.0)
+            )
+            seconds += npasses * pairs * FOOTPRINT_PAIR_TIME
+        else:
+            npoints = ncells / coarsen**2
+            seconds += (
+                2.0
+                * npasses
+                * (
+                    npoints * GRIDDATA_POINT_TIME
+                    + nlayers * nnodes * GRIDDATA_NODE_TIME
+                )
+            )
+            largest = max(largest, npoints / max(nlayers, 1))
+
+    nbytes = nnodes * len(zonecells) * nmaps * MAP_BYTES
+    if footprint:
+        nbytes += threads * (nnodes * WORK_BYTES + FOOTPRINT_CHUNK_BYTES)
+    else:
+        nbytes += threads * (nnodes * WORK_BYTES + largest * TRIANGULATION_BYTES)
+    return seconds / threads, nbytes / 1e6
+
+
+def _zone_cells(actnum, zonation, zoned, computesettings):
+    """The number of active cells and layers for each zone that is mapped.
+
+    With zone_avg, the zone is mapped as one layer.
+    """
+
+    active = actnum > 0
+    zonecells = []
+    for zname, zrange in zoned.items():
+        if zname == "all":
+            if computesettings["all"] is not True:
+                continue
+            inzone = active
+        else:
+            if computesettings["zone"] is not True:
+                continue
+            inzone = np.isin(zonation, zrange) & active
+        nlayers = int(inzone.any(axis=(0, 1)).sum())
+        if computesettings["tuning"]["zone_avg"]:
+            nlayers = min(nlayers, 1)
+        zonecells.append((int(inzone.sum()), nlayers))
+    return zonecells
+
+
+def grid_geometrics(grd):
+    """The geometrics of the grid (extent, rotation etc.), as a dictionary."""
+    return _gridcache.cached_for_grid(
+        "geometrics",
+        grd,
+        None,
+        lambda: grd.get_geometrics(return_dict=True, cellcenter=False),
+    )
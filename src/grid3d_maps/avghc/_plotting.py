@@ -0,0 +1,271 @@
+"""Private module for the plotting stage, shared by HC thickness and avg maps.
+
+Plotting is pure CPU work, and with many maps it can take longer than the
+mapping itself. With ``plotsettings: processes: N`` the plots are made in a
+pool of N processes. The map values are then shipped to the workers through
+one shared memory block, not as pickled surfaces.
+
+A PlotContext is made once per run, and caches what is common for many plots:
+fault polygons (loaded once per distinct file), the resolved hierarchical
+plot settings per (property, zone), the user name and the time stamp.
+"""
+
+import getpass
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from time import localtime, strftime
+
+import numpy as np
+import numpy.ma as ma
+import xtgeo
+from xtgeo.surface import RegularSurface
+from xtgeoviz import quickplot
+
+from grid3d_maps.mapcube import GEOMETRY_KEYS
+
+from . import _profiling
+
+logger = logging.getLogger(__name__)
+
+# fault polygons per file in a plot worker process
+_WORKER_FAULTS = {}
+
+
+class PlotContext:
+    """Settings and data that are shared by all plots in a run.
+
+    Args:
+        config: The processed config.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.user = getpass.getuser()
+        self.showtime = strftime("%Y-%m-%d %H:%M:%S", localtime())
+        self._faults = {}
+        self._plotsettings = {}
+
+    def plotsettings(self, resolver, zname, pname=None):
+        """Resolve the plot settings hierarchy once per (resolver, pname, zname).
+
+        The resolver is a function on the form resolver(plotcontext, zname, pname)
+        which returns a dict. A copy is returned, so it can be modified freely.
+        """
+        key = (resolver.__name__, pname, zname)
+        if key not in self._plotsettings:
+            self._plotsettings[key] = resolver(self, zname, pname)
+        return dict(self._plotsettings[key])
+
+    def faults(self, faultpolygons):
+        """Get fault polygons; each distinct file is read once."""
+        if faultpolygons not in self._faults:
+            self._faults[faultpolygons] = _load_faults(faultpolygons)
+        return self._faults[faultpolygons]
+
+
+def zone_plotsettings(plotcontext, zname, pname=None):
+    """The plot settings of a zone, for PlotContext.plotsettings().
+
+    The settings are the value ranges, colortable etc. from the plotsettings,
+    for maps with the same settings for all attributes, as HC thickness and
+    contact maps. The title and subtitle are set per plot by the caller.
+    """
+
+    config = plotcontext.config
+
+    infotext = config["title"] + " - "
+    infotext += " " + plotcontext.user + " " + plotcontext.showtime
+    if config["output"]["tag"]:
+        infotext += " (tag: " + config["output"]["tag"] + ")"
+
+    xlabelrotation = None
+    valuerange = (None, None)
+    diffvaluerange = (None, None)
+    colortable = "rainbow"
+    xlabelrotation = 0
+    fpolyfile = None
+
+    if "xlabelrotation" in config["plotsettings"]:
+        xlabelrotation = config["plotsettings"]["xlabelrotation"]
+
+    if "valuerange" in config["plotsettings"]:
+        valuerange = tuple(config["plotsettings"]["valuerange"])
+
+    if "diffvaluerange" in config["plotsettings"]:
+        diffvaluerange = tuple(config["plotsettings"]["diffvaluerange"])
+
+    if "faultpolygons" in config["plotsettings"]:
+        fpolyfile = config["plotsettings"]["faultpolygons"]
+
+    if "colortable" in config["plotsettings"]:
+        colortable = config["plotsettings"]["colortable"]
+
+    # there may be individual plotsettings for zname
+    if zname is not None and zname in config["plotsettings"]:
+        zfg = config["plotsettings"][zname]
+
+        if "valuerange" in zfg:
+            valuerange = tuple(zfg["valuerange"])
+
+        if "diffvaluerange" in zfg:
+            diffvaluerange = tuple(zfg["diffvaluerange"])
+
+        if "xlabelrotation" in zfg:
+            xlabelrotation = zfg["xlabelrotation"]
+
+        if "colortable" in zfg:
+            colortable = zfg["colortable"]
+
+        if "faultpolygons" in zfg:
+            fpolyfile = zfg["faultpolygons"]
+
+    # assing settings to a dictionary which is returned
+    plotcfg = {}
+    plotcfg["infotext"] = infotext
+    plotcfg["valuerange"] = valuerange
+    plotcfg["diffvaluerange"] = diffvaluerange
+    plotcfg["xlabelrotation"] = xlabelrotation
+    plotcfg["colortable"] = colortable
+    plotcfg["faultpolygons"] = fpolyfile
+
+    return plotcfg
+
+
+def plot_job(plotfile, xmap, pcfg, valuerange):
+    """Collect what is needed to make one plot, as a dict."""
+    return {
+        "filename": plotfile,
+        "surface": xmap,
+        "title": pcfg["title"],
+        "subtitle": pcfg["subtitle"],
+        "infotext": pcfg["infotext"],
+        "xlabelrotation": pcfg["xlabelrotation"],
+        "minmax": valuerange,
+        "colormap": pcfg["colortable"],
+        "faultpolygons": pcfg["faultpolygons"],
+    }
+
+
+def plot_maps(plotcontext, jobs):
+    """Make plots for a list of plot jobs, either serial or in a process pool.
+
+    File names and log messages are in the order of the jobs list, regardless
+    of the number of processes.
+    """
+
+    processes = int(plotcontext.config["plotsettings"].get("processes") or 1)
+    processes = min(processes, len(jobs))
+
+    if processes <= 1:
+        for job in jobs:
+            logger.info("Plot to {}".format(job["filename"]))
+            with _profiling.stage("quickplot", filename=job["filename"]):
+                faults = plotcontext.faults(job["faultpolygons"])
+                _quickplot(job["surface"], _plotargs(job), faults)
+        return
+
+    logger.info("Plotting %s maps using %s processes", len(jobs), processes)
+    _plot_maps_in_pool(jobs, processes)
+
+
+def _plotargs(job):
+    return {key: val for key, val in job.items() if key != "surface"}
+
+
+def _load_faults(faultpolygons):
+    """Load fault polygons; return None if missing or not possible to read."""
+    if faultpolygons is None:
+        return None
+
+    try:
+        fau = xtgeo.polygons_from_file(faultpolygons, fformat="guess")
+        logger.info("Use fault polygons")
+        return {"faults": fau}
+    except OSError as err:
+        logger.info(err)
+        logger.info("No fault polygons")
+        return None
+
+
+def _quickplot(xmap, plotargs, faults):
+    quickplot(
+        xmap,
+        filename=plotargs["filename"],
+        title=plotargs["title"],
+        subtitle=plotargs["subtitle"],
+        infotext=plotargs["infotext"],
+        xlabelrotation=plotargs["xlabelrotation"],
+        minmax=plotargs["minmax"],
+        colormap=plotargs["colormap"],
+        faults=faults,
+    )
+
+
+def _plot_maps_in_pool(jobs, processes):
+    """Copy all map values into one shared memory block and plot in a pool."""
+
+    shapes = [(job["surface"].ncol, job["surface"].nrow) for job in jobs]
+    nbytes = sum(ncol * nrow for ncol, nrow in shapes) * np.dtype(np.float64).itemsize
+
+    shm = shared_memory.SharedMemory(create=True, size=max(nbytes, 1))
+    try:
+        tasks = []
+        offset = 0
+        for job, shape in zip(jobs, shapes):
+            surf = job["surface"]
+            values = np.ndarray(shape, dtype=np.float64, buffer=shm.buf, offset=offset)
+            values[:] = ma.filled(surf.values.astype(np.float64), fill_value=np.nan)
+            geometry = {key: getattr(surf, key) for key in GEOMETRY_KEYS}
+            tasks.append((shm.name, offset, shape, geometry, _plotargs(job)))
+            offset += values.nbytes
+            del values  # the shared memory cannot be closed with views alive
+
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(
+            max_workers=processes, mp_context=context, initializer=_init_worker
+        ) as executor:
+            futures = []
+            for task in tasks:
+                logger.info("Plot to {}".format(task[-1]["filename"]))
+                futures.append(executor.submit(_plot_from_shared_memory, *task))
+
+            # collect in submit order, so errors are raised deterministically
+            for future in futures:
+                filename, start, end, pid = future.result()
+                _profiling.add_span("quickplot", start, end, pid=pid, filename=filename)
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def _init_worker():
+    import matplotlib as mpl
+
+    mpl.use("Agg")
+
+
+def _plot_from_shared_memory(shmname, offset, shape, geometry, plotargs):
+    """Worker function; rebuild the surface from shared memory and plot.
+
+    Returns:
+        The file name, and the start and end time (ns) and the process id
+    """
+    start = time.perf_counter_ns()
+    shm = shared_memory.SharedMemory(name=shmname)
+    try:
+        values = np.ndarray(shape, dtype=np.float64, buffer=shm.buf, offset=offset)
+        xmap = RegularSurface(**geometry, values=ma.masked_invalid(values.copy()))
+        del values
+    finally:
+        shm.close()
+
+    faultpolygons = plotargs["faultpolygons"]
+    if faultpolygons not in _WORKER_FAULTS:
+        _WORKER_FAULTS[faultpolygons] = _load_faults(faultpolygons)
+
+    _quickplot(xmap, plotargs, _WORKER_FAULTS[faultpolygons])
+    return plotargs["filename"], start, time.perf_counter_ns(), os.getpid()
@@ -0,0 +1,253 @@
+"""Private module for a profile report and a trace of the stages of a run.
+
+With --profile-report out.json, each stage of a run (config parse, file
+discovery, grid import, property import, filters, zonation, HCPFZ, mapping per
+zone, export and plot) records:
+
+* wall_time and cpu_time, in seconds
+* rss_mb, the resident memory at the end of the stage (Linux only)
+* maxrss_mb, the peak resident memory of the process so far
+* tracemalloc_peak_mb, the peak of memory allocated by Python and numpy
+  during the stage (including nested stages)
+
+Stages may be nested, e.g. an export within the mapping of a zone; the parent
+is given for each stage. Only the stages of the thread that started the report
+are recorded, as the memory peaks are for the whole process; the stages run in
+mapping threads (tuning: threads) are part of their parent stage. The memory
+used by plotting in worker processes is not included.
+
+With --trace out.json (or the GRID3D_MAPS_TRACE environment variable), each
+stage is written as a span to a Chrome trace event file, which can be opened
+in e.g. chrome://tracing or https://ui.perfetto.dev (locally in the browser).
+Besides the stages above, the gridding of each map and each plot are spans.
+The spans of all threads are traced.
+
+Outside a profile report or a trace, stages cost nothing.
+"""
+
+import json
+import logging
+import os
+import platform
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:  # not on Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+TRACE_ENV = "GRID3D_MAPS_TRACE"
+
+_STAGES = None
+_STACK = []
+_OWNER = None
+_TRACE = None
+_NAMED = set()
+_LOCK = threading.Lock()
+
+MB = 1024 * 1024
+
+
+@contextmanager
+def profile_report(filename, appname):
+    """Profile the stages within the context, and write the report to a file.
+
+    If filename is None, nothing is profiled.
+    """
+    global _STAGES, _OWNER
+
+    if filename is None:
+        yield
+        return
+
+    started = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+
+    _STAGES = []
+    _OWNER = threading.get_ident()
+    try:
+        with stage("total"):
+            yield
+    finally:
+        stages = _STAGES
+        _STAGES = None
+        _OWNER = None
+        if not tracing:
+            tracemalloc.stop()
+
+        report = {
+            "application": appname,
+            "started": started,
+            "hostname": platform.node(),
+            "pid": os.getpid(),
+            "cwd": os.getcwd(),
+            "argv": sys.argv,
+            "stages": stages,
+        }
+        with open(filename, "w", encoding="utf8") as stream:
+            json.dump(report, stream, indent=2)
+        logger.info("Profile report is written to %s", filename)
+
+
+@contextmanager
+def trace(filename, appname):
+    """Write the stages within the context as spans to a Chrome trace file.
+
+    If filename is None, the file name is taken from the GRID3D_MAPS_TRACE
+    environment variable, and if that is not set, nothing is traced.
+    """
+    global _TRACE
+
+    filename = filename or os.environ.get(TRACE_ENV)
+    if not filename or _TRACE is not None:
+        yield
+        return
+
+    _TRACE = [
+        {
+            "name": "process_name",
+            "ph": "M",
+            "pid": os.getpid(),
+            "args": {"name": appname},
+        }
+    ]
+    _NAMED.clear()
+    _NAMED.add(os.getpid())
+    try:
+        yield
+    finally:
+        events = _TRACE
+        _TRACE = None
+
+        report = {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": {
+                "application": appname,
+                "hostname": platform.node(),
+                "cwd": os.getcwd(),
+                "argv": sys.argv,
+            },
+        }
+        with open(filename, "w", encoding="utf8") as stream:
+            json.dump(report, stream)
+        logger.info("Trace is written to %s", filename)
+
+
+@contextmanager
+def stage(name, **info):
+    """Record time and memory use for a stage, with optional extra info.
+
+    Example::
+
+        with _profiling.stage("mapping", zone=zname):
+            ...
+    """
+
+    if _STAGES is None and _TRACE is None:
+        yield
+        return
+
+    record = None
+    if _STAGES is not None and threading.get_ident() == _OWNER:
+        record = _start_record(name, info)
+
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        end = time.perf_counter_ns()
+        if record is not None:
+            _end_record(*record)
+        add_span(name, start, end, **info)
+
+
+def add_span(name, start, end, pid=None, tid=None, **info):
+    """Add a span to the trace, e.g. timed in a worker process.
+
+    The start and end are from time.perf_counter_ns(), which is the same clock
+    for all processes on a host (Linux). Spans may be added from any thread.
+    """
+
+    if _TRACE is None:
+        return
+
+    span = {
+        "name": name,
+        "cat": "grid3d_maps",
+        "ph": "X",
+        "ts": start / 1000.0,
+        "dur": (end - start) / 1000.0,
+        "pid": pid or os.getpid(),
+        "tid": tid or threading.get_ident(),
+        "args": {key: str(val) for key, val in info.items()},
+    }
+    with _LOCK:
+        if pid is not None and pid not in _NAMED:
+            _NAMED.add(pid)
+            _TRACE.append(
+                {
+                    "name": "process_name",
+                    "ph": "M",
+                    "pid": pid,
+                    "args": {"name": "worker"},
+                }
+            )
+        _TRACE.append(span)
+
+
+def _start_record(name, info):
+    # the peak so far belongs to the parent stage
+    if _STACK:
+        _STACK[-1]["peak"] = max(_STACK[-1]["peak"], tracemalloc.get_traced_memory()[1])
+    tracemalloc.reset_peak()
+
+    record = {"stage": name, "parent": _STACK[-1]["name"] if _STACK else None}
+    record.update(info)
+    frame = {"name": name, "peak": 0}
+    _STACK.append(frame)
+    _STAGES.append(record)
+    return record, frame, time.perf_counter(), time.process_time()
+
+
+def _end_record(record, frame, wall, cpu):
+    _STACK.pop()
+    peak = max(frame["peak"], tracemalloc.get_traced_memory()[1])
+    record.update(
+        wall_time=round(time.perf_counter() - wall, 6),
+        cpu_time=round(time.process_time() - cpu, 6),
+        rss_mb=_rss_mb(),
+        maxrss_mb=_maxrss_mb(),
+        tracemalloc_peak_mb=round(peak / MB, 3),
+    )
+    if _STACK:
+        _STACK[-1]["peak"] = max(_STACK[-1]["peak"], peak)
+    tracemalloc.reset_peak()
+
+
+def _rss_mb():
+    try:
+        with open("/proc/self/statm", encoding="ascii") as stream:
+            pages = int(stream.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return round(pages * os.sysconf("SC_PAGE_SIZE") / MB, 3)
+
+
+def _maxrss_mb():
+    if resource is None:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    if sys.platform == "darwin":
+        return round(maxrss / MB, 3)
+    return round(maxrss / 1024, 3)
@@ -0,0 +1,172 @@
+"""Private module for mapping large grids in k-slabs (tuning: slabs).
+
+For grids of tens of millions of cells, the 3D numpies of the geometry, the
+properties, the filter and the zonation do not fit in memory at once. With
+``computesettings: tuning: slabs: N``, the grid is handled in k-slabs of (at
+most) N layers: for each slab, a grid of its layers is made, and the numpies,
+filters, zonation and weights are made for the slab as for a whole grid. The
+maps are accumulated layer by layer (or cell by cell for the footprints) over
+the slabs, so only the numpies of one slab, and the map sums, are in memory.
+
+The grid of a slab (a SlabGrid) is made from the pillars and the corner depths
+of its layers in the whole grid, so its cell geometry (centers, thickness,
+corners, volumes) is as for the whole grid, and it knows its layers in the
+whole grid. xtgeo reads a grid property for the whole grid only, so each
+property file (and UNRST date) is read once for the whole grid, the first time
+a slab asks for it, and kept for the slabs after it, that get their layers of
+it. So the memory is not bounded by the slab size: the whole grid and the
+imported properties are kept for the run, while the numpies made from them
+are for one slab at a time.
+"""
+
+import logging
+
+import xtgeo
+
+logger = logging.getLogger(__name__)
+
+# the tuning settings that are not used with slabs
+UNUSED_TUNING = ("zone_avg", "tiles", "processes", "auto")
+
+
+def slab_ranges(nlay, slabsize):
+    """The (k0, k1) layer ranges of the slabs, with at most slabsize layers."""
+    slabsize = max(1, int(slabsize))
+    return [(k0, min(k0 + slabsize, nlay)) for k0 in range(0, nlay, slabsize)]
+
+
+class SlabGrid(xtgeo.Grid):
+    """The grid of the layers k0:k1 of a grid, e.g. a k-slab.
+
+    It is an ordinary xtgeo Grid, with the layers in the whole grid as k0 and
+    k1, and the properties of the whole grid imported so far (see
+    gridproperty_from_file()).
+
+    Args:
+        grd (Grid): The whole grid
+        k0, k1 (int): The layers of the slab in the whole grid, k1 excluded
+        props (dict): The properties of the whole grid, shared by the slabs
+    """
+
+    def __init__(self, grd, k0, k1, props):
+        # the pillars are shared, the corner depths and actnum of the layers
+        # copied (from the arrays of the xtgeo grid, in its format 2)
+        grd._set_xtgformat2()
+        super().__init__(
+            coordsv=grd._coordsv,
+            zcornsv=grd._zcornsv[:, :, k0 : k1 + 1].copy(),
+            actnumsv=grd._actnumsv[:, :, k0:k1].copy(),
+            dualporo=grd.dualporo,
+            dualperm=grd.dualperm,
+            units=grd.units,
+        )
+        self.k0 = k0
+        self.k1 = k1
+        self.whole = grd
+        self.wholeprops = props
+
+
+class GridSlabs:
+    """The k-slabs of a grid, as grids of the layers of each slab.
+
+    Args:
+        grd (Grid): The whole grid
+        slabsize (int): The max number of layers per slab
+    """
+
+    def __init__(self, grd, slabsize):
+        self.grid = grd
+        self.ranges = slab_ranges(grd.dimensions[2], slabsize)
+        logger.info(
+            "Mapping in %s k-slabs of max %s layers, for %s layers",
+            len(self.ranges),
+            slabsize,
+            grd.dimensions[2],
+        )
+
+    def __iter__(self):
+        props = {}
+        for k0, k1 in self.ranges:
+            yield SlabGrid(self.grid, k0, k1, props)
+
+    def __len__(self):
+        return len(self.ranges)
+
+
+def layer_range(grd):
+    """The (k0, k1) layers of a slab grid in the whole grid, or None."""
+    return (grd.k0, grd.k1) if isinstance(grd, SlabGrid) else None
+
+
+def first_layer(grd):
+    """The index of the first layer of the grid in the whole grid."""
+    return grd.k0 if isinstance(grd, SlabGrid) else 0
+
+
+def _layers_of(prop, slabgrid):
+    """A GridProperty of the slab grid, with the layers of a whole grid property."""
+    return xtgeo.GridProperty(
+        slabgrid,
+        name=prop.name,
+        discrete=prop.isdiscrete,
+        codes=prop.codes if prop.isdiscrete else None,
+        date=prop.date,
+        values=prop.values[:, :, slabgrid.k0 : slabgrid.k1].copy(),
+    )
+
+
+def _whole_props(grid, key, func):
+    """The properties of the whole grid for key, imported by func() once."""
+    if key not in grid.wholeprops:
+        grid.wholeprops[key] = func()
+    return grid.wholeprops[key]
+
+
+def gridproperty_from_file(pfile, grid, **kwargs):
+    """As xtgeo.gridproperty_from_file(), also for a slab grid.
+
+    For a slab grid, the property of the whole grid is imported once for the
+    slabs, and the slab gets its layers of it.
+    """
+    if not isinstance(grid, SlabGrid):
+        return xtgeo.gridproperty_from_file(pfile, grid=grid, **kwargs)
+
+    key = ("property", pfile, repr(sorted(kwargs.items())))
+    prop = _whole_props(
+        grid,
+        key,
+        lambda: xtgeo.gridproperty_from_file(pfile, grid=grid.whole, **kwargs),
+    )
+    return _layers_of(prop, grid)
+
+
+def gridproperties_from_file(pfile, grid, names, fformat, **kwargs):
+    """As xtgeo.gridproperties_from_file(), also for a slab grid.
+
+    For a slab grid, the properties of the whole grid are imported once for
+    the slabs, and the slab gets its layers of them.
+    """
+    if not isinstance(grid, SlabGrid):
+        return xtgeo.gridproperties_from_file(
+            pfile, names=names, fformat=fformat, grid=grid, **kwargs
+        )
+
+    key = ("properties", pfile, tuple(names), fformat, repr(sorted(kwargs.items())))
+    props = _whole_props(
+        grid,
+        key,
+        lambda: (
+            xtgeo.gridproperties_from_file(
+                pfile, names=names, fformat=fformat, grid=grid.whole, **kwargs
+            ).props
+        ),
+    )
+    return xtgeo.GridProperties(props=[_layers_of(prop, grid) for prop in props])
+
+
+def warn_unused_tuning(config):
+    """Warn about the tuning settings that are not used with slabs."""
+    tuning = config["computesettings"]["tuning"]
+    for key in UNUSED_TUNING:
+        if tuning.get(key):
+            logger.warning("The tuning: %s is not used with tuning: slabs", key)
@@ -0,0 +1,62 @@
+"""Private module for mapping in several threads (tuning: threads).
+
+The mapping is split in tasks: the layers (or zones) of the gridding, and the
+chunks of cells of the footprint mapping. The tasks run in a pool of threads,
+since scipy's gridding and numpy release the GIL for the heavy work, and each
+task gives partial sums per map node. The partials are added in the order of
+the tasks, not in the order the tasks finish, so the maps are the same, bit for
+bit, for any number of threads.
+
+The number of threads is from computesettings: tuning: threads, else from the
+GRID3D_MAPS_THREADS environment variable, else 1 (no threads).
+"""
+
+import logging
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+THREADS_ENV = "GRID3D_MAPS_THREADS"
+
+
+def threads(config):
+    """The number of threads for the mapping, from the config or environment."""
+
+    nthreads = config["computesettings"]["tuning"]["threads"]
+    source = "computesettings: tuning: threads"
+    if nthreads is None:
+        nthreads = os.environ.get(THREADS_ENV) or 1
+        source = THREADS_ENV
+
+    try:
+        nthreads = int(nthreads)
+    except (TypeError, ValueError):
+        nthreads = 0
+    if nthreads < 1:
+        raise ValueError(f"The number of threads in {source} must be 1 or more")
+    return nthreads
+
+
+def ordered_map(func, items, nthreads=1):
+    """Yield func(item) for each item, in the order of the items.
+
+    With more than one thread, the items are run in a pool of threads, where
+    at most nthreads items are run (or done and waiting) ahead of the one that
+    is yielded, so the memory of the partial results is bounded.
+    """
+
+    if nthreads <= 1:
+        for item in items:
+            yield func(item)
+        return
+
+    with ThreadPoolExecutor(max_workers=nthreads) as pool:
+        pending = deque()
+        for item in items:
+            pending.append(pool.submit(func, item))
+            if len(pending) > nthreads:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -0,0 +1,267 @@
+"""Private module for tiled mapping of very large maps (tuning: tiles).
+
+A map of e.g. 5000 x 5000 nodes is split in tiles of (at most) tiles x tiles
+nodes. The grid columns are assigned to the tiles once, from their extent in
+the map: the top face footprints with tuning: footprint, else the cell centers
+with a margin of MARGIN cells, so the gridding near the tile edges sees the
+same cells as for the whole map. Each tile is then mapped from the (i, j) box
+of grid columns it needs, as views of the 3D numpies, so only the work arrays
+and accumulators of one tile are in memory.
+
+Each finished tile is written to a memory mapped map (a .npy file per zone,
+property and date) in a temporary folder, and the maps are made from these
+files one at a time, when exported or asked for (see TiledMaps).
+"""
+
+import logging
+import shutil
+import tempfile
+import warnings
+import weakref
+from pathlib import Path
+
+import numpy as np
+import numpy.ma as ma
+
+from . import _mapsettings
+
+logger = logging.getLogger(__name__)
+
+# the margin around each tile for the gridding, in (P90) cell sizes
+MARGIN = 2.0
+
+# coordinates above this are undefined
+UNDEF_LIMIT = 1e20
+
+# the min number of grid columns along i and j for a tile
+MINCOLUMNS = 3
+
+
+class Tile:
+    """A tile of the map, and the box of grid columns to map it from.
+
+    Args:
+        geometry (MapGeometry): The geometry of the tile
+        nodes: The node ranges of the tile in the map, as (i0, i1, j0, j1)
+        columns: The grid column ranges for the tile, as (i0, i1, j0, j1)
+    """
+
+    __slots__ = ("geometry", "nodes", "columns")
+
+    def __init__(self, geometry, nodes, columns):
+        self.geometry = geometry
+        self.nodes = nodes
+        self.columns = columns
+
+    def view(self, array):
+        """The part of a 3D (or 4D) grid numpy for the tile, as a view."""
+        if array is None:
+            return None
+        icol0, icol1, jrow0, jrow1 = self.columns
+        return array[icol0:icol1, jrow0:jrow1]
+
+    def __repr__(self):
+        return f"Tile(nodes={self.nodes}, columns={self.columns})"
+
+
+def tiles(geometry, tilesize, cells, corners=None, coarsen=1):
+    """Split the map in tiles, and find the grid columns for each tile.
+
+    Tiles with no active cells, or with all nodes masked in the geometry, are
+    left out, and are undefined in the maps.
+
+    Args:
+        geometry (MapGeometry): The map geometry
+        tilesize (int): The max number of nodes along each side of a tile
+        cells: The cell centers and actnum, as (xc, yc, actnum) 3D numpies
+        corners: The (x, y) top face corners, for the footprint mapping
+        coarsen (int): The column boxes start at a multiple of coarsen, so the
+            same cells are used as for the whole map
+
+    Returns:
+        A list of Tile
+    """
+
+    extent = column_extent(geometry, cells, corners, coarsen=coarsen)
+
+    tilelist = []
+    for inode in range(0, geometry.ncol, tilesize):
+        for jnode in range(0, geometry.nrow, tilesize):
+            ncol = min(tilesize, geometry.ncol - inode)
+            nrow = min(tilesize, geometry.nrow - jnode)
+            tilegeometry = geometry.window(inode, jnode, ncol, nrow)
+            if tilegeometry.mask is not None and tilegeometry.mask.all():
+                continue
+
+            # the columns reaching into the node squares of the tile
+            needed = (
+                (extent[1] >= inode - 0.5)
+                & (extent[0] <= inode + ncol - 0.5)
+                & (extent[3] >= jnode - 0.5)
+                & (extent[2] <= jnode + nrow - 0.5)
+            )
+            if not needed.any():
+                continue
+
+            icols = np.flatnonzero(needed.any(axis=1))
+            jrows = np.flatnonzero(needed.any(axis=0))
+            columns = (
+                *column_range(icols[0], icols[-1] + 1, extent[0].shape[0], coarsen),
+                *column_range(jrows[0], jrows[-1] + 1, extent[0].shape[1], coarsen),
+            )
+            tilelist.append(
+                Tile(
+                    tilegeometry,
+                    (inode, inode + ncol, jnode, jnode + nrow),
+                    columns,
+                )
+            )
+
+    logger.info(
+        "Mapping in %s tiles of max %s x %s nodes, for %s x %s nodes",
+        len(tilelist),
+        tilesize,
+        tilesize,
+        geometry.ncol,
+        geometry.nrow,
+    )
+    return tilelist
+
+
+def column_range(first, last, size, coarsen):
+    """The column range first:last, starting at a multiple of coarsen.
+
+    The range is widened to at least MINCOLUMNS (coarsened) columns inside the
+    grid, so the gridding has enough cells for the triangles.
+    """
+
+    minimum = MINCOLUMNS * coarsen
+    if last - first < minimum:
+        first = max(0, min(first - (minimum - last + first) // 2, size - minimum))
+        last = min(size, first + minimum)
+    return int(first - first % coarsen), int(last)
+
+
+def column_extent(geometry, cells, corners, coarsen=1):
+    """The extent of each grid column in the map index space, with margins.
+
+    For the gridding, the margin is MARGIN cell sizes, times coarsen, since
+    the triangles then span coarsen cells.
+
+    Returns:
+        The (umin, umax, vmin, vmax) as 2D (ncol, nrow) numpies; NaN for
+        columns without cells (with coordinates, or active for footprints)
+    """
+
+    xcells, ycells, actnum = cells
+
+    if corners is None:
+        sizes = _mapsettings.cell_sizes(xcells, ycells, actnum)
+        cellsize = max(sizes["dx"][2], sizes["dy"][2])
+        margin = MARGIN * coarsen * cellsize / min(geometry.xinc, geometry.yinc)
+        # as in the gridding, all cells with coordinates are in the triangles
+        valid = xcells < UNDEF_LIMIT
+        upos, vpos = geometry.to_index(xcells, ycells)
+        upos = np.where(valid, upos, np.nan)
+        vpos = np.where(valid, vpos, np.nan)
+        ulow, uhigh, vlow, vhigh = upos, upos, vpos, vpos
+    else:
+        margin = 0.0
+        upos, vpos = geometry.to_index(*corners)
+        inactive = (actnum <= 0)[..., np.newaxis]
+        upos = np.where(inactive, np.nan, upos)
+        vpos = np.where(inactive, np.nan, vpos)
+        ulow, uhigh = upos.min(axis=3), upos.max(axis=3)
+        vlow, vhigh = vpos.min(axis=3), vpos.max(axis=3)
+
+    # columns with no active cells are all NaN, and get NaN
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return (
+            np.nanmin(ulow, axis=2) - margin,
+            np.nanmax(uhigh, axis=2) + margin,
+            np.nanmin(vlow, axis=2) - margin,
+            np.nanmax(vhigh, axis=2) + margin,
+        )
+
+
+class TiledMaps:
+    """Maps written tile by tile to memory mapped files, read one at a time.
+
+    Undefined nodes are NaN in the files, and masked in the surfaces. The
+    folder is removed when the TiledMaps is closed or garbage collected.
+
+    Args:
+        geometry (MapGeometry): The map geometry
+        folder: Where to make the temporary folder; the system default if None
+        fill: The value of nodes not in any tile, NaN (undefined) by default
+    """
+
+    def __init__(self, geometry, folder=None, fill=np.nan):
+        self.geometry = geometry
+        self.fill = fill
+        self.folder = tempfile.mkdtemp(prefix="grid3d_maps_tiles_", dir=folder)
+        self._files = {}
+        self._finalizer = weakref.finalize(self, shutil.rmtree, self.folder, True)
+        logger.info("Tiled maps in %s", self.folder)
+
+    def write(self, key, tile, values):
+        """Write the (masked) values of a tile to the map for key."""
+
+        filename = self._files.get(key)
+        if filename is None:
+            filename = str(Path(self.folder) / f"map{len(self._files)}.npy")
+            mmap = np.lib.format.open_memmap(
+                filename,
+                mode="w+",
+                dtype=np.float64,
+                shape=(self.geometry.ncol, self.geometry.nrow),
+            )
+            mmap[:] = self.fill
+            self._files[key] = filename
+        else:
+            mmap = np.load(filename, mmap_mode="r+")
+
+        inode0, inode1, jnode0, jnode1 = tile.nodes
+        mmap[inode0:inode1, jnode0:jnode1] = ma.filled(
+            ma.asarray(values, dtype=np.float64), fill_value=np.nan
+        )
+        mmap.flush()
+        del mmap
+
+    def values(self, key):
+        """The map for key as a read only memory mapped numpy; NaN if undefined.
+
+        A map with no tiles written (e.g. a zone outside the map) is all fill.
+        """
+        if key not in self._files:
+            return np.full((self.geometry.ncol, self.geometry.nrow), self.fill)
+        return np.load(self._files[key], mmap_mode="r")
+
+    def surface(self, key):
+        """The map for key as a (new) RegularSurface."""
+        return self.geometry.surface(ma.masked_invalid(np.array(self.values(key))))
+
+    def keys(self):
+        return self._files.keys()
+
+    def items(self):
+        """The (key, surface) of each map, with the surfaces made on iteration."""
+        for key in self._files:
+            yield key, self.surface(key)
+
+    def __getitem__(self, key):
+        return self.surface(key)
+
+    def __contains__(self, key):
+        return key in self._files
+
+    def __iter__(self):
+        return iter(self._files)
+
+    def __len__(self):
+        return len(self._files)
+
+    def close(self):
+        """Remove the folder with the memory mapped files."""
+        self._finalizer()
@@ -0,0 +1,469 @@
+"""Private module for time-lapse maps, for many report steps of an UNRST file.
+
+Instead of listing each date, the dates can be given as:
+
+* ``all``: all report steps in the UNRST file
+* ``19991201:20050101``: all report steps in a range (both ends included)
+* ``19991201:20050101:4``: every 4'th report step in a range
+* ``all:4``: every 4'th report step
+
+For the HC thickness script these are entries in ``input: dates``, and for
+the average script they are dates of the UNRST properties, e.g.
+``PRESSURE--all: $eclroot.UNRST``.
+
+With such dates, the run is a time-lapse run: the dates are mapped in batches
+of a few report steps (see batches()), and the UNRST file is read forward once,
+with one file handle, for all batches (see RestartReader), so only the report
+steps of one batch are in memory. All maps go to one map cube, the stacked
+time-lapse file. Optionally, an animated plot is made per zone and attribute
+from the map cube.
+"""
+
+import contextlib
+import copy
+import logging
+from pathlib import Path
+
+import numpy as np
+import resfo
+import xtgeo
+
+from grid3d_maps.mapcube import MapCube, mapcube_writer
+
+from . import _get_grid_props
+from ._compute_avg import DATAIO_MAPFOLDER
+
+logger = logging.getLogger(__name__)
+
+# the INTEHEAD items of the grid dimensions, the phases and the date
+INTEHEAD_NX, INTEHEAD_NY, INTEHEAD_NZ = 8, 9, 10
+INTEHEAD_PHASES = 14
+INTEHEAD_DAY, INTEHEAD_MONTH, INTEHEAD_YEAR = 64, 65, 66
+
+# the saturations, and their phase bits in the INTEHEAD phases item
+SATURATIONS = {"SOIL": 1, "SWAT": 2, "SGAS": 4}
+
+
+def is_datespec(date):
+    """True if a date entry is 'all' or a range of report steps."""
+    date = str(date)
+    return date == "all" or date.startswith("all:") or ":" in date
+
+
+def report_dates(unrstfile):
+    """The dates of the report steps in an UNRST file, as YYYYMMDD strings."""
+
+    dates = xtgeo.GridProperties.scan_dates(unrstfile, datesonly=True)
+    return sorted({str(date) for date in dates})
+
+
+def expand_dates(dates, unrstfile):
+    """Expand 'all' and ranges of report steps to dates, in order, no duplicates.
+
+    Other entries (dates and date pairs) are kept as they are.
+    """
+
+    stepdates = None
+    expanded = []
+    for entry in dates:
+        entry = str(entry)
+        if not is_datespec(entry):
+            expanded.append(entry)
+            continue
+
+        if stepdates is None:
+            stepdates = report_dates(unrstfile)
+
+        parts = entry.split(":")
+        if parts[0] == "all":
+            first, last = stepdates[0], stepdates[-1]
+            stride = parts[1] if len(parts) > 1 else 1
+        elif len(parts) in (2, 3):
+            first, last = parts[0], parts[1]
+            stride = parts[2] if len(parts) > 2 else 1
+        else:
+            raise ValueError(f"Invalid dates {entry}, use e.g. 19991201:20050101:2")
+
+        try:
+            stride = int(stride)
+        except ValueError as err:
+            raise ValueError(f"Invalid stride in dates {entry}") from err
+        if stride < 1:
+            raise ValueError(f"Invalid stride in dates {entry}")
+
+        inrange = [date for date in stepdates if first <= date <= last]
+        if not inrange:
+            logger.warning("No report steps in %s for %s", unrstfile, entry)
+        expanded.extend(inrange[::stride])
+
+    return list(dict.fromkeys(expanded))
+
+
+def expand_config(config, appname):
+    """Expand time-lapse dates in the config, if any.
+
+    A time-lapse run gets config['_timelapse'] = True, and all maps go to a
+    map cube; if not given, it is '<mapfolder>/<script>_timelapse.g3dcube'.
+    """
+
+    newconfig = copy.deepcopy(config)
+    if appname == "grid3d_hc_thickness":
+        timelapse = _expand_hc(newconfig)
+    else:
+        timelapse = _expand_avg(newconfig)
+
+    if not timelapse:
+        return newconfig
+
+    newconfig["_timelapse"] = True
+    if not newconfig["output"].get("mapcube"):
+        mapfolder = newconfig["output"]["mapfolder"]
+        if mapfolder == "fmu-dataio":
+            mapfolder = DATAIO_MAPFOLDER
+        name = appname.replace("grid3d_", "") + "_timelapse.g3dcube"
+        newconfig["output"]["mapcube"] = str(Path(mapfolder) / name)
+
+    logger.info(
+        "Time-lapse run, all maps will be in %s", newconfig["output"]["mapcube"]
+    )
+    return newconfig
+
+
+def _expand_hc(config):
+    dates = config["input"].get("dates", [])
+    if not any(is_datespec(date) for date in dates):
+        return False
+
+    eclroot = config["input"].get("eclroot")
+    if not eclroot:
+        raise ValueError("Dates as 'all' or ranges need the 'eclroot' (UNRST)")
+
+    config["input"]["dates"] = expand_dates(dates, eclroot + ".UNRST")
+    logger.info("Time-lapse dates: %s", config["input"]["dates"])
+    return True
+
+
+def _expand_avg(config):
+    timelapse = False
+    newinput = {}
+    for pname, source in config["input"].items():
+        name, _, date = pname.partition("--")
+        if not date or not is_datespec(date) or "UNRST" not in str(source):
+            newinput[pname] = source
+            continue
+
+        timelapse = True
+        unrstfile = _resolved(str(source), config["input"])
+        metadata = config["metadata"].pop(pname, None)
+        for stepdate in expand_dates([date], unrstfile):
+            newinput[name + "--" + stepdate] = source
+            if metadata is not None:
+                config["metadata"][name + "--" + stepdate] = dict(
+                    {key: val for key, val in metadata.items() if key != "t2"},
+                    t1=stepdate,
+                )
+
+    config["input"] = newinput
+    return timelapse
+
+
+def _resolved(source, inputconfig):
+    for root in ("folderroot", "eclroot"):
+        if "$" + root in source:
+            source = source.replace("$" + root, inputconfig.get(root) or "")
+    return source
+
+
+def steps(dates):
+    """The dates to import for each step; a date, or the two dates of a pair."""
+
+    for date in dates:
+        date = str(date)
+        if "-" in date:
+            yield date, date.split("-")[:2]
+        else:
+            yield date, [date]
+
+
+def batches(dates, nsteps):
+    """The dates (or date pairs) in batches of at most nsteps report steps.
+
+    Returns:
+        A list of (dates, stepdates, keep) per batch, where stepdates are the
+        report steps to read, and keep are the report steps that are also
+        needed by a later batch (e.g. the base date of date pairs)
+    """
+
+    groups = []
+    for date, stepdates in steps(dates):
+        if not groups or len(groups[-1][1] | set(stepdates)) > nsteps:
+            groups.append(([], set()))
+        groups[-1][0].append(date)
+        groups[-1][1].update(stepdates)
+
+    result = []
+    for inum, (batchdates, stepdates) in enumerate(groups):
+        later = set().union(*(group[1] for group in groups[inum + 1 :]))
+        result.append((batchdates, sorted(stepdates), stepdates & later))
+    return result
+
+
+def stepconfig(config, dates):
+    """A shallow copy of the config, with the input dates of one batch only."""
+    return dict(config, input=dict(config["input"], dates=list(dates)))
+
+
+class RestartReader:
+    """Read the UNRST properties of report steps, going forward through the file.
+
+    Each UNRST file is kept open, and read forward one report step (SEQNUM
+    section) at a time, where only the properties of the report steps asked
+    for are read. So when the report steps are asked for in date order, each
+    file is read once for all of them, not once per step; if a report step
+    before the last one read is asked for, the file is read from the start.
+
+    The properties are as from xtgeo, e.g. SWAT_19991201, where a missing
+    saturation is found from the others and the phases of the run. For dual
+    porosity grids, xtgeo imports the properties, for the report steps of
+    each read().
+
+    Args:
+        grd (Grid): The grid
+        restartlist (dict): {property name: UNRST file}
+    """
+
+    def __init__(self, grd, restartlist):
+        self.grid = grd
+        self.names = {}
+        for name, rfile in restartlist.items():
+            self.names.setdefault(rfile, []).append(name)
+        self._files = {}
+        self._kept = {}
+        self._actind = None
+        self._stack = contextlib.ExitStack()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self._stack.close()
+
+    def read(self, dates, keep=()):
+        """The properties of the report steps, as a list of GridProperty.
+
+        Args:
+            dates (list): The report steps (YYYYMMDD) to read
+            keep (set): The report steps that are read again later; these are
+                kept in memory until then
+        """
+
+        props = []
+        for rfile, names in self.names.items():
+            found = {
+                date: dprops
+                for date, dprops in self._kept.pop(rfile, {}).items()
+                if date in dates
+            }
+            wanted = sorted(set(dates) - set(found))
+            if self.grid.dualporo:
+                _, _, restobjects, _ = _get_grid_props.import_data(
+                    "time lapse",
+                    None,
+                    {},
+                    dict.fromkeys(names, rfile),
+                    wanted,
+                    self.grid,
+                )
+                for prop in restobjects:
+                    found.setdefault(str(prop.date), []).append(prop)
+            elif wanted:
+                found.update(self._walk(rfile, names, wanted))
+
+            self._kept[rfile] = {
+                date: dprops for date, dprops in found.items() if date in keep
+            }
+            for date in dates:
+                if date not in found:
+                    logger.warning("Report step %s is not found in %s", date, rfile)
+                props.extend(found.get(date, []))
+        return props
+
+    def _walk(self, rfile, names, wanted):
+        """Read on in the file, to the last report step wanted."""
+
+        state = self._files.get(rfile)
+        if state is None or state["last"] is None or wanted[0] <= state["last"]:
+            if state is None:
+                stream = self._stack.enter_context(open(rfile, "rb"))  # noqa: SIM115
+            else:
+                stream = state["stream"]
+                stream.seek(0)
+                logger.info("Read %s again from the start", rfile)
+            state = self._files[rfile] = {"stream": stream, "last": ""}
+            state["steps"] = self._report_steps(state, names)
+
+        state["wanted"] = set(wanted)
+        found = {}
+        for date, values in state["steps"]:
+            if values is not None:
+                for name in set(names) - set(values):
+                    logger.warning("%s is not found for %s in %s", name, date, rfile)
+                found[date] = [
+                    self._gridprop(name, date, pvalues)
+                    for name, pvalues in values.items()
+                ]
+            if date >= wanted[-1]:
+                break
+        else:
+            state["last"] = None  # at the end of the file
+        return found
+
+    def _report_steps(self, state, names):
+        """Yield (date, {name: values}) per report step, values None if not wanted."""
+
+        date = values = intehead = None
+        inlgr = False
+        for entry in resfo.lazy_read(state["stream"]):
+            keyword = entry.read_keyword().strip()
+            if keyword == "SEQNUM":
+                if date is not None:
+                    yield date, self._saturations(values, names, intehead)
+                date = values = None
+            elif keyword in ("LGR", "ENDLGR"):
+                inlgr = keyword == "LGR"
+            elif keyword == "INTEHEAD" and not inlgr:
+                intehead = entry.read_array()
+                self._check_dimensions(intehead)
+                date = "{:04d}{:02d}{:02d}".format(
+                    *intehead[[INTEHEAD_YEAR, INTEHEAD_MONTH, INTEHEAD_DAY]]
+                )
+                state["last"] = date
+                values = {} if date in state["wanted"] else None
+            elif values is not None and keyword in names and not inlgr:
+                values[keyword] = entry.read_array()
+
+        if date is not None:
+            yield date, self._saturations(values, names, intehead)
+
+    def _saturations(self, values, names, intehead):
+        """Add the saturations that are not in the file, from the others."""
+
+        if values is None:
+            return None
+
+        phases = intehead[INTEHEAD_PHASES]
+        for name in names:
+            if name in values or name not in SATURATIONS:
+                continue
+            others = [sat for sat, bit in SATURATIONS.items() if phases & bit]
+            if not phases & SATURATIONS[name]:
+                values[name] = 0.0
+            elif all(sat in values for sat in others if sat != name):
+                values[name] = 1.0 - sum(values[sat] for sat in others if sat != name)
+        return {name: values[name] for name in names if name in values}
+
+    def _check_dimensions(self, intehead):
+        dimensions = tuple(intehead[[INTEHEAD_NX, INTEHEAD_NY, INTEHEAD_NZ]])
+        if dimensions != tuple(self.grid.dimensions):
+            raise ValueError(
+                f"The UNRST dimensions {dimensions} are not as for the grid, "
+                f"{self.grid.dimensions}"
+            )
+
+    def _gridprop(self, name, date, values):
+        """A GridProperty of the values for all (or the active) cells."""
+
+        if self._actind is None:
+            self._actind = self.grid.get_actnum_indices(order="F")
+
+        ncells = int(np.prod(self.grid.dimensions))
+        if np.isscalar(values):
+            values = np.full(len(self._actind), values)
+        if len(values) != ncells:
+            allvalues = np.zeros(ncells)
+            allvalues[self._actind] = values
+            values = allvalues
+
+        values = values.astype(np.float64).reshape(self.grid.dimensions, order="F")
+        return xtgeo.GridProperty(
+            self.grid,
+            name=f"{name}_{date}",
+            date=date,
+            values=np.ma.masked_where(self.grid.get_actnum().values < 1, values),
+        )
+
+
+def timelapse_writer(config):
+    """The map cube writer for a time-lapse run; the folder is made if needed."""
+
+    Path(config["output"]["mapcube"]).parent.mkdir(parents=True, exist_ok=True)
+    return mapcube_writer(config)
+
+
+def animate(config):
+    """Make an animated plot (GIF) per zone and attribute from the map cube.
+
+    The frames are the maps per date in date order, with a common value range,
+    and they are written to the plotfolder as e.g. 'z1--pressure.gif'.
+    """
+
+    import matplotlib as mpl
+
+    mpl.use("Agg")
+    import matplotlib.pyplot as plt
+    from matplotlib.animation import FuncAnimation, PillowWriter
+
+    plotfolder = config["output"]["plotfolder"]
+    if not plotfolder or not config["output"].get("mapcube"):
+        logger.error("The plotfolder or the mapcube is missing; no animated plots")
+        return []
+
+    cube = MapCube(config["output"]["mapcube"])
+    series = {}
+    for zone, attribute, date in cube.keys():  # noqa: SIM118, not a dict
+        if len(date) == 8:
+            series.setdefault((zone, attribute), []).append(date)
+
+    files = []
+    for (zone, attribute), dates in series.items():
+        dates = sorted(dates)
+        if len(dates) < 2:
+            continue
+
+        first = cube.get_surface(zone, attribute, dates[0])
+        xval, yval = first.get_xy_values(asmasked=False)
+        frames = [
+            np.ma.filled(cube.get_surface(zone, attribute, date).values, np.nan)
+            for date in dates
+        ]
+        finite = np.concatenate([frame[np.isfinite(frame)] for frame in frames])
+        vmin, vmax = (finite.min(), finite.max()) if finite.size else (0.0, 1.0)
+
+        fig, axes = plt.subplots(figsize=(8, 6))
+        mesh = axes.pcolormesh(
+            xval,
+            yval,
+            frames[0],
+            vmin=vmin,
+            vmax=vmax,
+            cmap="rainbow",
+            shading="nearest",
+        )
+        fig.colorbar(mesh, ax=axes)
+        axes.set_aspect("equal")
+        title = axes.set_title("")
+
+        def _frame(index, mesh=mesh, title=title, frames=frames, dates=dates):
+            mesh.set_array(frames[index].ravel())
+            title.set_text(f"{attribute}, zone {zone}, {dates[index]}")
+            return mesh, title
+
+        filename = str(Path(plotfolder) / f"{zone}--{attribute}.gif".lower())
+        anim = FuncAnimation(fig, _frame, frames=len(frames), blit=False)
+        anim.save(filename, writer=PillowWriter(fps=2))
+        plt.close(fig)
+
+        logger.info("Animated plot to %s", filename)
+        files.append(filename)
+
+    return files
@@ -0,0 +1,177 @@
+"""Private module for mapping the zones in a pool of processes.
+
+The zones (and for the HC thickness, the dates of each zone) are mapped
+independently of each other. With ``computesettings: tuning: processes: N``,
+the 3D input numpies (coordinates, properties or HCPFZ, weights and zonation)
+are copied once to one shared memory block, and the zones, or (zone, date)
+pairs, are mapped in a pool of N processes. The workers map read only views
+of the shared numpies, so the large arrays are not pickled, and only the
+finished 2D maps are sent back. The maps are exported (and plotted) in the
+main process, in the same order as without processes.
+"""
+
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import suppress
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from . import _profiling
+
+logger = logging.getLogger(__name__)
+
+
+def processes(config):
+    """The number of processes for the zones, from tuning: processes (or 1)."""
+    return max(1, int(config["computesettings"]["tuning"]["processes"] or 1))
+
+
+class _Shared:
+    """A placeholder for a shared numpy, by its index in the layout."""
+
+    __slots__ = ("index",)
+
+    def __init__(self, index):
+        self.index = index
+
+
+class SharedArrays:
+    """Numpies, in (nested) dicts and tuples, copied to one shared memory block.
+
+    The structure is kept with placeholders for the numpies, and rebuilt with
+    views of the block in the workers (see attach()). A numpy that is used more
+    than once (e.g. dz as a weight) is copied once.
+
+    Args:
+        arrays: A dict, e.g. {"propd": {name: 3D numpy}, "zonation": 3D numpy}
+    """
+
+    def __init__(self, arrays):
+        numpies = {}
+        self.structure = _replaced(arrays, numpies)
+
+        self.layout = []
+        offset = 0
+        for array in numpies.values():
+            self.layout.append((offset, array.shape, array.dtype.str))
+            offset += _aligned(array.nbytes)
+
+        self._shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        self.name = self._shm.name
+        for array, (start, shape, dtype) in zip(numpies.values(), self.layout):
+            view = np.ndarray(shape, dtype=dtype, buffer=self._shm.buf, offset=start)
+            view[...] = array
+            del view  # the shared memory cannot be closed with views alive
+
+        logger.info(
+            "Shared %s numpies, %.1f MB, for the mapping processes",
+            len(self.layout),
+            offset / (1024 * 1024),
+        )
+
+    def close(self):
+        self._shm.close()
+        self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+
+def _aligned(nbytes):
+    """Round up to a multiple of 64 bytes, so each numpy is aligned."""
+    return -(-nbytes // 64) * 64
+
+
+def _replaced(item, numpies):
+    """The item with placeholders for the numpies, which are added to numpies."""
+
+    if isinstance(item, np.ndarray):
+        numpies.setdefault(id(item), item)
+        return _Shared(list(numpies).index(id(item)))
+    if isinstance(item, dict):
+        return {key: _replaced(value, numpies) for key, value in item.items()}
+    if isinstance(item, tuple):
+        return tuple(_replaced(value, numpies) for value in item)
+    return item
+
+
+def _rebuilt(item, views):
+    if isinstance(item, _Shared):
+        return views[item.index]
+    if isinstance(item, dict):
+        return {key: _rebuilt(value, views) for key, value in item.items()}
+    if isinstance(item, tuple):
+        return tuple(_rebuilt(value, views) for value in item)
+    return item
+
+
+def attach(shm, structure, layout):
+    """The structure of SharedArrays, with read only views of the block."""
+
+    views = []
+    for offset, shape, dtype in layout:
+        view = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+        view.flags.writeable = False
+        views.append(view)
+    return _rebuilt(structure, views)
+
+
+def map_in_pool(func, arrays, tasks, nprocesses, spanname="mapping"):
+    """Yield func(shared, *task) for each task, in order, from a process pool.
+
+    The func must be a module level function, which gets the arrays as views
+    of the shared memory block, and returns small results (e.g. 2D maps).
+
+    Args:
+        func: The function to run for each task
+        arrays: The numpies to share, see SharedArrays
+        tasks: A list of tuples, the other arguments of func
+        nprocesses (int): The number of processes
+        spanname (str): The name of the task spans in a trace (see _profiling)
+    """
+
+    nprocesses = max(1, min(nprocesses, len(tasks)))
+    logger.info("Mapping %s tasks using %s processes", len(tasks), nprocesses)
+
+    context = multiprocessing.get_context("spawn")
+    with (
+        SharedArrays(arrays) as shared,
+        ProcessPoolExecutor(max_workers=nprocesses, mp_context=context) as executor,
+    ):
+        futures = [
+            executor.submit(
+                _run_task, shared.name, shared.structure, shared.layout, func, task
+            )
+            for task in tasks
+        ]
+
+        # collect in submit order, so the results and errors are deterministic
+        for task, future in zip(tasks, futures):
+            result, start, end, pid = future.result()
+            _profiling.add_span(spanname, start, end, pid=pid, task=task[0])
+            yield result
+
+
+def _run_task(shmname, structure, layout, func, task):
+    """Worker function; map from views of the shared memory block.
+
+    Returns:
+        The result, the start and end time (ns) and the process id
+    """
+
+    start = time.perf_counter_ns()
+    shm = shared_memory.SharedMemory(name=shmname)
+    try:
+        result = func(attach(shm, structure, layout), *task)
+    finally:
+        # views may still be referenced after an error; then closed on exit
+        with suppress(BufferError):
+            shm.close()
+    return result, start, time.perf_counter_ns(), os.getpid()
@@ -7,13 +7,22 @@ are equally supported.
 
 import logging
 import sys
+from contextlib import nullcontext
+
+from grid3d_maps.mapcube import mapcube_writer
 
 from . import (
+    _columns,
     _compute_avg,
     _configparser,
+    _culling,
     _get_grid_props,
     _get_zonation_filters,
+    _gridcache,
     _mapsettings,
+    _profiling,
+    _slabs,
+    _timelapse,
 )
 
 try:
@@ -50,6 +59,9 @@ def yamlconfig(inputfile, args):
 
     config = _configparser.yconfig_set_defaults(config, APPNAME)
 
+    # dates as 'all' or ranges of report steps
+    config = _timelapse.expand_config(config, APPNAME)
+
     # in case of YAML input (e.g. zonation from file)
     config = _configparser.yconfig_addons(config, APPNAME)
 
@@ -83,15 +95,16 @@ def get_grid_props_data(config):
     return gfile, initlist, restartlist, dates
 
 
-def import_pdata(config, gfile, initlist, restartlist, dates):
+def import_pdata(config, gfile, initlist, restartlist, dates, grd=None):
     """Import the data, and represent datas as numpies"""
 
     grd, initobjects, restobjects, dates = _get_grid_props.import_data(
-        APPNAME, gfile, initlist, restartlist, dates
-    )
-    specd, averaged = _get_grid_props.get_numpies_avgprops(
-        config, grd, initobjects, restobjects
+        APPNAME, gfile, initlist, restartlist, dates, grd=grd
     )
+    with _profiling.stage("numpies"):
+        specd, averaged = _get_grid_props.get_numpies_avgprops(
+            config, grd, initobjects, restobjects
+        )
 
     # returns also dates since dates list may be updated after import
     return grd, specd, averaged, dates
@@ -125,10 +138,28 @@ def get_zranges(config, grd):
 
 
 def compute_avg_and_plot(
-    config, grd, specd, propd, dates, zonation, zoned, filterarray
+    config, grd, specd, propd, dates, zonation, zoned, filterarray, mapcube=None
 ):
     """A dict of avg (numpy) maps, with zone name as keys."""
 
+    if config["computesettings"]["tuning"]["auto"]:
+        with _profiling.stage("autotune"):
+            nmaps = sum(
+                len(_compute_avg.property_statistics(config, pname)) for pname in propd
+            )
+            npasses = len(propd)
+            if config["computesettings"]["tuning"]["footprint"]:
+                npasses = len(_compute_avg.weight_names(config, propd))
+            config = _mapsettings.autotune(
+                config,
+                grd,
+                (specd["ixc"], specd["iyc"], specd["iactnum"]),
+                zonation,
+                zoned,
+                nmaps,
+                npasses,
+            )
+
     if config["mapsettings"] is None:
         config = _mapsettings.estimate_mapsettings(config, grd)
     else:
@@ -140,12 +171,82 @@ def compute_avg_and_plot(
     # This is done a bit different here than in the HC thickness. Here the
     # mapping and plotting is done within _compute_avg.py
 
+    with _profiling.stage("culling"):
+        specd = dict(
+            specd,
+            culled=_culling.culled_columns(
+                config,
+                grd,
+                (specd["ixc"], specd["iyc"], specd["iactnum"]),
+                corners=specd.get("icorners"),
+            ),
+        )
+
     avgd = _compute_avg.get_avg(
-        config, specd, propd, dates, zonation, zoned, filterarray
+        config, specd, propd, dates, zonation, zoned, filterarray, mapcube=mapcube
     )
 
     if config["output"]["plotfolder"] is not None:
-        _compute_avg.do_avg_plotting(config, avgd)
+        with _profiling.stage("plot"):
+            _compute_avg.do_avg_plotting(config, avgd)
+
+
+def plot_only(config):
+    """Plot maps made earlier with the same config, without any 3D import."""
+
+    if config["output"]["plotfolder"] is None:
+        logger.error("The plotfolder is missing; nothing to plot")
+        sys.exit(1)
+
+    config["_filterinfo"] = _get_grid_props.filterinfo(config)
+    znames = _get_zonation_filters.zone_names(config)
+
+    avgd = _compute_avg.find_avg_maps(config, znames)
+    _compute_avg.do_avg_plotting(config, avgd)
+
+
+def from_columns(config, filename):
+    """Make (and plot) the average maps from a column table, without 3D data.
+
+    The column table is made by an earlier run with output: columns (see
+    _columns); the maps are made for the mapsettings in the config.
+    """
+
+    table = _columns.ColumnTable(filename)
+    table.check(APPNAME)
+
+    geometrics = table.index["geometrics"]
+    if config["mapsettings"] is None:
+        config = _mapsettings.estimate_mapsettings(config, None, geometrics=geometrics)
+    else:
+        logger.info("Check map settings vs grid...")
+        status = _mapsettings.check_mapsettings(config, None, geometrics=geometrics)
+        if status >= 10:
+            logger.critical("STOP! Mapsettings defined is outside the 3D grid!")
+
+    config["_filterinfo"] = _get_grid_props.filterinfo(config)
+
+    writer = mapcube_writer(config)
+    with writer or nullcontext() as mapcube:
+        avgd = _compute_avg.get_avg_from_columns(config, table, mapcube=mapcube)
+
+    if config["output"]["plotfolder"] is not None:
+        with _profiling.stage("plot"):
+            _compute_avg.do_avg_plotting(config, avgd)
+
+
+def write_columns(config, columns, grd, propd):
+    """Write the column table (output: columns), for mapping with --from-columns."""
+
+    with _profiling.stage("columns"):
+        columns.write(
+            config["output"]["columns"],
+            appname=APPNAME,
+            geometrics=_mapsettings.grid_geometrics(grd),
+            weights={
+                pname: _compute_avg.property_weight(config, pname) for pname in propd
+            },
+        )
 
 
 def main(args=None):
@@ -161,21 +262,190 @@ def main(args=None):
 
     logger.debug("--config option is applied, reading YAML ...")
 
-    # get the configurations
-    logger.info("Parse YAML file")
-    config = yamlconfig(args.config, args)
+    with (
+        _profiling.trace(args.trace, APPNAME),
+        _profiling.profile_report(args.profile_report, APPNAME),
+    ):
+        # get the configurations
+        logger.info("Parse YAML file")
+        with _profiling.stage("config parse"):
+            config = yamlconfig(args.config, args)
+
+        run(config, args)
+
+
+def run(config, args):
+    """Make the maps (or plots) for a parsed config, as set by it and the args.
+
+    This picks plot only, maps from a column table, time lapse (one report
+    step at a time), k-slabs or one import of all data, and then the
+    animation if asked for.
+    """
+
+    if args.plot_only:
+        logger.info("Plot only, from existing maps...")
+        with _profiling.stage("plot"):
+            plot_only(config)
+        return
+
+    if args.from_columns:
+        logger.info("Map from the column table %s...", args.from_columns)
+        from_columns(config, args.from_columns)
+        return
 
     # get the files
     logger.info("Collect files...")
-    gfile, initlist, restartlist, dates = get_grid_props_data(config)
+    with _profiling.stage("file discovery"):
+        gfile, initlist, restartlist, dates = get_grid_props_data(config)
+
+    if config.get("_timelapse"):
+        logger.info("Import and map one report step at a time...")
+        if config["computesettings"]["tuning"]["slabs"]:
+            logger.warning("The tuning: slabs is not used for time lapse")
+        if config["output"].get("columns"):
+            logger.warning("The column table is not made for time lapse")
+            config["output"]["columns"] = None
+        stream_maps(config, gfile, initlist, restartlist)
+    elif config["computesettings"]["tuning"]["slabs"]:
+        logger.info("Import and map one k-slab at a time...")
+        slab_maps(config, gfile, initlist, restartlist, dates)
+    else:
+        # import data from files and return relevant numpies
+        logger.info("Import files...")
+
+        grd, specd, propd, dates = import_pdata(
+            config, gfile, initlist, restartlist, dates
+        )
+
+        compute_maps(config, grd, specd, propd, dates)
+
+    if config["output"].get("animation"):
+        with _profiling.stage("animation"):
+            _timelapse.animate(config)
 
-    # import data from files and return relevant numpies
-    logger.info("Import files...")
 
-    grd, specd, propd, dates = import_pdata(config, gfile, initlist, restartlist, dates)
+def stream_maps(config, gfile, initlist, restartlist):
+    """Make the maps for many dates, importing a batch of report steps at a time.
+
+    The properties that are not from the UNRST are imported and mapped first,
+    then the UNRST properties a batch of dates at a time, with the UNRST file
+    read forward once for all batches (see _timelapse). The grid geometry,
+    zonation and filters are made once, and all maps go to one map cube.
+    """
+
+    unrstdates = [
+        pname.partition("--")[2]
+        for pname, source in config["input"].items()
+        if "--" in pname and "UNRST" in str(source)
+    ]
+    nsteps = config["computesettings"]["tuning"]["steps"]
+
+    with (
+        _gridcache.active(),
+        _timelapse.timelapse_writer(config) as mapcube,
+    ):
+        if initlist:
+            grd, specd, propd, dates = import_pdata(config, gfile, initlist, {}, [])
+            compute_maps(config, grd, specd, propd, dates, mapcube=mapcube)
+
+        with _profiling.stage("grid import"):
+            grd = _gridcache.grid_from_file(gfile)
+
+        with _timelapse.RestartReader(grd, restartlist) as reader:
+            for batchdates, stepdates, keep in _timelapse.batches(
+                dict.fromkeys(unrstdates), nsteps
+            ):
+                with _profiling.stage("property import"):
+                    restobjects = reader.read(stepdates, keep)
+                with _profiling.stage("numpies"):
+                    specd, propd = _get_grid_props.get_numpies_avgprops(
+                        config, grd, None, restobjects
+                    )
+                propd = {
+                    pname: values
+                    for pname, values in propd.items()
+                    if pname.partition("--")[2] in batchdates
+                }
+                if not propd:
+                    logger.warning("No properties found for %s", batchdates)
+                    continue
+                compute_maps(config, grd, specd, propd, stepdates, mapcube=mapcube)
+
+
+def slab_maps(config, gfile, initlist, restartlist, dates):
+    """Make (and plot) the average maps of a large grid, one k-slab at a time.
+
+    The grid and each property are imported once, and the numpies, filters,
+    weights and zonation are made for the layers of one k-slab at a time, with
+    the maps summed over the slabs (see _slabs).
+    """
+
+    _slabs.warn_unused_tuning(config)
+
+    with _profiling.stage("grid import"):
+        grd = _gridcache.grid_from_file(gfile)
+
+    if config["mapsettings"] is None:
+        config = _mapsettings.estimate_mapsettings(config, grd)
+    else:
+        logger.info("Check map settings vs grid...")
+        status = _mapsettings.check_mapsettings(config, grd)
+        if status >= 10:
+            logger.critical("STOP! Mapsettings defined is outside the 3D grid!")
+
+    slabmaps = columns = None
+    for slabgrid in _slabs.GridSlabs(grd, config["computesettings"]["tuning"]["slabs"]):
+        with _profiling.stage("slab", layers=_slabs.layer_range(slabgrid)):
+            _, specd, propd, _ = import_pdata(
+                config, gfile, initlist, restartlist, dates, grd=slabgrid
+            )
+            with _profiling.stage("filters"):
+                filterarray = import_filters(config, slabgrid)
+            with _profiling.stage("weights"):
+                specd["weights"] = _get_grid_props.import_weights(
+                    config, slabgrid, specd, _compute_avg.weight_names(config, propd)
+                )
+            with _profiling.stage("zonation"):
+                zonation, zoned = get_zranges(config, slabgrid)
+            with _profiling.stage("culling"):
+                specd["culled"] = _culling.culled_columns(
+                    config,
+                    slabgrid,
+                    (specd["ixc"], specd["iyc"], specd["iactnum"]),
+                    corners=specd.get("icorners"),
+                )
+
+            if slabmaps is None:
+                slabmaps = _compute_avg.SlabMaps(config, zoned)
+            if columns is None and config["output"].get("columns"):
+                columns = _columns.ColumnSums(config, zoned)
+            slabmaps.add(specd, propd, zonation, filterarray)
+            if columns is not None:
+                _compute_avg.add_column_sums(
+                    columns, config, specd, propd, zonation, filterarray
+                )
+
+    if columns is not None:
+        write_columns(config, columns, grd, propd)
+
+    writer = mapcube_writer(config)
+    with writer or nullcontext() as mapcube:
+        avgd = _compute_avg.get_avg_from_slabs(config, slabmaps, mapcube=mapcube)
+
+    if config["output"]["plotfolder"] is not None:
+        with _profiling.stage("plot"):
+            _compute_avg.do_avg_plotting(config, avgd)
+
+
+def compute_maps(config, grd, specd, propd, dates, mapcube=None):
+    """Make (and plot) the average maps from imported data.
+
+    If a mapcube (MapCubeWriter) is given, the maps are added to that.
+    """
 
     # get the filter array
-    filterarray = import_filters(config, grd)
+    with _profiling.stage("filters"):
+        filterarray = import_filters(config, grd)
     logger.info("Filter mean value: %s", filterarray.mean())
     if filterarray.mean() < 1.0:
         logger.info("Property filters are active")
@@ -183,12 +453,31 @@ def main(args=None):
     for prop, val in propd.items():
         logger.info("Key is %s, avg value is %s", prop, val.mean())
 
+    # the weights (dz by default), each computed once for all properties
+    with _profiling.stage("weights"):
+        specd["weights"] = _get_grid_props.import_weights(
+            config, grd, specd, _compute_avg.weight_names(config, propd)
+        )
+
     # Get the zonations
     logger.info("Get zonation info")
-    zonation, zoned = get_zranges(config, grd)
+    with _profiling.stage("zonation"):
+        zonation, zoned = get_zranges(config, grd)
+
+    if config["output"].get("columns"):
+        with _profiling.stage("columns"):
+            columns = _columns.ColumnSums(config, zoned)
+            _compute_avg.add_column_sums(
+                columns, config, specd, propd, zonation, filterarray
+            )
+        write_columns(config, columns, grd, propd)
 
     logger.info("Compute average properties")
-    compute_avg_and_plot(config, grd, specd, propd, dates, zonation, zoned, filterarray)
+    writer = nullcontext(mapcube) if mapcube else mapcube_writer(config)
+    with writer or nullcontext() as mapcube:
+        compute_avg_and_plot(
+            config, grd, specd, propd, dates, zonation, zoned, filterarray, mapcube
+        )
 
 
 if __name__ == "__main__":
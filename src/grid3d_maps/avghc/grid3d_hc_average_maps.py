@@ -0,0 +1,195 @@
+"""Script to make both HC thickness and average maps directly from 3D grids.
+
+This is as running grid3d_hc_thickness and grid3d_average_map after each
+other, each with its own config, but the grid is imported once, and the INIT
+and RESTART properties needed by both are imported in one go. The grid
+geometry, and the zonation and filters if the configs agree on them, are also
+made once (see _gridcache).
+
+With --plot-only, time-lapse dates (e.g. dates: all) or
+tuning: slabs in either config, the two scripts are run after each other as
+by themselves, with no shared import.
+"""
+
+import argparse
+import logging
+
+from . import (
+    _configparser,
+    _get_grid_props,
+    _gridcache,
+    _profiling,
+    _timelapse,
+    grid3d_average_map,
+    grid3d_hc_thickness,
+)
+
+try:
+    from grid3d_maps.version import __version__
+except ImportError:
+    __version__ = "0.0.0"
+
+APPNAME = "grid3d_hc_average_maps"
+
+# Module variables for ERT hook implementation:
+DESCRIPTION = (
+    "Make HC thickness and average property maps directly from 3D grids, "
+    "with one import of the grid and the properties. Docs:\n"
+    + "https://fmu-docs.equinor.com/docs/grid3d-maps/"
+)
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+def do_parse_args(args):
+    return _configparser.parse_args(args, APPNAME, DESCRIPTION)
+
+
+def yamlconfigs(args):
+    """Read both YAML files, with command line overrides as in each script."""
+
+    hcconfig = grid3d_hc_thickness.yamlconfig(
+        args.hcconfig, _scriptargs(args, args.hcconfig)
+    )
+    avgconfig = grid3d_average_map.yamlconfig(
+        args.avgconfig, _scriptargs(args, args.avgconfig)
+    )
+    return hcconfig, avgconfig
+
+
+def _scriptargs(args, config):
+    """The args of one script, from the args of this script."""
+
+    return argparse.Namespace(
+        **vars(args),
+        config=config,
+        dumpfile=None,
+        dates=None,
+        mode=None,
+        from_columns=None,
+    )
+
+
+def _separate(config):
+    """If the config needs the script's own driver (time lapse or k-slabs)."""
+
+    return config.get("_timelapse") or config["computesettings"]["tuning"]["slabs"]
+
+
+def import_pdata(hcconfig, avgconfig, hcfiles, avgfiles):
+    """Import the data for both scripts, shared when possible.
+
+    Args:
+        hcconfig, avgconfig (dict): The configs
+        hcfiles, avgfiles (tuple): (gfile, initlist, restartlist, dates) for
+            each script, as from get_grid_props_data()
+
+    Returns:
+        (grd, initd, restartd, dates) for HC thickness and
+        (grd, specd, propd, dates) for the average maps
+    """
+
+    initlist = _merged(hcfiles[1], avgfiles[1])
+    restartlist = _merged(hcfiles[2], avgfiles[2])
+
+    if hcfiles[0] != avgfiles[0] or initlist is None or restartlist is None:
+        logger.warning(
+            "The configs use different grids, or the same property name from "
+            "different files; properties are imported for each config"
+        )
+        return (
+            grid3d_hc_thickness.import_pdata(hcconfig, *hcfiles),
+            grid3d_average_map.import_pdata(avgconfig, *avgfiles),
+        )
+
+    dates = sorted(set(hcfiles[3]) | set(avgfiles[3]))
+    grd, initobjects, restobjects, _ = _get_grid_props.import_data(
+        APPNAME, hcfiles[0], initlist, restartlist, dates
+    )
+
+    with _profiling.stage("numpies"):
+        avginit, avgrest, avgdates = _selected(initobjects, restobjects, avgfiles)
+        specd, propd = _get_grid_props.get_numpies_avgprops(
+            avgconfig, grd, avginit, avgrest
+        )
+
+        hcinit, hcrest, hcdates = _selected(initobjects, restobjects, hcfiles)
+        initd, restartd = _get_grid_props.get_numpies_hc_thickness(
+            hcconfig, grd, hcinit, hcrest, hcdates
+        )
+
+    return (grd, initd, restartd, hcdates), (grd, specd, propd, avgdates)
+
+
+def _merged(first, second):
+    """Merge two {name: file} dicts; None if a name is given different files."""
+
+    merged = dict(first)
+    for name, filename in second.items():
+        if merged.setdefault(name, filename) != filename:
+            return None
+    return merged
+
+
+def _selected(initobjects, restobjects, files):
+    """Select the imported properties (and dates) that one script asked for."""
+
+    _, initlist, restartlist, dates = files
+
+    init = [prop for prop in initobjects or [] if prop.name in initlist]
+    rest = [
+        prop
+        for prop in restobjects or []
+        if prop.name.rpartition("_")[0] in restartlist and str(prop.date) in dates
+    ]
+    return init, rest, sorted({str(prop.date) for prop in rest})
+
+
+def main(args=None):
+    logger.info(f"Starting {APPNAME} (version {__version__})")
+    logger.info("Parse command line")
+    args = do_parse_args(args)
+
+    with (
+        _profiling.trace(args.trace, APPNAME),
+        _profiling.profile_report(args.profile_report, APPNAME),
+        _gridcache.active(),
+    ):
+        logger.info("Parse YAML files")
+        with _profiling.stage("config parse"):
+            hcconfig, avgconfig = yamlconfigs(args)
+
+        if args.plot_only or _separate(hcconfig) or _separate(avgconfig):
+            logger.warning(
+                "Plot only, time lapse or tuning: slabs is used; the scripts are "
+                "run after each other, with no shared import"
+            )
+            logger.info("Make HC thickness maps...")
+            grid3d_hc_thickness.run(hcconfig, _scriptargs(args, args.hcconfig))
+            logger.info("Make average maps...")
+            grid3d_average_map.run(avgconfig, _scriptargs(args, args.avgconfig))
+            return
+
+        logger.info("Collect files...")
+        with _profiling.stage("file discovery"):
+            hcfiles = grid3d_hc_thickness.get_grid_props_data(hcconfig)
+            avgfiles = grid3d_average_map.get_grid_props_data(avgconfig)
+
+        logger.info("Import files...")
+        hcdata, avgdata = import_pdata(hcconfig, avgconfig, hcfiles, avgfiles)
+
+        logger.info("Make HC thickness maps...")
+        grid3d_hc_thickness.compute_maps(hcconfig, *hcdata)
+
+        logger.info("Make average maps...")
+        grid3d_average_map.compute_maps(avgconfig, *avgdata)
+
+        for config in (hcconfig, avgconfig):
+            if config["output"].get("animation"):
+                with _profiling.stage("animation"):
+                    _timelapse.animate(config)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,14 +7,24 @@ simulation files (or eventually other similators).
 
 import logging
 import sys
+from contextlib import nullcontext
+
+from grid3d_maps.mapcube import mapcube_writer
 
 from . import (
+    _columns,
     _compute_hcpfz,
     _configparser,
+    _culling,
     _get_grid_props,
     _get_zonation_filters,
+    _gridcache,
     _hc_plotmap,
     _mapsettings,
+    _plotting,
+    _profiling,
+    _slabs,
+    _timelapse,
 )
 
 try:
@@ -50,6 +60,9 @@ def yamlconfig(inputfile, args):
 
     config = _configparser.yconfig_set_defaults(config, APPNAME)
 
+    # dates as 'all' or ranges of report steps
+    config = _timelapse.expand_config(config, APPNAME)
+
     # in case of YAML input (e.g. zonation from file)
     config = _configparser.yconfig_addons(config, APPNAME)
     config = _configparser.yconfig_metadata_hc(config)
@@ -87,17 +100,18 @@ def get_grid_props_data(config):
     return gfile, initlist, restartlist, dates
 
 
-def import_pdata(config, gfile, initlist, restartlist, dates):
+def import_pdata(config, gfile, initlist, restartlist, dates, grd=None):
     """Import the data, and represent datas as numpies"""
 
     grd, initobjects, restobjects, dates = _get_grid_props.import_data(
-        APPNAME, gfile, initlist, restartlist, dates
+        APPNAME, gfile, initlist, restartlist, dates, grd=grd
     )
 
     # get the numpies
-    initd, restartd = _get_grid_props.get_numpies_hc_thickness(
-        config, grd, initobjects, restobjects, dates
-    )
+    with _profiling.stage("numpies"):
+        initd, restartd = _get_grid_props.get_numpies_hc_thickness(
+            config, grd, initobjects, restobjects, dates
+        )
 
     # returns also dates since dates list may be updated after import
 
@@ -135,12 +149,35 @@ def compute_hcpfz(config, initd, restartd, dates, hcmode, filterarray):
     return _compute_hcpfz.get_hcpfz(config, initd, restartd, dates, hcmode, filterarray)
 
 
-def plotmap(config, grd, initd, hcpfzd, zonation, zoned, hcmode, filtermean=None):
+def plotmap(
+    config,
+    grd,
+    initd,
+    hcpfzd,
+    zonation,
+    zoned,
+    hcmode,
+    filtermean=None,
+    mapcube=None,
+    plotcontext=None,
+):
     """Do checks, mapping and plotting"""
 
     # check if values looks OK. Status flag:
     # 0: Seems
 
+    if config["computesettings"]["tuning"]["auto"]:
+        with _profiling.stage("autotune", hcmode=hcmode):
+            config = _mapsettings.autotune(
+                config,
+                grd,
+                (initd["xc"], initd["yc"], initd["iactnum"]),
+                zonation,
+                zoned,
+                len(hcpfzd),
+                len(hcpfzd),
+            )
+
     if config["mapsettings"] is None:
         config = _mapsettings.estimate_mapsettings(config, grd)
     else:
@@ -149,10 +186,111 @@ def plotmap(config, grd, initd, hcpfzd, zonation, zoned, hcmode, filtermean=None
         if status >= 10:
             logger.critical("STOP! Mapsettings defined is outside the 3D grid!")
 
-    mapzd = _hc_plotmap.do_hc_mapping(config, initd, hcpfzd, zonation, zoned, hcmode)
+    with _profiling.stage("culling"):
+        initd = dict(
+            initd,
+            culled=_culling.culled_columns(
+                config,
+                grd,
+                (initd["xc"], initd["yc"], initd["iactnum"]),
+                corners=initd.get("corners"),
+            ),
+        )
+
+    mapzd = _hc_plotmap.do_hc_mapping(
+        config, initd, hcpfzd, zonation, zoned, hcmode, mapcube=mapcube
+    )
 
     if config["output"]["plotfolder"] is not None:
-        _hc_plotmap.do_hc_plotting(config, mapzd, hcmode, filtermean=filtermean)
+        with _profiling.stage("plot", hcmode=hcmode):
+            _hc_plotmap.do_hc_plotting(
+                config, mapzd, hcmode, filtermean=filtermean, plotcontext=plotcontext
+            )
+
+
+def plot_only(config):
+    """Plot maps made earlier with the same config, without any 3D import."""
+
+    if config["output"]["plotfolder"] is None:
+        logger.error("The plotfolder is missing; nothing to plot")
+        sys.exit(1)
+
+    # the filter info is from config only; the filters are assumed active
+    config["_filterinfo"] = _get_grid_props.filterinfo(config)
+    filtermean = 0.0 if config["_filterinfo"] else 1.0
+
+    znames = _get_zonation_filters.zone_names(config)
+    plotcontext = _plotting.PlotContext(config)
+
+    for hcmode in _hcmodes(config):
+        mapzd = _hc_plotmap.find_hc_maps(config, znames, hcmode)
+        _hc_plotmap.do_hc_plotting(
+            config, mapzd, hcmode, filtermean=filtermean, plotcontext=plotcontext
+        )
+
+
+def from_columns(config, filename):
+    """Make (and plot) the maps from a column table, without 3D data.
+
+    The column table is made by an earlier run with output: columns (see
+    _columns); the maps are made for the mapsettings in the config.
+    """
+
+    table = _columns.ColumnTable(filename)
+    table.check(APPNAME)
+
+    geometrics = table.index["geometrics"]
+    if config["mapsettings"] is None:
+        config = _mapsettings.estimate_mapsettings(config, None, geometrics=geometrics)
+    else:
+        logger.info("Check map settings vs grid...")
+        status = _mapsettings.check_mapsettings(config, None, geometrics=geometrics)
+        if status >= 10:
+            logger.critical("STOP! Mapsettings defined is outside the 3D grid!")
+
+    config["_filterinfo"] = _get_grid_props.filterinfo(config)
+    plotcontext = _plotting.PlotContext(config)
+
+    writer = mapcube_writer(config)
+    with writer or nullcontext() as mapcube:
+        for hcmode in table.index["hcmodes"]:
+            mapzd = _hc_plotmap.hc_maps_from_columns(
+                config, table, hcmode, mapcube=mapcube
+            )
+            if config["output"]["plotfolder"] is not None:
+                with _profiling.stage("plot", hcmode=hcmode):
+                    _hc_plotmap.do_hc_plotting(
+                        config,
+                        mapzd,
+                        hcmode,
+                        filtermean=table.index["filtermean"],
+                        plotcontext=plotcontext,
+                    )
+
+
+def add_columns(columns, initd, zonation):
+    """Add the cells and the thickness of a grid (or k-slab) to the column sums."""
+    columns.add_cells(zonation, (initd["xc"], initd["yc"], initd["iactnum"]))
+    columns.add_sums(zonation, "weight", {"dz": initd["dz"]})
+
+
+def write_columns(config, columns, grd, filtermean):
+    """Write the column table (output: columns), for mapping with --from-columns."""
+
+    with _profiling.stage("columns"):
+        columns.write(
+            config["output"]["columns"],
+            appname=APPNAME,
+            geometrics=_mapsettings.grid_geometrics(grd),
+            hcmodes=_hcmodes(config),
+            filtermean=filtermean,
+        )
+
+
+def _hcmodes(config):
+    if config["computesettings"]["mode"] == "both":
+        return ["oil", "gas"]
+    return [config["computesettings"]["mode"]]
 
 
 def main(args=None):
@@ -167,22 +305,190 @@ def main(args=None):
 
     logger.debug("--config option is applied, reading YAML ...")
 
-    # get the configurations
-    logger.info("Parse YAML file")
-    config = yamlconfig(args.config, args)
+    with (
+        _profiling.trace(args.trace, APPNAME),
+        _profiling.profile_report(args.profile_report, APPNAME),
+    ):
+        # get the configurations
+        logger.info("Parse YAML file")
+        with _profiling.stage("config parse"):
+            config = yamlconfig(args.config, args)
+
+        run(config, args)
+
+
+def run(config, args):
+    """Make the maps (or plots) for a parsed config, as set by it and the args.
+
+    This picks plot only, maps from a column table, time lapse (one report
+    step at a time), k-slabs or one import of all data, and then the
+    animation if asked for.
+    """
+
+    if args.plot_only:
+        logger.info("Plot only, from existing maps...")
+        with _profiling.stage("plot"):
+            plot_only(config)
+        return
+
+    if args.from_columns:
+        logger.info("Map from the column table %s...", args.from_columns)
+        from_columns(config, args.from_columns)
+        return
 
     # get the files
     logger.info("Collect files...")
-    gfile, initlist, restartlist, dates = get_grid_props_data(config)
+    with _profiling.stage("file discovery"):
+        gfile, initlist, restartlist, dates = get_grid_props_data(config)
+
+    if config.get("_timelapse"):
+        logger.info("Import and map one report step at a time...")
+        if config["computesettings"]["tuning"]["slabs"]:
+            logger.warning("The tuning: slabs is not used for time lapse")
+        if config["output"].get("columns"):
+            logger.warning("The column table is not made for time lapse")
+            config["output"]["columns"] = None
+        stream_maps(config, gfile, initlist, restartlist)
+    elif config["computesettings"]["tuning"]["slabs"]:
+        logger.info("Import and map one k-slab at a time...")
+        slab_maps(config, gfile, initlist, restartlist, dates)
+    else:
+        # import data from files and return relevant numpies
+        logger.info("Import files...")
+        grd, initd, restartd, dates = import_pdata(
+            config, gfile, initlist, restartlist, dates
+        )
 
-    # import data from files and return relevant numpies
-    logger.info("Import files...")
-    grd, initd, restartd, dates = import_pdata(
-        config, gfile, initlist, restartlist, dates
-    )
+        compute_maps(config, grd, initd, restartd, dates)
+
+    if config["output"].get("animation"):
+        with _profiling.stage("animation"):
+            _timelapse.animate(config)
+
+
+def stream_maps(config, gfile, initlist, restartlist):
+    """Make the maps for many dates, importing a batch of report steps at a time.
+
+    The grid and the INIT properties are imported once, the grid geometry,
+    zonation and filters are made once, and the UNRST file is read forward
+    once for all batches (see _timelapse). All maps go to one map cube.
+    """
+
+    nsteps = config["computesettings"]["tuning"]["steps"]
+    with (
+        _gridcache.active(),
+        _timelapse.timelapse_writer(config) as mapcube,
+    ):
+        grd, initobjects, _, _ = _get_grid_props.import_data(
+            APPNAME, gfile, initlist, {}, []
+        )
+
+        with _timelapse.RestartReader(grd, restartlist) as reader:
+            for batchdates, stepdates, keep in _timelapse.batches(
+                config["input"]["dates"], nsteps
+            ):
+                batchconfig = _timelapse.stepconfig(config, batchdates)
+                with _profiling.stage("property import"):
+                    restobjects = reader.read(stepdates, keep)
+                dates = sorted({str(prop.date) for prop in restobjects})
+                with _profiling.stage("numpies"):
+                    initd, restartd = _get_grid_props.get_numpies_hc_thickness(
+                        batchconfig, grd, initobjects, restobjects, dates
+                    )
+                compute_maps(batchconfig, grd, initd, restartd, dates, mapcube=mapcube)
+
+
+def slab_maps(config, gfile, initlist, restartlist, dates):
+    """Make (and plot) the maps of a large grid, one k-slab at a time.
+
+    The grid and each property are imported once, and the numpies, filters,
+    zonation and HCPFZ are made for the layers of one k-slab at a time, with
+    the thickness maps summed over the slabs (see _slabs), for all HC modes.
+    """
+
+    _slabs.warn_unused_tuning(config)
+
+    with _profiling.stage("grid import"):
+        grd = _gridcache.grid_from_file(gfile)
+
+    if config["mapsettings"] is None:
+        config = _mapsettings.estimate_mapsettings(config, grd)
+    else:
+        logger.info("Check map settings vs grid...")
+        status = _mapsettings.check_mapsettings(config, grd)
+        if status >= 10:
+            logger.critical("STOP! Mapsettings defined is outside the 3D grid!")
+
+    hcmodelist = _hcmodes(config)
+    slabthickness = {}
+    columns = None
+    filtersum = ncells = 0
+    for slabgrid in _slabs.GridSlabs(grd, config["computesettings"]["tuning"]["slabs"]):
+        with _profiling.stage("slab", layers=_slabs.layer_range(slabgrid)):
+            _, initd, restartd, slabdates = import_pdata(
+                config, gfile, initlist, restartlist, dates, grd=slabgrid
+            )
+            with _profiling.stage("filters"):
+                filterarray = import_filters(config, slabgrid)
+            filtersum += filterarray.sum()
+            ncells += filterarray.size
+            with _profiling.stage("zonation"):
+                zonation, zoned = get_zranges(config, slabgrid)
+            with _profiling.stage("culling"):
+                culled = _culling.culled_columns(
+                    config,
+                    slabgrid,
+                    (initd["xc"], initd["yc"], initd["iactnum"]),
+                    corners=initd.get("corners"),
+                )
+
+            if columns is None and config["output"].get("columns"):
+                columns = _columns.ColumnSums(config, zoned)
+            if columns is not None:
+                add_columns(columns, initd, zonation)
+
+            for hcmode in hcmodelist:
+                with _profiling.stage("HCPFZ", hcmode=hcmode):
+                    hcpfzd = compute_hcpfz(
+                        config, initd, restartd, slabdates, hcmode, filterarray
+                    )
+                if hcmode not in slabthickness:
+                    slabthickness[hcmode] = _hc_plotmap.SlabThickness(config, zoned)
+                slabthickness[hcmode].add(dict(initd, culled=culled), hcpfzd, zonation)
+                if columns is not None:
+                    columns.add_sums(zonation, hcmode, hcpfzd)
+
+    logger.info("Filter mean value: %s", filtersum / ncells)
+    if columns is not None:
+        write_columns(config, columns, grd, filtersum / ncells)
+    plotcontext = _plotting.PlotContext(config)
+
+    writer = mapcube_writer(config)
+    with writer or nullcontext() as mapcube:
+        for hcmode in hcmodelist:
+            mapzd = _hc_plotmap.hc_maps_from_slabs(
+                config, slabthickness[hcmode], hcmode, mapcube=mapcube
+            )
+            if config["output"]["plotfolder"] is not None:
+                with _profiling.stage("plot", hcmode=hcmode):
+                    _hc_plotmap.do_hc_plotting(
+                        config,
+                        mapzd,
+                        hcmode,
+                        filtermean=filtersum / ncells,
+                        plotcontext=plotcontext,
+                    )
+
+
+def compute_maps(config, grd, initd, restartd, dates, mapcube=None):
+    """Make (and plot) the maps from imported data, for all HC modes.
+
+    If a mapcube (MapCubeWriter) is given, the maps are added to that.
+    """
 
     # get the filter array
-    filterarray = import_filters(config, grd)
+    with _profiling.stage("filters"):
+        filterarray = import_filters(config, grd)
     logger.info("Filter mean value: %s", filterarray.mean())
     if filterarray.mean() < 1.0:
         logger.info("Property filters are active")
@@ -190,28 +496,48 @@ def main(args=None):
     # Get the zonations
     logger.info("Get zonation info")
 
-    zonation, zoned = get_zranges(config, grd)
-
-    if config["computesettings"]["mode"] == "both":
-        hcmodelist = ["oil", "gas"]
-    else:
-        hcmodelist = [config["computesettings"]["mode"]]
-
-    for hcmode in hcmodelist:
-        logger.info("Compute HCPFZ property for {}".format(hcmode))
-        hcpfzd = compute_hcpfz(config, initd, restartd, dates, hcmode, filterarray)
-
-        logger.info("Do mapping...")
-        plotmap(
-            config,
-            grd,
-            initd,
-            hcpfzd,
-            zonation,
-            zoned,
-            hcmode,
-            filtermean=filterarray.mean(),
-        )
+    with _profiling.stage("zonation"):
+        zonation, zoned = get_zranges(config, grd)
+
+    hcmodelist = _hcmodes(config)
+
+    # plot settings and fault polygons are shared by all plots in the run
+    plotcontext = _plotting.PlotContext(config)
+
+    columns = None
+    if config["output"].get("columns"):
+        columns = _columns.ColumnSums(config, zoned)
+        with _profiling.stage("columns"):
+            add_columns(columns, initd, zonation)
+
+    writer = nullcontext(mapcube) if mapcube else mapcube_writer(config)
+    with writer or nullcontext() as mapcube:
+        for hcmode in hcmodelist:
+            logger.info("Compute HCPFZ property for {}".format(hcmode))
+            with _profiling.stage("HCPFZ", hcmode=hcmode):
+                hcpfzd = compute_hcpfz(
+                    config, initd, restartd, dates, hcmode, filterarray
+                )
+            if columns is not None:
+                with _profiling.stage("columns", hcmode=hcmode):
+                    columns.add_sums(zonation, hcmode, hcpfzd)
+
+            logger.info("Do mapping...")
+            plotmap(
+                config,
+                grd,
+                initd,
+                hcpfzd,
+                zonation,
+                zoned,
+                hcmode,
+                filtermean=filterarray.mean(),
+                mapcube=mapcube,
+                plotcontext=plotcontext,
+            )
+
+    if columns is not None:
+        write_columns(config, columns, grd, filterarray.mean())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,84 @@
+"""The grid3d_maps command, with sub commands.
+
+Example::
+
+    grid3d_maps ensemble grid3d_hc_thickness --runpath realization-<IENS>/iter-0 \\
+        --realizations 0-99 --processes 4 --statistics stats --config ../../hc.yml
+
+All arguments that are not known by the sub command are given to the script.
+"""
+
+import argparse
+import logging
+import sys
+
+from grid3d_maps import ensemble
+
+logger = logging.getLogger(__name__)
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(
+        prog="grid3d_maps",
+        description="Make maps directly from 3D grids, for many realizations.",
+        allow_abbrev=False,
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ens = subparsers.add_parser(
+        "ensemble",
+        help="Run a script for many realizations, sharing grid data",
+        allow_abbrev=False,
+    )
+    ens.add_argument("script", choices=list(ensemble.SCRIPTS))
+    ens.add_argument(
+        "--runpath",
+        required=True,
+        help="Runpath pattern, e.g. realization-<IENS>/iter-<ITER>",
+    )
+    ens.add_argument(
+        "--realizations",
+        required=True,
+        help="Realizations, e.g. 0-9,12",
+    )
+    ens.add_argument(
+        "--iteration", type=int, default=0, help="Iteration number for <ITER>"
+    )
+    ens.add_argument(
+        "--processes",
+        type=int,
+        default=1,
+        help="Number of processes; realizations in the same process share grids",
+    )
+
+    ens.add_argument(
+        "--statistics",
+        default=None,
+        help="Folder for ensemble statistic maps (mean, std, p10, p50, p90)",
+    )
+
+    return parser.parse_known_args(args)
+
+
+def main(args=None):
+    if args is None:
+        args = sys.argv[1:]
+
+    args, scriptargs = parse_args(args)
+
+    if args.command == "ensemble":
+        failed = ensemble.run_ensemble(
+            args.script,
+            args.runpath,
+            ensemble.parse_realizations(args.realizations),
+            scriptargs,
+            iteration=args.iteration,
+            processes=args.processes,
+            statistics=args.statistics,
+        )
+        if failed:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
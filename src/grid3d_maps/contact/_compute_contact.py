@@ -1,29 +1,280 @@
+"""Private module for fluid contact maps, estimated directly from 3D grids.
+
+The contact is found per (i, j) column of the grid, below the deepest cell in
+the zone where the saturation is at or above a threshold, given that there is
+an active cell below it (i.e. the contact is seen in the column). The depth is
+interpolated linearly in saturation between the two cell centers that
+straddle the threshold. All columns and all dates are processed at once,
+vectorized along k.
+
+The column contacts are gridded to the map nodes in one pass for all dates,
+together with an indicator of where the contact is defined; map nodes where
+the indicator is below 0.5 are undefined.
+
+For date pairs d1-d2, the contact rise from d2 to d1 is mapped, i.e. the
+depth at d2 minus the depth at d1, positive when the contact moves up.
+"""
+
 import logging
 
 import numpy as np
-import xtgeo
-from xtgeo.surface import RegularSurface
+import numpy.ma as ma
+from scipy.interpolate import griddata
+
+from grid3d_maps.avghc import _mapsettings, _plotting
+from grid3d_maps.avghc._export_via_fmudataio import export_contact_map_dataio
 
 logger = logging.getLogger(__name__)
 
+# contacts to compute per computesettings mode
+CONTACTS = {"oil": ["owc"], "gas": ["goc"], "both": ["owc", "goc"]}
 
-def gridmap_contact(config, specd, propd, dates):
-    """Compute a contact as a gridded map surface"""
 
-    if "templatefile" in config["mapsettings"]:
-        xmap = xtgeo.surface_from_file(config["mapsettings"]["templatefile"])
-        xmap.values = 0.0
-    else:
-        ncol = config["mapsettings"].get("ncol")
-        nrow = config["mapsettings"].get("nrow")
-
-        xmap = RegularSurface(
-            xori=config["mapsettings"].get("xori"),
-            yori=config["mapsettings"].get("yori"),
-            ncol=ncol,
-            nrow=nrow,
-            xinc=config["mapsettings"].get("xinc"),
-            yinc=config["mapsettings"].get("yinc"),
-            values=np.zeros((ncol, nrow)),
+def contact_saturation(restartd, date, contact):
+    """The saturation that defines a contact; all HC for OWC, gas for GOC."""
+    if contact == "goc":
+        return restartd["sgas_" + date]
+    return restartd["soil_" + date] + restartd["sgas_" + date]
+
+
+def column_contacts(initd, sat, inzone, threshold):
+    """Find the interpolated contact depth per column.
+
+    Args:
+        initd (dict): Numpies from get_numpies_contact()
+        sat (ndarray): 3D saturation, or 4D with dates along the first axis
+        inzone (ndarray): 3D boolean, True for cells in the zone
+        threshold (float): The saturation defining the contact
+
+    Returns:
+        A 2D (or 3D, per date) numpy with contact depth per column, NaN if no
+        contact is seen in the column
+    """
+
+    active = inzone & (initd["iactnum"] == 1) & (initd["dz"] > 0.0)
+    zc = np.broadcast_to(initd["zc"], sat.shape)
+
+    # the deepest HC cell (above) and the next active cell below it
+    zabove = np.where(active & (sat >= threshold), zc, -np.inf)
+    kabove = zabove.argmax(axis=-1)[..., np.newaxis]
+    zabove = np.take_along_axis(zabove, kabove, axis=-1)
+
+    zbelow = np.where(active & (zc > zabove), zc, np.inf)
+    kbelow = zbelow.argmin(axis=-1)[..., np.newaxis]
+    zbelow = np.take_along_axis(zbelow, kbelow, axis=-1)[..., 0]
+    zabove = zabove[..., 0]
+
+    sabove = np.take_along_axis(sat, kabove, axis=-1)[..., 0]
+    sbelow = np.take_along_axis(sat, kbelow, axis=-1)[..., 0]
+
+    seen = np.isfinite(zabove) & np.isfinite(zbelow)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        frac = (sabove - threshold) / (sabove - sbelow)
+        depth = zabove + frac * (zbelow - zabove)
+
+    return np.where(seen, depth, np.nan)
+
+
+def column_xy(initd, inzone):
+    """The x, y per column as mean of cell centers; NaN if no active cells."""
+
+    active = inzone & (initd["iactnum"] == 1)
+    ncells = active.sum(axis=2)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        xcol = np.where(active, initd["xc"], 0.0).sum(axis=2) / ncells
+        ycol = np.where(active, initd["yc"], 0.0).sum(axis=2) / ncells
+    return xcol, ycol
+
+
+def grid_columns(geometry, xcol, ycol, depths):
+    """Grid column values to maps, undefined where the value is not defined.
+
+    Args:
+        geometry (MapGeometry): The map geometry
+        xcol, ycol (ndarray): 2D column coordinates, NaN for inactive columns
+        depths (ndarray): 3D, a stack of 2D column values (one per map)
+
+    Returns:
+        A list of maps, one per column values in the stack
+    """
+
+    incol = np.isfinite(xcol)
+    defined = np.isfinite(depths[:, incol])
+
+    # all maps share the triangulation; values and indicators are interpolated
+    values = np.concatenate((np.where(defined, depths[:, incol], 0.0), defined)).T
+    xnode, ynode = geometry.nodes()
+
+    gridded = None
+    if incol.sum() >= 3:
+        gridded = griddata(
+            (xcol[incol], ycol[incol]), values, (xnode, ynode), method="linear"
         )
-    logger.info(propd)
+
+    nmaps = len(depths)
+    maps = []
+    for inum in range(nmaps):
+        if gridded is None or defined[inum].sum() < 3:
+            xmap = geometry.surface(ma.masked_all((geometry.ncol, geometry.nrow)))
+        else:
+            indicator = gridded[..., nmaps + inum]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                zvalues = gridded[..., inum] / indicator
+            xmap = geometry.surface(
+                ma.masked_where(~(indicator >= 0.5), np.nan_to_num(zvalues, nan=0.0))
+            )
+        maps.append(xmap)
+
+    return maps
+
+
+def contact_dates(config, dates):
+    """Get the requested single dates and date pairs that can be computed.
+
+    Args:
+        config (dict): The config dict
+        dates (list): The dates found in the restart file(s)
+
+    Returns:
+        A list of single dates to compute contacts for (sorted), and a list of
+        requested dates, i.e. single dates and date pairs on form d1-d2
+    """
+
+    found = {str(date) for date in dates}
+    requested = []
+    for date in config["input"]["dates"]:
+        date = str(date)
+        missing = [dte for dte in date.split("-") if dte not in found]
+        if missing:
+            logger.warning("Skip %s since %s is not found in restart", date, missing)
+            continue
+        requested.append(date)
+
+    singles = sorted({dte for date in requested for dte in date.split("-")})
+    return singles, requested
+
+
+def gridmap_contact(config, initd, restartd, dates, zonation, zoned, mapcube=None):
+    """Compute contacts as gridded map surfaces, per zone, contact and date.
+
+    Contacts for all dates are computed in one batch per zone and contact. For
+    date pairs d1-d2, the contact rise is mapped as e.g. "owcrise".
+
+    If a mapcube (MapCubeWriter) is given, maps are added to that instead of
+    being exported as individual files.
+
+    Returns:
+        A dictionary {(zname, contact, date): map_object}
+    """
+
+    geometry = _mapsettings.map_geometry(config)
+    threshold = config["computesettings"]["contact_threshold"]
+    contacts = CONTACTS[config["computesettings"]["mode"]]
+    singles, requested = contact_dates(config, dates)
+
+    mapd = {}
+    if not requested:
+        logger.warning("No dates to compute contacts for")
+        return mapd
+
+    for zname, zrange in zoned.items():
+        if zname == "all":
+            if config["computesettings"]["all"] is not True:
+                logger.debug("Skip <%s> (cf. computesettings: all)", zname)
+                continue
+            inzone = np.ones(zonation.shape, dtype=bool)
+        else:
+            if config["computesettings"]["zone"] is not True:
+                logger.debug("Skip <%s> (cf. computesettings: zone)", zname)
+                continue
+            inzone = np.isin(zonation, zrange)
+
+        xcol, ycol = column_xy(initd, inzone)
+
+        for contact in contacts:
+            logger.info("Mapping %s for <%s>, %s dates", contact, zname, len(singles))
+            sats = np.stack(
+                [contact_saturation(restartd, date, contact) for date in singles]
+            )
+            depths = dict(zip(singles, column_contacts(initd, sats, inzone, threshold)))
+
+            keys = []
+            values = []
+            for date in requested:
+                if "-" in date:
+                    date1, date2 = date.split("-")
+                    keys.append((zname, contact + "rise", date))
+                    values.append(depths[date2] - depths[date1])
+                else:
+                    keys.append((zname, contact, date))
+                    values.append(depths[date])
+
+            maps = grid_columns(geometry, xcol, ycol, np.stack(values))
+            for key, xmap in zip(keys, maps):
+                _export_map(config, xmap, *key, mapcube)
+                mapd[key] = xmap
+
+    return mapd
+
+
+def do_contact_plotting(config, mapd, plotcontext=None):
+    """Do plotting via matplotlib to PNG (etc) (if requested)"""
+
+    logger.info("Plotting ...")
+
+    if plotcontext is None:
+        plotcontext = _plotting.PlotContext(config)
+
+    jobs = []
+    for (zname, contact, date), xmap in mapd.items():
+        plotfile = _contact_filesettings(config, zname, contact, date, mode="plot")
+
+        pcfg = plotcontext.plotsettings(_plotting.zone_plotsettings, zname)
+        title = contact.upper().replace("RISE", " rise")
+        if len(date) <= 10:
+            title += " depth"
+        pcfg["title"] = title + " for " + zname + " " + date
+        pcfg["subtitle"] = None
+
+        usevrange = pcfg["valuerange"]
+        if len(date) > 10:
+            usevrange = pcfg["diffvaluerange"]
+
+        jobs.append(_plotting.plot_job(plotfile, xmap, pcfg, usevrange))
+
+    _plotting.plot_maps(plotcontext, jobs)
+
+
+def _export_map(config, xmap, zname, contact, date, mapcube):
+    if mapcube is not None:
+        mapcube.add(zname, contact, date, xmap)
+    elif config["output"]["mapfolder"] != "fmu-dataio":
+        filename = _contact_filesettings(config, zname, contact, date)
+        logger.info(f"Map file to {filename}")
+        xmap.to_file(filename)
+    else:
+        export_contact_map_dataio(xmap, zname, date, contact, config)
+
+
+def _contact_filesettings(config, zname, contact, date, mode="map"):
+    """Local function for map or plot file name"""
+
+    delim = "--"
+
+    if config["output"]["lowercase"]:
+        zname = zname.lower()
+
+    tag = ""
+    if config["output"]["tag"]:
+        tag = config["output"]["tag"] + "_"
+
+    prefix = zname
+    if prefix == "all" and config["output"]["prefix"]:
+        prefix = config["output"]["prefix"]
+
+    xfil = prefix + delim + tag + contact + delim + date.replace("-", "_")
+
+    if mode == "plot":
+        return config["output"]["plotfolder"] + "/" + xfil + ".png"
+
+    return config["output"]["mapfolder"] + "/" + xfil + ".gri"
@@ -28,21 +28,24 @@ def files_to_import(config, appname):
     if "grid" in config["input"]:
         gfile = config["input"]["grid"]
 
-    else:
-        initlist["PORO"] = eclroot + ".INIT"
-        initlist["NTG"] = eclroot + ".INIT"
-        initlist["PORV"] = eclroot + ".INIT"
-
-        restartlist["SWAT"] = eclroot + ".UNRST"
-        restartlist["SGAS"] = eclroot + ".UNRST"
-
-        for date in config["input"]["dates"]:
-            logger.debug(f"DATE {date}")
-            if len(date) == 8:
-                dates.append(date)
-            elif len(date) > 12:
-                dates.append(date.split("-")[0])
-                dates.append(date.split("-")[1])
+    if eclroot is None:
+        raise ValueError("'eclroot' information is not provided")
+
+    initlist["PORO"] = eclroot + ".INIT"
+    initlist["NTG"] = eclroot + ".INIT"
+    initlist["PORV"] = eclroot + ".INIT"
+
+    restartlist["SWAT"] = eclroot + ".UNRST"
+    restartlist["SGAS"] = eclroot + ".UNRST"
+
+    for date in config["input"]["dates"]:
+        date = str(date)
+        logger.debug(f"DATE {date}")
+        if len(date) == 8:
+            dates.append(date)
+        elif len(date) > 12:
+            dates.append(date.split("-")[0])
+            dates.append(date.split("-")[1])
 
     dates = sorted(set(dates))  # to get a list with unique dates
 
@@ -153,7 +156,7 @@ def import_data(appname, gfile, initlist, restartlist, dates):
     for restfile, restprops in restdict.items():
         try:
             logger.info("Reading--")
-            tmp = xtgeo.gridproperty_from_file(
+            tmp = xtgeo.gridproperties_from_file(
                 restfile, names=restprops, fformat="unrst", grid=grd, dates=dates
             )
 
@@ -177,7 +180,7 @@ def import_data(appname, gfile, initlist, restartlist, dates):
 
     newdateslist = []
     for rest in restobjects:
-        newdateslist.append(rest.date)
+        newdateslist.append(str(rest.date))  # assure date datatype is str
 
     newdateslist = list(set(newdateslist))
     logger.info("Actual dates to use: {}".format(newdateslist))
@@ -206,21 +209,20 @@ def get_numpies_contact(config, grd, initobjects, restobjects, dates):
     # mask is False  to get values for all cells, also inactive
 
     logger.info("Getting xc, yc, zc...")
-    xc, yc, zc = grd.get_xyz(mask=False)
+    xc, yc, zc = grd.get_xyz(asmasked=False)
     xc = ma.filled(xc.values)
     yc = ma.filled(yc.values)
     zc = ma.filled(zc.values)
 
     logger.info("Getting dz...")
-    dz = ma.filled(grd.get_dz(mask=False).values)
+    dz = ma.filled(grd.get_dz(asmasked=False).values)
     logger.info("Getting dz as ma.filled...")
     dz[actnum == 0] = 0.0
     logger.info("dz = 0 of actnum is 0 ...")
 
     logger.info("Getting dx dy...")
-    dx, dy = grd.get_dxdy()
-    dx = ma.filled(dx.values)
-    dy = ma.filled(dy.values)
+    dx = ma.filled(grd.get_dx().values)
+    dy = ma.filled(grd.get_dy().values)
     logger.info("ma.filled for dx dy done")
 
     initd = {
@@ -2,9 +2,16 @@
 
 import logging
 import sys
+from contextlib import nullcontext
 
-from grid3d_maps.avghc import _configparser, _get_zonation_filters
+from grid3d_maps.avghc import (
+    _configparser,
+    _get_zonation_filters,
+    _mapsettings,
+    _plotting,
+)
 from grid3d_maps.contact import _compute_contact, _get_grid_props
+from grid3d_maps.mapcube import mapcube_writer
 
 try:
     from grid3d_maps.version import __version__
@@ -12,7 +19,7 @@ except ImportError:
     __version__ = "0.0.0"
 
 
-APPNAME = "grid3d_get_contact"
+APPNAME = "grid3d_contact_map"
 
 APPDESCR = (
     "Estimate contact maps directly from 3D grids. Docs:\n"
@@ -30,6 +37,8 @@ def do_parse_args(args):
 def yamlconfig(inputfile, args):
     """Read from YAML file and modify/override"""
     config = _configparser.yconfig(inputfile)
+    config = _configparser.dateformatting(config)
+    config = _configparser.prepare_metadata(config)
 
     # override with command line args
     config = _configparser.yconfig_override(config, args, APPNAME)
@@ -38,11 +47,10 @@ def yamlconfig(inputfile, args):
 
     # in case of YAML input (e.g. zonation from file)
     config = _configparser.yconfig_addons(config, APPNAME)
+    config = _configparser.yconfig_metadata_contact(config)
 
-    logger.info("Updated config:")
-    for name, val in config.items():
-        logger.info("{}".format(name))
-        logger.info("{}".format(val))
+    if args.dumpfile:
+        _configparser.yconfigdump(config, args.dumpfile)
 
     return config
 
@@ -111,9 +119,27 @@ def get_zranges(config, grd):
     return zonation, zoned
 
 
-def compute_contact(config, initd, restartd, dates):
-    """The contact here is .... ready for gridding??"""
-    return _compute_contact.gridmap_contact(config, initd, restartd, dates)
+def compute_contact(config, grd, initd, restartd, dates, zonation, zoned, mapcube=None):
+    """Grid contact maps per zone and date, and plot them if requested."""
+
+    if config["mapsettings"] is None:
+        config = _mapsettings.estimate_mapsettings(config, grd)
+    else:
+        logger.info("Check map settings vs grid...")
+        status = _mapsettings.check_mapsettings(config, grd)
+        if status >= 10:
+            logger.critical("STOP! Mapsettings defined is outside the 3D grid!")
+
+    mapd = _compute_contact.gridmap_contact(
+        config, initd, restartd, dates, zonation, zoned, mapcube=mapcube
+    )
+
+    if config["output"]["plotfolder"] is not None:
+        _compute_contact.do_contact_plotting(
+            config, mapd, plotcontext=_plotting.PlotContext(config)
+        )
+
+    return mapd
 
 
 def main(args=None):
@@ -143,10 +169,11 @@ def main(args=None):
     )
 
     # Get the zonations
-    # zonation, zoned = get_zranges(config, grd)
+    zonation, zoned = get_zranges(config, grd)
 
     logger.info("Grid contact map...")
-    compute_contact(config, initd, restartd, dates)
+    with mapcube_writer(config) or nullcontext() as mapcube:
+        compute_contact(config, grd, initd, restartd, dates, zonation, zoned, mapcube)
 
 
 if __name__ == "__main__":
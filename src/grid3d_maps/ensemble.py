@@ -0,0 +1,180 @@
+"""Map many realizations of an ensemble in one run, with shared grid data.
+
+The ERT forward models start one process per realization, and each process
+imports the grid, makes the zonation, the filters and the map settings again.
+Here, the scripts are run for a range of realizations in one process, or in a
+pool of processes, where each process keeps a cache (see avghc._gridcache).
+Realizations with identical grid files then share the grid, the grid
+geometry, the zonation, the filter array and the map settings.
+
+Each realization is run in its runpath, as the forward models are, so relative
+paths in the config and on the command line are relative to the runpath. The
+runpaths are made absolute before the realizations are run, and the working
+directory is changed to the runpath while a realization is run, and changed
+back after. This is safe since a process (the main process, or a worker process
+of the pool) runs one realization at a time.
+
+Optionally, the maps of each realization are fed to streaming statistics (see
+grid3d_maps.mapstats) as each realization is done, and the statistic maps are
+exported at the end. Realizations are added in realization order, also with a
+process pool, so the result is reproducible.
+"""
+
+import importlib
+import logging
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+
+from grid3d_maps.avghc import _gridcache, _mapcollect
+from grid3d_maps.mapstats import MapStatistics
+
+logger = logging.getLogger(__name__)
+
+SCRIPTS = {
+    "grid3d_hc_thickness": "grid3d_maps.avghc.grid3d_hc_thickness",
+    "grid3d_average_map": "grid3d_maps.avghc.grid3d_average_map",
+    "grid3d_hc_average_maps": "grid3d_maps.avghc.grid3d_hc_average_maps",
+}
+
+
+def parse_realizations(spec):
+    """Parse realizations on the form '0-9,12,20-29' to a sorted list."""
+
+    realizations = set()
+    for item in str(spec).split(","):
+        item = item.strip()
+        if not item:
+            continue
+        first, _, last = item.partition("-")
+        if not last:
+            realizations.add(int(first))
+            continue
+        if int(last) < int(first):
+            raise ValueError(f"Invalid realization range: {item}")
+        realizations.update(range(int(first), int(last) + 1))
+
+    if not realizations:
+        raise ValueError(f"No realizations given in: {spec}")
+    return sorted(realizations)
+
+
+def runpath(pattern, iens, iteration=0):
+    """Get the runpath of a realization, from an ERT style runpath pattern."""
+    return pattern.replace("<IENS>", str(iens)).replace("<ITER>", str(iteration))
+
+
+def run_ensemble(
+    script,
+    pattern,
+    realizations,
+    scriptargs,
+    iteration=0,
+    processes=1,
+    statistics=None,
+):
+    """Run a script for each realization, serial or in a process pool.
+
+    Args:
+        script: Name of the script, e.g. "grid3d_hc_thickness"
+        pattern: Runpath pattern with <IENS> (and optionally <ITER>)
+        realizations: List of realization numbers
+        scriptargs: The command line arguments to the script, e.g. the config
+        iteration: The iteration number, for <ITER> in the pattern
+        processes: Number of processes
+        statistics: If given, a folder for ensemble statistic maps
+
+    Returns:
+        A list of realizations that failed
+    """
+
+    if script not in SCRIPTS:
+        raise ValueError(f"Unknown script {script}, use one of {list(SCRIPTS)}")
+
+    collect = statistics is not None
+    tasks = [
+        (
+            iens,
+            script,
+            os.path.abspath(runpath(pattern, iens, iteration)),
+            list(scriptargs),
+            collect,
+        )
+        for iens in realizations
+    ]
+    processes = max(1, min(int(processes), len(tasks)))
+    logger.info(
+        "Run %s for %s realizations using %s processes", script, len(tasks), processes
+    )
+
+    mapstats = MapStatistics()
+    failed = []
+
+    def _done(iens, result):
+        ok, maps = result
+        if not ok:
+            failed.append(iens)
+            return
+        for (zone, attribute, date), values, geometry in maps:
+            mapstats.add_values(zone, attribute, date, values, geometry)
+
+    if processes == 1:
+        with _gridcache.active():
+            for task in tasks:
+                _done(task[0], _run_realization(*task))
+    else:
+        # a bounded number of realizations in flight, done in realization order
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(
+            max_workers=processes, mp_context=context, initializer=_gridcache.activate
+        ) as executor:
+            pending = deque()
+            for task in tasks:
+                pending.append((task[0], executor.submit(_run_realization, *task)))
+                if len(pending) >= 2 * processes:
+                    iens, future = pending.popleft()
+                    _done(iens, future.result())
+            while pending:
+                iens, future = pending.popleft()
+                _done(iens, future.result())
+
+    logger.info("Done %s realizations, %s failed", len(tasks), len(failed))
+    if failed:
+        logger.error("Failed realizations: %s", failed)
+
+    if collect:
+        logger.info("Export statistics for %s maps to %s", len(mapstats), statistics)
+        mapstats.export(statistics)
+
+    return failed
+
+
+def _run_realization(iens, script, path, scriptargs, collect=False):
+    """Run the script in the runpath (absolute), as the working directory.
+
+    Returns:
+        A tuple (ok, maps) where maps are the collected maps if collect is True
+    """
+
+    logger.info("Realization %s in %s", iens, path)
+    module = importlib.import_module(SCRIPTS[script])
+
+    cwd = os.getcwd()
+    with _mapcollect.collecting() if collect else nullcontext([]) as maps:
+        try:
+            os.chdir(path)
+            module.main(scriptargs)
+        except SystemExit as err:
+            # the scripts stop on purpose with SystemExit, after logging why
+            logger.error("Realization %s stopped: %s", iens, err)
+            return False, []
+        except Exception:
+            logger.exception("Realization %s failed", iens)
+            return False, []
+        finally:
+            os.chdir(cwd)
+
+    logger.info("Realization %s done, grid cache: %s", iens, _gridcache.stats())
+    return True, maps
@@ -1,9 +1,11 @@
 from __future__ import annotations
 
 from .grid3d_average_map import Grid3dAverageMap
+from .grid3d_hc_average_maps import Grid3dHcAverageMaps
 from .grid3d_hc_thickness import Grid3dHcThickness
 
 __all__ = [
     "Grid3dAverageMap",
+    "Grid3dHcAverageMaps",
     "Grid3dHcThickness",
 ]
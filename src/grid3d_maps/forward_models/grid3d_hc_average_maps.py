@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+from ert import (
+    ForwardModelStepDocumentation,
+    ForwardModelStepJSON,
+    ForwardModelStepPlugin,
+)
+
+from grid3d_maps.avghc.grid3d_hc_average_maps import DESCRIPTION
+
+
+class Grid3dHcAverageMaps(ForwardModelStepPlugin):
+    def __init__(self) -> None:
+        super().__init__(
+            name="GRID3D_HC_AVERAGE_MAPS",
+            command=[
+                "grid3d_hc_average_maps",
+                "--hcconfig",
+                "<CONFIG_HCMAP>",
+                "--avgconfig",
+                "<CONFIG_AVGMAP>",
+                "--eclroot",
+                "<ECLROOT>",
+            ],
+            default_mapping={
+                "<ECLROOT>": "",
+            },
+        )
+
+    def validate_pre_realization_run(
+        self, fm_step_json: ForwardModelStepJSON
+    ) -> ForwardModelStepJSON:
+        return fm_step_json
+
+    def validate_pre_experiment(self, fm_step_json: ForwardModelStepJSON) -> None:
+        pass
+
+    @staticmethod
+    def documentation() -> ForwardModelStepDocumentation | None:
+        return ForwardModelStepDocumentation(
+            category="modelling.reservoir",
+            source_package="grid3d_maps",
+            source_function_name="Grid3dHcAverageMaps",
+            description=DESCRIPTION,
+            examples="""
+Following is an example for extracting both HC thickness maps and average maps
+from the flow simulation grid, importing the grid and properties once
+.. code-block:: console
+
+  FORWARD_MODEL GRID3D_HC_AVERAGE_MAPS(<CONFIG_HCMAP>=hc.yml, <CONFIG_AVGMAP>=avg.yml, <ECLROOT>=<ECLBASE>)
+
+where ECLBASE is already defined in your ERT config, pointing to the Eclipse/Flow
+basename relative to RUNPATH. This replaces GRID3D_HC_THICKNESS and
+GRID3D_AVERAGE_MAP with the same configs.
+
+.. note:: The <ECLROOT> argument is optional and can be omitted if sufficient
+information is provided in the configs, e.g. when extracting maps from a geological
+grid.
+""",  # noqa: E501
+        )
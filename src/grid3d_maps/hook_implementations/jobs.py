@@ -4,6 +4,7 @@ import ert
 
 from grid3d_maps.forward_models import (
     Grid3dAverageMap,
+    Grid3dHcAverageMaps,
     Grid3dHcThickness,
 )
 
@@ -20,4 +21,5 @@ def installable_forward_model_steps() -> list[ert.ForwardModelStepPlugin]:
     return [
         Grid3dHcThickness,
         Grid3dAverageMap,
+        Grid3dHcAverageMaps,
     ]
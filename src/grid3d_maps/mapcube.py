@@ -0,0 +1,237 @@
+"""Stacked map cube; all maps from one run in one binary file.
+
+The map cube is an alternative to writing one map file per zone, attribute and
+date. All maps in a run share the same geometry, hence the geometry is stored
+once in the file index, and each map is stored as one (optionally compressed)
+layer. The layout is::
+
+    [32 bytes header]   magic, version, offset and length of the index
+    [layer 0]           float64 values, C order (ncol, nrow), NaN is undefined
+    [layer 1]
+    ...
+    [index]             JSON with geometry, compression and layer table
+
+Each layer is compressed as an independent chunk, so a single map can be read
+without touching the rest of the file. When compression is 0, the layers are
+stored raw and are returned as memory mapped arrays (no copy).
+
+Example of reading::
+
+    from grid3d_maps.mapcube import MapCube
+
+    cube = MapCube("maps.g3dcube")
+    for zone, attribute, date in cube.keys():
+        print(zone, attribute, date)
+
+    surf = cube.get_surface("z1", "PRESSURE", "19991201")
+"""
+
+import json
+import logging
+import mmap
+import struct
+import zlib
+
+import numpy as np
+import numpy.ma as ma
+from xtgeo.surface import RegularSurface
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"G3DMCUBE"
+VERSION = 1
+HEADER = struct.Struct("<8sIIQQ")  # magic, version, reserved, index offset, length
+DTYPE = "<f8"
+
+GEOMETRY_KEYS = ("xori", "yori", "xinc", "yinc", "ncol", "nrow", "rotation", "yflip")
+
+
+def _geometry(surf):
+    """Return the geometry of a surface as a dict (json serializable)."""
+    return {
+        "xori": float(surf.xori),
+        "yori": float(surf.yori),
+        "xinc": float(surf.xinc),
+        "yinc": float(surf.yinc),
+        "ncol": int(surf.ncol),
+        "nrow": int(surf.nrow),
+        "rotation": float(surf.rotation),
+        "yflip": int(surf.yflip),
+    }
+
+
+class MapCubeWriter:
+    """Write maps, one by one, as layers in a map cube file.
+
+    Args:
+        filename: Name of output file.
+        compression: The zlib compression level (0-9). If 0, layers are
+            stored uncompressed and can be memory mapped directly when read.
+
+    The writer is a context manager; the index is written on close.
+    """
+
+    def __init__(self, filename, compression=6):
+        self._filename = str(filename)
+        self._compression = int(compression)
+        self._geometry = None
+        self._layers = []
+        self._keys = set()
+        self._stream = open(self._filename, "wb")  # noqa: SIM115
+        self._stream.write(HEADER.pack(MAGIC, VERSION, 0, 0, 0))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def filename(self):
+        return self._filename
+
+    def add(self, zone, attribute, date, surf):
+        """Add a map (RegularSurface) as a new layer in the cube."""
+
+        geom = _geometry(surf)
+        if self._geometry is None:
+            self._geometry = geom
+        elif geom != self._geometry:
+            raise ValueError(
+                f"Map for ({zone}, {attribute}, {date}) has a geometry different "
+                "from the other maps in the map cube"
+            )
+
+        key = (str(zone), str(attribute), str(date or ""))
+        if key in self._keys:
+            raise ValueError(f"Map for {key} is already present in the map cube")
+
+        values = ma.filled(surf.values.astype(DTYPE), fill_value=np.nan)
+        buffer = np.ascontiguousarray(values).tobytes()
+        if self._compression > 0:
+            buffer = zlib.compress(buffer, self._compression)
+
+        offset = self._stream.tell()
+        self._stream.write(buffer)
+        self._layers.append(
+            {
+                "zone": key[0],
+                "attribute": key[1],
+                "date": key[2],
+                "offset": offset,
+                "nbytes": len(buffer),
+            }
+        )
+        self._keys.add(key)
+        logger.info("Map cube layer %s: %s", len(self._layers) - 1, key)
+
+    def close(self):
+        """Write the index and close the file."""
+        if self._stream.closed:
+            return
+
+        index = {
+            "geometry": self._geometry,
+            "dtype": DTYPE,
+            "compression": self._compression,
+            "layers": self._layers,
+        }
+        buffer = json.dumps(index).encode("utf8")
+        offset = self._stream.tell()
+        self._stream.write(buffer)
+        self._stream.seek(0)
+        self._stream.write(HEADER.pack(MAGIC, VERSION, 0, offset, len(buffer)))
+        self._stream.close()
+        logger.info(
+            "Map cube with %s layers written to %s", len(self._layers), self._filename
+        )
+
+
+class MapCube:
+    """Read maps from a map cube file; only the requested layer is read.
+
+    Args:
+        filename: Name of map cube file.
+    """
+
+    def __init__(self, filename):
+        self._filename = str(filename)
+        with open(self._filename, "rb") as stream:
+            magic, version, _, offset, length = HEADER.unpack(stream.read(HEADER.size))
+            if magic != MAGIC:
+                raise ValueError(f"File {self._filename} is not a map cube")
+            if version > VERSION:
+                raise ValueError(f"Unsupported map cube version {version}")
+            stream.seek(offset)
+            self._index = json.loads(stream.read(length).decode("utf8"))
+
+        self._layers = {
+            (lay["zone"], lay["attribute"], lay["date"]): lay
+            for lay in self._index["layers"]
+        }
+
+    @property
+    def geometry(self):
+        """The shared map geometry as a dict."""
+        return dict(self._index["geometry"] or {})
+
+    def keys(self):
+        """List of (zone, attribute, date) for all layers, in stored order."""
+        return list(self._layers.keys())
+
+    def __len__(self):
+        return len(self._layers)
+
+    def __contains__(self, key):
+        return tuple(key) in self._layers
+
+    def get_values(self, zone, attribute, date=""):
+        """Get the values of one layer as a 2D numpy array (NaN is undefined).
+
+        For uncompressed cubes the array is a read-only memory mapped view.
+        """
+        key = (str(zone), str(attribute), str(date or ""))
+        if key not in self._layers:
+            raise KeyError(f"No map for {key} in map cube {self._filename}")
+
+        lay = self._layers[key]
+        geom = self._index["geometry"]
+        shape = (geom["ncol"], geom["nrow"])
+
+        if self._index["compression"] == 0:
+            return np.memmap(
+                self._filename,
+                dtype=self._index["dtype"],
+                mode="r",
+                offset=lay["offset"],
+                shape=shape,
+            )
+
+        with (
+            open(self._filename, "rb") as stream,
+            mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ) as mfile,
+        ):
+            buffer = zlib.decompress(
+                mfile[lay["offset"] : lay["offset"] + lay["nbytes"]]
+            )
+        return np.frombuffer(buffer, dtype=self._index["dtype"]).reshape(shape)
+
+    def get_surface(self, zone, attribute, date=""):
+        """Get one layer as a xtgeo RegularSurface."""
+        values = ma.masked_invalid(np.array(self.get_values(zone, attribute, date)))
+        geom = self._index["geometry"]
+        return RegularSurface(
+            **{key: geom[key] for key in GEOMETRY_KEYS}, values=values
+        )
+
+
+def mapcube_writer(config):
+    """Return a MapCubeWriter if requested in config, otherwise None."""
+
+    filename = config["output"].get("mapcube")
+    if not filename:
+        return None
+
+    compression = config["output"].get("mapcube_compression", 6)
+    logger.info("All maps will be written to map cube %s", filename)
+    return MapCubeWriter(filename, compression=compression)
@@ -0,0 +1,238 @@
+"""Streaming statistics per map node, over the realizations of an ensemble.
+
+Maps are added one realization at a time, and nothing is kept per
+realization, so the memory use is independent of the ensemble size:
+
+* The mean and standard deviation are found with Welford's online algorithm.
+* The percentiles are approximated with the P-square algorithm (Jain and
+  Chlamtac, 1985), which keeps five markers per node and percentile. Until
+  five values are seen in a node, the percentiles are exact.
+
+Undefined map nodes are skipped, so each node has its own count.
+
+Example::
+
+    stats = MapStatistics()
+    for realization in ...:
+        stats.add("z1", "oilthickness", "20010101", surf)
+    stats.export("share/results/maps/stats")
+"""
+
+import logging
+from pathlib import Path
+
+import numpy as np
+import numpy.ma as ma
+from xtgeo.surface import RegularSurface
+
+from grid3d_maps.mapcube import GEOMETRY_KEYS
+
+logger = logging.getLogger(__name__)
+
+PERCENTILES = (10, 50, 90)
+STATISTICS = ("mean", "std") + tuple(f"p{pct}" for pct in PERCENTILES)
+
+
+class P2Quantile:
+    """Approximate one quantile for many nodes at once, with P-square.
+
+    Args:
+        quantile: The quantile, in (0, 1)
+        shape: Shape of the node array
+    """
+
+    def __init__(self, quantile, shape):
+        self.quantile = quantile
+        size = int(np.prod(shape))
+        self._shape = shape
+        self._count = np.zeros(size, dtype=np.int64)
+        self._heights = np.zeros((5, size))
+        self._positions = np.tile(np.arange(1.0, 6.0)[:, np.newaxis], (1, size))
+        self._desired = np.tile(
+            np.array([1, 1 + 2 * quantile, 1 + 4 * quantile, 3 + 2 * quantile, 5.0])[
+                :, np.newaxis
+            ],
+            (1, size),
+        )
+        self._increments = np.array(
+            [0, quantile / 2, quantile, (1 + quantile) / 2, 1.0]
+        )[:, np.newaxis]
+
+    def add(self, values):
+        """Add one value per node; NaN values are skipped."""
+
+        values = np.ravel(values)
+        valid = np.isfinite(values)
+
+        # the first five values per node are kept as is, then sorted
+        starting = valid & (self._count < 5)
+        idx = np.flatnonzero(starting)
+        self._heights[self._count[idx], idx] = values[idx]
+        self._count[idx] += 1
+        ready = idx[self._count[idx] == 5]
+        self._heights[:, ready] = np.sort(self._heights[:, ready], axis=0)
+
+        idx = np.flatnonzero(valid & ~starting)
+        if idx.size:
+            self._update(idx, values[idx])
+            self._count[idx] += 1
+
+    def _update(self, idx, xval):
+        heights = self._heights[:, idx]
+        positions = self._positions[:, idx]
+
+        # the cell k where q[k] <= x < q[k+1], extending the extremes if needed
+        heights[0] = np.minimum(heights[0], xval)
+        heights[4] = np.maximum(heights[4], xval)
+        kcell = np.clip((xval[np.newaxis, :] >= heights[1:4]).sum(axis=0), 0, 3)
+
+        positions += np.arange(5)[:, np.newaxis] > kcell[np.newaxis, :]
+        desired = self._desired[:, idx] + self._increments
+
+        for imark in (1, 2, 3):
+            diff = desired[imark] - positions[imark]
+            up = (diff >= 1) & (positions[imark + 1] - positions[imark] > 1)
+            down = (diff <= -1) & (positions[imark - 1] - positions[imark] < -1)
+            move = up | down
+            if not move.any():
+                continue
+
+            sign = np.where(up, 1.0, -1.0)[move]
+            qim, qi, qip = (heights[imark + step][move] for step in (-1, 0, 1))
+            nim, ni, nip = (positions[imark + step][move] for step in (-1, 0, 1))
+
+            parabolic = qi + sign / (nip - nim) * (
+                (ni - nim + sign) * (qip - qi) / (nip - ni)
+                + (nip - ni - sign) * (qi - qim) / (ni - nim)
+            )
+            qnext = np.where(sign > 0, qip, qim)
+            nnext = np.where(sign > 0, nip, nim)
+            linear = qi + sign * (qnext - qi) / (nnext - ni)
+
+            inside = (qim < parabolic) & (parabolic < qip)
+            heights[imark][move] = np.where(inside, parabolic, linear)
+            positions[imark][move] = ni + sign
+
+        self._heights[:, idx] = heights
+        self._positions[:, idx] = positions
+        self._desired[:, idx] = desired
+
+    def result(self):
+        """The quantile per node; NaN where no values are seen."""
+
+        result = self._heights[2].copy()
+
+        # exact for nodes with less than five values
+        few = np.flatnonzero(self._count < 5)
+        for count in np.unique(self._count[few]):
+            nodes = few[self._count[few] == count]
+            if count == 0:
+                result[nodes] = np.nan
+            else:
+                result[nodes] = np.quantile(
+                    self._heights[:count, nodes], self.quantile, axis=0
+                )
+
+        return result.reshape(self._shape)
+
+
+class NodeStatistics:
+    """Mean, standard deviation and percentiles per node, for one map key."""
+
+    def __init__(self, geometry):
+        self.geometry = geometry
+        shape = (geometry["ncol"], geometry["nrow"])
+        self.count = np.zeros(shape, dtype=np.int64)
+        self._mean = np.zeros(shape)
+        self._m2 = np.zeros(shape)
+        self._quantiles = {pct: P2Quantile(pct / 100.0, shape) for pct in PERCENTILES}
+
+    def add(self, values):
+        """Add a 2D array of values; NaN values are skipped."""
+
+        valid = np.isfinite(values)
+        self.count += valid
+        delta = np.where(valid, values - self._mean, 0.0)
+        self._mean += np.divide(
+            delta, self.count, where=valid, out=np.zeros_like(delta)
+        )
+        self._m2 += delta * np.where(valid, values - self._mean, 0.0)
+
+        for quantile in self._quantiles.values():
+            quantile.add(values)
+
+    def result(self, statistic):
+        """Get a statistic as a 2D array, NaN where undefined."""
+
+        if statistic == "mean":
+            return np.where(self.count > 0, self._mean, np.nan)
+        if statistic == "std":
+            with np.errstate(invalid="ignore", divide="ignore"):
+                return np.where(
+                    self.count > 1, np.sqrt(self._m2 / (self.count - 1)), np.nan
+                )
+        return self._quantiles[int(statistic[1:])].result()
+
+
+class MapStatistics:
+    """Streaming statistics for all maps, per (zone, attribute, date)."""
+
+    def __init__(self):
+        self._stats = {}
+
+    def __len__(self):
+        return len(self._stats)
+
+    def keys(self):
+        return list(self._stats)
+
+    def add(self, zone, attribute, date, surf):
+        """Add a map (RegularSurface) for one realization."""
+        geometry = {key: getattr(surf, key) for key in GEOMETRY_KEYS}
+        values = ma.filled(surf.values.astype(np.float64), fill_value=np.nan)
+        self.add_values(zone, attribute, date, values, geometry)
+
+    def add_values(self, zone, attribute, date, values, geometry):
+        """Add map values (NaN for undefined) with the map geometry."""
+
+        key = (zone, attribute, date)
+        if key not in self._stats:
+            self._stats[key] = NodeStatistics(geometry)
+        elif self._stats[key].geometry != geometry:
+            raise ValueError(f"The map geometry for {key} differs between maps")
+
+        self._stats[key].add(values)
+
+    def get_surface(self, zone, attribute, date, statistic):
+        """Get a statistic map, e.g. statistic="p90", as a RegularSurface."""
+
+        nstat = self._stats[(zone, attribute, date)]
+        return RegularSurface(
+            **nstat.geometry,
+            values=ma.masked_invalid(nstat.result(statistic)),
+        )
+
+    def export(self, folder):
+        """Write all statistic maps to files in a folder.
+
+        The file names are on the form zone--attribute_statistic--date.gri,
+        lowercase.
+
+        Returns:
+            A list of file names
+        """
+
+        Path(folder).mkdir(parents=True, exist_ok=True)
+
+        filenames = []
+        for zone, attribute, date in self._stats:
+            for statistic in STATISTICS:
+                name = zone + "--" + attribute + "_" + statistic
+                if date:
+                    name += "--" + date.replace("-", "_")
+                filename = Path(folder) / (name.lower() + ".gri")
+                logger.info("Statistics map file to %s", filename)
+                self.get_surface(zone, attribute, date, statistic).to_file(filename)
+                filenames.append(filename)
+
+        return filenames
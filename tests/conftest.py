@@ -1,9 +1,13 @@
 """Conftest.py pytest setup."""
 
+import copy
 import shutil
 from pathlib import Path
 
+import numpy as np
 import pytest
+import xtgeo
+import yaml
 
 
 def pytest_configure(config):
@@ -50,3 +54,87 @@ def datatree(
     print("Temporary folder: ", tmp_path)
     monkeypatch.chdir(tmp_path)
     return tmp_path
+
+
+@pytest.fixture()
+def yaml_config():
+    """A function that reads a config in tests/yaml, e.g. "hc_rock1.yml"."""
+
+    def _yaml_config(name):
+        with open(Path("tests/yaml") / name, encoding="utf8") as stream:
+            return yaml.safe_load(stream)
+
+    return _yaml_config
+
+
+@pytest.fixture()
+def read_maps():
+    """A function that reads the maps in a folder, as {file name: values}."""
+
+    def _read_maps(folder):
+        return {
+            path.name: xtgeo.surface_from_file(path).values
+            for path in sorted(Path(folder).glob("*.gri"))
+        }
+
+    return _read_maps
+
+
+@pytest.fixture()
+def run_maps(tmp_path, read_maps):
+    """A function that runs a map script with a config, in a folder of tmp_path.
+
+    The maps (not plots) are written to the folder, and are returned as
+    {file name: values}. Extra args are given to the script.
+    """
+
+    def _run_maps(script, config, name, *args):
+        folder = tmp_path / str(name)
+        folder.mkdir()
+        config = copy.deepcopy(config)
+        config["output"]["mapfolder"] = str(folder)
+        config["output"].pop("plotfolder", None)
+        (folder / "config.yml").write_text(yaml.dump(config))
+        script.main(["--config", str(folder / "config.yml"), *args])
+        return read_maps(folder)
+
+    return _run_maps
+
+
+@pytest.fixture()
+def map_runs(run_maps):
+    """A function that runs a map script once for each of a set of tunings.
+
+    The tunings are given by run name, and the maps are returned as {run name:
+    {file name: values}}.
+    """
+
+    def _map_runs(script, config, tunings, *args):
+        maps = {}
+        for name, tuning in tunings.items():
+            config = copy.deepcopy(config)
+            config["computesettings"]["tuning"] = tuning
+            maps[name] = run_maps(script, config, name, *args)
+        return maps
+
+    return _map_runs
+
+
+@pytest.fixture()
+def assert_same_maps():
+    """A function that asserts that two sets of maps (by name) are the same.
+
+    The masks are the same, and the values are the same bit for bit, or close
+    with exact=False.
+    """
+
+    def _assert_same_maps(maps, expected, exact=True):
+        assert maps.keys() == expected.keys()
+        for name, values in expected.items():
+            np.testing.assert_array_equal(maps[name].mask, values.mask)
+            if exact:
+                np.testing.assert_array_equal(maps[name], values)
+            else:
+                np.testing.assert_allclose(maps[name], values, rtol=1e-9, atol=1e-9)
+
+    return _assert_same_maps
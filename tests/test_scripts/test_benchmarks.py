@@ -0,0 +1,53 @@
+"""Testing the synthetic grid benchmark, on a tiny grid."""
+
+import numpy as np
+import pytest
+
+bench_pipeline = pytest.importorskip("benchmarks.bench_pipeline")
+synthetic = pytest.importorskip("benchmarks.synthetic")
+
+
+def test_synthetic_grid():
+    grd = synthetic.synthetic_grid(12, 10, 6, inactive=0.1)
+    assert grd.dimensions == (12, 10, 6)
+    assert 0.8 * 720 < grd.nactive < 720
+
+    depth = grd.get_xyz()[2].values
+    assert depth.min() > 1600.0
+    # the crest is in the middle of the grid
+    assert depth[6, 5, 0] < depth[0, 0, 0]
+
+    sats = synthetic.synthetic_saturations(grd, synthetic.synthetic_dates(2))
+    assert set(sats) == {
+        "SWAT_20000101",
+        "SGAS_20000101",
+        "SWAT_20010101",
+        "SGAS_20010101",
+    }
+    assert np.all(sats["SWAT_20000101"] + sats["SGAS_20000101"] <= 1.0)
+
+    assert synthetic.zranges(6, 3) == [{"Z1": [1, 2]}, {"Z2": [3, 4]}, {"Z3": [5, 6]}]
+
+
+@pytest.mark.parametrize("case", bench_pipeline.CASES)
+def test_benchmark_case(tmp_path, case):
+    """All pipeline stages are timed, and the maps are made."""
+    benchmark = bench_pipeline.run(
+        ["15x12x6"], cases=[case], workdir=tmp_path, in_process=True, ndates=2
+    )
+
+    (result,) = benchmark["results"]
+    assert result["cells"] == 15 * 12 * 6
+    stages = result["stages"]
+    assert {"total", "grid import", "property import", "mapping", "export"} <= set(
+        stages
+    )
+    assert stages["mapping"]["count"] == 4  # 3 zones and all
+    if case == "hc_thickness":
+        assert stages["export"]["count"] == 4 * 2
+    else:
+        # PORO, NTG and SWAT for two dates
+        assert stages["export"]["count"] == 4 * 4
+
+    lines = bench_pipeline.compare(benchmark, benchmark)
+    assert len(lines) == len(stages) + 1
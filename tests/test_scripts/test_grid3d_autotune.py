@@ -0,0 +1,83 @@
+"""Testing the automatic tuning of the map increment and coarsen (tuning: auto)."""
+
+import numpy as np
+import pytest
+import xtgeo
+import yaml
+
+import grid3d_maps.avghc.grid3d_average_map as grid3d_average_map
+from grid3d_maps.avghc import _mapsettings
+
+
+def _config(auto, mapsettings=None):
+    return {
+        "mapsettings": mapsettings,
+        "computesettings": {
+            "all": True,
+            "zone": False,
+            "tuning": {
+                "auto": auto,
+                "coarsen": 1,
+                "footprint": False,
+                "threads": None,
+                "zone_avg": False,
+            },
+        },
+    }
+
+
+@pytest.fixture(name="reek")
+def fixture_reek():
+    grd = xtgeo.grid_from_file("tests/data/reek/reek_sim_grid.roff")
+    xcells, ycells, _ = (np.ma.filled(prop.values, 0.0) for prop in grd.get_xyz())
+    actnum = np.ma.filled(grd.get_actnum().values, 0)
+    return grd, (xcells, ycells, actnum)
+
+
+def test_autotune_budget(reek):
+    """Half the cell size without a budget; coarser with a tight time budget."""
+
+    grd, cells = reek
+    zonation = np.ones(cells[2].shape, dtype=np.int32)
+    zoned = {"all": [1]}
+
+    sizes = _mapsettings.cell_sizes(*cells)
+    assert sizes["dx"][0] <= sizes["dx"][1] <= sizes["dx"][2]
+    cellsize = 0.5 * (sizes["dx"][1] + sizes["dy"][1])
+    assert 100.0 < cellsize < 200.0
+
+    config = _mapsettings.autotune(_config(True), grd, cells, zonation, zoned, 1, 1)
+    assert config["mapsettings"]["xinc"] == pytest.approx(0.5 * cellsize)
+    assert config["computesettings"]["tuning"]["coarsen"] == 1
+
+    config = _mapsettings.autotune(
+        _config({"time": 0.2, "max_coarsen": 2}), grd, cells, zonation, zoned, 1, 1
+    )
+    assert config["computesettings"]["tuning"]["coarsen"] == 2
+    assert 0.5 * cellsize < config["mapsettings"]["xinc"] <= 2.0 * cellsize
+
+    # given map settings are kept, only coarsen is tuned
+    mapsettings = {"xori": 0.0, "yori": 0.0, "xinc": 25.0, "yinc": 25.0}
+    mapsettings.update(ncol=400, nrow=500)
+    config = _mapsettings.autotune(
+        _config({"time": 0.01}, mapsettings), grd, cells, zonation, zoned, 1, 1
+    )
+    assert config["mapsettings"] == mapsettings
+    assert config["computesettings"]["tuning"]["coarsen"] == 3
+
+
+def test_average_map_autotune(tmp_path):
+    """Average maps with auto tuning, on the map settings of the config (1c)."""
+
+    with open("tests/yaml/avg1c.yml", encoding="utf8") as stream:
+        config = yaml.safe_load(stream)
+    config["computesettings"]["tuning"] = {"auto": {"time": 1.0e-6}}
+    (tmp_path / "avg.yml").write_text(yaml.dump(config))
+
+    grid3d_average_map.main(
+        ["--config", str(tmp_path / "avg.yml"), "--mapfolder", str(tmp_path)]
+    )
+
+    # see test_average_map1c; coarsen 3 keeps the average close
+    poro = xtgeo.surface_from_file(tmp_path / "all--avg1c_average_por.gri")
+    assert poro.values.mean() == pytest.approx(0.1678, abs=0.005)
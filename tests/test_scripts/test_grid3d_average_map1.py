@@ -3,8 +3,10 @@
 import shutil
 from pathlib import Path
 
+import numpy as np
 import pytest
 import xtgeo
+import yaml
 
 import grid3d_maps.avghc.grid3d_average_map as grid3d_hc_thickness
 
@@ -130,3 +132,73 @@ def test_average_map1f(datatree):
     assert mymap.values.mean() == pytest.approx(2.633, abs=0.005)
     mymap = xtgeo.surface_from_file(result / "zero--avg1f_average_dz.gri")
     assert mymap.values.mask.all()
+
+
+def test_average_map1g_statistics(datatree):
+    """Test several statistics per map node, as 1c with statistics for por"""
+    result = datatree / "map1g_folder"
+    result.mkdir(parents=True)
+    grid3d_hc_thickness.main(
+        [
+            "--config",
+            "tests/yaml/avg1g.yml",
+            "--mapfolder",
+            str(result),
+            "--plotfolder",
+            str(result),
+        ]
+    )
+
+    stats = {
+        stat: xtgeo.surface_from_file(result / f"all--avg1g_{stat}_por.gri")
+        for stat in ("average", "min", "max", "std", "sum", "p50")
+    }
+    # the mean is as from avg_from_3dprop(), see test_average_map1c
+    assert stats["average"].values.mean() == pytest.approx(0.1678, abs=0.001)
+    assert (stats["min"].values <= stats["p50"].values).all()
+    assert (stats["p50"].values <= stats["max"].values).all()
+    assert (stats["min"].values <= stats["average"].values + 1e-6).all()
+    assert (stats["average"].values <= stats["max"].values + 1e-6).all()
+    assert stats["std"].values.min() >= 0.0
+    assert stats["sum"].values.mean() > stats["max"].values.mean()
+
+    assert (result / "all--avg1g_max_por.png").is_file()
+    assert (result / "all--avg1g_average_permx.gri").is_file()
+    assert not (result / "all--avg1g_max_permx.gri").is_file()
+
+
+def test_average_map1c_weights(datatree):
+    """Test bulk, PORV and HCPV weights, as 1c with ROFF weight sources"""
+    result = datatree / "map1c_weights"
+    result.mkdir(parents=True)
+
+    grd = xtgeo.grid_from_file("tests/data/reek/reek_sim_grid.roff")
+    poro = xtgeo.gridproperty_from_file("tests/data/reek/reek_sim_poro.roff", grid=grd)
+    bulk = grd.get_bulk_volume()
+    porv = xtgeo.GridProperty(grd, values=bulk.values * poro.values, name="PORV")
+    porv.to_file(result / "porv.roff")
+    _, _, zcell = grd.get_xyz()
+    swat = np.clip((zcell.values - 1650.0) / 50.0, 0.1, 1.0)
+    xtgeo.GridProperty(grd, values=swat, name="SWAT").to_file(result / "swat.roff")
+
+    with open("tests/yaml/avg1c.yml", encoding="utf8") as stream:
+        config = yaml.safe_load(stream)
+    config["computesettings"]["weight"] = {
+        "por": "porv",
+        "permx": "hcpv--19991201",
+    }
+    config["computesettings"]["weightsources"] = {
+        "PORV": str(result / "porv.roff"),
+        "SWAT--19991201": str(result / "swat.roff"),
+    }
+    (result / "avg.yml").write_text(yaml.dump(config))
+
+    grid3d_hc_thickness.main(
+        ["--config", str(result / "avg.yml"), "--mapfolder", str(result)]
+    )
+
+    # PORV weights give more weight to high porosity than DZ weights (1c)
+    z1poro = xtgeo.surface_from_file(result / "all--avg1c_average_por.gri")
+    assert z1poro.values.mean() > 0.1678 + 0.001
+    permx = xtgeo.surface_from_file(result / "all--avg1c_average_permx.gri")
+    assert permx.values.count() > 0
@@ -0,0 +1,143 @@
+"""Testing the column table, and the maps made from it (--from-columns)."""
+
+import numpy as np
+import pytest
+
+import grid3d_maps.avghc.grid3d_average_map as grid3d_average_map
+import grid3d_maps.avghc.grid3d_hc_thickness as grid3d_hc_thickness
+from grid3d_maps.avghc import _columns
+
+
+def test_column_sums(tmp_path):
+    """The column sums per zone, written and read as a column table."""
+
+    zonation = np.array([1, 1, 2, 2], dtype=np.int32) * np.ones((2, 3, 4), np.int32)
+    actnum = np.ones((2, 3, 4), dtype=np.int32)
+    actnum[0, 0, :2] = 0
+    xc = np.arange(24, dtype=np.float64).reshape(2, 3, 4)
+    dz = np.full((2, 3, 4), 2.0)
+
+    config = {"computesettings": {"zone": True, "all": True}}
+    columns = _columns.ColumnSums(config, {"Z1": 1, "Z2": 2, "all": None})
+    columns.add_cells(zonation, (xc, xc, actnum))
+    columns.add_sums(zonation, "weight", {"dz": dz})
+    columns.add_sums(zonation, "sum", {"PORO": dz * 0.25})
+    columns.write(tmp_path / "table.g3dcols", appname="test", weights={"PORO": "dz"})
+
+    table = _columns.ColumnTable(tmp_path / "table.g3dcols")
+    assert table.zones == ["Z1", "Z2", "all"]
+    assert table.names("Z1", "sum") == ["PORO"]
+    np.testing.assert_array_equal(table.values("Z2", "weight", "dz"), 4.0)
+    np.testing.assert_array_equal(table.values("all", "sum", "PORO"), 2.0)
+
+    # the mean of the active cell centers; undefined without active cells
+    xvalues = table.values("Z1", "x")
+    assert xvalues[0, 0] == _columns.UNDEF
+    assert xvalues[0, 1] == xc[0, 1, :2].mean()
+    assert table.values("all", "x")[0, 0] == xc[0, 0, 2:].mean()
+    assert table.layer("Z1", "x").shape == (2, 3, 1)
+
+    with pytest.raises(ValueError, match="read-only"):
+        table.values("Z1", "x")[0, 0] = 0.0
+    with pytest.raises(KeyError):
+        table.values("Z3", "x")
+    with pytest.raises(ValueError, match="made by test"):
+        table.check("grid3d_average_map")
+
+
+def test_column_sums_no_zones(tmp_path):
+    """Without zones to map, the column table has no arrays."""
+
+    zonation = np.ones((2, 3, 4), dtype=np.int32)
+    cells = (np.zeros((2, 3, 4)), np.zeros((2, 3, 4)), np.ones((2, 3, 4)))
+
+    config = {"computesettings": {"zone": False, "all": False}}
+    columns = _columns.ColumnSums(config, {"Z1": 1, "all": None})
+    with pytest.raises(ValueError, match="No cells"):
+        columns.write(tmp_path / "table.g3dcols", appname="test")
+
+    columns.add_cells(zonation, cells)
+    columns.write(tmp_path / "table.g3dcols", appname="test")
+
+    table = _columns.ColumnTable(tmp_path / "table.g3dcols")
+    assert table.zones == []
+    assert table.index["shape"] == [2, 3]
+
+
+def test_average_map_from_columns(tmp_path, yaml_config, run_maps):
+    """The average maps from the column table are as with zone_avg."""
+
+    config = yaml_config("avg1c.yml")
+    table = str(tmp_path / "avg.g3dcols")
+    slabtable = str(tmp_path / "slabs.g3dcols")
+
+    maps = {}
+    for name, tuning, columns in (
+        ("table", {}, table),
+        ("zone_avg", {"zone_avg": True}, None),
+        ("slabs", {"slabs": 4}, slabtable),
+    ):
+        config["computesettings"]["tuning"] = tuning
+        config["output"]["columns"] = columns
+        maps[name] = run_maps(grid3d_average_map, config, name)
+
+    config["computesettings"]["tuning"] = {}
+    config["output"]["columns"] = None
+    for name, tablefile in (("columns", table), ("slabcolumns", slabtable)):
+        maps[name] = run_maps(
+            grid3d_average_map, config, name, "--from-columns", tablefile
+        )
+
+    assert maps["columns"].keys() == maps["zone_avg"].keys()
+    for mapname, values in maps["columns"].items():
+        np.testing.assert_array_equal(values.mask, maps["zone_avg"][mapname].mask)
+        np.testing.assert_allclose(values, maps["slabcolumns"][mapname], rtol=1e-6)
+
+    # all cells of zones 1 and 3 are active, so the column x and y are as
+    # averaged by zone_avg
+    for mapname in ("z1--avg1c_average_por.gri", "z3--avg1c_average_permx.gri"):
+        np.testing.assert_allclose(
+            maps["columns"][mapname], maps["zone_avg"][mapname], rtol=1e-9
+        )
+
+
+def test_hc_thickness_from_columns(tmp_path, yaml_config, run_maps):
+    """The rock thickness from the column table, for two map resolutions."""
+
+    config = yaml_config("hc_rock2.yml")
+    table = str(tmp_path / "hc.g3dcols")
+    maps = {}
+    for name, increment, fromcolumns in (
+        ("zone_avg", 50, False),
+        ("columns", 50, True),
+        ("coarse", 100, True),
+    ):
+        config["mapsettings"] = {
+            "xori": 458300,
+            "yori": 5928800,
+            "xinc": increment,
+            "yinc": increment,
+            "ncol": 6000 // increment,
+            "nrow": 8000 // increment,
+        }
+        if fromcolumns:
+            config["computesettings"]["tuning"] = {}
+            config["output"]["columns"] = None
+            args = ["--from-columns", table]
+        else:
+            config["computesettings"]["tuning"] = {"zone_avg": True}
+            config["output"]["columns"] = table
+            args = []
+        maps[name] = run_maps(grid3d_hc_thickness, config, name, *args)
+
+    assert len(maps["zone_avg"]) == 3
+    assert maps["columns"].keys() == maps["zone_avg"].keys()
+    np.testing.assert_allclose(
+        maps["columns"]["z1--rockthickness.gri"],
+        maps["zone_avg"]["z1--rockthickness.gri"],
+        rtol=1e-9,
+    )
+    for mapname, values in maps["coarse"].items():
+        # the coarse map nodes are every other node of the finer map
+        assert values.shape == (60, 80)
+        np.testing.assert_allclose(values, maps["columns"][mapname][::2, ::2])
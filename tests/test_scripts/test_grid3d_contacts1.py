@@ -1,17 +1,136 @@
-"""Testing contacts, not finished!"""
+"""Testing contacts."""
 
-import pytest
+import numpy as np
+import xtgeo
 
 import grid3d_maps.contact.grid3d_contact_map as grid3d_contacts
+from grid3d_maps.contact import _compute_contact
 
-# =============================================================================
-# Do tests
-# =============================================================================
+OWC = {"19991201": 1713.0, "20021101": 1708.0}
+
+
+def _box_case():
+    """A box grid with 20 layers of 5 m from 1700 m and a flat OWC per date.
+
+    The HC saturation is linear across the contact, with 0.5 at the contact,
+    so the interpolated contact shall be exact.
+    """
+    grd = xtgeo.create_box_grid(
+        (20, 15, 20), origin=(1000.0, 2000.0, 1700.0), increment=(50.0, 50.0, 5.0)
+    )
+    xc, yc, zc = grd.get_xyz(asmasked=False)
+    initd = {
+        "iactnum": grd.get_actnum().values.filled(0),
+        "xc": xc.values.filled(),
+        "yc": yc.values.filled(),
+        "zc": zc.values.filled(),
+        "dz": grd.get_dz(asmasked=False).values.filled(),
+    }
+    restartd = {}
+    for date, owc in OWC.items():
+        shc = np.clip(0.5 + (owc - initd["zc"]) / 10.0, 0.0, 0.8)
+        sgas = np.where(initd["zc"] < 1705.0, 0.7, 0.0)
+        restartd["soil_" + date] = shc - sgas
+        restartd["sgas_" + date] = sgas
+    return initd, restartd
+
+
+def _config(mode="oil"):
+    return {
+        "input": {"dates": ["19991201", "20021101", "20021101-19991201"]},
+        "computesettings": {
+            "mode": mode,
+            "contact_threshold": 0.5,
+            "zone": True,
+            "all": True,
+        },
+        "mapsettings": {
+            "xori": 1100,
+            "yori": 2100,
+            "xinc": 25,
+            "yinc": 25,
+            "ncol": 20,
+            "nrow": 16,
+        },
+        "output": {"mapfolder": "fmu-dataio"},
+    }
+
+
+def test_column_contacts():
+    """The contact is interpolated below the deepest HC cell, if seen."""
+    initd, restartd = _box_case()
+    sat = restartd["soil_19991201"] + restartd["sgas_19991201"]
+    inzone = np.ones(sat.shape, dtype=bool)
+
+    depth = _compute_contact.column_contacts(initd, sat, inzone, 0.5)
+    np.testing.assert_allclose(depth, 1713.0)
+
+    # all dates in one batch
+    sats = np.stack([sat, restartd["soil_20021101"] + restartd["sgas_20021101"]])
+    depths = _compute_contact.column_contacts(initd, sats, inzone, 0.5)
+    assert depths.shape == (2, 20, 15)
+    np.testing.assert_allclose(depths[1], 1708.0)
+
+    # a zone entirely above the contact has HC all through; no contact is seen
+    inzone[:, :, 2:] = False
+    depth = _compute_contact.column_contacts(initd, sat, inzone, 0.5)
+    assert np.isnan(depth).all()
+
+    # no HC at all
+    depth = _compute_contact.column_contacts(initd, sat * 0.0, inzone, 0.5)
+    assert np.isnan(depth).all()
+
+
+def test_gridmap_contact():
+    """Test gridded contact and contact rise maps per zone, to a mapcube."""
+    initd, restartd = _box_case()
+    zonation = np.ones(initd["zc"].shape, dtype=np.int32)
+    zonation[:, :, 10:] = 2
+    zoned = {"Z1": 1, "Z2": 2, "all": None}
+
+    class _Sink(dict):
+        def add(self, zone, attribute, date, surf):
+            self[(zone, attribute, date)] = surf
+
+    sink = _Sink()
+    dates = ["19991201", "20021101"]
+    mapd = _compute_contact.gridmap_contact(
+        _config("both"), initd, restartd, dates, zonation, zoned, sink
+    )
+
+    assert sorted(sink) == sorted(mapd)
+    assert len(mapd) == 3 * 2 * 3
+    for zname in ("Z1", "all"):
+        for key, expected in [
+            ("owc", 1713.0),
+            ("goc", 1702.5 + 5.0 * 0.2 / 0.7),
+            ("owcrise", 5.0),
+            ("gocrise", 0.0),
+        ]:
+            date = "20021101-19991201" if "rise" in key else "19991201"
+            values = mapd[(zname, key, date)].values
+            assert values.count() > 200
+            np.testing.assert_allclose(values.compressed(), expected, atol=1e-6)
+
+    # the contacts are above zone Z2
+    assert mapd[("Z2", "owc", "19991201")].values.mask.all()
+    assert mapd[("Z2", "owcrise", "20021101-19991201")].values.mask.all()
 
 
-@pytest.mark.skip("Take this later")
 def test_contact1a(datatree):
     """Test HC contacts with YAML config example 1a"""
     result = datatree / "contacts1a_folder"
     result.mkdir(parents=True)
-    grid3d_contacts.main(["--config", "tests/yaml/contact1a.yml"])
+    grid3d_contacts.main(
+        [
+            "--config",
+            "tests/yaml/contact1a.yml",
+            "--mapfolder",
+            str(result),
+            "--plotfolder",
+            str(result),
+        ]
+    )
+    assert (result / "all--owc--20021101.gri").is_file()
+    assert (result / "z1+3--owc--19991201.png").is_file()
+    assert (result / "all--owcrise--20021101_19991201.gri").is_file()
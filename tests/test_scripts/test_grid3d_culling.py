@@ -0,0 +1,92 @@
+"""Testing the culling of grid columns away from the map (tuning: cull, aoi)."""
+
+import numpy as np
+import pandas as pd
+import xtgeo
+
+import grid3d_maps.avghc.grid3d_average_map as grid3d_average_map
+from grid3d_maps.avghc import _culling, _gridcache
+from grid3d_maps.avghc._mapsettings import MapGeometry
+
+# a map over a part of the Reek grid
+MAPSETTINGS = {
+    "xori": 459000.0,
+    "yori": 5932000.0,
+    "xinc": 40.0,
+    "yinc": 40.0,
+    "ncol": 60,
+    "nrow": 50,
+}
+
+
+def _aoi(tmp_path):
+    """A square area of interest inside the map."""
+    dataframe = pd.DataFrame(
+        {
+            "X_UTME": [460000.0, 461500.0, 461500.0, 460000.0, 460000.0],
+            "Y_UTMN": [5932500.0, 5932500.0, 5933500.0, 5933500.0, 5932500.0],
+            "Z_TVDSS": 0.0,
+            "POLY_ID": 0,
+        }
+    )
+    aoi = tmp_path / "aoi.pol"
+    xtgeo.Polygons(dataframe).to_file(aoi)
+    return str(aoi)
+
+
+def test_cull_columns(tmp_path):
+    """Columns outside the map, and outside the AOI, are culled once."""
+
+    grd = xtgeo.grid_from_file("tests/data/reek/reek_sim_grid.roff")
+    xcells, ycells, _ = (np.ma.filled(prop.values) for prop in grd.get_xyz())
+    actnum = np.ma.filled(grd.get_actnum().values, 0)
+    cells = (xcells, ycells, actnum)
+    geometry = MapGeometry(**MAPSETTINGS)
+
+    culled = _culling.cull(geometry, cells, coarsen=2)
+    assert culled.columns[0] % 2 == 0
+    assert 0 < culled.keep.sum() < 0.5 * actnum[:, :, 0].size
+
+    inaoi = _culling.cull(geometry, cells, aoi=_aoi(tmp_path), coarsen=2)
+    assert inaoi.keep.sum() < culled.keep.sum()
+
+    xbox = culled.coordinates(xcells)
+    assert xbox.shape[:2] == culled.keep.shape
+    assert (xbox[~culled.keep] >= 1e20).all()
+
+    config = {
+        "mapsettings": MAPSETTINGS,
+        "computesettings": {"aoi": None, "tuning": {"cull": True, "coarsen": 1}},
+    }
+    with _gridcache.active():
+        grd = _gridcache.grid_from_file("tests/data/reek/reek_sim_grid.roff")
+        first = _culling.culled_columns(config, grd, cells)
+        assert _culling.culled_columns(config, grd, cells) is first
+        config.pop("_culled")
+        assert _culling.culled_columns(config, grd, cells) is first
+        assert _gridcache.stats()["hits"] >= 1
+
+
+def test_average_map_culled(tmp_path, yaml_config, map_runs, run_maps):
+    """Culled maps are the same, also inside the AOI."""
+
+    config = yaml_config("avg1c.yml")
+    config["mapsettings"] = MAPSETTINGS
+    maps = map_runs(
+        grid3d_average_map,
+        config,
+        {"whole": {"coarsen": 2}, "culled": {"coarsen": 2, "cull": True}},
+    )
+    whole = maps["whole"]["z1--avg1c_average_por.gri"]
+    culled = maps["culled"]["z1--avg1c_average_por.gri"]
+    np.testing.assert_array_equal(culled.mask, whole.mask)
+    np.testing.assert_allclose(culled, whole, atol=1e-12)
+
+    aoi = _aoi(tmp_path)
+    inaoi = _culling.aoi_nodes(MapGeometry(**MAPSETTINGS), aoi)
+    config["computesettings"]["tuning"] = {"coarsen": 2}
+    config["computesettings"]["aoi"] = aoi
+    culled = run_maps(grid3d_average_map, config, "aoi")["z1--avg1c_average_por.gri"]
+    assert culled.count() < whole.count()
+    assert not culled.mask[inaoi].any()
+    np.testing.assert_allclose(culled[inaoi], whole[inaoi], atol=1e-12)
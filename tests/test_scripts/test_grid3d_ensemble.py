@@ -0,0 +1,171 @@
+"""Testing the ensemble run, with grid data shared between realizations."""
+
+import shutil
+
+import numpy as np
+import pytest
+import xtgeo
+import yaml
+
+from grid3d_maps import cli, ensemble
+from grid3d_maps.avghc import _gridcache
+
+
+@pytest.fixture()
+def make_ensemble(datatree, yaml_config):
+    """A function that makes realizations with identical grids (copies), and a
+    common config with the grid and maps in the realization folder."""
+
+    config = yaml_config("hc_rock1.yml")
+    config["input"]["grid"] = "reek_sim_grid.roff"
+    config["output"] = {"tag": "ens", "mapfolder": "maps"}
+
+    def _make_ensemble(nreal):
+        (datatree / "hc_rock.yml").write_text(yaml.dump(config))
+        for iens in range(nreal):
+            path = datatree / f"realization-{iens}" / "iter-0"
+            (path / "maps").mkdir(parents=True)
+            shutil.copy(datatree / "tests/data/reek/reek_sim_grid.roff", path)
+
+    return _make_ensemble
+
+
+def test_parse_realizations():
+    assert ensemble.parse_realizations("0-3, 7,9-10") == [0, 1, 2, 3, 7, 9, 10]
+    assert ensemble.parse_realizations(5) == [5]
+    with pytest.raises(ValueError):
+        ensemble.parse_realizations("4-2")
+
+
+def test_grid_cache_keeps_last_grids(tmp_path):
+    """The data of the grids used most recently are kept, the others dropped."""
+    gfiles = ["tests/data/reek/reek_sim_grid.roff"]
+    grd = xtgeo.grid_from_file(gfiles[0])
+    for fformat in ("roff", "egrid"):
+        gfiles.append(str(tmp_path / f"grid.{fformat}"))
+        grd.to_file(gfiles[-1], fformat=fformat)
+
+    with _gridcache.active():
+        grids = [_gridcache.grid_from_file(gfile) for gfile in gfiles]
+        assert _gridcache.stats() == {"hits": 0, "misses": 3, "grids": 2}
+
+        # the first grid is dropped, and is not known to the cache anymore
+        calls = []
+        for grd in grids:
+            _gridcache.cached_for_grid("test", grd, None, lambda: calls.append(1))
+            _gridcache.cached_for_grid("test", grd, None, lambda: calls.append(1))
+        assert len(calls) == 4
+        assert _gridcache.grid_from_file(gfiles[2]) is grids[2]
+        assert _gridcache.grid_from_file(gfiles[0]) is not grids[0]
+
+
+def test_ensemble_hc_thickness_shares_grid(datatree, make_ensemble, monkeypatch):
+    """Identical grids are imported once, and all realizations are mapped."""
+    make_ensemble(3)
+
+    calls = []
+    grid_from_file = xtgeo.grid_from_file
+
+    def _counted(*args, **kwargs):
+        calls.append(args[0])
+        return grid_from_file(*args, **kwargs)
+
+    monkeypatch.setattr(xtgeo, "grid_from_file", _counted)
+
+    cli.main(
+        [
+            "ensemble",
+            "grid3d_hc_thickness",
+            "--runpath",
+            "realization-<IENS>/iter-<ITER>",
+            "--realizations",
+            "0-2",
+            "--config",
+            "../../hc_rock.yml",
+        ]
+    )
+
+    assert calls == ["reek_sim_grid.roff"]
+    for iens in range(3):
+        maps = datatree / f"realization-{iens}" / "iter-0" / "maps"
+        assert sorted(mfile.name for mfile in maps.glob("*.gri")) == [
+            "all--ens_rockthickness.gri",
+            "z1--ens_rockthickness.gri",
+            "z2--ens_rockthickness.gri",
+            "z3--ens_rockthickness.gri",
+        ]
+
+    first = xtgeo.surface_from_file(
+        datatree / "realization-0/iter-0/maps/all--ens_rockthickness.gri"
+    )
+    last = xtgeo.surface_from_file(
+        datatree / "realization-2/iter-0/maps/all--ens_rockthickness.gri"
+    )
+    assert first.values.mean() == pytest.approx(last.values.mean())
+
+
+def test_ensemble_failed_realization(datatree, make_ensemble):
+    """A failing realization does not stop the others, but gives exit code 1."""
+    make_ensemble(2)
+    shutil.rmtree(datatree / "realization-1")
+
+    args = ["--config", "../../hc_rock.yml"]
+    failed = ensemble.run_ensemble(
+        "grid3d_hc_thickness", "realization-<IENS>/iter-0", [0, 1], args
+    )
+    assert failed == [1]
+    assert (datatree / "realization-0/iter-0/maps/all--ens_rockthickness.gri").is_file()
+
+    with pytest.raises(SystemExit):
+        cli.main(
+            [
+                "ensemble",
+                "grid3d_hc_thickness",
+                "--runpath",
+                "realization-<IENS>/iter-0",
+                "--realizations",
+                "0-1",
+                *args,
+            ]
+        )
+
+
+def test_ensemble_processes(datatree, make_ensemble):
+    """Realizations mapped in a process pool."""
+    make_ensemble(2)
+    failed = ensemble.run_ensemble(
+        "grid3d_hc_thickness",
+        "realization-<IENS>/iter-0",
+        [0, 1],
+        ["--config", "../../hc_rock.yml"],
+        processes=2,
+    )
+    assert failed == []
+    for iens in range(2):
+        path = datatree / f"realization-{iens}/iter-0/maps/z2--ens_rockthickness.gri"
+        assert path.is_file()
+
+
+def test_ensemble_statistics(datatree, make_ensemble):
+    """Statistic maps over realizations, here with identical grids."""
+    make_ensemble(3)
+
+    failed = ensemble.run_ensemble(
+        "grid3d_hc_thickness",
+        "realization-<IENS>/iter-0",
+        [0, 1, 2],
+        ["--config", "../../hc_rock.yml"],
+        statistics="stats",
+    )
+    assert failed == []
+
+    assert len(list((datatree / "stats").glob("*.gri"))) == 4 * 5
+    single = xtgeo.surface_from_file(
+        datatree / "realization-0/iter-0/maps/z1--ens_rockthickness.gri"
+    )
+    mean = xtgeo.surface_from_file(datatree / "stats/z1--rockthickness_mean.gri")
+    std = xtgeo.surface_from_file(datatree / "stats/z1--rockthickness_std.gri")
+    p90 = xtgeo.surface_from_file(datatree / "stats/z1--rockthickness_p90.gri")
+    np.testing.assert_allclose(mean.values, single.values, atol=1e-5)
+    np.testing.assert_allclose(p90.values, single.values, atol=1e-5)
+    assert std.values.max() == pytest.approx(0.0, abs=1e-5)
@@ -0,0 +1,90 @@
+"""Testing the mapping by exact cell footprints (tuning: footprint)."""
+
+import numpy as np
+import pytest
+import xtgeo
+import yaml
+
+import grid3d_maps.avghc.grid3d_average_map as grid3d_average_map
+from grid3d_maps.avghc import _footprint, _get_grid_props
+from grid3d_maps.avghc._mapsettings import MapGeometry
+
+
+def test_overlap_area():
+    """Overlap areas of cells (unit squares in index space) with the nodes."""
+
+    # a unit square shifted half a node in x and a quarter in y
+    ucorners = np.array([[0.5, 1.5, 0.5, 1.5]] * 4)
+    vcorners = np.array([[0.25, 0.25, 1.25, 1.25]] * 4)
+    inode = np.array([0.0, 1.0, 0.0, 1.0])
+    jnode = np.array([0.0, 0.0, 1.0, 1.0])
+    areas = _footprint.overlap_area(ucorners, vcorners, inode, jnode)
+    assert areas == pytest.approx([0.375, 0.375, 0.125, 0.125])
+
+    # a diamond, reversed orientation, covers half of the node
+    ucorners = np.array([[0.5, 0.0, 1.0, 0.5]])
+    vcorners = np.array([[0.0, 0.5, 0.5, 1.0]])
+    areas = _footprint.overlap_area(ucorners, vcorners, np.zeros(1), np.zeros(1))
+    assert areas == pytest.approx([0.5])
+
+
+def test_thickness_preserves_volume():
+    """The thickness times the node area sums to the volume, on a rotated map."""
+
+    grd = xtgeo.grid_from_file("tests/data/reek/reek_sim_grid.roff")
+    xcorners, ycorners = _get_grid_props._top_corners(grd)
+    dz = np.ma.filled(grd.get_dz().values, fill_value=0.0)
+
+    geometry = MapGeometry(
+        xori=460000.0,
+        yori=5924000.0,
+        xinc=40.0,
+        yinc=50.0,
+        ncol=250,
+        nrow=300,
+        rotation=20.0,
+    )
+    corners = _footprint.map_index_corners(geometry, (xcorners, ycorners))
+    inzone = np.ones(dz.shape, dtype=bool)
+    thickness = _footprint.thickness(
+        geometry, corners, dz, dz, inzone, mask_outside=True
+    )
+
+    # the top face areas (shoelace) times dz
+    xpol = xcorners[..., [0, 1, 3, 2]]
+    ypol = ycorners[..., [0, 1, 3, 2]]
+    areas = 0.5 * np.abs(
+        (xpol * np.roll(ypol, -1, axis=-1) - np.roll(xpol, -1, axis=-1) * ypol).sum(
+            axis=-1
+        )
+    )
+    volume = (areas * dz)[dz > 0.0].sum()
+
+    assert thickness.sum() * 40.0 * 50.0 == pytest.approx(volume, rel=1e-9)
+    assert thickness.mask.any()
+    assert not thickness.mask.all()
+
+
+def test_average_map_footprint(tmp_path):
+    """Average maps with footprint weights are close to the gridded maps (1c)."""
+
+    with open("tests/yaml/avg1c.yml", encoding="utf8") as stream:
+        config = yaml.safe_load(stream)
+    config["computesettings"]["tuning"] = {"footprint": True}
+    (tmp_path / "avg.yml").write_text(yaml.dump(config))
+
+    grid3d_average_map.main(
+        ["--config", str(tmp_path / "avg.yml"), "--mapfolder", str(tmp_path)]
+    )
+
+    # see test_average_map1c for the gridded map
+    poro = xtgeo.surface_from_file(tmp_path / "all--avg1c_average_por.gri")
+    assert poro.values.mean() == pytest.approx(0.1678, abs=0.001)
+    assert poro.rotation == pytest.approx(-22.0)
+
+    config["computesettings"]["statistics"] = ["mean", "max"]
+    (tmp_path / "avg.yml").write_text(yaml.dump(config))
+    with pytest.raises(ValueError, match="Only the mean"):
+        grid3d_average_map.main(
+            ["--config", str(tmp_path / "avg.yml"), "--mapfolder", str(tmp_path)]
+        )
@@ -0,0 +1,103 @@
+"""Testing HC thickness and average maps in one run, with one import."""
+
+import numpy as np
+import xtgeo
+import yaml
+
+import grid3d_maps.avghc.grid3d_average_map as grid3d_average_map
+import grid3d_maps.avghc.grid3d_hc_average_maps as grid3d_hc_average_maps
+import grid3d_maps.avghc.grid3d_hc_thickness as grid3d_hc_thickness
+
+
+def _configs(datatree, yaml_config, mapfolder):
+    (datatree / mapfolder).mkdir()
+    config = yaml_config("hc_rock1.yml")
+    config["zonation"] = {"yamlfile": "tests/yaml/avg1a_zone.yml"}
+    config["mapsettings"] = {"templatefile": "tests/data/reek/reek_hcmap_rotated.gri"}
+    config["output"] = {"tag": "combined", "mapfolder": mapfolder}
+    hccfg = datatree / f"hc_{mapfolder}.yml"
+    hccfg.write_text(yaml.dump(config))
+
+    config = yaml_config("avg1c.yml")
+    config["output"]["mapfolder"] = mapfolder
+    config["output"]["plotfolder"] = None
+    avgcfg = datatree / f"avg_{mapfolder}.yml"
+    avgcfg.write_text(yaml.dump(config))
+    return str(hccfg), str(avgcfg)
+
+
+def test_hc_average_maps_as_separate_runs(datatree, monkeypatch, yaml_config):
+    """The maps are as from the two scripts, with one import of grid and props."""
+
+    hccfg, avgcfg = _configs(datatree, yaml_config, "separate")
+    grid3d_hc_thickness.main(["--config", hccfg])
+    grid3d_average_map.main(["--config", avgcfg])
+
+    calls = []
+    for name in ("grid_from_file", "gridproperty_from_file"):
+        func = getattr(xtgeo, name)
+
+        def _counted(*args, _func=func, **kwargs):
+            calls.append(str(args[0]))
+            return _func(*args, **kwargs)
+
+        monkeypatch.setattr(xtgeo, name, _counted)
+
+    hccfg, avgcfg = _configs(datatree, yaml_config, "combined")
+    grid3d_hc_average_maps.main(["--hcconfig", hccfg, "--avgconfig", avgcfg])
+
+    assert sorted(calls) == [
+        "tests/data/reek/reek_sim_grid.roff",
+        "tests/data/reek/reek_sim_permx.roff",
+        "tests/data/reek/reek_sim_poro.roff",
+    ]
+
+    separate = sorted((datatree / "separate").glob("*.gri"))
+    assert len(separate) == 15
+    assert [mfile.name for mfile in separate] == [
+        mfile.name for mfile in sorted((datatree / "combined").glob("*.gri"))
+    ]
+    for mfile in separate:
+        expected = xtgeo.surface_from_file(mfile)
+        result = xtgeo.surface_from_file(datatree / "combined" / mfile.name)
+        np.testing.assert_allclose(result.values, expected.values)
+        assert (result.values.mask == expected.values.mask).all()
+
+
+def test_hc_average_maps_slabs(datatree, yaml_config):
+    """With tuning: slabs, each script runs its own driver, with the same maps."""
+
+    hccfg, avgcfg = _configs(datatree, yaml_config, "separate")
+    grid3d_hc_average_maps.main(["--hcconfig", hccfg, "--avgconfig", avgcfg])
+
+    hccfg, avgcfg = _configs(datatree, yaml_config, "slabs")
+    config = yaml.safe_load((datatree / "hc_slabs.yml").read_text())
+    config["computesettings"]["tuning"] = {"slabs": 4}
+    (datatree / "hc_slabs.yml").write_text(yaml.dump(config))
+    grid3d_hc_average_maps.main(["--hcconfig", hccfg, "--avgconfig", avgcfg])
+
+    separate = sorted((datatree / "separate").glob("*.gri"))
+    assert [mfile.name for mfile in separate] == [
+        mfile.name for mfile in sorted((datatree / "slabs").glob("*.gri"))
+    ]
+    for mfile in separate:
+        expected = xtgeo.surface_from_file(mfile)
+        result = xtgeo.surface_from_file(datatree / "slabs" / mfile.name)
+        np.testing.assert_allclose(result.values, expected.values, atol=1e-4)
+
+
+def test_hc_average_maps_plot_only(datatree, yaml_config):
+    """The --plot-only option is passed on to both scripts."""
+
+    hccfg, avgcfg = _configs(datatree, yaml_config, "plotonly")
+    grid3d_hc_average_maps.main(["--hcconfig", hccfg, "--avgconfig", avgcfg])
+    assert not (datatree / "plots").exists()
+
+    (datatree / "plots").mkdir()
+    grid3d_hc_average_maps.main(
+        ["--hcconfig", hccfg, "--avgconfig", avgcfg, "--plot-only"]
+        + ["--plotfolder", "plots"]
+    )
+    plots = {pfile.stem for pfile in (datatree / "plots").glob("*.png")}
+    maps = {mfile.stem for mfile in (datatree / "plotonly").glob("*.gri")}
+    assert plots and plots <= maps
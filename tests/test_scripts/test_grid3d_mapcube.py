@@ -0,0 +1,101 @@
+"""Testing output to a stacked map cube."""
+
+import numpy as np
+import pytest
+import xtgeo
+import yaml
+
+import grid3d_maps.avghc.grid3d_average_map as grid3d_average_map
+import grid3d_maps.avghc.grid3d_hc_thickness as grid3d_hc_thickness
+from grid3d_maps.mapcube import MapCube, MapCubeWriter
+
+
+def _avg1c_with_mapcube(datatree, compression):
+    with open("tests/yaml/avg1c.yml", encoding="utf8") as stream:
+        config = yaml.safe_load(stream)
+    config["output"]["mapcube"] = str(datatree / "avg1c.g3dcube")
+    config["output"]["mapcube_compression"] = compression
+    cfg = datatree / "avg1c_mapcube.yml"
+    cfg.write_text(yaml.dump(config))
+    return cfg
+
+
+@pytest.mark.parametrize("compression", [0, 6])
+def test_mapcube_roundtrip(tmp_path, compression):
+    """Write and read a map cube with masked values."""
+    surf = xtgeo.RegularSurface(
+        ncol=5, nrow=4, xinc=25, yinc=25, rotation=30, values=np.arange(20.0)
+    )
+    surf.values[2, 1] = np.ma.masked
+
+    with MapCubeWriter(tmp_path / "my.g3dcube", compression=compression) as cube:
+        cube.add("z1", "PRESSURE", "19991201", surf)
+        cube.add("z1", "PRESSURE", "20010101-19991201", surf * 2)
+        with pytest.raises(ValueError, match="already present"):
+            cube.add("z1", "PRESSURE", "19991201", surf)
+
+    cube = MapCube(tmp_path / "my.g3dcube")
+    assert cube.keys() == [
+        ("z1", "PRESSURE", "19991201"),
+        ("z1", "PRESSURE", "20010101-19991201"),
+    ]
+    res = cube.get_surface("z1", "PRESSURE", "20010101-19991201")
+    assert res.rotation == pytest.approx(30)
+    assert res.values[2, 1] is np.ma.masked
+    assert res.values.sum() == pytest.approx(2 * surf.values.sum())
+    assert isinstance(cube.get_values("z1", "PRESSURE", "19991201"), np.memmap) == (
+        compression == 0
+    )
+
+
+def test_average_map1c_mapcube(datatree):
+    """Test that average maps in a map cube equals the single map files."""
+    result = datatree / "map1c_folder"
+    result.mkdir(parents=True)
+    grid3d_average_map.main(
+        ["--config", "tests/yaml/avg1c.yml", "--mapfolder", str(result)]
+    )
+
+    cubefolder = datatree / "map1c_cube"
+    cubefolder.mkdir(parents=True)
+    cfg = _avg1c_with_mapcube(datatree, 0)
+    grid3d_average_map.main(["--config", str(cfg), "--mapfolder", str(cubefolder)])
+
+    assert not list(cubefolder.glob("*.gri"))
+
+    cube = MapCube(datatree / "avg1c.g3dcube")
+    assert len(cube) == len(list(result.glob("*.gri")))
+    assert ("Z1", "por", "") in cube
+
+    por = cube.get_surface("all", "por")
+    expected = xtgeo.surface_from_file(result / "all--avg1c_average_por.gri")
+    assert por.rotation == pytest.approx(expected.rotation)
+    assert por.ncol == expected.ncol
+    assert por.values.mean() == pytest.approx(expected.values.mean())
+    np.testing.assert_array_equal(por.values.mask, expected.values.mask)
+
+    with pytest.raises(KeyError):
+        cube.get_values("Z1", "poro")
+
+
+def test_hc_thickness_rock_mapcube(datatree, yaml_config):
+    """Test HC thickness (rock mode) to a map cube."""
+    cfg = datatree / "hc_rock_mapcube.yml"
+    config = yaml_config("hc_rock1.yml")
+    config["output"] = {"tag": "cube", "mapfolder": str(datatree)}
+    config["output"]["mapcube"] = "hcrock.g3dcube"
+    cfg.write_text(yaml.dump(config))
+
+    grid3d_hc_thickness.main(["--config", str(cfg)])
+
+    cube = MapCube(datatree / "hcrock.g3dcube")
+    assert cube.keys() == [
+        ("Z1", "rockthickness", ""),
+        ("Z2", "rockthickness", ""),
+        ("Z3", "rockthickness", ""),
+        ("all", "rockthickness", ""),
+    ]
+    assert cube.geometry["ncol"] == 100
+
+    zsum = sum(cube.get_values(zone, "rockthickness") for zone in ("Z1", "Z2", "Z3"))
+    np.testing.assert_allclose(zsum, cube.get_values("all", "rockthickness"), atol=1e-6)
@@ -0,0 +1,92 @@
+"""Testing the map geometry, made once per run from the map settings."""
+
+import pickle
+
+import numpy as np
+import pytest
+import xtgeo
+
+from grid3d_maps.avghc import _culling, _gridcache, _mapsettings
+
+TEMPLATE = "tests/data/reek/reek_hcmap_rotated.gri"
+
+
+def test_map_geometry_rotated_template():
+    """The geometry of a rotated template, as for the xtgeo surface."""
+
+    template = xtgeo.surface_from_file(TEMPLATE)
+    geometry = _mapsettings.MapGeometry.from_mapsettings({"templatefile": TEMPLATE})
+
+    assert geometry.rotation == pytest.approx(-22.0)
+    assert geometry.bounds() == pytest.approx(
+        (template.xmin, template.xmax, template.ymin, template.ymax)
+    )
+
+    xnodes, ynodes = geometry.nodes()
+    xval, yval = template.get_xy_values(asmasked=False)
+    np.testing.assert_allclose(xnodes, xval, atol=1e-6)
+    np.testing.assert_allclose(ynodes, yval, atol=1e-6)
+
+    inode, jnode = geometry.to_index(xnodes, ynodes)
+    np.testing.assert_allclose(inode[:, 0], np.arange(geometry.ncol), atol=1e-9)
+    np.testing.assert_allclose(jnode[0, :], np.arange(geometry.nrow), atol=1e-9)
+
+    surf = geometry.surface()
+    assert surf.values.shape == (geometry.ncol, geometry.nrow)
+    assert surf.rotation == pytest.approx(-22.0)
+
+    with pytest.raises(AttributeError):
+        geometry.xinc = 25.0
+    with pytest.raises(ValueError):
+        xnodes[0, 0] = 0.0
+
+
+def test_map_geometry_template_mask(tmp_path):
+    """The undefined nodes of a template mask the maps, and cull the columns."""
+
+    template = xtgeo.surface_from_file(TEMPLATE)
+    values = np.ma.array(template.values)
+    values[: template.ncol // 2, :] = np.ma.masked
+    template.values = values
+    template.to_file(tmp_path / "masked.gri")
+
+    whole = _mapsettings.MapGeometry.from_mapsettings({"templatefile": TEMPLATE})
+    assert whole.mask is None
+    geometry = _mapsettings.MapGeometry.from_mapsettings(
+        {"templatefile": str(tmp_path / "masked.gri")}
+    )
+    np.testing.assert_array_equal(geometry.mask, np.ma.getmaskarray(values))
+    with pytest.raises(ValueError):
+        geometry.mask[0, 0] = False
+
+    surf = geometry.surface(np.ones((geometry.ncol, geometry.nrow)))
+    np.testing.assert_array_equal(surf.values.mask, geometry.mask)
+    assert pickle.loads(pickle.dumps(geometry)).mask.sum() == geometry.mask.sum()
+    window = geometry.window(70, 10, 20, 30)
+    np.testing.assert_array_equal(window.mask, geometry.mask[70:90, 10:40])
+
+    grd = xtgeo.grid_from_file("tests/data/reek/reek_sim_grid.roff")
+    xcells, ycells, _ = (np.ma.filled(prop.values) for prop in grd.get_xyz())
+    cells = (xcells, ycells, np.ma.filled(grd.get_actnum().values, 0))
+    kept = _culling.cull(whole, cells).keep.sum()
+    assert _culling.cull(geometry, cells).keep.sum() < 0.8 * kept
+
+
+def test_map_geometry_made_once():
+    """The template is read once per config, and once per cache activation."""
+
+    config = {"mapsettings": {"templatefile": TEMPLATE}}
+    geometry = _mapsettings.map_geometry(config)
+    assert _mapsettings.map_geometry(config) is geometry
+
+    with _gridcache.active():
+        first = _mapsettings.map_geometry({"mapsettings": {"templatefile": TEMPLATE}})
+        second = _mapsettings.map_geometry({"mapsettings": {"templatefile": TEMPLATE}})
+        assert second is first
+        assert _gridcache.stats() == {"hits": 1, "misses": 1, "grids": 0}
+
+    settings = {"xori": 0.0, "yori": 0.0, "xinc": 25.0, "yinc": 50.0}
+    geometry = _mapsettings.map_geometry(
+        {"mapsettings": dict(settings, ncol=10, nrow=20)}
+    )
+    assert geometry.as_dict() == dict(settings, ncol=10, nrow=20, rotation=0.0, yflip=1)
@@ -0,0 +1,57 @@
+"""Testing streaming statistics per map node."""
+
+import numpy as np
+import pytest
+import xtgeo
+
+from grid3d_maps.mapstats import MapStatistics, P2Quantile
+
+
+def test_p2_quantiles_vs_numpy():
+    """The P-square percentiles are close to the exact ones."""
+    rng = np.random.default_rng(1234)
+    samples = rng.normal(loc=10.0, scale=2.0, size=(400, 30, 20))
+
+    quantiles = {pct: P2Quantile(pct / 100, (30, 20)) for pct in (10, 50, 90)}
+    for values in samples:
+        for quantile in quantiles.values():
+            quantile.add(values)
+
+    for pct, quantile in quantiles.items():
+        exact = np.percentile(samples, pct, axis=0)
+        assert np.abs(quantile.result() - exact).mean() < 0.1
+
+
+def test_p2_quantile_few_values():
+    """With less than five values per node, the quantile is exact."""
+    quantile = P2Quantile(0.9, (3,))
+    quantile.add(np.array([1.0, np.nan, 4.0]))
+    quantile.add(np.array([3.0, np.nan, np.nan]))
+
+    result = quantile.result()
+    assert result[0] == pytest.approx(np.quantile([1.0, 3.0], 0.9))
+    assert np.isnan(result[1])
+    assert result[2] == 4.0
+
+
+def test_map_statistics():
+    """Mean and std per node equal numpy, undefined nodes are skipped."""
+    rng = np.random.default_rng(42)
+    surf = xtgeo.RegularSurface(ncol=6, nrow=5, xinc=25, yinc=25, values=0.0)
+
+    samples = rng.uniform(0.0, 30.0, size=(50, 6, 5))
+    samples[::2, 0, 0] = np.nan
+
+    stats = MapStatistics()
+    for values in samples:
+        surf.values = np.ma.masked_invalid(values)
+        stats.add("z1", "oilthickness", "20010101", surf)
+
+    mean = stats.get_surface("z1", "oilthickness", "20010101", "mean")
+    std = stats.get_surface("z1", "oilthickness", "20010101", "std")
+    np.testing.assert_allclose(mean.values, np.nanmean(samples, axis=0))
+    np.testing.assert_allclose(std.values, np.nanstd(samples, axis=0, ddof=1))
+
+    other = xtgeo.RegularSurface(ncol=6, nrow=5, xinc=50, yinc=25, values=0.0)
+    with pytest.raises(ValueError, match="differs"):
+        stats.add("z1", "oilthickness", "20010101", other)
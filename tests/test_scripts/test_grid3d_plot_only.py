@@ -0,0 +1,124 @@
+"""Testing --plot-only, i.e. plotting from maps made in an earlier run."""
+
+import json
+
+import pytest
+import xtgeo
+import yaml
+
+import grid3d_maps.avghc.grid3d_average_map as grid3d_average_map
+import grid3d_maps.avghc.grid3d_hc_thickness as grid3d_hc_thickness
+from grid3d_maps.avghc import _export_via_fmudataio
+
+PLOTS = [
+    "all--plotonly_rockthickness.png",
+    "z1--plotonly_rockthickness.png",
+    "z2--plotonly_rockthickness.png",
+    "z3--plotonly_rockthickness.png",
+]
+
+
+def _hc_rock(yaml_config):
+    config = yaml_config("hc_rock1.yml")
+    config["plotsettings"] = {"valuerange": [0, 40]}
+    config["output"] = {"tag": "plotonly"}
+    return config
+
+
+def _no_grid_import(*args, **kwargs):
+    raise AssertionError("The grid shall not be imported with --plot-only")
+
+
+@pytest.mark.parametrize("mapcube", [False, True])
+def test_hc_thickness_plot_only(datatree, monkeypatch, mapcube, yaml_config):
+    """Plots made with --plot-only shall equal plots from the full run."""
+    result = datatree / f"plotonly_{mapcube}"
+    result.mkdir(parents=True)
+
+    config = _hc_rock(yaml_config)
+    if mapcube:
+        config["output"]["mapcube"] = str(result / "hcrock.g3dcube")
+    cfg = datatree / f"plotonly_{mapcube}.yml"
+    cfg.write_text(yaml.dump(config))
+
+    args = ["--config", str(cfg), "--mapfolder", str(result), "--plotfolder"]
+    grid3d_hc_thickness.main([*args, str(result)])
+    assert sorted(pfile.name for pfile in result.glob("*.png")) == PLOTS
+
+    replot = datatree / f"replot_{mapcube}"
+    replot.mkdir(parents=True)
+    monkeypatch.setattr(xtgeo, "grid_from_file", _no_grid_import)
+    grid3d_hc_thickness.main([*args, str(replot), "--plot-only"])
+
+    assert sorted(pfile.name for pfile in replot.glob("*.png")) == PLOTS
+    assert not list(replot.glob("*.gri"))
+
+
+def test_hc_thickness_plot_only_missing_plotfolder(datatree, yaml_config):
+    """Without a plotfolder, --plot-only has nothing to do."""
+    cfg = datatree / "plotonly_noplot.yml"
+    cfg.write_text(yaml.dump(_hc_rock(yaml_config)))
+
+    with pytest.raises(SystemExit):
+        grid3d_hc_thickness.main(["--config", str(cfg), "--plot-only"])
+
+
+AVGDATAIO = """
+title: Reek
+
+input:
+  grid: tests/data/reek/reek_sim_grid.roff
+  properties:
+    - name: PORO
+      source: tests/data/reek/reek_sim_poro.roff
+      metadata:
+        attribute: porosity
+        unit: fraction
+
+zonation:
+  zranges:
+    - Z1: [1, 5]
+    - Z2: [6, 14]
+
+computesettings:
+  zone: Yes
+  all: Yes
+
+mapsettings:
+  xori: 458300
+  xinc: 50
+  yori: 5928800
+  yinc: 50
+  ncol: 100
+  nrow: 100
+
+output:
+  mapfolder: fmu-dataio
+"""
+
+
+def test_average_map_plot_only_dataio(datatree, monkeypatch):
+    """The fmu-dataio maps are found again from the record of the export."""
+    plots = datatree / "plots"
+    plots.mkdir()
+    cfg = datatree / "plotonly_dataio.yml"
+    cfg.write_text(AVGDATAIO)
+
+    args = ["--config", str(cfg), "--plotfolder"]
+    grid3d_average_map.main([*args, str(plots)])
+    record = datatree / "share/results/maps" / _export_via_fmudataio.RECORD
+    exported = json.loads(record.read_text())
+    assert sorted(item["key"] for item in exported) == [
+        ["Z1", "PORO", ""],
+        ["Z2", "PORO", ""],
+        ["all", "PORO", ""],
+    ]
+
+    replot = datatree / "replot"
+    replot.mkdir()
+    monkeypatch.setattr(xtgeo, "grid_from_file", _no_grid_import)
+    grid3d_average_map.main([*args, str(replot), "--plot-only"])
+
+    expected = sorted(pfile.name for pfile in plots.glob("*.png"))
+    assert len(expected) == 3
+    assert sorted(pfile.name for pfile in replot.glob("*.png")) == expected
@@ -0,0 +1,85 @@
+"""Testing the plotting stage, serial and in a process pool."""
+
+import xtgeo
+import yaml
+
+import grid3d_maps.avghc.grid3d_hc_thickness as grid3d_hc_thickness
+from grid3d_maps.avghc import _compute_avg, _plotting
+
+
+def _run_hc_rock(datatree, yaml_config, folder, processes):
+    result = datatree / folder
+    result.mkdir(parents=True)
+
+    config = yaml_config("hc_rock1.yml")
+    config["plotsettings"] = {
+        "faultpolygons": "tests/data/reek/top_upper_reek_faultpoly.xyz",
+        "valuerange": [0, 40],
+        "processes": processes,
+    }
+    config["output"] = {"tag": "plot"}
+    cfg = datatree / f"{folder}.yml"
+    cfg.write_text(yaml.dump(config))
+
+    grid3d_hc_thickness.main(
+        [
+            "--config",
+            str(cfg),
+            "--mapfolder",
+            str(result),
+            "--plotfolder",
+            str(result),
+        ]
+    )
+    return sorted(pfile.name for pfile in result.glob("*.png"))
+
+
+def test_hc_thickness_plot_processes(datatree, yaml_config):
+    """Plots made in a process pool shall be equal to serial plotting."""
+    serial = _run_hc_rock(datatree, yaml_config, "serial", 1)
+    pooled = _run_hc_rock(datatree, yaml_config, "pooled", 3)
+
+    assert serial == [
+        "all--plot_rockthickness.png",
+        "z1--plot_rockthickness.png",
+        "z2--plot_rockthickness.png",
+        "z3--plot_rockthickness.png",
+    ]
+    assert pooled == serial
+
+
+def test_hc_thickness_plot_context_reads_faults_once(
+    datatree, monkeypatch, yaml_config
+):
+    """Fault polygons are read once per run, not once per plot."""
+    calls = []
+    polygons_from_file = xtgeo.polygons_from_file
+
+    def _counted(*args, **kwargs):
+        calls.append(args[0])
+        return polygons_from_file(*args, **kwargs)
+
+    monkeypatch.setattr(xtgeo, "polygons_from_file", _counted)
+
+    assert len(_run_hc_rock(datatree, yaml_config, "context", 1)) == 4
+    assert calls == ["tests/data/reek/top_upper_reek_faultpoly.xyz"]
+
+
+def test_plot_context_plotsettings_cached():
+    """The plotsettings hierarchy is resolved once per (property, zone)."""
+    config = {
+        "title": "Reek",
+        "output": {"tag": None},
+        "plotsettings": {"valuerange": [0, 1], "PORO": {"Z1": {"valuerange": [0, 2]}}},
+    }
+    plotcontext = _plotting.PlotContext(config)
+
+    pcfg1 = plotcontext.plotsettings(_compute_avg._avg_plotsettings, "Z1", "PORO")
+    pcfg1["title"] = "modified"
+    pcfg2 = plotcontext.plotsettings(_compute_avg._avg_plotsettings, "Z1", "PORO")
+    pcfg3 = plotcontext.plotsettings(_compute_avg._avg_plotsettings, "Z2", "PORO")
+
+    assert pcfg2["valuerange"] == (0, 2)
+    assert pcfg2["title"] == "Weighted average for PORO, zone Z1"
+    assert pcfg3["valuerange"] == (0, 1)
+    assert pcfg2["infotext"] == pcfg3["infotext"]
@@ -0,0 +1,77 @@
+"""Testing the float32 compute mode (tuning: precision)."""
+
+import logging
+import re
+
+import numpy as np
+import pytest
+
+import grid3d_maps.avghc.grid3d_average_map as grid3d_average_map
+import grid3d_maps.avghc.grid3d_hc_thickness as grid3d_hc_thickness
+from grid3d_maps.avghc import _get_grid_props
+
+
+def _numpies_mb(caplog):
+    """The MB of the numpies, as logged by _get_grid_props."""
+    return [float(value) for value in re.findall(r"use ([\d.]+) MB", caplog.text)]
+
+
+def test_compute_dtype():
+    """The float type from the config; only float64 and float32."""
+
+    config = {"computesettings": {"tuning": {"precision": "float32"}}}
+    assert _get_grid_props.compute_dtype(config) == np.float32
+
+    config["computesettings"]["tuning"]["precision"] = "float16"
+    with pytest.raises(ValueError, match="Unknown precision"):
+        _get_grid_props.compute_dtype(config)
+
+
+def test_average_map_float32(caplog, yaml_config, run_maps):
+    """The float32 maps are as the float64 maps, with less memory (1b)."""
+
+    caplog.set_level(logging.INFO, logger=_get_grid_props.__name__)
+
+    config = yaml_config("avg1b.yml")
+    maps = {}
+    memory = {}
+    for precision in ("float64", "float32"):
+        config["computesettings"]["tuning"] = {"precision": precision}
+        caplog.clear()
+        maps[precision] = run_maps(grid3d_average_map, config, precision)
+        memory[precision] = _numpies_mb(caplog)[0]
+
+    assert len(maps["float32"]) == 8
+    for name, values in maps["float64"].items():
+        np.testing.assert_array_equal(maps["float32"][name].mask, values.mask)
+        np.testing.assert_allclose(maps["float32"][name], values, rtol=1e-6)
+
+    assert memory["float32"] < 0.75 * memory["float64"]
+
+
+def test_hc_thickness_float32(caplog, yaml_config, map_runs):
+    """The float32 rock thickness, filtered, as float64; also for footprints."""
+
+    caplog.set_level(logging.INFO, logger=_get_grid_props.__name__)
+
+    maps = map_runs(
+        grid3d_hc_thickness,
+        yaml_config("hc_rock2.yml"),
+        {
+            f"{precision}{footprint}": {"footprint": footprint, "precision": precision}
+            for footprint in (False, True)
+            for precision in ("float64", "float32")
+        },
+    )
+    for footprint in (False, True):
+        thickness = {
+            precision: maps[f"{precision}{footprint}"]["all--rockthickness.gri"]
+            for precision in ("float64", "float32")
+        }
+        np.testing.assert_allclose(
+            thickness["float32"], thickness["float64"], rtol=1e-6, atol=1e-6
+        )
+        assert thickness["float32"].sum() > 0.0
+
+    first, second = _numpies_mb(caplog)[:2]
+    assert second < 0.75 * first
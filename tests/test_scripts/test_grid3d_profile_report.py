@@ -0,0 +1,141 @@
+"""Testing the profile report, with time and memory use per stage."""
+
+import json
+
+import yaml
+
+import grid3d_maps.avghc.grid3d_average_map as grid3d_average_map
+from grid3d_maps.avghc import _profiling, _threads
+
+
+def test_profile_stages_nested(tmp_path):
+    """Nested stages get the parent, and the peak memory includes children."""
+    report = tmp_path / "profile.json"
+    with _profiling.profile_report(str(report), "test"), _profiling.stage("outer"):
+        with _profiling.stage("inner", zone="Z1"):
+            data = bytearray(20 * 1024 * 1024)
+        del data
+
+    # outside a report, stages do nothing
+    with _profiling.stage("ignored"):
+        pass
+
+    stages = json.loads(report.read_text())["stages"]
+    assert [stage["stage"] for stage in stages] == ["total", "outer", "inner"]
+    total, outer, inner = stages
+    assert outer["parent"] == "total"
+    assert inner["parent"] == "outer"
+    assert inner["zone"] == "Z1"
+    assert inner["tracemalloc_peak_mb"] >= 20.0
+    assert outer["tracemalloc_peak_mb"] >= inner["tracemalloc_peak_mb"]
+    assert total["wall_time"] >= outer["wall_time"] >= inner["wall_time"]
+
+
+def test_profile_stages_in_threads(tmp_path):
+    """Stages in threads are traced, but recorded in the report only when run
+    by the thread of the report, so the parents are right."""
+    report = tmp_path / "profile.json"
+    trace = tmp_path / "trace.json"
+
+    def _staged(item):
+        with _profiling.stage("chunk", item=item):
+            return item
+
+    with (
+        _profiling.profile_report(str(report), "test"),
+        _profiling.trace(str(trace), "test"),
+        _profiling.stage("outer"),
+    ):
+        assert list(_threads.ordered_map(_staged, range(8), 3)) == list(range(8))
+        with _profiling.stage("inner"):
+            pass
+
+    stages = json.loads(report.read_text())["stages"]
+    assert [stage["stage"] for stage in stages] == ["total", "outer", "inner"]
+    assert stages[2]["parent"] == "outer"
+
+    events = json.loads(trace.read_text())["traceEvents"]
+    assert sum(event["name"] == "chunk" for event in events) == 8
+    assert sum(event["ph"] == "M" for event in events) == 1
+
+
+def test_average_map1c_profile_report(datatree):
+    """The stages of a run are written to the report."""
+    report = datatree / "avg1c_profile.json"
+    grid3d_average_map.main(
+        [
+            "--config",
+            "tests/yaml/avg1c.yml",
+            "--mapfolder",
+            str(datatree),
+            "--plotfolder",
+            str(datatree),
+            "--profile-report",
+            str(report),
+        ]
+    )
+
+    result = json.loads(report.read_text())
+    assert result["application"] == "grid3d_average_map"
+
+    stages = result["stages"]
+    names = {stage["stage"] for stage in stages}
+    assert {
+        "total",
+        "config parse",
+        "file discovery",
+        "grid import",
+        "property import",
+        "numpies",
+        "filters",
+        "zonation",
+        "mapping",
+        "export",
+        "plot",
+    } <= names
+
+    zones = [stage["zone"] for stage in stages if stage["stage"] == "mapping"]
+    assert zones == ["Z1", "Z2", "Z3", "Z1+3", "all"]
+    for stage in stages:
+        assert stage["wall_time"] >= 0.0
+        assert stage["cpu_time"] >= 0.0
+        assert stage["maxrss_mb"] > 0.0
+
+
+def test_average_map1c_trace(datatree, monkeypatch):
+    """Spans for stages, gridding and plots, with plots in worker processes."""
+    with open("tests/yaml/avg1c.yml", encoding="utf8") as stream:
+        config = yaml.safe_load(stream)
+    config["plotsettings"]["processes"] = 2
+    (datatree / "avg1c_trace.yml").write_text(yaml.dump(config))
+
+    trace = datatree / "avg1c_trace.json"
+    monkeypatch.setenv(_profiling.TRACE_ENV, str(trace))
+    grid3d_average_map.main(
+        [
+            "--config",
+            "avg1c_trace.yml",
+            "--mapfolder",
+            str(datatree),
+            "--plotfolder",
+            str(datatree),
+        ]
+    )
+
+    events = json.loads(trace.read_text())["traceEvents"]
+    spans = [event for event in events if event["ph"] == "X"]
+    names = [span["name"] for span in spans]
+    for name in ("grid import", "property import", "filters", "zonation", "plot"):
+        assert names.count(name) == 1
+    # 5 zones (incl. a super zone and all), 2 properties
+    assert names.count("gridding") == 10
+    assert names.count("export") == 10
+    assert names.count("quickplot") == 10
+    assert all(span["dur"] >= 0.0 for span in spans)
+
+    # the plots are made in two worker processes
+    main_pid = spans[0]["pid"]
+    workers = {span["pid"] for span in spans if span["name"] == "quickplot"}
+    assert main_pid not in workers
+    processes = [event for event in events if event["ph"] == "M"]
+    assert {event["pid"] for event in processes} == workers | {main_pid}
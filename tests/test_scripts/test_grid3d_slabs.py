@@ -0,0 +1,93 @@
+"""Testing the mapping of large grids in k-slabs (tuning: slabs)."""
+
+import numpy as np
+import pytest
+import xtgeo
+
+import grid3d_maps.avghc.grid3d_average_map as grid3d_average_map
+import grid3d_maps.avghc.grid3d_hc_thickness as grid3d_hc_thickness
+from grid3d_maps.avghc import _get_zonation_filters, _slabs
+
+GRID = "tests/data/reek/reek_sim_grid.roff"
+
+
+def test_slab_ranges():
+    """The slabs have at most slabsize layers, and cover all layers."""
+
+    assert _slabs.slab_ranges(14, 4) == [(0, 4), (4, 8), (8, 12), (12, 14)]
+    assert _slabs.slab_ranges(14, 20) == [(0, 14)]
+    assert _slabs.slab_ranges(3, 1) == [(0, 1), (1, 2), (2, 3)]
+
+
+def test_slab_grid(monkeypatch):
+    """A slab grid has the layers of the grid, and its properties and zones."""
+
+    grd = xtgeo.grid_from_file(GRID)
+    dz = grd.get_dz().values
+    poro = xtgeo.gridproperty_from_file("tests/data/reek/reek_sim_poro.roff", grid=grd)
+
+    calls = []
+    func = xtgeo.gridproperty_from_file
+
+    def _counted(*args, **kwargs):
+        calls.append(args[0])
+        return func(*args, **kwargs)
+
+    monkeypatch.setattr(xtgeo, "gridproperty_from_file", _counted)
+
+    slabs = _slabs.GridSlabs(grd, 4)
+    assert len(slabs) == 4
+
+    config = {"input": {}, "zonation": {"zranges": [{"Z1": [1, 5]}, {"Z2": [6, 14]}]}}
+    for slabgrid in slabs:
+        k0, k1 = _slabs.layer_range(slabgrid)
+        assert (slabgrid.k0, slabgrid.k1) == (k0, k1)
+        assert _slabs.first_layer(slabgrid) == k0
+        assert slabgrid.dimensions == (grd.ncol, grd.nrow, k1 - k0)
+        np.testing.assert_allclose(slabgrid.get_dz().values, dz[:, :, k0:k1])
+
+        slabporo = _slabs.gridproperty_from_file(
+            "tests/data/reek/reek_sim_poro.roff", slabgrid
+        )
+        np.testing.assert_array_equal(slabporo.values, poro.values[:, :, k0:k1])
+
+        zonation, zoned = _get_zonation_filters.zonation(config, slabgrid)
+        assert zoned == {"Z1": 1, "Z2": 2, "all": None}
+        expected = np.where(np.arange(k0, k1) < 5, 1, 2)
+        np.testing.assert_array_equal(zonation[0, 0, :], expected)
+
+    # the property is read once for all slabs, and the whole grid is no slab
+    assert calls == ["tests/data/reek/reek_sim_poro.roff"]
+    assert _slabs.layer_range(grd) is None
+    assert _slabs.first_layer(grd) == 0
+
+
+def test_average_map_slabs(yaml_config, map_runs, assert_same_maps):
+    """The average maps and statistics in k-slabs are as for the whole grid."""
+
+    config = yaml_config("avg1g.yml")
+    config["computesettings"]["weight"] = {"permx": "bulk"}
+    maps = map_runs(grid3d_average_map, config, {"whole": {}, "slabs": {"slabs": 4}})
+
+    assert len(maps["whole"]) > 10
+    assert_same_maps(maps["slabs"], maps["whole"])
+
+
+@pytest.mark.parametrize("footprint", [False, True])
+def test_hc_thickness_slabs(footprint, yaml_config, map_runs, assert_same_maps):
+    """The rock thickness in k-slabs is as for the whole grid."""
+
+    config = yaml_config("hc_rock2.yml")
+    config["zonation"]["superranges"] = [{"Z12": ["Z1", "Z2"]}]
+    config["computesettings"]["mask_outside"] = True
+    maps = map_runs(
+        grid3d_hc_thickness,
+        config,
+        {
+            "whole": {"footprint": footprint},
+            "slabs": {"footprint": footprint, "slabs": 3},
+        },
+    )
+
+    assert len(maps["whole"]) == 4
+    assert_same_maps(maps["slabs"], maps["whole"], exact=not footprint)
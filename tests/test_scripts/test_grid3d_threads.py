@@ -0,0 +1,230 @@
+"""Testing the mapping in threads (tuning: threads)."""
+
+import numpy as np
+import pytest
+import xtgeo
+
+import grid3d_maps.avghc.grid3d_average_map as grid3d_average_map
+import grid3d_maps.avghc.grid3d_hc_thickness as grid3d_hc_thickness
+from grid3d_maps.avghc import (
+    _compute_hcpfz,
+    _footprint,
+    _get_grid_props,
+    _gridding,
+    _threads,
+)
+from grid3d_maps.avghc._mapsettings import MapGeometry
+
+GEOMETRY = MapGeometry(
+    xori=456000.0, yori=5926000.0, xinc=40.0, yinc=40.0, ncol=150, nrow=200
+)
+
+
+@pytest.fixture(name="reek")
+def fixture_reek():
+    grd = xtgeo.grid_from_file("tests/data/reek/reek_sim_grid.roff")
+    xcells, ycells, zcells = (
+        np.ma.filled(prop.values) for prop in grd.get_xyz(asmasked=False)
+    )
+    actnum = np.ma.filled(grd.get_actnum().values, 0)
+    dz = np.ma.filled(grd.get_dz(asmasked=False).values)
+    dz[actnum == 0] = 0.0
+    poro = xtgeo.gridproperty_from_file(
+        "tests/data/reek/reek_sim_poro.roff", grid=grd
+    ).get_npvalues3d()
+    zonation = np.ones(dz.shape, dtype=np.int32)
+    zonation[:, :, 5:] = 2
+    return grd, xcells, ycells, zcells, dz, poro, zonation
+
+
+def test_threads_setting(monkeypatch):
+    """The threads from the config, else the environment, else 1."""
+
+    config = {"computesettings": {"tuning": {"threads": None}}}
+    monkeypatch.delenv(_threads.THREADS_ENV, raising=False)
+    assert _threads.threads(config) == 1
+
+    monkeypatch.setenv(_threads.THREADS_ENV, "4")
+    assert _threads.threads(config) == 4
+
+    config["computesettings"]["tuning"]["threads"] = 2
+    assert _threads.threads(config) == 2
+
+    config["computesettings"]["tuning"]["threads"] = 0
+    with pytest.raises(ValueError, match="1 or more"):
+        _threads.threads(config)
+
+    # the results are in the order of the items, for any number of threads
+    items = list(range(50))
+    assert list(_threads.ordered_map(lambda item: item * item, items, 7)) == [
+        item * item for item in items
+    ]
+
+
+def test_gridding_threads(reek):
+    """The gridding in threads is as without, and as xtgeo, bit for bit."""
+
+    _, xcells, ycells, zcells, dz, poro, zonation = reek
+    hcpfz = poro * dz * (zcells > 1650.0)
+
+    for zone_avg, coarsen in ((False, 1), (True, 2)):
+        settings = {"zone_minmax": (1, 1), "zone_avg": zone_avg, "coarsen": coarsen}
+        hcmap = GEOMETRY.surface()
+        hcmap.hc_thickness_from_3dprops(
+            xprop=xcells,
+            yprop=ycells,
+            hcpfzprop=hcpfz,
+            dzprop=dz,
+            zoneprop=zonation,
+            mask_outside=True,
+            **settings,
+        )
+        avgmap = GEOMETRY.surface()
+        avgmap.avg_from_3dprop(
+            xprop=xcells,
+            yprop=ycells,
+            mprop=poro,
+            dzprop=dz,
+            zoneprop=zonation,
+            **settings,
+        )
+
+        expected = None
+        for threads in (1, 3):
+            thickness = _gridding.node_thickness(
+                GEOMETRY,
+                xcells,
+                ycells,
+                hcpfz,
+                dz,
+                zonation,
+                (1, 1),
+                zone_avg=zone_avg,
+                coarsen=coarsen,
+                mask_outside=True,
+                threads=threads,
+            )
+            np.testing.assert_array_equal(thickness.mask, hcmap.values.mask)
+            np.testing.assert_array_equal(thickness, hcmap.values)
+
+            statistics = _gridding.node_statistics(
+                GEOMETRY,
+                xcells,
+                ycells,
+                poro,
+                dz,
+                zonation,
+                (1, 1),
+                statistics=("mean", "max", "p50"),
+                zone_avg=zone_avg,
+                coarsen=coarsen,
+                threads=threads,
+            )
+            np.testing.assert_array_equal(statistics["mean"], avgmap.values)
+
+            if expected is None:
+                expected = statistics
+            for stat, values in statistics.items():
+                np.testing.assert_array_equal(values.mask, expected[stat].mask)
+                np.testing.assert_array_equal(values, expected[stat])
+
+
+@pytest.mark.parametrize("hcmode", ["oil", "gas", "comb", "rock"])
+@pytest.mark.parametrize("method", ["use_poro", "dz_only"])
+def test_gridding_hc_modes(reek, hcmode, method):
+    """The HC thickness in threads is as xtgeo, for the HC modes and a date pair."""
+
+    _, xcells, ycells, zcells, dz, poro, zonation = reek
+    sgas = np.clip((1620.0 - zcells) / 40.0, 0.0, 0.8)
+    soil = np.clip((1700.0 - zcells) / 60.0, 0.0, 0.8) - sgas
+    restartd = {
+        "sgas_20010101": sgas,
+        "soil_20010101": np.clip(soil, 0.0, None),
+        "sgas_19991201": sgas * 0.5,
+        "soil_19991201": np.clip(soil * 1.2, 0.0, None),
+    }
+    config = {
+        "input": {"dates": ["20010101", "20010101-19991201"]},
+        "computesettings": {"shc_interval": [0.0001, 1.0], "method": method},
+    }
+    initd = {"poro": poro, "ntg": np.ones_like(poro), "dz": dz}
+    hcpfzd = _compute_hcpfz.get_hcpfz(
+        config, initd, restartd, ["20010101", "19991201"], hcmode, 1.0
+    )
+    assert len(hcpfzd) == (1 if hcmode == "rock" else 2)
+
+    for hcpfz in hcpfzd.values():
+        for zone_avg, mask_outside in ((False, True), (True, False)):
+            hcmap = GEOMETRY.surface()
+            hcmap.hc_thickness_from_3dprops(
+                xprop=xcells,
+                yprop=ycells,
+                hcpfzprop=hcpfz,
+                dzprop=dz,
+                zoneprop=zonation,
+                zone_minmax=(2, 2),
+                zone_avg=zone_avg,
+                mask_outside=mask_outside,
+            )
+            thickness = _gridding.node_thickness(
+                GEOMETRY,
+                xcells,
+                ycells,
+                hcpfz,
+                dz,
+                zonation,
+                (2, 2),
+                zone_avg=zone_avg,
+                mask_outside=mask_outside,
+                threads=2,
+            )
+            np.testing.assert_array_equal(thickness.mask, hcmap.values.mask)
+            np.testing.assert_array_equal(thickness, hcmap.values)
+            assert thickness.count() > 1000
+
+
+def test_footprint_threads(reek, monkeypatch):
+    """The footprint chunks in threads give the same sums, bit for bit."""
+
+    grd, _, _, _, dz, poro, zonation = reek
+    corners = _footprint.map_index_corners(GEOMETRY, _get_grid_props._top_corners(grd))
+
+    # many small chunks
+    monkeypatch.setattr(_footprint, "CHUNKSIZE", 5000)
+    serial = _footprint.average(GEOMETRY, corners, [poro], dz, zonation == 1)[0]
+    threaded = _footprint.average(
+        GEOMETRY, corners, [poro], dz, zonation == 1, threads=4
+    )[0]
+    np.testing.assert_array_equal(threaded.mask, serial.mask)
+    np.testing.assert_array_equal(threaded, serial)
+    assert serial.count() > 1000
+
+
+def test_average_map_threads(monkeypatch, yaml_config, run_maps, assert_same_maps):
+    """Average maps with threads from the environment, as without (1c)."""
+
+    config = yaml_config("avg1c.yml")
+    config["computesettings"]["tuning"] = {"coarsen": 2}
+
+    maps = {}
+    for threads in ("1", "3"):
+        monkeypatch.setenv(_threads.THREADS_ENV, threads)
+        maps[threads] = run_maps(grid3d_average_map, config, threads)
+
+    assert len(maps["1"]) > 2
+    assert_same_maps(maps["3"], maps["1"])
+
+
+def test_hc_thickness_threads(monkeypatch, yaml_config, run_maps, assert_same_maps):
+    """HC thickness maps with threads (by _gridding) as without (by xtgeo)."""
+
+    config = yaml_config("hc_rock1.yml")
+    config["computesettings"]["tuning"] = {"zone_avg": True}
+
+    maps = {}
+    for threads in ("1", "3"):
+        monkeypatch.setenv(_threads.THREADS_ENV, threads)
+        maps[threads] = run_maps(grid3d_hc_thickness, config, threads)
+
+    assert len(maps["1"]) == 4
+    assert_same_maps(maps["3"], maps["1"])
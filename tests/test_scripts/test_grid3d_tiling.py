@@ -0,0 +1,89 @@
+"""Testing the tiled mapping of large maps (tuning: tiles)."""
+
+import numpy as np
+import pytest
+import xtgeo
+import yaml
+
+import grid3d_maps.avghc.grid3d_average_map as grid3d_average_map
+import grid3d_maps.avghc.grid3d_hc_thickness as grid3d_hc_thickness
+from grid3d_maps.avghc import _tiling
+from grid3d_maps.avghc._mapsettings import MapGeometry
+from grid3d_maps.mapcube import MapCube
+
+
+def test_tiles_cover_map():
+    """The tiles split the map, and each tile has the nodes of the map."""
+
+    grd = xtgeo.grid_from_file("tests/data/reek/reek_sim_grid.roff")
+    xcells, ycells, _ = (np.ma.filled(prop.values) for prop in grd.get_xyz())
+    actnum = np.ma.filled(grd.get_actnum().values, 0)
+
+    geometry = MapGeometry.from_mapsettings(
+        {"templatefile": "tests/data/reek/reek_hcmap_rotated.gri"}
+    )
+    tiles = _tiling.tiles(geometry, 50, (xcells, ycells, actnum), coarsen=2)
+
+    covered = np.zeros((geometry.ncol, geometry.nrow), dtype=np.int32)
+    xnodes, ynodes = geometry.nodes()
+    for tile in tiles:
+        inode0, inode1, jnode0, jnode1 = tile.nodes
+        covered[inode0:inode1, jnode0:jnode1] += 1
+
+        xtile, ytile = tile.geometry.nodes()
+        np.testing.assert_allclose(xtile, xnodes[inode0:inode1, jnode0:jnode1])
+        np.testing.assert_allclose(ytile, ynodes[inode0:inode1, jnode0:jnode1])
+        assert tile.columns[0] % 2 == 0
+        assert tile.columns[2] % 2 == 0
+
+    # tiles without cells are left out
+    assert covered.max() == 1
+    assert 1 < len(tiles) < 16
+
+
+def test_average_map_tiled(yaml_config, map_runs):
+    """The tiled maps are as the whole maps; exactly for footprints."""
+
+    maps = map_runs(
+        grid3d_average_map,
+        yaml_config("avg1c.yml"),
+        {
+            "whole": {"footprint": True},
+            "tiled": {"footprint": True, "tiles": 40},
+            "wholegrid": {},
+            "tiledgrid": {"tiles": 40},
+        },
+    )
+    por = {
+        name: runmaps["all--avg1c_average_por.gri"] for name, runmaps in maps.items()
+    }
+
+    np.testing.assert_array_equal(por["tiled"].mask, por["whole"].mask)
+    np.testing.assert_allclose(por["tiled"], por["whole"], atol=1e-12)
+
+    # gridded, differences where the triangles are not unique, and along the
+    # edges of the grid, where the whole map triangles span the concave edges
+    same = np.isclose(por["tiledgrid"], por["wholegrid"], rtol=0.0, atol=1e-9)
+    assert same.sum() > 0.98 * por["wholegrid"].count()
+    assert por["tiledgrid"].mean() == pytest.approx(por["wholegrid"].mean(), abs=0.001)
+
+
+def test_hc_thickness_tiled(tmp_path, yaml_config):
+    """The HC (rock) thickness in tiles, with footprints, to a map cube."""
+
+    thickness = {}
+    for name, tuning in (("whole", {}), ("tiled", {"tiles": 30})):
+        config = yaml_config("hc_rock1.yml")
+        config["output"]["mapfolder"] = str(tmp_path)
+        config["computesettings"]["tuning"] = dict(tuning, footprint=True)
+        config["output"]["mapcube"] = str(tmp_path / f"{name}.g3dcube")
+        (tmp_path / "hc.yml").write_text(yaml.dump(config))
+
+        grid3d_hc_thickness.main(["--config", str(tmp_path / "hc.yml")])
+        cube = MapCube(tmp_path / f"{name}.g3dcube")
+        thickness[name] = [
+            cube.get_values(zone, "rockthickness") for zone in ("Z1", "all")
+        ]
+
+    np.testing.assert_allclose(thickness["tiled"], thickness["whole"], atol=1e-9)
+    assert np.nansum(thickness["tiled"][1]) > 0.0
@@ -0,0 +1,141 @@
+"""Testing time-lapse maps, for all (or a range of) report steps in an UNRST."""
+
+import numpy as np
+import pytest
+import xtgeo
+import yaml
+
+import grid3d_maps.avghc.grid3d_average_map as grid3d_average_map
+from grid3d_maps.avghc import _timelapse
+from grid3d_maps.mapcube import MapCube
+
+UNRST = "tests/data/reek/REEK_LETTERS_W_SPACE.UNRST"
+
+CONFIG = {
+    "title": "Reek",
+    "input": {
+        "eclroot": "tests/data/reek/REEK_LETTERS_W_SPACE",
+        "grid": "tests/data/reek/REEK.EGRID",
+    },
+    "zonation": {"zranges": [{"Z1": [1, 5]}, {"Z2": [6, 14]}]},
+    "computesettings": {"zone": True, "all": True},
+    "mapsettings": {
+        "xori": 457000,
+        "xinc": 50,
+        "yori": 5927000,
+        "yinc": 50,
+        "ncol": 200,
+        "nrow": 250,
+    },
+}
+
+
+def test_expand_dates():
+    """Dates as all, ranges and strides, from the report steps in the UNRST."""
+
+    assert _timelapse.report_dates(UNRST) == ["19991201", "20000101"]
+    assert _timelapse.expand_dates(["all"], UNRST) == ["19991201", "20000101"]
+    assert _timelapse.expand_dates(["all:2"], UNRST) == ["19991201"]
+    assert _timelapse.expand_dates(["19991215:20001231"], UNRST) == ["20000101"]
+    assert _timelapse.expand_dates(
+        ["19991201:20000101:2", "20000101-19991201", "19991201"], UNRST
+    ) == ["19991201", "20000101-19991201"]
+
+    with pytest.raises(ValueError, match="stride"):
+        _timelapse.expand_dates(["all:0"], UNRST)
+
+
+def test_average_map_timelapse(datatree):
+    """All report steps, one step at a time, as the same dates listed."""
+
+    config = dict(CONFIG, input=dict(CONFIG["input"]))
+    config["input"]["PRESSURE--all"] = "$eclroot.UNRST"
+    config["output"] = {
+        "mapfolder": str(datatree),
+        "plotfolder": str(datatree),
+        "animation": True,
+    }
+    (datatree / "timelapse.yml").write_text(yaml.dump(config))
+    grid3d_average_map.main(["--config", str(datatree / "timelapse.yml")])
+
+    del config["input"]["PRESSURE--all"]
+    config["input"]["PRESSURE--19991201"] = "$eclroot.UNRST"
+    config["input"]["PRESSURE--20000101"] = "$eclroot.UNRST"
+    config["output"] = {"mapfolder": str(datatree), "mapcube": "listed.g3dcube"}
+    (datatree / "listed.yml").write_text(yaml.dump(config))
+    grid3d_average_map.main(["--config", str(datatree / "listed.yml")])
+
+    cube = MapCube(datatree / "average_map_timelapse.g3dcube")
+    listed = MapCube(datatree / "listed.g3dcube")
+    assert sorted(cube.keys()) == sorted(listed.keys())
+    assert len(cube.keys()) == 6
+    for key in cube.keys():  # noqa: SIM118
+        np.testing.assert_allclose(
+            cube.get_surface(*key).values.filled(np.nan),
+            listed.get_surface(*key).values.filled(np.nan),
+        )
+
+    for zone in ("z1", "z2", "all"):
+        assert (datatree / f"{zone}--pressure.gif").is_file()
+
+
+def test_timelapse_batches():
+    """Batches of report steps, keeping the steps that later batches need."""
+
+    assert _timelapse.batches(["19991201", "20000101", "20010101"], 2) == [
+        (["19991201", "20000101"], ["19991201", "20000101"], set()),
+        (["20010101"], ["20010101"], set()),
+    ]
+    assert _timelapse.batches(["20000101-19991201", "20010101-19991201"], 1) == [
+        (["20000101-19991201"], ["19991201", "20000101"], {"19991201"}),
+        (["20010101-19991201"], ["19991201", "20010101"], set()),
+    ]
+
+
+def test_restart_reader():
+    """The UNRST is read forward once, with the properties as from xtgeo."""
+
+    grd = xtgeo.grid_from_file("tests/data/reek/REEK.EGRID")
+    expected = xtgeo.gridproperties_from_file(
+        UNRST, fformat="unrst", names=["PRESSURE"], dates="all", grid=grd
+    )
+
+    with _timelapse.RestartReader(grd, {"PRESSURE": UNRST}) as reader:
+        props = reader.read(["19991201"], keep={"19991201"})
+        stream = reader._files[UNRST]["stream"]
+        props += reader.read(["19991201", "20000101"])[1:]
+        assert reader._files[UNRST]["stream"] is stream
+        assert reader.read(["20000101"])
+
+    assert [prop.name for prop in props] == [prop.name for prop in expected.props]
+    for prop, exp in zip(props, expected.props):
+        assert prop.date == exp.date
+        np.testing.assert_array_equal(prop.values, exp.values)
+        assert (prop.values.mask == exp.values.mask).all()
+
+
+def test_average_map_timelapse_steps(datatree):
+    """The maps are the same for any number of report steps per batch."""
+
+    cubes = []
+    for nsteps in (1, 10):
+        config = dict(CONFIG, input=dict(CONFIG["input"]))
+        config["input"]["PRESSURE--all"] = "$eclroot.UNRST"
+        config["computesettings"] = dict(
+            CONFIG["computesettings"], tuning={"steps": nsteps}
+        )
+        config["output"] = {
+            "mapfolder": str(datatree),
+            "mapcube": f"steps{nsteps}.g3dcube",
+        }
+        (datatree / "steps.yml").write_text(yaml.dump(config))
+        grid3d_average_map.main(["--config", str(datatree / "steps.yml")])
+        cubes.append(MapCube(datatree / f"steps{nsteps}.g3dcube"))
+
+    assert len(cubes[0].keys()) == 6
+    assert sorted(cubes[0].keys()) == sorted(cubes[1].keys())
+    for key in cubes[0].keys():  # noqa: SIM118
+        np.testing.assert_array_equal(
+            cubes[0].get_surface(*key).values.filled(np.nan),
+            cubes[1].get_surface(*key).values.filled(np.nan),
+        )
@@ -0,0 +1,92 @@
+"""Testing the mapping of zones in a pool of processes (tuning: processes)."""
+
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+import grid3d_maps.avghc.grid3d_average_map as grid3d_average_map
+import grid3d_maps.avghc.grid3d_hc_thickness as grid3d_hc_thickness
+from grid3d_maps.avghc import _get_zonation_filters, _zonepool
+
+
+def test_shared_arrays():
+    """The numpies are shared once, and rebuilt as read only views."""
+
+    dz = np.arange(24, dtype=np.float32).reshape(2, 3, 4)
+    zonation = np.ones((2, 3, 4), dtype=np.int32)
+    arrays = {
+        "propd": {"PORO": np.linspace(0.0, 1.0, 24).reshape(2, 3, 4)},
+        "usedweights": {"dz": dz, "PORO": dz},
+        "zonation": zonation,
+        "corners": (dz[:, :, 0], dz[:, :, 1]),
+        "other": None,
+    }
+
+    with _zonepool.SharedArrays(arrays) as shared:
+        assert len(shared.layout) == 5
+        assert all(offset % 64 == 0 for offset, _, _ in shared.layout)
+
+        shm = shared_memory.SharedMemory(name=shared.name)
+        views = _zonepool.attach(shm, shared.structure, shared.layout)
+        np.testing.assert_array_equal(views["propd"]["PORO"], arrays["propd"]["PORO"])
+        assert views["usedweights"]["dz"] is views["usedweights"]["PORO"]
+        assert views["usedweights"]["dz"].dtype == np.float32
+        np.testing.assert_array_equal(views["zonation"], zonation)
+        np.testing.assert_array_equal(views["corners"][1], dz[:, :, 1])
+        assert views["other"] is None
+        with pytest.raises(ValueError, match="read-only"):
+            views["zonation"][0, 0, 0] = 2
+        del views
+        shm.close()
+
+
+def test_zones_to_map_and_subset():
+    """The zones to map from the computesettings, and their zonation."""
+
+    zonation = np.array([1, 1, 2, 3], dtype=np.int32).reshape(1, 1, 4)
+    zoned = {"Z1": 1, "Z2": 2, "Z3": 3, "Z12": [1, 2]}
+    config = {"computesettings": {"zone": True, "all": False}}
+    zones = _get_zonation_filters.zones_to_map(config, {"all": 999, **zoned})
+    assert [zname for zname, _ in zones] == ["Z1", "Z2", "Z3", "Z12"]
+
+    subset, zrange = _get_zonation_filters.zone_subset(zonation, "Z12", [1, 2])
+    assert zrange == 888
+    np.testing.assert_array_equal(subset.ravel(), [888, 888, 888, 0])
+
+    subset, zrange = _get_zonation_filters.zone_subset(zonation, "all", 999)
+    assert zrange == 999
+    assert (subset == 999).all()
+
+    assert _get_zonation_filters.zone_subset(zonation, "Z3", 3) == (zonation, 3)
+
+
+def test_average_map_processes(yaml_config, map_runs, assert_same_maps):
+    """The zone average maps in processes are as in one process (1c)."""
+
+    config = yaml_config("avg1c.yml")
+    config["computesettings"]["zone"] = True
+    maps = map_runs(
+        grid3d_average_map,
+        config,
+        {processes: {"coarsen": 2, "processes": processes} for processes in (1, 2)},
+    )
+
+    assert len(maps[1]) > 2
+    assert_same_maps(maps[2], maps[1])
+
+
+def test_hc_thickness_processes(yaml_config, map_runs, assert_same_maps):
+    """The rock thickness of each zone in processes, as in one (footprints)."""
+
+    maps = map_runs(
+        grid3d_hc_thickness,
+        yaml_config("hc_rock2.yml"),
+        {
+            processes: {"footprint": True, "processes": processes}
+            for processes in (1, 2)
+        },
+    )
+
+    assert len(maps[1]) == 3
+    assert_same_maps(maps[2], maps[1])
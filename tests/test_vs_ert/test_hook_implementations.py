@@ -14,12 +14,14 @@ except ImportError:
 import grid3d_maps.hook_implementations.jobs as jobs
 from grid3d_maps.forward_models import (
     Grid3dAverageMap,
+    Grid3dHcAverageMaps,
     Grid3dHcThickness,
 )
 
 EXPECTED_JOBS = {
     "GRID3D_AVERAGE_MAP",
     "GRID3D_HC_THICKNESS",
+    "GRID3D_HC_AVERAGE_MAPS",
 }
 
 
@@ -30,6 +32,7 @@ def test_that_installable_fm_steps_work_as_plugins():
 
     assert Grid3dHcThickness in fms
     assert Grid3dAverageMap in fms
+    assert Grid3dHcAverageMaps in fms
 
     assert len(fms) == len(EXPECTED_JOBS)
 